@@ -24,11 +24,43 @@ class Settings:
     
     # Redis
     REDIS_URL: Optional[str] = field(default_factory=lambda: os.getenv("REDIS_URL"))
+    STATE_BACKEND: str = field(default_factory=lambda: os.getenv("STATE_BACKEND", "auto"))
+    STATE_KEY_PREFIX: str = field(default_factory=lambda: os.getenv("STATE_KEY_PREFIX", "vpnbot"))
+    FSM_STORAGE_TTL_HOURS: int = field(default_factory=lambda: int(os.getenv("FSM_STORAGE_TTL_HOURS", "48")))
+    LEADER_LOCK_TTL_SECONDS: int = field(default_factory=lambda: int(os.getenv("LEADER_LOCK_TTL_SECONDS", "30")))
+    THROTTLING_ENABLED: bool = field(default_factory=lambda: os.getenv("THROTTLING_ENABLED", "true").lower() == "true")
+    THROTTLE_MESSAGE_INTERVAL: float = field(default_factory=lambda: float(os.getenv("THROTTLE_MESSAGE_INTERVAL", "0.5")))
+    THROTTLE_MESSAGE_BURST: int = field(default_factory=lambda: int(os.getenv("THROTTLE_MESSAGE_BURST", "3")))
+    THROTTLE_CALLBACK_INTERVAL: float = field(default_factory=lambda: float(os.getenv("THROTTLE_CALLBACK_INTERVAL", "0.3")))
+    THROTTLE_CALLBACK_BURST: int = field(default_factory=lambda: int(os.getenv("THROTTLE_CALLBACK_BURST", "5")))
+    THROTTLE_PAYMENT_INTERVAL: float = field(default_factory=lambda: float(os.getenv("THROTTLE_PAYMENT_INTERVAL", "2.0")))
+    THROTTLE_PAYMENT_BURST: int = field(default_factory=lambda: int(os.getenv("THROTTLE_PAYMENT_BURST", "1")))
     
     # Remnawave
     REMNAWAVE_URL: str = field(default_factory=lambda: os.getenv("REMNAWAVE_URL", ""))
     REMNAWAVE_API_KEY: str = field(default_factory=lambda: os.getenv("REMNAWAVE_API_KEY", ""))
     REMNAWAVE_SECRET_KEY: Optional[str] = field(default_factory=lambda: os.getenv("REMNAWAVE_SECRET_KEY"))
+    # Shared HTTP connection pool to the panel
+    REMNAWAVE_POOL_SIZE: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_POOL_SIZE", "100")))
+    REMNAWAVE_POOL_PER_HOST: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_POOL_PER_HOST", "50")))
+    REMNAWAVE_KEEPALIVE_SECONDS: float = field(default_factory=lambda: float(os.getenv("REMNAWAVE_KEEPALIVE_SECONDS", "30")))
+    REMNAWAVE_DNS_CACHE_SECONDS: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_DNS_CACHE_SECONDS", "300")))
+    REMNAWAVE_MAX_RETRIES: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_MAX_RETRIES", "2")))
+    REMNAWAVE_RETRY_BACKOFF_SECONDS: float = field(default_factory=lambda: float(os.getenv("REMNAWAVE_RETRY_BACKOFF_SECONDS", "0.5")))
+    # Squad migration: subscriptions per committed page and parallel panel updates
+    SQUAD_MIGRATION_CHUNK_SIZE: int = field(default_factory=lambda: int(os.getenv("SQUAD_MIGRATION_CHUNK_SIZE", "500")))
+    SQUAD_MIGRATION_CONCURRENCY: int = field(default_factory=lambda: int(os.getenv("SQUAD_MIGRATION_CONCURRENCY", "10")))
+    # Panel users snapshot shared by background jobs
+    REMNAWAVE_SNAPSHOT_TTL_SECONDS: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SNAPSHOT_TTL_SECONDS", "300")))
+    REMNAWAVE_SNAPSHOT_PAGE_SIZE: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SNAPSHOT_PAGE_SIZE", "500")))
+    REMNAWAVE_SNAPSHOT_PAGE_CONCURRENCY: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SNAPSHOT_PAGE_CONCURRENCY", "4")))
+    # Panel -> bot users sync: rows per bulk statement and parallel panel calls
+    REMNAWAVE_SYNC_CHUNK_SIZE: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SYNC_CHUNK_SIZE", "1000")))
+    REMNAWAVE_SYNC_CONCURRENCY: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SYNC_CONCURRENCY", "10")))
+    # Auto sync: reconcile only users changed since the updatedAt watermark, full sync as a safety net
+    REMNAWAVE_INCREMENTAL_SYNC_ENABLED: bool = field(default_factory=lambda: os.getenv("REMNAWAVE_INCREMENTAL_SYNC_ENABLED", "true").lower() == "true")
+    REMNAWAVE_FULL_SYNC_INTERVAL_HOURS: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_FULL_SYNC_INTERVAL_HOURS", "24")))
+    REMNAWAVE_SYNC_WATERMARK_OVERLAP_SECONDS: int = field(default_factory=lambda: int(os.getenv("REMNAWAVE_SYNC_WATERMARK_OVERLAP_SECONDS", "300")))
     
     # YooKassa
     YOOKASSA_SHOP_ID: str = field(default_factory=lambda: os.getenv("YOOKASSA_SHOP_ID", ""))
@@ -41,8 +73,44 @@ class Settings:
     
     # Subscription pricing (rubles per day per device)
     SUBSCRIPTION_DAILY_PRICE: float = field(default_factory=lambda: float(os.getenv("SUBSCRIPTION_DAILY_PRICE", "6.0")))
+    # In-memory pricing catalog: max age of the snapshot for changes made by other workers
+    PRICING_CATALOG_TTL_SECONDS: int = field(default_factory=lambda: int(os.getenv("PRICING_CATALOG_TTL_SECONDS", "300")))
     # Daily billing time (HH:MM format, UTC)
     DAILY_BILLING_TIME: str = field(default_factory=lambda: os.getenv("DAILY_BILLING_TIME", "00:05"))
+    # Daily billing pipeline: users per keyset chunk and parallel panel requests
+    DAILY_BILLING_CHUNK_SIZE: int = field(default_factory=lambda: int(os.getenv("DAILY_BILLING_CHUNK_SIZE", "500")))
+    DAILY_BILLING_CONCURRENCY: int = field(default_factory=lambda: int(os.getenv("DAILY_BILLING_CONCURRENCY", "20")))
+    # Per-update user context: LRU of immutable user identity fields and batched last_activity writes
+    USER_CONTEXT_CACHE_TTL_SECONDS: float = field(default_factory=lambda: float(os.getenv("USER_CONTEXT_CACHE_TTL_SECONDS", "30")))
+    USER_CONTEXT_CACHE_SIZE: int = field(default_factory=lambda: int(os.getenv("USER_CONTEXT_CACHE_SIZE", "10000")))
+    USER_ACTIVITY_FLUSH_SECONDS: float = field(default_factory=lambda: float(os.getenv("USER_ACTIVITY_FLUSH_SECONDS", "60")))
+    # Mini app: shared content cache (bumped on writes) and per-user panel cache with stale-while-revalidate
+    MINIAPP_CONTENT_CACHE_TTL_SECONDS: float = field(default_factory=lambda: float(os.getenv("MINIAPP_CONTENT_CACHE_TTL_SECONDS", "600")))
+    MINIAPP_PANEL_CACHE_TTL_SECONDS: float = field(default_factory=lambda: float(os.getenv("MINIAPP_PANEL_CACHE_TTL_SECONDS", "30")))
+    MINIAPP_PANEL_CACHE_STALE_SECONDS: float = field(default_factory=lambda: float(os.getenv("MINIAPP_PANEL_CACHE_STALE_SECONDS", "300")))
+    # Mini app payment status polling: cache for pending/final statuses and parallel provider calls per method
+    MINIAPP_PAYMENT_STATUS_CACHE_SECONDS: float = field(default_factory=lambda: float(os.getenv("MINIAPP_PAYMENT_STATUS_CACHE_SECONDS", "5")))
+    MINIAPP_PAYMENT_STATUS_FINAL_CACHE_SECONDS: float = field(default_factory=lambda: float(os.getenv("MINIAPP_PAYMENT_STATUS_FINAL_CACHE_SECONDS", "600")))
+    MINIAPP_PAYMENT_STATUS_PROVIDER_CONCURRENCY: int = field(default_factory=lambda: int(os.getenv("MINIAPP_PAYMENT_STATUS_PROVIDER_CONCURRENCY", "4")))
+    # Auto payment verification: base interval, age tiers ("age_min:interval_min"), per-provider pools ("3,pal24=2")
+    PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED: bool = field(default_factory=lambda: os.getenv("PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED", "false").lower() == "true")
+    PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES: int = field(default_factory=lambda: int(os.getenv("PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES", "10")))
+    PAYMENT_VERIFICATION_AGE_TIERS: str = field(default_factory=lambda: os.getenv("PAYMENT_VERIFICATION_AGE_TIERS", "10:1,60:3,360:10"))
+    PAYMENT_VERIFICATION_PROVIDER_CONCURRENCY: str = field(default_factory=lambda: os.getenv("PAYMENT_VERIFICATION_PROVIDER_CONCURRENCY", "3"))
+    PAYMENT_VERIFICATION_CHECK_TIMEOUT_SECONDS: str = field(default_factory=lambda: os.getenv("PAYMENT_VERIFICATION_CHECK_TIMEOUT_SECONDS", "30"))
+    # Daily stats rollups: how often the current and unfinished days are recomputed, and how long committed deltas are buffered
+    STATS_ROLLUP_REFRESH_MINUTES: int = field(default_factory=lambda: int(os.getenv("STATS_ROLLUP_REFRESH_MINUTES", "15")))
+    STATS_ROLLUP_FLUSH_SECONDS: float = field(default_factory=lambda: float(os.getenv("STATS_ROLLUP_FLUSH_SECONDS", "5")))
+    # Shared outbound Telegram send scheduler: global token bucket, per-chat pacing and retries
+    TELEGRAM_SEND_RATE: float = field(default_factory=lambda: float(os.getenv("TELEGRAM_SEND_RATE", "25")))
+    TELEGRAM_SEND_BURST: int = field(default_factory=lambda: int(os.getenv("TELEGRAM_SEND_BURST", "30")))
+    TELEGRAM_PER_CHAT_INTERVAL: float = field(default_factory=lambda: float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "1.0")))
+    TELEGRAM_SEND_WORKERS: int = field(default_factory=lambda: int(os.getenv("TELEGRAM_SEND_WORKERS", "20")))
+    TELEGRAM_SEND_MAX_RETRIES: int = field(default_factory=lambda: int(os.getenv("TELEGRAM_SEND_MAX_RETRIES", "3")))
+    # Broadcast checkpoints: how long blocked/deactivated recipients are skipped (0 = forever)
+    BROADCAST_UNREACHABLE_TTL_DAYS: int = field(default_factory=lambda: int(os.getenv("BROADCAST_UNREACHABLE_TTL_DAYS", "30")))
+    # Admin chat notifications: routine events are coalesced into one digest per window (0 = next loop tick)
+    ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS: float = field(default_factory=lambda: float(os.getenv("ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS", "10")))
     # Device limit: 0 = unlimited
     DEVICE_LIMIT_ENABLED: bool = field(default_factory=lambda: os.getenv("DEVICE_LIMIT_ENABLED", "false").lower() == "true")
     
@@ -84,6 +152,9 @@ class Settings:
     BACKUP_AUTO_ENABLED: bool = field(default_factory=lambda: os.getenv("BACKUP_AUTO_ENABLED", "false").lower() == "true")
     BACKUP_INTERVAL_HOURS: int = field(default_factory=lambda: int(os.getenv("BACKUP_INTERVAL_HOURS", "24")))
     BACKUP_MAX_KEEP: int = field(default_factory=lambda: int(os.getenv("BACKUP_MAX_KEEP", "7")))
+    BACKUP_INCREMENTAL_ENABLED: bool = field(default_factory=lambda: os.getenv("BACKUP_INCREMENTAL_ENABLED", "false").lower() == "true")
+    BACKUP_FULL_EVERY: int = field(default_factory=lambda: int(os.getenv("BACKUP_FULL_EVERY", "7")))
+    BACKUP_STREAM_CHUNK_SIZE: int = field(default_factory=lambda: int(os.getenv("BACKUP_STREAM_CHUNK_SIZE", "1000")))
     
     # Bot username for return URLs
     BOT_USERNAME: str = field(default_factory=lambda: os.getenv("BOT_USERNAME", "vpn_bot"))
@@ -159,7 +230,16 @@ class Settings:
         return False
     
     def is_payment_verification_auto_check_enabled(self) -> bool:
-        return False
+        return bool(self.PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED)
+
+    def get_payment_verification_auto_check_interval(self) -> int:
+        return max(1, int(self.PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES))
+    
+    def get_state_backend(self) -> str:
+        backend = (self.STATE_BACKEND or "auto").strip().lower()
+        if backend == "auto":
+            return "redis" if self.REDIS_URL else "memory"
+        return backend
     
     def is_admin_notifications_enabled(self) -> bool:
         return True
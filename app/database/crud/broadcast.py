@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import BroadcastCheckpoint, BroadcastHistory, UnreachableRecipient
+
+
+async def get_broadcast_checkpoint(
+    db: AsyncSession,
+    broadcast_id: int
+) -> Optional[BroadcastCheckpoint]:
+    result = await db.execute(
+        select(BroadcastCheckpoint).where(BroadcastCheckpoint.broadcast_id == broadcast_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_broadcast_checkpoint(
+    db: AsyncSession,
+    broadcast_id: int,
+    last_user_id: int,
+    sent_count: int,
+    failed_count: int,
+    skipped_count: int = 0,
+    selected_buttons: Optional[List[str]] = None
+) -> BroadcastCheckpoint:
+    """Persist the keyset cursor and counters together with BroadcastHistory progress."""
+    checkpoint = await get_broadcast_checkpoint(db, broadcast_id)
+    if checkpoint is None:
+        checkpoint = BroadcastCheckpoint(broadcast_id=broadcast_id, selected_buttons=[])
+        db.add(checkpoint)
+
+    checkpoint.last_user_id = last_user_id
+    checkpoint.sent_count = sent_count
+    checkpoint.failed_count = failed_count
+    checkpoint.skipped_count = skipped_count
+    if selected_buttons is not None:
+        checkpoint.selected_buttons = list(selected_buttons)
+
+    broadcast = await db.get(BroadcastHistory, broadcast_id)
+    if broadcast is not None:
+        broadcast.sent_count = sent_count
+        broadcast.failed_count = failed_count
+
+    await db.commit()
+    return checkpoint
+
+
+async def get_resumable_broadcasts(db: AsyncSession) -> List[BroadcastHistory]:
+    """Queued broadcasts and in-progress ones that have a checkpoint.
+
+    In-progress rows without a checkpoint were sent from the bot handler, which cannot
+    resume them without re-sending to everyone.
+    """
+    has_checkpoint = (
+        select(BroadcastCheckpoint.id)
+        .where(BroadcastCheckpoint.broadcast_id == BroadcastHistory.id)
+        .exists()
+    )
+    result = await db.execute(
+        select(BroadcastHistory)
+        .where(
+            or_(
+                BroadcastHistory.status == "queued",
+                and_(BroadcastHistory.status == "in_progress", has_checkpoint),
+            )
+        )
+        .order_by(BroadcastHistory.id)
+    )
+    return result.scalars().all()
+
+
+async def close_interrupted_cancellations(db: AsyncSession) -> int:
+    """Broadcasts stopped while cancelling cannot be resumed, so they become cancelled."""
+    result = await db.execute(
+        update(BroadcastHistory)
+        .where(BroadcastHistory.status == "cancelling")
+        .values(status="cancelled", completed_at=datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount or 0
+
+
+async def record_unreachable_recipients(
+    db: AsyncSession,
+    reasons: Dict[int, str]
+) -> int:
+    """Insert or refresh unreachable recipients keyed by telegram_id."""
+    if not reasons:
+        return 0
+    telegram_ids = list(reasons.keys())
+    now = datetime.utcnow()
+    await db.execute(
+        delete(UnreachableRecipient).where(UnreachableRecipient.telegram_id.in_(telegram_ids))
+    )
+    await db.execute(
+        insert(UnreachableRecipient),
+        [
+            {'telegram_id': telegram_id, 'reason': (reason or '')[:255], 'detected_at': now}
+            for telegram_id, reason in reasons.items()
+        ]
+    )
+    await db.commit()
+    return len(reasons)
+
+
+async def clear_unreachable_recipient(db: AsyncSession, telegram_id: int) -> bool:
+    result = await db.execute(
+        delete(UnreachableRecipient).where(UnreachableRecipient.telegram_id == telegram_id)
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+
+def unreachable_cutoff(ttl_days: int) -> Optional[datetime]:
+    if ttl_days <= 0:
+        return None
+    return datetime.utcnow() - timedelta(days=ttl_days)
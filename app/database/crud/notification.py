@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from sqlalchemy import select, func
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Set, Tuple
+from sqlalchemy import select, func, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models import SentNotification
 
@@ -165,3 +165,47 @@ async def record_notification(
         notification_type=notification_type,
         message_id=message_id
     )
+
+
+async def get_sent_notification_keys(
+    db: AsyncSession,
+    user_ids: Iterable[int],
+    notification_types: Iterable[str],
+    chunk_size: int = 1000
+) -> Set[Tuple[int, str]]:
+    """Return (user_id, notification_type) pairs already sent, in one query per chunk."""
+    user_ids = list(set(user_ids))
+    notification_types = list(set(notification_types))
+    if not user_ids or not notification_types:
+        return set()
+
+    sent: Set[Tuple[int, str]] = set()
+    for offset in range(0, len(user_ids), chunk_size):
+        result = await db.execute(
+            select(SentNotification.user_id, SentNotification.notification_type)
+            .where(
+                SentNotification.user_id.in_(user_ids[offset:offset + chunk_size]),
+                SentNotification.notification_type.in_(notification_types)
+            )
+        )
+        sent.update((row[0], row[1]) for row in result)
+    return sent
+
+
+async def record_notifications_bulk(
+    db: AsyncSession,
+    records: Sequence[Tuple[int, str]]
+) -> int:
+    """Record many (user_id, notification_type) notifications with a single insert."""
+    if not records:
+        return 0
+    now = datetime.utcnow()
+    await db.execute(
+        insert(SentNotification),
+        [
+            {'user_id': user_id, 'notification_type': notification_type, 'sent_at': now}
+            for user_id, notification_type in records
+        ]
+    )
+    await db.commit()
+    return len(records)
@@ -12,38 +12,23 @@ async def get_referral_statistics(db: AsyncSession) -> Dict[str, Any]:
     )
     users_with_referrals = users_with_refs.scalar() or 0
     
-    active_referrers = await db.execute(
-        select(func.count(func.distinct(ReferralEarning.referrer_id)))
-    )
-    active_refs = active_referrers.scalar() or 0
-    
-    total_paid = await db.execute(
-        select(func.sum(ReferralEarning.amount_kopeks))
-    )
-    total_paid_kopeks = total_paid.scalar() or 0
-    
     now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_start = today_start - timedelta(days=7)
     month_start = today_start - timedelta(days=30)
     
-    today_result = await db.execute(
-        select(func.sum(ReferralEarning.amount_kopeks))
-        .where(ReferralEarning.created_at >= today_start)
-    )
-    today_earnings = today_result.scalar() or 0
-    
-    week_result = await db.execute(
-        select(func.sum(ReferralEarning.amount_kopeks))
-        .where(ReferralEarning.created_at >= week_start)
+    earnings = await db.execute(
+        select(
+            func.count(func.distinct(ReferralEarning.referrer_id)),
+            func.sum(ReferralEarning.amount_kopeks),
+            func.sum(ReferralEarning.amount_kopeks).filter(ReferralEarning.created_at >= today_start),
+            func.sum(ReferralEarning.amount_kopeks).filter(ReferralEarning.created_at >= week_start),
+            func.sum(ReferralEarning.amount_kopeks).filter(ReferralEarning.created_at >= month_start),
+        )
     )
-    week_earnings = week_result.scalar() or 0
-    
-    month_result = await db.execute(
-        select(func.sum(ReferralEarning.amount_kopeks))
-        .where(ReferralEarning.created_at >= month_start)
+    active_refs, total_paid_kopeks, today_earnings, week_earnings, month_earnings = (
+        value or 0 for value in earnings.one()
     )
-    month_earnings = month_result.scalar() or 0
     
     top_referrers_query = await db.execute(
         select(
@@ -3,7 +3,12 @@ from typing import Optional, List, Dict, Any
 from sqlalchemy import select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.database.models import ServerSquad, PromoGroup, server_squad_promo_groups
+from app.database.crud.subscription_squad import (
+    count_squad_subscriptions,
+    get_squad_users,
+    refresh_server_user_counts,
+)
+from app.database.models import ServerSquad, PromoGroup, User, server_squad_promo_groups
 
 
 async def get_all_server_squads(db: AsyncSession, include_inactive: bool = True) -> List[ServerSquad]:
@@ -177,18 +182,28 @@ async def update_server_squad_promo_groups(
     return squad
 
 
-async def get_server_connected_users(db: AsyncSession, squad_id: int) -> int:
-    squad = await get_server_squad_by_id(db, squad_id)
-    return squad.current_users if squad else 0
+async def get_server_connected_users(
+    db: AsyncSession,
+    squad_id: int,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[User]:
+    squad_uuid = await db.scalar(select(ServerSquad.squad_uuid).where(ServerSquad.id == squad_id))
+    if not squad_uuid:
+        return []
+    return await get_squad_users(db, squad_uuid, limit=limit, offset=offset)
 
 
-async def sync_server_user_counts(db: AsyncSession, counts: Dict[str, int]) -> None:
-    for squad_uuid, count in counts.items():
-        squad = await get_server_squad_by_uuid(db, squad_uuid)
-        if squad:
-            squad.current_users = count
-            squad.updated_at = datetime.utcnow()
-    await db.commit()
+async def count_server_connected_users(db: AsyncSession, squad_id: int) -> int:
+    squad_uuid = await db.scalar(select(ServerSquad.squad_uuid).where(ServerSquad.id == squad_id))
+    if not squad_uuid:
+        return 0
+    counts = await count_squad_subscriptions(db, [squad_uuid])
+    return counts.get(squad_uuid, 0)
+
+
+async def sync_server_user_counts(db: AsyncSession) -> int:
+    return await refresh_server_user_counts(db)
 
 
 async def get_random_trial_squad_uuid(db: AsyncSession) -> Optional[str]:
@@ -235,8 +250,8 @@ async def remove_user_from_servers(
 
 async def count_active_users_for_squad(db: AsyncSession, squad_uuid: str) -> int:
     """Count active users for a specific squad."""
-    squad = await get_server_squad_by_uuid(db, squad_uuid)
-    return squad.current_users if squad else 0
+    counts = await count_squad_subscriptions(db, [squad_uuid])
+    return counts.get(squad_uuid, 0)
 
 
 async def get_server_ids_by_uuids(
@@ -0,0 +1,304 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import Interval, and_, func, literal_column, not_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import (
+    DailyStatsRollup,
+    ReferralEarning,
+    Subscription,
+    SubscriptionConversion,
+    SubscriptionStatus,
+    Ticket,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+)
+
+
+# Stats days follow Moscow time like the daily report (UTC+3, no DST)
+STATS_UTC_OFFSET_HOURS = 3
+STATS_UTC_OFFSET = timedelta(hours=STATS_UTC_OFFSET_HOURS)
+
+ROLLUP_COUNTERS = (
+    "new_users",
+    "new_trials",
+    "new_paid_subscriptions",
+    "trial_conversions",
+    "deposits_count",
+    "deposits_kopeks",
+    "subscription_payments_count",
+    "subscription_payments_kopeks",
+    "refunds_kopeks",
+    "referral_earnings_count",
+    "referral_earnings_kopeks",
+    "new_tickets",
+)
+
+REFERRAL_DESCRIPTION_MARKERS = ("реферал", "referral")
+
+
+def stats_day(moment: datetime) -> date:
+    return (moment + STATS_UTC_OFFSET).date()
+
+
+def stats_day_start(day: date) -> datetime:
+    """UTC start of a stats day."""
+    return datetime.combine(day, time.min) - STATS_UTC_OFFSET
+
+
+def is_referral_description(description: Optional[str]) -> bool:
+    text = (description or "").lower()
+    return any(marker in text for marker in REFERRAL_DESCRIPTION_MARKERS)
+
+
+def _stats_day_expression(db: AsyncSession, column):
+    # The offset is a literal so the expression renders identically in SELECT and GROUP BY
+    if db.bind.dialect.name == "sqlite":
+        return func.date(column, f"+{STATS_UTC_OFFSET_HOURS} hours")
+    return func.date(column + literal_column(f"INTERVAL '{STATS_UTC_OFFSET_HOURS} hours'", Interval))
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert(DailyStatsRollup)
+
+
+def non_referral_deposit_condition():
+    return and_(
+        Transaction.type == TransactionType.DEPOSIT,
+        not_(or_(*(
+            func.coalesce(Transaction.description, "").ilike(f"%{marker}%")
+            for marker in REFERRAL_DESCRIPTION_MARKERS
+        ))),
+    )
+
+
+def _kopeks_sum(condition):
+    return func.coalesce(func.sum(func.round(func.abs(Transaction.amount) * 100)).filter(condition), 0)
+
+
+async def collect_daily_rollups(
+    db: AsyncSession,
+    start_day: date,
+    end_day: date
+) -> Dict[date, Dict[str, int]]:
+    """Aggregate days in [start_day, end_day) with one grouped pass per source table."""
+    start = stats_day_start(start_day)
+    end = stats_day_start(end_day)
+
+    rows: Dict[date, Dict[str, int]] = {}
+    day = start_day
+    while day < end_day:
+        rows[day] = dict.fromkeys(ROLLUP_COUNTERS, 0)
+        day += timedelta(days=1)
+
+    def apply(result, *names: str) -> None:
+        for row_day, *values in result:
+            counters = rows.get(_as_date(row_day))
+            if counters is None:
+                continue
+            for name, value in zip(names, values):
+                counters[name] = int(value or 0)
+
+    user_day = _stats_day_expression(db, User.created_at)
+    apply(
+        await db.execute(
+            select(user_day, func.count(User.id))
+            .where(User.created_at >= start, User.created_at < end)
+            .group_by(user_day)
+        ),
+        "new_users",
+    )
+
+    subscription_day = _stats_day_expression(db, Subscription.created_at)
+    is_trial = Subscription.status == SubscriptionStatus.TRIAL
+    apply(
+        await db.execute(
+            select(
+                subscription_day,
+                func.count(Subscription.id).filter(is_trial),
+                func.count(Subscription.id).filter(not_(is_trial)),
+            )
+            .where(Subscription.created_at >= start, Subscription.created_at < end)
+            .group_by(subscription_day)
+        ),
+        "new_trials",
+        "new_paid_subscriptions",
+    )
+
+    conversion_day = _stats_day_expression(db, SubscriptionConversion.converted_at)
+    apply(
+        await db.execute(
+            select(conversion_day, func.count(SubscriptionConversion.id))
+            .where(
+                SubscriptionConversion.converted_at >= start,
+                SubscriptionConversion.converted_at < end,
+            )
+            .group_by(conversion_day)
+        ),
+        "trial_conversions",
+    )
+
+    completed_at = func.coalesce(Transaction.completed_at, Transaction.created_at)
+    transaction_day = _stats_day_expression(db, completed_at)
+    deposit = non_referral_deposit_condition()
+    subscription_payment = Transaction.type == TransactionType.SUBSCRIPTION
+    refund = Transaction.type == TransactionType.REFUND
+    apply(
+        await db.execute(
+            select(
+                transaction_day,
+                func.count(Transaction.id).filter(deposit),
+                _kopeks_sum(deposit),
+                func.count(Transaction.id).filter(subscription_payment),
+                _kopeks_sum(subscription_payment),
+                _kopeks_sum(refund),
+            )
+            .where(
+                Transaction.status == TransactionStatus.COMPLETED,
+                completed_at >= start,
+                completed_at < end,
+            )
+            .group_by(transaction_day)
+        ),
+        "deposits_count",
+        "deposits_kopeks",
+        "subscription_payments_count",
+        "subscription_payments_kopeks",
+        "refunds_kopeks",
+    )
+
+    earning_day = _stats_day_expression(db, ReferralEarning.created_at)
+    apply(
+        await db.execute(
+            select(
+                earning_day,
+                func.count(ReferralEarning.id),
+                func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0),
+            )
+            .where(ReferralEarning.created_at >= start, ReferralEarning.created_at < end)
+            .group_by(earning_day)
+        ),
+        "referral_earnings_count",
+        "referral_earnings_kopeks",
+    )
+
+    ticket_day = _stats_day_expression(db, Ticket.created_at)
+    apply(
+        await db.execute(
+            select(ticket_day, func.count(Ticket.id))
+            .where(Ticket.created_at >= start, Ticket.created_at < end)
+            .group_by(ticket_day)
+        ),
+        "new_tickets",
+    )
+
+    return rows
+
+
+async def upsert_daily_rollups(
+    db: AsyncSession,
+    rows: Dict[date, Dict[str, int]],
+    final_before: date
+) -> None:
+    """Replace rollup rows; days before ``final_before`` are marked final."""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    statement = _dialect_insert(db.bind.dialect.name)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[DailyStatsRollup.day],
+            set_={
+                **{name: statement.excluded[name] for name in ROLLUP_COUNTERS},
+                "is_final": statement.excluded.is_final,
+                "updated_at": now,
+            },
+        ),
+        [
+            {"day": day, **counters, "is_final": day < final_before, "updated_at": now}
+            for day, counters in rows.items()
+        ]
+    )
+    await db.commit()
+
+
+async def increment_daily_rollups(db: AsyncSession, rows: Dict[date, Dict[str, int]]) -> None:
+    """Add buffered deltas to rollup rows in one statement per batch."""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    statement = _dialect_insert(db.bind.dialect.name)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[DailyStatsRollup.day],
+            set_={
+                **{
+                    name: getattr(DailyStatsRollup, name) + statement.excluded[name]
+                    for name in ROLLUP_COUNTERS
+                },
+                "updated_at": now,
+            },
+        ),
+        [
+            {
+                "day": day,
+                **{name: counters.get(name, 0) for name in ROLLUP_COUNTERS},
+                "is_final": False,
+                "updated_at": now,
+            }
+            for day, counters in rows.items()
+        ]
+    )
+    await db.commit()
+
+
+async def get_rollup_days(
+    db: AsyncSession,
+    start_day: date,
+    end_day: date
+) -> Dict[date, bool]:
+    """Existing rollup days in [start_day, end_day) mapped to their ``is_final`` flag."""
+    result = await db.execute(
+        select(DailyStatsRollup.day, DailyStatsRollup.is_final).where(
+            DailyStatsRollup.day >= start_day,
+            DailyStatsRollup.day < end_day,
+        )
+    )
+    return {_as_date(day): bool(is_final) for day, is_final in result.all()}
+
+
+async def get_first_activity_day(db: AsyncSession) -> Optional[date]:
+    first_user_at = await db.scalar(select(func.min(User.created_at)))
+    return stats_day(first_user_at) if first_user_at else None
+
+
+async def get_rollup_totals(
+    db: AsyncSession,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None
+) -> Dict[str, int]:
+    query = select(*(
+        func.coalesce(func.sum(getattr(DailyStatsRollup, name)), 0)
+        for name in ROLLUP_COUNTERS
+    ))
+    if start_day is not None:
+        query = query.where(DailyStatsRollup.day >= start_day)
+    if end_day is not None:
+        query = query.where(DailyStatsRollup.day < end_day)
+    values = (await db.execute(query)).one()
+    return {name: int(value or 0) for name, value in zip(ROLLUP_COUNTERS, values)}
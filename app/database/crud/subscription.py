@@ -113,31 +113,35 @@ async def create_paid_subscription(
 
 async def get_subscriptions_statistics(db: AsyncSession) -> dict:
     from sqlalchemy import func
-    
-    total_result = await db.execute(
-        select(func.count(Subscription.id))
-    )
-    total = total_result.scalar() or 0
-    
-    active_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            Subscription.status == SubscriptionStatus.ACTIVE
-        )
-    )
-    active = active_result.scalar() or 0
-    
-    trial_result = await db.execute(
-        select(func.count(Subscription.id)).where(
-            Subscription.status == SubscriptionStatus.TRIAL
+    from app.database.crud.stats import get_rollup_totals, stats_day
+
+    row = (await db.execute(
+        select(
+            func.count(Subscription.id),
+            func.count(Subscription.id).filter(Subscription.status == SubscriptionStatus.ACTIVE),
+            func.count(Subscription.id).filter(Subscription.status == SubscriptionStatus.TRIAL),
         )
-    )
-    trial = trial_result.scalar() or 0
-    
+    )).one()
+    total, active, trial = (value or 0 for value in row)
+
+    today = stats_day(datetime.utcnow())
+    purchased = {
+        period: (await get_rollup_totals(db, today - timedelta(days=days - 1)))['subscription_payments_count']
+        for period, days in (('today', 1), ('week', 7), ('month', 30))
+    }
+
     return {
         'total': total,
         'active': active,
         'trial': trial,
-        'inactive': total - active - trial
+        'inactive': total - active - trial,
+        'total_subscriptions': total,
+        'active_subscriptions': active + trial,
+        'paid_subscriptions': active,
+        'trial_subscriptions': trial,
+        'purchased_today': purchased['today'],
+        'purchased_week': purchased['week'],
+        'purchased_month': purchased['month'],
     }
 
 
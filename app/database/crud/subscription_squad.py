@@ -0,0 +1,322 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes, selectinload
+
+from app.database.models import (
+    ServerSquad,
+    Subscription,
+    SubscriptionServer,
+    SubscriptionSquad,
+    SubscriptionStatus,
+    User,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+OCCUPYING_STATUSES = (SubscriptionStatus.ACTIVE.value, SubscriptionStatus.TRIAL.value)
+REBUILD_CHUNK_SIZE = 1000
+
+# Без колонки connected_squads источник сквадов подписки — связи subscription_servers
+SQUADS_COLUMN_MAPPED = "connected_squads" in Subscription.__table__.c
+
+
+def _normalize_squads(squads: Optional[Iterable]) -> List[str]:
+    normalized: List[str] = []
+    for squad_uuid in squads or []:
+        squad_uuid = str(squad_uuid).strip()
+        if squad_uuid and squad_uuid not in normalized:
+            normalized.append(squad_uuid)
+    return normalized
+
+
+def _replace_rows(connection, squads_by_subscription: Dict[int, List[str]]) -> None:
+    if not squads_by_subscription:
+        return
+    connection.execute(
+        delete(SubscriptionSquad).where(
+            SubscriptionSquad.subscription_id.in_(list(squads_by_subscription))
+        )
+    )
+    rows = [
+        {"subscription_id": subscription_id, "squad_uuid": squad_uuid}
+        for subscription_id, squads in squads_by_subscription.items()
+        for squad_uuid in squads
+    ]
+    if rows:
+        connection.execute(insert(SubscriptionSquad), rows)
+
+
+def _load_linked_squads(connection, subscription_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Сквады подписок по связям ``subscription_servers`` в текущей транзакции."""
+    subscription_ids = list(dict.fromkeys(subscription_ids))
+    squads_by_subscription: Dict[int, List[str]] = {
+        subscription_id: [] for subscription_id in subscription_ids
+    }
+    if not subscription_ids:
+        return squads_by_subscription
+
+    result = connection.execute(
+        select(SubscriptionServer.subscription_id, ServerSquad.squad_uuid)
+        .join(ServerSquad, ServerSquad.id == SubscriptionServer.server_squad_id)
+        .where(SubscriptionServer.subscription_id.in_(subscription_ids))
+        .order_by(SubscriptionServer.subscription_id, SubscriptionServer.id)
+    )
+    for subscription_id, squad_uuid in result.all():
+        squads_by_subscription[subscription_id].append(squad_uuid)
+
+    return {
+        subscription_id: _normalize_squads(squads)
+        for subscription_id, squads in squads_by_subscription.items()
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_subscription_squads(session: Session, flush_context) -> None:
+    """Держит индекс в согласии с источником сквадов при любой записи через ORM."""
+    changed: Dict[int, List[str]] = {}
+    linked_ids: List[int] = []
+
+    for obj in session.new | session.dirty | session.deleted:
+        if SQUADS_COLUMN_MAPPED and isinstance(obj, Subscription):
+            if obj in session.deleted or obj.id is None:
+                continue
+            if obj in session.new or attributes.get_history(obj, "connected_squads").has_changes():
+                changed[obj.id] = _normalize_squads(obj.connected_squads)
+        elif not SQUADS_COLUMN_MAPPED and isinstance(obj, SubscriptionServer):
+            linked_ids.extend(attributes.get_history(obj, "subscription_id").sum())
+
+    deleted_ids = [
+        obj.id for obj in session.deleted if isinstance(obj, Subscription) and obj.id is not None
+    ]
+
+    if not changed and not linked_ids and not deleted_ids:
+        return
+
+    connection = session.connection()
+    if linked_ids:
+        changed.update(_load_linked_squads(connection, linked_ids))
+    for subscription_id in deleted_ids:
+        changed.pop(subscription_id, None)
+    _replace_rows(connection, changed)
+    if deleted_ids:
+        connection.execute(
+            delete(SubscriptionSquad).where(SubscriptionSquad.subscription_id.in_(deleted_ids))
+        )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _sync_subscription_squads_on_bulk(orm_execute_state):
+    """Пересобирает индекс для подписок, затронутых массовыми INSERT/UPDATE/DELETE связей."""
+    if SQUADS_COLUMN_MAPPED:
+        return None
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+
+    statement = orm_execute_state.statement
+    table = getattr(statement, "table", None)
+    if getattr(table, "name", None) != SubscriptionServer.__tablename__:
+        return None
+
+    session = orm_execute_state.session
+    if orm_execute_state.is_insert:
+        parameters = orm_execute_state.parameters or []
+        if isinstance(parameters, dict):
+            parameters = [parameters]
+        subscription_ids = [
+            row["subscription_id"] for row in parameters if row.get("subscription_id") is not None
+        ]
+    else:
+        query = select(SubscriptionServer.subscription_id)
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        subscription_ids = list(session.execute(query).scalars().all())
+
+    result = orm_execute_state.invoke_statement()
+    if subscription_ids:
+        connection = session.connection()
+        _replace_rows(connection, _load_linked_squads(connection, subscription_ids))
+    return result
+
+
+async def get_squad_subscription_ids(
+    db: AsyncSession,
+    squad_uuid: str,
+    *,
+    after_id: int = 0,
+    limit: int = REBUILD_CHUNK_SIZE,
+    statuses: Optional[Sequence[str]] = OCCUPYING_STATUSES,
+) -> List[int]:
+    """Страница id подписок сквада по возрастанию id (keyset)."""
+    query = (
+        select(SubscriptionSquad.subscription_id)
+        .where(
+            SubscriptionSquad.squad_uuid == squad_uuid,
+            SubscriptionSquad.subscription_id > after_id,
+        )
+        .order_by(SubscriptionSquad.subscription_id)
+        .limit(limit)
+    )
+    if statuses is not None:
+        query = query.join(Subscription, Subscription.id == SubscriptionSquad.subscription_id).where(
+            Subscription.status.in_(list(statuses))
+        )
+    result = await db.execute(query)
+    return [row[0] for row in result.all()]
+
+
+async def get_subscription_squads(db: AsyncSession, subscription_ids: Sequence[int]) -> Dict[int, List[str]]:
+    """Сквады подписок по индексу: ``subscription_id -> [squad_uuid, ...]``."""
+    squads_by_subscription: Dict[int, List[str]] = {
+        subscription_id: [] for subscription_id in subscription_ids
+    }
+    if not subscription_ids:
+        return squads_by_subscription
+
+    result = await db.execute(
+        select(SubscriptionSquad.subscription_id, SubscriptionSquad.squad_uuid)
+        .where(SubscriptionSquad.subscription_id.in_(list(subscription_ids)))
+        .order_by(SubscriptionSquad.subscription_id, SubscriptionSquad.squad_uuid)
+    )
+    for subscription_id, squad_uuid in result.all():
+        squads_by_subscription[subscription_id].append(squad_uuid)
+    return squads_by_subscription
+
+
+async def count_squad_subscriptions(
+    db: AsyncSession,
+    squad_uuids: Optional[Sequence[str]] = None,
+    *,
+    statuses: Optional[Sequence[str]] = OCCUPYING_STATUSES,
+) -> Dict[str, int]:
+    query = select(SubscriptionSquad.squad_uuid, func.count()).group_by(SubscriptionSquad.squad_uuid)
+    if squad_uuids is not None:
+        query = query.where(SubscriptionSquad.squad_uuid.in_(list(squad_uuids)))
+    if statuses is not None:
+        query = query.join(Subscription, Subscription.id == SubscriptionSquad.subscription_id).where(
+            Subscription.status.in_(list(statuses))
+        )
+    result = await db.execute(query)
+    return {squad_uuid: count for squad_uuid, count in result.all()}
+
+
+async def get_squad_users(
+    db: AsyncSession,
+    squad_uuid: str,
+    *,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    statuses: Optional[Sequence[str]] = OCCUPYING_STATUSES,
+) -> List[User]:
+    query = (
+        select(User)
+        .join(Subscription, Subscription.user_id == User.id)
+        .join(SubscriptionSquad, SubscriptionSquad.subscription_id == Subscription.id)
+        .options(selectinload(User.subscription))
+        .where(SubscriptionSquad.squad_uuid == squad_uuid)
+        .order_by(User.id)
+        .offset(offset)
+    )
+    if statuses is not None:
+        query = query.where(Subscription.status.in_(list(statuses)))
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def is_subscription_squads_index_ready(db: AsyncSession) -> bool:
+    """Индекс пригоден для подсчётов: в нём есть строки или сквадов у подписок ещё нет."""
+    has_rows = await db.scalar(select(SubscriptionSquad.subscription_id).limit(1))
+    if has_rows is not None:
+        return True
+
+    if SQUADS_COLUMN_MAPPED:
+        has_source = await db.scalar(
+            select(Subscription.id).where(Subscription.connected_squads.isnot(None)).limit(1)
+        )
+    else:
+        has_source = await db.scalar(select(SubscriptionServer.id).limit(1))
+    return has_source is None
+
+
+async def refresh_server_user_counts(db: AsyncSession) -> int:
+    """Пересчитывает ``ServerSquad.current_users`` по индексу; возвращает число изменённых серверов."""
+    if not await is_subscription_squads_index_ready(db):
+        logger.warning("⚠️ Индекс подписок по сквадам не построен, пересчёт пользователей серверов пропущен")
+        return 0
+
+    counts = await count_squad_subscriptions(db)
+    result = await db.execute(select(ServerSquad.id, ServerSquad.squad_uuid, ServerSquad.current_users))
+
+    updated = 0
+    for server_id, squad_uuid, current_users in result.all():
+        count = counts.get(squad_uuid, 0)
+        if (current_users or 0) == count:
+            continue
+        await db.execute(
+            update(ServerSquad)
+            .where(ServerSquad.id == server_id)
+            .values(current_users=count, updated_at=datetime.utcnow())
+        )
+        updated += 1
+
+    if updated:
+        await db.commit()
+    return updated
+
+
+async def _load_squad_chunk(db: AsyncSession, last_id: int, chunk_size: int) -> Dict[int, List[str]]:
+    if SQUADS_COLUMN_MAPPED:
+        result = await db.execute(
+            select(Subscription.id, Subscription.connected_squads)
+            .where(Subscription.id > last_id)
+            .order_by(Subscription.id)
+            .limit(chunk_size)
+        )
+        return {subscription_id: _normalize_squads(squads) for subscription_id, squads in result.all()}
+
+    result = await db.execute(
+        select(SubscriptionServer.subscription_id)
+        .where(SubscriptionServer.subscription_id > last_id)
+        .group_by(SubscriptionServer.subscription_id)
+        .order_by(SubscriptionServer.subscription_id)
+        .limit(chunk_size)
+    )
+    subscription_ids = list(result.scalars().all())
+    return await db.run_sync(
+        lambda session: _load_linked_squads(session.connection(), subscription_ids)
+    )
+
+
+async def rebuild_subscription_squads(db: AsyncSession, chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """Заполняет индекс из источника сквадов по страницам подписок; возвращает число строк."""
+    last_id = 0
+    total_rows = 0
+    while True:
+        chunk = await _load_squad_chunk(db, last_id, chunk_size)
+        if not chunk:
+            break
+
+        await db.run_sync(lambda session: _replace_rows(session.connection(), chunk))
+        await db.commit()
+
+        total_rows += sum(len(squads) for squads in chunk.values())
+        last_id = max(chunk)
+
+    return total_rows
+
+
+async def ensure_subscription_squads_index(db: AsyncSession) -> None:
+    """Строит индекс при первом запуске, если он пуст, а у подписок уже есть сквады."""
+    if await is_subscription_squads_index_ready(db):
+        return
+
+    logger.info("🗂️ Построение индекса подписок по сквадам...")
+    total_rows = await rebuild_subscription_squads(db)
+    logger.info(f"✅ Индекс подписок по сквадам построен: {total_rows} записей")
@@ -4,6 +4,8 @@ from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.database.models import Ticket, TicketMessage, TicketStatus
+# Регистрирует слушатель, который держит очередь SLA-напоминаний в согласии с тикетами
+from app.database.crud import ticket_sla  # noqa: F401
 
 
 class TicketCRUD:
@@ -0,0 +1,204 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes, selectinload
+
+from app.config import settings
+from app.database.models import Ticket, TicketSlaSchedule, TicketStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+REBUILD_CHUNK_SIZE = 1000
+
+
+def get_sla_minutes() -> int:
+    try:
+        from app.services.support_settings_service import SupportSettingsService
+        return max(1, int(SupportSettingsService.get_sla_minutes()))
+    except Exception:
+        return max(1, int(getattr(settings, 'SUPPORT_TICKET_SLA_MINUTES', 5)))
+
+
+def _schedule_row(ticket_id: int, waiting_since: Optional[datetime], sla_minutes: int) -> Dict:
+    waiting_since = waiting_since or datetime.utcnow()
+    return {
+        "ticket_id": ticket_id,
+        "waiting_since": waiting_since,
+        "next_reminder_at": waiting_since + timedelta(minutes=sla_minutes),
+        "last_reminder_at": None,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_ticket_sla_schedule(session: Session, flush_context) -> None:
+    """Ставит открытый тикет в очередь SLA при смене статуса или новом сообщении и снимает закрытый."""
+    waiting: Dict[int, Optional[datetime]] = {}
+    removed: List[int] = []
+
+    for obj in session.new | session.dirty:
+        if not isinstance(obj, Ticket) or obj.id is None:
+            continue
+        if obj not in session.new and not (
+            attributes.get_history(obj, "status").has_changes()
+            or attributes.get_history(obj, "updated_at").has_changes()
+        ):
+            continue
+        if obj.status == TicketStatus.OPEN.value:
+            waiting[obj.id] = obj.updated_at
+        else:
+            removed.append(obj.id)
+
+    removed.extend(
+        obj.id for obj in session.deleted if isinstance(obj, Ticket) and obj.id is not None
+    )
+
+    if not waiting and not removed:
+        return
+
+    connection = session.connection()
+    connection.execute(
+        delete(TicketSlaSchedule).where(
+            TicketSlaSchedule.ticket_id.in_(list(waiting) + removed)
+        )
+    )
+    if waiting:
+        sla_minutes = get_sla_minutes()
+        connection.execute(
+            insert(TicketSlaSchedule),
+            [
+                _schedule_row(ticket_id, waiting_since, sla_minutes)
+                for ticket_id, waiting_since in waiting.items()
+            ],
+        )
+
+
+async def get_due_ticket_reminders(
+    db: AsyncSession,
+    now: datetime,
+    limit: int,
+) -> List[Tuple[Ticket, datetime]]:
+    """Открытые тикеты, у которых подошло время напоминания, вместе с началом ожидания."""
+    result = await db.execute(
+        select(Ticket, TicketSlaSchedule.waiting_since)
+        .join(TicketSlaSchedule, TicketSlaSchedule.ticket_id == Ticket.id)
+        .options(selectinload(Ticket.user))
+        .where(
+            TicketSlaSchedule.next_reminder_at <= now,
+            Ticket.status == TicketStatus.OPEN.value,
+        )
+        .order_by(TicketSlaSchedule.next_reminder_at)
+        .limit(limit)
+    )
+    return [(ticket, waiting_since) for ticket, waiting_since in result.all()]
+
+
+async def mark_ticket_reminders_sent(
+    db: AsyncSession,
+    ticket_ids: Sequence[int],
+    now: datetime,
+    cooldown_minutes: int,
+) -> None:
+    if not ticket_ids:
+        return
+    await db.execute(
+        update(TicketSlaSchedule)
+        .where(TicketSlaSchedule.ticket_id.in_(list(ticket_ids)))
+        .values(
+            last_reminder_at=now,
+            next_reminder_at=now + timedelta(minutes=cooldown_minutes),
+        )
+    )
+    await db.commit()
+
+
+async def reschedule_ticket_sla(
+    db: AsyncSession,
+    sla_minutes: int,
+    chunk_size: int = REBUILD_CHUNK_SIZE,
+) -> int:
+    """Пересчитывает срок первого напоминания после смены SLA страницами; возвращает число тикетов."""
+    last_id = 0
+    total_rows = 0
+    while True:
+        result = await db.execute(
+            select(TicketSlaSchedule.ticket_id, TicketSlaSchedule.waiting_since)
+            .where(
+                TicketSlaSchedule.ticket_id > last_id,
+                TicketSlaSchedule.last_reminder_at.is_(None),
+            )
+            .order_by(TicketSlaSchedule.ticket_id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        # Одно пакетное обновление по первичному ключу на страницу
+        await db.execute(
+            update(TicketSlaSchedule),
+            [
+                {
+                    "ticket_id": ticket_id,
+                    "next_reminder_at": waiting_since + timedelta(minutes=sla_minutes),
+                }
+                for ticket_id, waiting_since in rows
+            ],
+        )
+        await db.commit()
+
+        total_rows += len(rows)
+        last_id = rows[-1][0]
+
+    return total_rows
+
+
+async def rebuild_ticket_sla_schedule(db: AsyncSession, chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """Заполняет очередь SLA по открытым тикетам страницами; возвращает число строк."""
+    sla_minutes = get_sla_minutes()
+    last_id = 0
+    total_rows = 0
+    while True:
+        result = await db.execute(
+            select(Ticket.id, Ticket.updated_at)
+            .where(Ticket.id > last_id, Ticket.status == TicketStatus.OPEN.value)
+            .order_by(Ticket.id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        ticket_ids = [ticket_id for ticket_id, _ in rows]
+        await db.execute(delete(TicketSlaSchedule).where(TicketSlaSchedule.ticket_id.in_(ticket_ids)))
+        await db.execute(
+            insert(TicketSlaSchedule),
+            [_schedule_row(ticket_id, updated_at, sla_minutes) for ticket_id, updated_at in rows],
+        )
+        await db.commit()
+
+        total_rows += len(rows)
+        last_id = rows[-1][0]
+
+    return total_rows
+
+
+async def ensure_ticket_sla_schedule(db: AsyncSession) -> None:
+    """Строит очередь SLA при первом запуске, если она пуста, а открытые тикеты уже есть."""
+    has_rows = await db.scalar(select(TicketSlaSchedule.ticket_id).limit(1))
+    if has_rows is not None:
+        return
+
+    has_open_tickets = await db.scalar(
+        select(Ticket.id).where(Ticket.status == TicketStatus.OPEN.value).limit(1)
+    )
+    if has_open_tickets is None:
+        return
+
+    logger.info("🎫 Построение очереди SLA-напоминаний по тикетам...")
+    total_rows = await rebuild_ticket_sla_schedule(db)
+    logger.info(f"✅ Очередь SLA-напоминаний построена: {total_rows} тикетов")
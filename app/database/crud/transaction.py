@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import select, desc
+from sqlalchemy import and_, select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models import Transaction, TransactionType, TransactionStatus
 
@@ -80,34 +80,68 @@ async def get_transaction_by_external_id(
     return result.scalar_one_or_none()
 
 
-async def get_transactions_statistics(db: AsyncSession) -> dict:
-    """Get transaction statistics."""
+async def get_transactions_statistics(
+    db: AsyncSession,
+    start_date: datetime = None,
+    end_date: datetime = None
+) -> dict:
+    """Get transaction statistics in a single pass over the period."""
     from sqlalchemy import func
-    
-    total_result = await db.execute(
-        select(func.count(Transaction.id))
-    )
-    total = total_result.scalar() or 0
-    
-    completed_result = await db.execute(
-        select(func.count(Transaction.id)).where(
-            Transaction.status == TransactionStatus.COMPLETED
-        )
-    )
-    completed = completed_result.scalar() or 0
-    
-    total_amount_result = await db.execute(
-        select(func.sum(Transaction.amount)).where(
-            Transaction.status == TransactionStatus.COMPLETED
-        )
+    from app.database.crud.stats import non_referral_deposit_condition
+
+    kopeks = func.round(func.abs(Transaction.amount) * 100)
+    completed = Transaction.status == TransactionStatus.COMPLETED
+    income = and_(completed, non_referral_deposit_condition())
+    subscription_income = and_(completed, Transaction.type == TransactionType.SUBSCRIPTION)
+    expenses = and_(completed, Transaction.type == TransactionType.REFUND)
+    today = Transaction.created_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    period = []
+    if start_date:
+        period.append(Transaction.created_at >= start_date)
+    if end_date:
+        period.append(Transaction.created_at <= end_date)
+
+    row = (await db.execute(
+        select(
+            func.count(Transaction.id),
+            func.count(Transaction.id).filter(completed),
+            func.coalesce(func.sum(Transaction.amount).filter(completed), 0),
+            func.coalesce(func.sum(kopeks).filter(income), 0),
+            func.coalesce(func.sum(kopeks).filter(subscription_income), 0),
+            func.coalesce(func.sum(kopeks).filter(expenses), 0),
+            func.count(Transaction.id).filter(today),
+            func.coalesce(func.sum(kopeks).filter(and_(income, today)), 0),
+        ).where(*period)
+    )).one()
+    total, completed_count, total_amount, income_kopeks, subscription_kopeks, expenses_kopeks, today_count, today_income = row
+
+    by_method_result = await db.execute(
+        select(Transaction.payment_method, func.count(Transaction.id), func.coalesce(func.sum(kopeks), 0))
+        .where(income, *period)
+        .group_by(Transaction.payment_method)
     )
-    total_amount = total_amount_result.scalar() or 0
-    
+    by_payment_method = {
+        method: {'count': int(count or 0), 'amount': int(amount or 0)}
+        for method, count, amount in by_method_result.all()
+    }
+
     return {
-        'total': total,
-        'completed': completed,
-        'pending': total - completed,
-        'total_amount': total_amount
+        'total': total or 0,
+        'completed': completed_count or 0,
+        'pending': (total or 0) - (completed_count or 0),
+        'total_amount': total_amount or 0,
+        'totals': {
+            'income_kopeks': int(income_kopeks),
+            'expenses_kopeks': int(expenses_kopeks),
+            'profit_kopeks': int(income_kopeks) - int(expenses_kopeks),
+            'subscription_income_kopeks': int(subscription_kopeks),
+        },
+        'today': {
+            'transactions_count': today_count or 0,
+            'income_kopeks': int(today_income),
+        },
+        'by_payment_method': by_payment_method,
     }
 
 
@@ -320,7 +320,7 @@ from typing import Dict, Any
 
 
 async def get_users_statistics(db: AsyncSession) -> Dict[str, Any]:
-    """Get user statistics."""
+    """Get user statistics in a single pass over users."""
     from sqlalchemy import func
     from datetime import datetime, timedelta
     
@@ -329,30 +329,25 @@ async def get_users_statistics(db: AsyncSession) -> Dict[str, Any]:
     week_ago = now - timedelta(days=7)
     month_ago = now - timedelta(days=30)
     
-    total = await db.execute(select(func.count(User.id)))
-    active = await db.execute(
-        select(func.count(User.id)).where(User.is_active == True)
-    )
-    blocked = await db.execute(
-        select(func.count(User.id)).where(User.status == 'blocked')
-    )
-    new_today = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= today_start)
-    )
-    new_week = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= week_ago)
-    )
-    new_month = await db.execute(
-        select(func.count(User.id)).where(User.created_at >= month_ago)
-    )
+    row = (await db.execute(
+        select(
+            func.count(User.id),
+            func.count(User.id).filter(User.is_active == True),
+            func.count(User.id).filter(User.status == 'blocked'),
+            func.count(User.id).filter(User.created_at >= today_start),
+            func.count(User.id).filter(User.created_at >= week_ago),
+            func.count(User.id).filter(User.created_at >= month_ago),
+        )
+    )).one()
+    total, active, blocked, new_today, new_week, new_month = (value or 0 for value in row)
     
     return {
-        'total_users': total.scalar() or 0,
-        'active_users': active.scalar() or 0,
-        'blocked_users': blocked.scalar() or 0,
-        'new_today': new_today.scalar() or 0,
-        'new_week': new_week.scalar() or 0,
-        'new_month': new_month.scalar() or 0,
+        'total_users': total,
+        'active_users': active,
+        'blocked_users': blocked,
+        'new_today': new_today,
+        'new_week': new_week,
+        'new_month': new_month,
     }
 
 
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Boolean, Text, Enum, ForeignKey, Table, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Boolean, Text, Enum, ForeignKey, Table, JSON
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 
@@ -375,6 +375,55 @@ class BroadcastHistory(Base):
     completed_at = Column(DateTime, nullable=True)
 
 
+class BroadcastCheckpoint(Base):
+    __tablename__ = "broadcast_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    broadcast_id = Column(
+        Integer,
+        ForeignKey("broadcast_history.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+        index=True,
+    )
+    last_user_id = Column(Integer, default=0, nullable=False)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    skipped_count = Column(Integer, default=0)
+    selected_buttons = Column(JSON, default=list)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UnreachableRecipient(Base):
+    __tablename__ = "unreachable_recipients"
+
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(BigInteger, unique=True, index=True, nullable=False)
+    reason = Column(String(255), nullable=True)
+    detected_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class DailyStatsRollup(Base):
+    __tablename__ = "daily_stats_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, unique=True, index=True, nullable=False)
+    new_users = Column(Integer, default=0, nullable=False)
+    new_trials = Column(Integer, default=0, nullable=False)
+    new_paid_subscriptions = Column(Integer, default=0, nullable=False)
+    trial_conversions = Column(Integer, default=0, nullable=False)
+    deposits_count = Column(Integer, default=0, nullable=False)
+    deposits_kopeks = Column(BigInteger, default=0, nullable=False)
+    subscription_payments_count = Column(Integer, default=0, nullable=False)
+    subscription_payments_kopeks = Column(BigInteger, default=0, nullable=False)
+    refunds_kopeks = Column(BigInteger, default=0, nullable=False)
+    referral_earnings_count = Column(Integer, default=0, nullable=False)
+    referral_earnings_kopeks = Column(BigInteger, default=0, nullable=False)
+    new_tickets = Column(Integer, default=0, nullable=False)
+    is_final = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class SubscriptionServer(Base):
     __tablename__ = "subscription_servers"
     
@@ -384,6 +433,19 @@ class SubscriptionServer(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class SubscriptionSquad(Base):
+    """Индекс подписок по сквадам: строка на каждый сквад подписки (``connected_squads`` или ``subscription_servers``)."""
+
+    __tablename__ = "subscription_squads"
+
+    subscription_id = Column(
+        Integer,
+        ForeignKey("subscriptions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    squad_uuid = Column(String(100), primary_key=True, index=True)
+
+
 class UserMessage(Base):
     __tablename__ = "user_messages"
     
@@ -605,6 +667,21 @@ class TicketMessage(Base):
     ticket = relationship("Ticket", back_populates="messages")
 
 
+class TicketSlaSchedule(Base):
+    """Очередь SLA-напоминаний: строка на каждый открытый тикет, ждущий ответа."""
+
+    __tablename__ = "ticket_sla_schedule"
+
+    ticket_id = Column(
+        Integer,
+        ForeignKey("tickets.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    waiting_since = Column(DateTime, nullable=False)
+    next_reminder_at = Column(DateTime, nullable=False, index=True)
+    last_reminder_at = Column(DateTime, nullable=True)
+
+
 class SupportAuditLog(Base):
     __tablename__ = "support_audit_logs"
     
@@ -1,9 +1,11 @@
 import asyncio
 import json
+import random
 import ssl
 import base64 
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union, Any
+from typing import Callable, Dict, List, Optional, Tuple, Union, Any
 import aiohttp
 import logging
 from dataclasses import dataclass
@@ -97,6 +99,187 @@ class SubscriptionInfo:
     happ_crypto_link: Optional[str] = None
 
 
+UserChangeListener = Callable[[str, Optional[RemnaWaveUser]], None]
+
+_user_change_listeners: List[UserChangeListener] = []
+
+
+def add_user_change_listener(listener: UserChangeListener) -> None:
+    if listener not in _user_change_listeners:
+        _user_change_listeners.append(listener)
+
+
+def remove_user_change_listener(listener: UserChangeListener) -> None:
+    if listener in _user_change_listeners:
+        _user_change_listeners.remove(listener)
+
+
+def _notify_user_change(uuid: str, user: Optional[RemnaWaveUser]) -> None:
+    for listener in list(_user_change_listeners):
+        try:
+            listener(uuid, user)
+        except Exception as e:
+            logger.debug(f"User change listener failed for {uuid}: {e}")
+
+
+@dataclass(frozen=True)
+class RemnaWavePoolMetrics:
+    base_url: str
+    pool_size: int
+    per_host_limit: int
+    in_use: int
+    idle: int
+    requests_total: int
+    retries_total: int
+    queued_total: int
+    wait_time_total: float
+    wait_time_max: float
+
+    @property
+    def wait_time_avg(self) -> float:
+        return self.wait_time_total / self.queued_total if self.queued_total else 0.0
+
+
+def _pool_setting(name: str, default: Union[int, float]) -> Union[int, float]:
+    try:
+        from app.config import settings
+        value = getattr(settings, name, default)
+        return type(default)(value)
+    except Exception:
+        return default
+
+
+class _RemnaWaveSessionPool:
+    """Общая для процесса aiohttp-сессия с пулом keep-alive соединений к одной панели."""
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        cookies: Optional[Dict[str, str]],
+        ssl_context: Optional[ssl.SSLContext],
+    ):
+        self.base_url = base_url
+        self.headers = headers
+        self.cookies = cookies
+        self.ssl_context = ssl_context
+        self.pool_size = int(_pool_setting('REMNAWAVE_POOL_SIZE', 100))
+        self.per_host_limit = int(_pool_setting('REMNAWAVE_POOL_PER_HOST', 50))
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = asyncio.Lock()
+
+        self.in_flight = 0
+        self.requests_total = 0
+        self.retries_total = 0
+        self.queued_total = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _is_usable(self) -> bool:
+        if not self.session or self.session.closed:
+            return False
+        try:
+            return self._loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self._is_usable():
+            return self.session
+
+        async with self._lock:
+            if self._is_usable():
+                return self.session
+
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host_limit,
+                keepalive_timeout=float(_pool_setting('REMNAWAVE_KEEPALIVE_SECONDS', 30.0)),
+                ttl_dns_cache=int(_pool_setting('REMNAWAVE_DNS_CACHE_SECONDS', 300)),
+                use_dns_cache=True,
+                ssl=self.ssl_context if self.ssl_context is not None else True,
+            )
+
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_queued_start.append(self._on_queued_start)
+            trace_config.on_connection_queued_end.append(self._on_queued_end)
+
+            session_kwargs = {
+                'timeout': aiohttp.ClientTimeout(total=60, connect=30),
+                'headers': self.headers,
+                'connector': connector,
+                'trace_configs': [trace_config],
+            }
+            if self.cookies:
+                session_kwargs['cookies'] = self.cookies
+
+            self.session = aiohttp.ClientSession(**session_kwargs)
+            self._loop = asyncio.get_running_loop()
+            logger.debug(
+                f"Создан пул соединений Remnawave: {self.base_url} "
+                f"(limit={self.pool_size}, per_host={self.per_host_limit})"
+            )
+            return self.session
+
+    async def _on_queued_start(self, session, trace_config_ctx, params) -> None:
+        trace_config_ctx.queued_at = time.monotonic()
+
+    async def _on_queued_end(self, session, trace_config_ctx, params) -> None:
+        queued_at = getattr(trace_config_ctx, 'queued_at', None)
+        if queued_at is None:
+            return
+        waited = time.monotonic() - queued_at
+        self.queued_total += 1
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+
+    def idle_connections(self) -> int:
+        connector = self.session.connector if self.session and not self.session.closed else None
+        conns = getattr(connector, '_conns', None) or {}
+        return sum(len(items) for items in conns.values())
+
+    def metrics(self) -> RemnaWavePoolMetrics:
+        return RemnaWavePoolMetrics(
+            base_url=self.base_url,
+            pool_size=self.pool_size,
+            per_host_limit=self.per_host_limit,
+            in_use=self.in_flight,
+            idle=self.idle_connections(),
+            requests_total=self.requests_total,
+            retries_total=self.retries_total,
+            queued_total=self.queued_total,
+            wait_time_total=round(self.wait_time_total, 3),
+            wait_time_max=round(self.wait_time_max, 3),
+        )
+
+    async def close(self) -> None:
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self._loop = None
+
+
+_session_pools: Dict[Tuple, _RemnaWaveSessionPool] = {}
+
+RETRYABLE_METHODS = frozenset({'GET', 'PUT', 'PATCH', 'DELETE'})
+
+
+def get_pool_metrics() -> List[RemnaWavePoolMetrics]:
+    return [pool.metrics() for pool in _session_pools.values()]
+
+
+async def close_shared_sessions() -> None:
+    pools = list(_session_pools.values())
+    _session_pools.clear()
+    for pool in pools:
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.warning(f"Ошибка закрытия пула соединений Remnawave {pool.base_url}: {e}")
+
+
 class RemnaWaveAPIError(Exception):
     def __init__(self, message: str, status_code: int = None, response_data: dict = None):
         self.message = message
@@ -116,6 +299,7 @@ class RemnaWaveAPI:
         self.password = password
         self.session: Optional[aiohttp.ClientSession] = None
         self.authenticated = False
+        self._pool: Optional[_RemnaWaveSessionPool] = None
         
     def _detect_connection_type(self) -> str:
         parsed = urlparse(self.base_url)
@@ -160,7 +344,12 @@ class RemnaWaveAPI:
         
         return headers
         
-    async def __aenter__(self):
+    def _get_pool(self) -> _RemnaWaveSessionPool:
+        pool_key = (self.base_url, self.api_key, self.secret_key, self.username, self.password)
+        pool = _session_pools.get(pool_key)
+        if pool is not None:
+            return pool
+
         conn_type = self._detect_connection_type()
         
         logger.debug(f"Подключение к Remnawave: {self.base_url} (тип: {conn_type})")
@@ -177,7 +366,7 @@ class RemnaWaveAPI:
                 cookies = {self.secret_key: self.secret_key}
                 logger.debug(f"Используем куки: {self.secret_key}=***")
         
-        connector_kwargs = {}
+        ssl_context = None
         
         if conn_type == "local":
             logger.debug("Используют локальные заголовки proxy")
@@ -190,7 +379,6 @@ class RemnaWaveAPI:
                 ssl_context = ssl.create_default_context()
                 ssl_context.check_hostname = False
                 ssl_context.verify_mode = ssl.CERT_NONE
-                connector_kwargs['ssl'] = ssl_context
                 logger.debug("SSL проверка отключена для локального HTTPS")
                 
         elif conn_type == "external":
@@ -199,28 +387,22 @@ class RemnaWaveAPI:
                 ssl_context = ssl.create_default_context()
                 ssl_context.check_hostname = False
                 ssl_context.verify_mode = ssl.CERT_NONE
-                connector_kwargs['ssl'] = ssl_context
                 logger.debug("SSL проверка отключена для внешнего HTTPS")
-            
-        connector = aiohttp.TCPConnector(**connector_kwargs)
         
-        session_kwargs = {
-            'timeout': aiohttp.ClientTimeout(total=60, connect=30),
-            'headers': headers,
-            'connector': connector
-        }
+        pool = _RemnaWaveSessionPool(self.base_url, headers, cookies, ssl_context)
+        _session_pools[pool_key] = pool
+        return pool
         
-        if cookies:
-            session_kwargs['cookies'] = cookies
-            
-        self.session = aiohttp.ClientSession(**session_kwargs)
+    async def __aenter__(self):
+        self._pool = self._get_pool()
+        self.session = await self._pool.get_session()
         self.authenticated = True 
                 
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        # Сессия общая для процесса и закрывается через close_shared_sessions()
+        pass
             
     async def _make_request(
         self, 
@@ -233,6 +415,37 @@ class RemnaWaveAPI:
             raise RemnaWaveAPIError("Session not initialized. Use async context manager.")
             
         url = f"{self.base_url}{endpoint}"
+        max_retries = int(_pool_setting('REMNAWAVE_MAX_RETRIES', 2)) if method.upper() in RETRYABLE_METHODS else 0
+        backoff = float(_pool_setting('REMNAWAVE_RETRY_BACKOFF_SECONDS', 0.5))
+        
+        attempt = 0
+        while True:
+            try:
+                return await self._send_request(method, url, data, params)
+            except RemnaWaveAPIError as e:
+                retryable = e.status_code is None or e.status_code >= 500
+                if not retryable or attempt >= max_retries:
+                    raise
+            
+            attempt += 1
+            if self._pool:
+                self._pool.retries_total += 1
+            delay = backoff * (2 ** (attempt - 1))
+            delay = random.uniform(delay / 2, delay * 1.5)
+            logger.warning(f"Повтор запроса {method} {endpoint} через {delay:.2f}с (попытка {attempt}/{max_retries})")
+            await asyncio.sleep(delay)
+    
+    async def _send_request(
+        self,
+        method: str,
+        url: str,
+        data: Optional[Dict],
+        params: Optional[Dict]
+    ) -> Dict:
+        pool = self._pool
+        if pool:
+            pool.in_flight += 1
+            pool.requests_total += 1
         
         try:
             kwargs = {
@@ -263,9 +476,12 @@ class RemnaWaveAPI:
                     
                 return response_data
                 
-        except aiohttp.ClientError as e:
-            logger.error(f"Request failed: {e}")
-            raise RemnaWaveAPIError(f"Request failed: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Request failed: {e!r}")
+            raise RemnaWaveAPIError(f"Request failed: {str(e) or type(e).__name__}")
+        finally:
+            if pool:
+                pool.in_flight -= 1
     
     
     async def create_user(
@@ -304,7 +520,9 @@ class RemnaWaveAPI:
             data['activeInternalSquads'] = active_internal_squads
             
         response = await self._make_request('POST', '/api/users', data)
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(user.uuid, user)
+        return user
     
     async def get_user_by_uuid(self, uuid: str) -> Optional[RemnaWaveUser]:
         try:
@@ -374,23 +592,34 @@ class RemnaWaveAPI:
             data['activeInternalSquads'] = active_internal_squads
             
         response = await self._make_request('PATCH', '/api/users', data)
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(uuid, user)
+        return user
     
     async def delete_user(self, uuid: str) -> bool:
         response = await self._make_request('DELETE', f'/api/users/{uuid}')
-        return response['response']['isDeleted']
+        is_deleted = response['response']['isDeleted']
+        if is_deleted:
+            _notify_user_change(uuid, None)
+        return is_deleted
     
     async def enable_user(self, uuid: str) -> RemnaWaveUser:
         response = await self._make_request('POST', f'/api/users/{uuid}/actions/enable')
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(uuid, user)
+        return user
     
     async def disable_user(self, uuid: str) -> RemnaWaveUser:
         response = await self._make_request('POST', f'/api/users/{uuid}/actions/disable')
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(uuid, user)
+        return user
     
     async def reset_user_traffic(self, uuid: str) -> RemnaWaveUser:
         response = await self._make_request('POST', f'/api/users/{uuid}/actions/reset-traffic')
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(uuid, user)
+        return user
     
     async def revoke_user_subscription(self, uuid: str, new_short_uuid: Optional[str] = None) -> RemnaWaveUser:
         data = {}
@@ -398,7 +627,9 @@ class RemnaWaveAPI:
             data['shortUuid'] = new_short_uuid
             
         response = await self._make_request('POST', f'/api/users/{uuid}/actions/revoke', data)
-        return self._parse_user(response['response'])
+        user = self._parse_user(response['response'])
+        _notify_user_change(uuid, user)
+        return user
     
     async def get_all_users(self, start: int = 0, size: int = 100) -> Dict[str, Any]:
         params = {'start': start, 'size': size}
@@ -145,6 +145,7 @@ async def show_backup_panel(
 • Интервал: {settings_obj.backup_interval_hours} часов
 • Хранить: {settings_obj.max_backups_keep} файлов
 • Сжатие: {'Да' if settings_obj.compression_enabled else 'Нет'}
+• Инкрементальные: {f'Да (полный каждые {settings_obj.full_backup_every})' if settings_obj.incremental_enabled else 'Нет'}
 
 📁 <b>Расположение:</b> <code>/app/data/backups</code>
 
@@ -272,6 +273,7 @@ async def manage_backup_file(
 📈 <b>Записей:</b> {backup_info.get('total_records', '?'):,}
 🗜️ <b>Сжатие:</b> {'Да' if backup_info.get('compressed') else 'Нет'}
 🗄️ <b>БД:</b> {backup_info.get('database_type', 'unknown')}
+🧩 <b>Тип:</b> {'Инкремент #' + str(backup_info.get('chain_position')) if backup_info.get('backup_type') == 'incremental' else 'Полный'}
 """
     
     if backup_info.get("error"):
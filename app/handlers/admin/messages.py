@@ -4,11 +4,12 @@ import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from aiogram import Dispatcher, types, F
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import InterfaceError
 from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.states import AdminStates
@@ -19,8 +20,10 @@ from app.database.models import (
     SubscriptionStatus,
     BroadcastHistory,
     Tariff,
+    UnreachableRecipient,
 )
 from app.database.database import AsyncSessionLocal
+from app.database.crud.broadcast import unreachable_cutoff
 from app.keyboards.admin import (
     get_admin_messages_keyboard, get_broadcast_target_keyboard,
     get_custom_criteria_keyboard, get_broadcast_history_keyboard,
@@ -30,8 +33,6 @@ from app.keyboards.admin import (
     get_broadcast_button_config, get_broadcast_button_labels, get_pinned_message_keyboard
 )
 from app.localization.texts import get_texts
-from app.database.crud.user import get_users_list
-from app.database.crud.subscription import get_expiring_subscriptions
 from app.database.crud.tariff import get_all_tariffs
 from app.utils.decorators import admin_required, error_handler
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
@@ -41,6 +42,7 @@ from app.services.pinned_message_service import (
     set_active_pinned_message,
     unpin_active_pinned_message,
 )
+from app.services.telegram_send_scheduler import telegram_send_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -1256,10 +1258,7 @@ async def confirm_broadcast(
         parse_mode="HTML"
     )
 
-    if target.startswith('custom_'):
-        users = await get_custom_users(db, target.replace('custom_', ''))
-    else:
-        users = await get_target_users(db, target)
+    total_count = await count_broadcast_recipients(db, target)
     
     broadcast_history = BroadcastHistory(
         target_type=target,
@@ -1268,7 +1267,7 @@ async def confirm_broadcast(
         media_type=media_type,
         media_file_id=media_file_id,
         media_caption=media_caption,
-        total_count=len(users),
+        total_count=total_count,
         sent_count=0,
         failed_count=0,
         admin_id=db_user.id,
@@ -1284,94 +1283,84 @@ async def confirm_broadcast(
     
     broadcast_keyboard = create_broadcast_keyboard(selected_buttons, db_user.language_code)
     
-    # Ограничение на количество одновременных отправок и базовая задержка между сообщениями,
-    # чтобы избежать перегрузки бота и лимитов Telegram при больших рассылках
-    max_concurrent_sends = 5
-    per_message_delay = 0.05
-    semaphore = asyncio.Semaphore(max_concurrent_sends)
-
-    async def send_single_broadcast(user):
-        """Отправляет одно сообщение рассылки с семафором ограничения"""
-        async with semaphore:
-            for attempt in range(3):
-                try:
-                    if has_media and media_file_id:
-                        if media_type == "photo":
-                            await callback.bot.send_photo(
-                                chat_id=user.telegram_id,
-                                photo=media_file_id,
-                                caption=message_text,
-                                parse_mode="HTML",
-                                reply_markup=broadcast_keyboard
-                            )
-                        elif media_type == "video":
-                            await callback.bot.send_video(
-                                chat_id=user.telegram_id,
-                                video=media_file_id,
-                                caption=message_text,
-                                parse_mode="HTML",
-                                reply_markup=broadcast_keyboard
-                            )
-                        elif media_type == "document":
-                            await callback.bot.send_document(
-                                chat_id=user.telegram_id,
-                                document=media_file_id,
-                                caption=message_text,
-                                parse_mode="HTML",
-                                reply_markup=broadcast_keyboard
-                            )
-                    else:
-                        await callback.bot.send_message(
-                            chat_id=user.telegram_id,
-                            text=message_text,
-                            parse_mode="HTML",
-                            reply_markup=broadcast_keyboard
-                        )
-
-                    await asyncio.sleep(per_message_delay)
-                    return True, user.telegram_id
-                except TelegramRetryAfter as e:
-                    retry_delay = min(e.retry_after + 1, 30)
-                    logger.warning(
-                        f"Превышен лимит Telegram для {user.telegram_id}, ожидание {retry_delay} сек."
-                    )
-                    await asyncio.sleep(retry_delay)
-                except TelegramForbiddenError:
-                    # Пользователь мог удалить бота или запретить сообщения
-                    logger.info(f"Рассылка недоступна для пользователя {user.telegram_id}: Forbidden")
-                    return False, user.telegram_id
-                except TelegramBadRequest as e:
-                    logger.error(
-                        f"Некорректный запрос при рассылке пользователю {user.telegram_id}: {e}"
-                    )
-                    return False, user.telegram_id
-                except Exception as e:
-                    logger.error(
-                        f"Ошибка отправки рассылки пользователю {user.telegram_id} (попытка {attempt + 1}/3): {e}"
-                    )
-                    await asyncio.sleep(0.5 * (attempt + 1))
+    def build_send(telegram_id: int):
+        if has_media and media_file_id:
+            if media_type == "photo":
+                return lambda: callback.bot.send_photo(
+                    chat_id=telegram_id,
+                    photo=media_file_id,
+                    caption=message_text,
+                    parse_mode="HTML",
+                    reply_markup=broadcast_keyboard
+                )
+            if media_type == "video":
+                return lambda: callback.bot.send_video(
+                    chat_id=telegram_id,
+                    video=media_file_id,
+                    caption=message_text,
+                    parse_mode="HTML",
+                    reply_markup=broadcast_keyboard
+                )
+            if media_type == "document":
+                return lambda: callback.bot.send_document(
+                    chat_id=telegram_id,
+                    document=media_file_id,
+                    caption=message_text,
+                    parse_mode="HTML",
+                    reply_markup=broadcast_keyboard
+                )
+        return lambda: callback.bot.send_message(
+            chat_id=telegram_id,
+            text=message_text,
+            parse_mode="HTML",
+            reply_markup=broadcast_keyboard
+        )
 
-            return False, user.telegram_id
+    async def send_single_broadcast(telegram_id: int):
+        """Отправляет одно сообщение рассылки через общий планировщик отправки.
+
+        Планировщик сам соблюдает глобальный и поканальный лимиты Telegram
+        и повторяет запрос после RetryAfter.
+        """
+        try:
+            await telegram_send_scheduler.send(telegram_id, build_send(telegram_id))
+            return True, telegram_id
+        except TelegramForbiddenError:
+            # Пользователь мог удалить бота или запретить сообщения
+            logger.info(f"Рассылка недоступна для пользователя {telegram_id}: Forbidden")
+            return False, telegram_id
+        except TelegramBadRequest as e:
+            logger.error(
+                f"Некорректный запрос при рассылке пользователю {telegram_id}: {e}"
+            )
+            return False, telegram_id
+        except Exception as e:
+            logger.error(f"Ошибка отправки рассылки пользователю {telegram_id}: {e}")
+            return False, telegram_id
 
-    # Отправляем сообщения пакетами для эффективности
+    # Получатели читаются страницами по User.id, в памяти держится только текущая страница
     batch_size = 50
-    for i in range(0, len(users), batch_size):
-        batch = users[i:i + batch_size]
-        tasks = [send_single_broadcast(user) for user in batch]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for result in results:
-            if isinstance(result, tuple):  # (success, telegram_id)
-                success, _ = result
-                if success:
-                    sent_count += 1
-                else:
+    last_id = 0
+    while True:
+        page = await fetch_broadcast_recipient_page(db, target, after_id=last_id)
+        if not page:
+            break
+        last_id = page[-1][0]
+
+        for i in range(0, len(page), batch_size):
+            batch = page[i:i + batch_size]
+            tasks = [send_single_broadcast(telegram_id) for _, telegram_id in batch]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+            for result in results:
+                if isinstance(result, tuple):  # (success, telegram_id)
+                    success, _ = result
+                    if success:
+                        sent_count += 1
+                    else:
+                        failed_count += 1
+                elif isinstance(result, Exception):
                     failed_count += 1
-            elif isinstance(result, Exception):
-                failed_count += 1
-
-        # Небольшая задержка между пакетами для снижения нагрузки на API
-        await asyncio.sleep(0.25)
     
     status = "completed" if failed_count == 0 else "partial"
     await _persist_broadcast_result(
@@ -1392,8 +1381,8 @@ async def confirm_broadcast(
 📊 <b>Результат:</b>
 - Отправлено: {sent_count}
 - Не доставлено: {failed_count}
-- Всего пользователей: {len(users)}
-- Успешность: {round(sent_count / len(users) * 100, 1) if users else 0}%{media_info}
+- Всего пользователей: {total_count}
+- Успешность: {round(sent_count / total_count * 100, 1) if total_count else 0}%{media_info}
 
 <b>Администратор:</b> {db_user.full_name}
 """
@@ -1422,465 +1411,240 @@ async def confirm_broadcast(
             raise
 
     await state.clear()
-    logger.info(f"Рассылка выполнена админом {db_user.telegram_id}: {sent_count}/{len(users)} (медиа: {has_media})")
-
-
-async def get_target_users_count(db: AsyncSession, target: str) -> int:
-    """Быстрый подсчёт пользователей через SQL COUNT вместо загрузки всех в память."""
-    from sqlalchemy import func as sql_func, distinct
-    from datetime import datetime, timedelta
-
-    base_filter = User.status == UserStatus.ACTIVE.value
+    logger.info(f"Рассылка выполнена админом {db_user.telegram_id}: {sent_count}/{total_count} (медиа: {has_media})")
 
-    if target == "all":
-        query = select(sql_func.count(User.id)).where(base_filter)
-        result = await db.execute(query)
-        return result.scalar() or 0
 
-    if target == "active":
-        # Активные платные подписки (не триал)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_trial == False,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+BROADCAST_RECIPIENT_PAGE_SIZE = 5000
 
-    if target == "trial":
-        # Триальные подписки (без проверки is_active, как в оригинале)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.is_trial == True,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "no":
-        # Без активной подписки - используем NOT EXISTS для корректности
-        subquery = (
-            select(Subscription.id)
-            .where(
-                Subscription.user_id == User.id,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-            )
-            .exists()
-        )
-        query = (
-            select(sql_func.count(User.id))
-            .where(base_filter, ~subquery)
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "expiring":
-        # Истекающие в ближайшие 3 дня
-        now = datetime.utcnow()
-        expiry_threshold = now + timedelta(days=3)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.end_date <= expiry_threshold,
-                Subscription.end_date > now,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "expiring_subscribers":
-        # Истекающие в ближайшие 7 дней
-        now = datetime.utcnow()
-        expiry_threshold = now + timedelta(days=7)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.end_date <= expiry_threshold,
-                Subscription.end_date > now,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "expired":
-        # Истекшие подписки
-        now = datetime.utcnow()
-        expired_statuses = [SubscriptionStatus.EXPIRED.value, SubscriptionStatus.DISABLED.value]
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .outerjoin(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                or_(
-                    Subscription.status.in_(expired_statuses),
-                    and_(Subscription.end_date <= now, Subscription.status != SubscriptionStatus.ACTIVE.value),
-                    and_(Subscription.id == None, User.has_had_paid_subscription == True),
-                )
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "expired_subscribers":
-        # То же что и expired
-        now = datetime.utcnow()
-        expired_statuses = [SubscriptionStatus.EXPIRED.value, SubscriptionStatus.DISABLED.value]
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .outerjoin(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                or_(
-                    Subscription.status.in_(expired_statuses),
-                    and_(Subscription.end_date <= now, Subscription.status != SubscriptionStatus.ACTIVE.value),
-                    and_(Subscription.id == None, User.has_had_paid_subscription == True),
-                )
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "active_zero":
-        # Активные платные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_trial == False,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "trial_zero":
-        # Триальные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.is_trial == True,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == "zero":
-        # Все активные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    # Фильтр по тарифу
-    if target.startswith("tariff_"):
-        tariff_id = int(target.split("_")[1])
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.tariff_id == tariff_id,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    # Для остальных фильтров (custom_ и неизвестные) - fallback на старый метод
-    users = await get_target_users(db, target)
-    return len(users)
 
+def _subscription_exists(*conditions):
+    return (
+        select(Subscription.id)
+        .where(Subscription.user_id == User.id, *conditions)
+        .exists()
+    )
 
-async def get_target_users(db: AsyncSession, target: str) -> list:
-    # Загружаем всех активных пользователей батчами, чтобы не ограничиваться 10к
-    users: list[User] = []
-    offset = 0
-    batch_size = 5000
 
-    while True:
-        batch = await get_users_list(
-            db,
-            offset=offset,
-            limit=batch_size,
-            status=UserStatus.ACTIVE,
-        )
+def _zero_traffic_condition():
+    return or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0)
 
-        if not batch:
-            break
 
-        users.extend(batch)
-        offset += batch_size
+def build_target_user_filters(target: str) -> Optional[list]:
+    """SQL-условия для выбора получателей рассылки; None для неизвестной цели."""
+    now = datetime.utcnow()
+    filters = [User.status == UserStatus.ACTIVE.value]
+    active = Subscription.status == SubscriptionStatus.ACTIVE.value
 
     if target == "all":
-        return users
+        return filters
 
     if target == "active":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_active
-            and not user.subscription.is_trial
-        ]
+        # Активные платные подписки (не триал)
+        return filters + [_subscription_exists(active, Subscription.is_trial == False)]
 
     if target == "trial":
-        return [
-            user
-            for user in users
-            if user.subscription and user.subscription.is_trial
-        ]
+        return filters + [_subscription_exists(Subscription.is_trial == True)]
 
     if target == "no":
-        return [
-            user
-            for user in users
-            if not user.subscription or not user.subscription.is_active
+        return filters + [~_subscription_exists(active)]
+
+    if target in ("expiring", "expiring_subscribers"):
+        # Истекающие в ближайшие 3 / 7 дней
+        days = 3 if target == "expiring" else 7
+        return filters + [
+            _subscription_exists(
+                active,
+                Subscription.end_date <= now + timedelta(days=days),
+                Subscription.end_date > now,
+            )
         ]
 
-    if target == "expiring":
-        expiring_subs = await get_expiring_subscriptions(db, 3)
-        return [sub.user for sub in expiring_subs if sub.user]
-
-    if target == "expired":
-        now = datetime.utcnow()
-        expired_statuses = {
-            SubscriptionStatus.EXPIRED.value,
-            SubscriptionStatus.DISABLED.value,
-        }
-        expired_users = []
-        for user in users:
-            subscription = user.subscription
-            if subscription:
-                if subscription.status in expired_statuses:
-                    expired_users.append(user)
-                    continue
-                if subscription.end_date <= now and not subscription.is_active:
-                    expired_users.append(user)
-                    continue
-            elif user.has_had_paid_subscription:
-                expired_users.append(user)
-        return expired_users
+    if target in ("expired", "expired_subscribers"):
+        expired_statuses = [SubscriptionStatus.EXPIRED.value, SubscriptionStatus.DISABLED.value]
+        return filters + [
+            or_(
+                _subscription_exists(
+                    or_(
+                        Subscription.status.in_(expired_statuses),
+                        and_(Subscription.end_date <= now, ~active),
+                    )
+                ),
+                and_(~_subscription_exists(), User.has_had_paid_subscription == True),
+            )
+        ]
 
     if target == "active_zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and not user.subscription.is_trial
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
+        return filters + [
+            _subscription_exists(active, Subscription.is_trial == False, _zero_traffic_condition())
         ]
 
     if target == "trial_zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_trial
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
+        return filters + [
+            _subscription_exists(active, Subscription.is_trial == True, _zero_traffic_condition())
         ]
 
     if target == "zero":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_active
-            and (user.subscription.traffic_used_gb or 0) <= 0
-        ]
-
-    if target == "expiring_subscribers":
-        expiring_subs = await get_expiring_subscriptions(db, 7)
-        return [sub.user for sub in expiring_subs if sub.user]
-
-    if target == "expired_subscribers":
-        now = datetime.utcnow()
-        expired_statuses = {
-            SubscriptionStatus.EXPIRED.value,
-            SubscriptionStatus.DISABLED.value,
-        }
-        expired_users = []
-        for user in users:
-            subscription = user.subscription
-            if subscription:
-                if subscription.status in expired_statuses:
-                    expired_users.append(user)
-                    continue
-                if subscription.end_date <= now and not subscription.is_active:
-                    expired_users.append(user)
-                    continue
-            elif user.has_had_paid_subscription:
-                expired_users.append(user)
-        return expired_users
+        return filters + [_subscription_exists(active, _zero_traffic_condition())]
 
     if target == "canceled_subscribers":
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.status == SubscriptionStatus.DISABLED.value
+        return filters + [
+            _subscription_exists(Subscription.status == SubscriptionStatus.DISABLED.value)
         ]
 
     if target == "trial_ending":
-        now = datetime.utcnow()
-        in_3_days = now + timedelta(days=3)
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_trial
-            and user.subscription.is_active
-            and user.subscription.end_date <= in_3_days
+        return filters + [
+            _subscription_exists(
+                active,
+                Subscription.is_trial == True,
+                Subscription.end_date <= now + timedelta(days=3),
+            )
         ]
 
     if target == "trial_expired":
-        now = datetime.utcnow()
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_trial
-            and user.subscription.end_date <= now
+        return filters + [
+            _subscription_exists(Subscription.is_trial == True, Subscription.end_date <= now)
         ]
 
     if target == "autopay_failed":
         from app.database.models import SubscriptionEvent
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        stmt = select(SubscriptionEvent.user_id).where(
-            and_(
-                SubscriptionEvent.event_type == "autopay_failed",
-                SubscriptionEvent.occurred_at >= week_ago,
+        week_ago = now - timedelta(days=7)
+        return filters + [
+            User.id.in_(
+                select(SubscriptionEvent.user_id).where(
+                    SubscriptionEvent.event_type == "autopay_failed",
+                    SubscriptionEvent.occurred_at >= week_ago,
+                )
             )
-        ).distinct()
-        result = await db.execute(stmt)
-        failed_user_ids = set(result.scalars().all())
-        return [user for user in users if user.id in failed_user_ids]
+        ]
 
     if target == "low_balance":
         threshold_kopeks = 10000  # 100 рублей
-        return [
-            user
-            for user in users
-            if (user.balance_kopeks or 0) < threshold_kopeks
-            and (user.balance_kopeks or 0) > 0
-        ]
+        return filters + [User.balance_kopeks > 0, User.balance_kopeks < threshold_kopeks]
 
-    if target == "inactive_30d":
-        threshold = datetime.utcnow() - timedelta(days=30)
-        return [
-            user
-            for user in users
-            if user.last_activity and user.last_activity < threshold
-        ]
-
-    if target == "inactive_60d":
-        threshold = datetime.utcnow() - timedelta(days=60)
-        return [
-            user
-            for user in users
-            if user.last_activity and user.last_activity < threshold
-        ]
-
-    if target == "inactive_90d":
-        threshold = datetime.utcnow() - timedelta(days=90)
-        return [
-            user
-            for user in users
-            if user.last_activity and user.last_activity < threshold
-        ]
+    if target in ("inactive_30d", "inactive_60d", "inactive_90d"):
+        days = int(target[len("inactive_"):-1])
+        return filters + [User.last_activity < now - timedelta(days=days)]
 
     # Фильтр по тарифу
     if target.startswith("tariff_"):
         tariff_id = int(target.split("_")[1])
-        return [
-            user
-            for user in users
-            if user.subscription
-            and user.subscription.is_active
-            and user.subscription.tariff_id == tariff_id
-        ]
+        return filters + [_subscription_exists(active, Subscription.tariff_id == tariff_id)]
 
-    return []
-
-
-async def get_custom_users_count(db: AsyncSession, criteria: str) -> int:
-    users = await get_custom_users(db, criteria)
-    return len(users)
+    return None
 
 
-async def get_custom_users(db: AsyncSession, criteria: str) -> list:
+def build_custom_user_filters(criteria: str) -> Optional[list]:
     now = datetime.utcnow()
     today = now.replace(hour=0, minute=0, second=0, microsecond=0)
     week_ago = now - timedelta(days=7)
     month_ago = now - timedelta(days=30)
-    
+    filters = [User.status == "active"]
+
     if criteria == "today":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= today)
-        )
-    elif criteria == "week":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= week_ago)
-        )
-    elif criteria == "month":
-        stmt = select(User).where(
-            and_(User.status == "active", User.created_at >= month_ago)
-        )
-    elif criteria == "active_today":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity >= today)
-        )
-    elif criteria == "inactive_week":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity < week_ago)
-        )
-    elif criteria == "inactive_month":
-        stmt = select(User).where(
-            and_(User.status == "active", User.last_activity < month_ago)
-        )
-    elif criteria == "referrals":
-        stmt = select(User).where(
-            and_(User.status == "active", User.referred_by_id.isnot(None))
-        )
-    elif criteria == "direct":
-        stmt = select(User).where(
-            and_(
-                User.status == "active", 
-                User.referred_by_id.is_(None)
-            )
-        )
+        return filters + [User.created_at >= today]
+    if criteria == "week":
+        return filters + [User.created_at >= week_ago]
+    if criteria == "month":
+        return filters + [User.created_at >= month_ago]
+    if criteria == "active_today":
+        return filters + [User.last_activity >= today]
+    if criteria == "inactive_week":
+        return filters + [User.last_activity < week_ago]
+    if criteria == "inactive_month":
+        return filters + [User.last_activity < month_ago]
+    if criteria == "referrals":
+        return filters + [User.referred_by_id.isnot(None)]
+    if criteria == "direct":
+        return filters + [User.referred_by_id.is_(None)]
+    return None
+
+
+def build_broadcast_filters(target: str) -> Optional[list]:
+    """Условия выборки получателей рассылки без недавно недоступных пользователей."""
+    if target.startswith("custom_"):
+        filters = build_custom_user_filters(target[len("custom_"):])
     else:
+        filters = build_target_user_filters(target)
+    if filters is None:
+        return None
+
+    unreachable = select(UnreachableRecipient.id).where(
+        UnreachableRecipient.telegram_id == User.telegram_id
+    )
+    cutoff = unreachable_cutoff(getattr(settings, 'BROADCAST_UNREACHABLE_TTL_DAYS', 30))
+    if cutoff is not None:
+        unreachable = unreachable.where(UnreachableRecipient.detected_at >= cutoff)
+    return filters + [~unreachable.exists()]
+
+
+async def count_broadcast_recipients(db: AsyncSession, target: str) -> int:
+    return await _count_users(db, build_broadcast_filters(target))
+
+
+async def _count_users(db: AsyncSession, filters: Optional[list]) -> int:
+    if filters is None:
+        return 0
+    result = await db.execute(select(func.count(User.id)).where(*filters))
+    return result.scalar() or 0
+
+
+async def _load_users(db: AsyncSession, filters: Optional[list]) -> list:
+    if filters is None:
         return []
-    
-    result = await db.execute(stmt)
-    return result.scalars().all()
+
+    users: list[User] = []
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User)
+            .options(selectinload(User.subscription))
+            .where(*filters, User.id > last_id)
+            .order_by(User.id)
+            .limit(BROADCAST_RECIPIENT_PAGE_SIZE)
+        )
+        batch = result.scalars().all()
+        if not batch:
+            break
+        users.extend(batch)
+        last_id = batch[-1].id
+    return users
+
+
+async def fetch_broadcast_recipient_page(
+    db: AsyncSession,
+    target: str,
+    after_id: int = 0,
+    limit: int = BROADCAST_RECIPIENT_PAGE_SIZE,
+) -> list[tuple[int, int]]:
+    """Страница получателей (user_id, telegram_id) после after_id в порядке User.id."""
+    filters = build_broadcast_filters(target)
+    if filters is None:
+        return []
+
+    result = await db.execute(
+        select(User.id, User.telegram_id)
+        .where(*filters, User.id > after_id)
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return [(row[0], row[1]) for row in result.all()]
+
+
+async def get_target_users_count(db: AsyncSession, target: str) -> int:
+    """Быстрый подсчёт пользователей через SQL COUNT вместо загрузки всех в память."""
+    return await _count_users(db, build_target_user_filters(target))
+
+
+async def get_target_users(db: AsyncSession, target: str) -> list:
+    return await _load_users(db, build_target_user_filters(target))
+
+
+async def get_custom_users_count(db: AsyncSession, criteria: str) -> int:
+    return await _count_users(db, build_custom_user_filters(criteria))
+
+
+async def get_custom_users(db: AsyncSession, criteria: str) -> list:
+    return await _load_users(db, build_custom_user_filters(criteria))
 
 
 async def get_users_statistics(db: AsyncSession) -> dict:
@@ -1889,60 +1653,21 @@ async def get_users_statistics(db: AsyncSession) -> dict:
     week_ago = now - timedelta(days=7)
     month_ago = now - timedelta(days=30)
     
-    stats = {}
-    
-    stats['today'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.created_at >= today)
-        )
-    ) or 0
-    
-    stats['week'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.created_at >= week_ago)
-        )
-    ) or 0
-    
-    stats['month'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.created_at >= month_ago)
-        )
-    ) or 0
-    
-    stats['active_today'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.last_activity >= today)
-        )
-    ) or 0
-    
-    stats['inactive_week'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.last_activity < week_ago)
-        )
-    ) or 0
-    
-    stats['inactive_month'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.last_activity < month_ago)
-        )
-    ) or 0
-    
-    stats['referrals'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(User.status == "active", User.referred_by_id.isnot(None))
-        )
-    ) or 0
-    
-    stats['direct'] = await db.scalar(
-        select(func.count(User.id)).where(
-            and_(
-                User.status == "active", 
-                User.referred_by_id.is_(None)
-            )
-        )
-    ) or 0
+    row = (await db.execute(
+        select(
+            func.count(User.id).filter(User.created_at >= today),
+            func.count(User.id).filter(User.created_at >= week_ago),
+            func.count(User.id).filter(User.created_at >= month_ago),
+            func.count(User.id).filter(User.last_activity >= today),
+            func.count(User.id).filter(User.last_activity < week_ago),
+            func.count(User.id).filter(User.last_activity < month_ago),
+            func.count(User.id).filter(User.referrer_id.isnot(None)),
+            func.count(User.id).filter(User.referrer_id.is_(None)),
+        ).where(User.status == "active")
+    )).one()
     
-    return stats
+    keys = ('today', 'week', 'month', 'active_today', 'inactive_week', 'inactive_month', 'referrals', 'direct')
+    return {key: value or 0 for key, value in zip(keys, row)}
 
 
 def get_target_name(target_type: str) -> str:
@@ -15,6 +15,7 @@ from app.services.payment_service import PaymentService
 from app.services.payment_verification_service import (
     PendingPayment,
     SUPPORTED_MANUAL_CHECK_METHODS,
+    auto_payment_verification_service,
     get_payment_record,
     list_recent_pending_payments,
     run_manual_check,
@@ -285,6 +286,26 @@ def _build_detail_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+def _build_auto_check_lines(texts) -> list[str]:
+    stats = auto_payment_verification_service.get_stats()
+    if not stats:
+        return []
+
+    lines = ["", texts.t("ADMIN_PAYMENTS_AUTO_CHECK_TITLE", "🔄 <b>Auto check</b>")]
+    for method, provider_stats in sorted(stats.items(), key=lambda item: _method_display(item[0])):
+        latency = (
+            f"{provider_stats.p95_latency:.1f}s"
+            if provider_stats.p95_latency is not None
+            else "—"
+        )
+        lines.append(
+            f"• {html.escape(_method_display(method))}: "
+            f"{provider_stats.backlog} pending, p95 {latency}, "
+            f"timeouts {provider_stats.timeouts_total}, errors {provider_stats.errors_total}"
+        )
+    return lines
+
+
 def _format_user_line(user: User) -> str:
     username = format_username(user.username, user.telegram_id, user.full_name)
     return f"👤 {html.escape(username)} (<code>{user.telegram_id}</code>)"
@@ -501,6 +522,7 @@ async def show_payments_overview(
     )
 
     lines = [header, "", description]
+    lines.extend(_build_auto_check_lines(texts))
 
     if page_records:
         for idx, record in enumerate(page_records, start=start_index + 1):
@@ -137,14 +137,28 @@ def _build_auto_sync_view(status: RemnaWaveAutoSyncStatus) -> tuple[str, types.I
     running_text = "⏳ Выполняется сейчас" if status.is_running else "Ожидание"
     toggle_text = "❌ Отключить" if status.enabled else "✅ Включить"
 
+    mode_map = {"full": "полная", "incremental": "инкрементальная"}
+    mode_text = (
+        f"инкрементальная, полная раз в {status.full_sync_interval_hours} ч"
+        if status.incremental_enabled
+        else "всегда полная"
+    )
+    watermark_text = format_datetime(status.watermark) if status.watermark else "—"
+    full_sync_text = format_datetime(status.last_full_sync_at) if status.last_full_sync_at else "—"
+    next_full_text = format_datetime(status.next_full_sync_due) if status.next_full_sync_due else "при следующем запуске"
+
     text = f"""🔄 <b>Автосинхронизация RemnaWave</b>
 
 ⚙️ <b>Статус:</b> {'✅ Включена' if status.enabled else '❌ Отключена'}
 🕒 <b>Расписание:</b> {times_text}
 📅 <b>Следующий запуск:</b> {next_run_text if status.enabled else '—'}
 ⏱️ <b>Состояние:</b> {running_text}
+🧭 <b>Режим:</b> {mode_text}
+• Метка updatedAt: {watermark_text}
+• Последняя полная: {full_sync_text}
+• Следующая полная: {next_full_text}
 
-📊 <b>Последний запуск:</b>
+📊 <b>Последний запуск:</b> {mode_map.get(status.last_run_mode or "", "—")}
 {last_run_text}
 
 👥 <b>Пользователи:</b>
@@ -17,6 +17,7 @@ from app.database.crud.server_squad import (
     get_available_server_squads,
     update_server_squad_promo_groups,
     get_server_connected_users,
+    count_server_connected_users,
 )
 from app.database.crud.promo_group import get_promo_groups_with_counts
 from app.services.remnawave_service import RemnaWaveService
@@ -379,8 +380,7 @@ async def show_server_users(
         await callback.answer("❌ Сервер не найден!", show_alert=True)
         return
 
-    users = await get_server_connected_users(db, server_id)
-    total_users = len(users)
+    total_users = await count_server_connected_users(db, server_id)
 
     page_size = 10
     total_pages = max((total_users + page_size - 1) // page_size, 1)
@@ -389,8 +389,12 @@ async def show_server_users(
         page = total_pages
 
     start_index = (page - 1) * page_size
-    end_index = start_index + page_size
-    page_users = users[start_index:end_index]
+    page_users = await get_server_connected_users(
+        db,
+        server_id,
+        limit=page_size,
+        offset=start_index,
+    )
 
     safe_name = html.escape(server.display_name or "—")
     safe_uuid = html.escape(server.squad_uuid or "—")
@@ -417,7 +421,7 @@ async def show_server_users(
         parts = status_text.split(" ", 1)
         return parts[0] if parts else status_text
 
-    if users:
+    if page_users:
         lines = []
         for index, user in enumerate(page_users, start=start_index + 1):
             safe_user_name = html.escape(user.full_name)
@@ -7,6 +7,7 @@ from app.config import settings
 from app.database.models import User
 from app.keyboards.admin import get_admin_statistics_keyboard, get_period_selection_keyboard
 from app.localization.texts import get_texts
+from app.services.stats_rollup_service import stats_rollup_service
 from app.services.user_service import UserService
 from app.database.crud.subscription import get_subscriptions_statistics
 from app.database.crud.transaction import get_transactions_statistics, get_revenue_by_period
@@ -152,7 +153,7 @@ async def show_revenue_statistics(
     month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
     month_stats = await get_transactions_statistics(db, month_start, now)
-    all_time_stats = await get_transactions_statistics(db)
+    all_time_totals = await stats_rollup_service.get_totals(db)
     current_time = format_datetime(datetime.utcnow())
     
     text = f"""
@@ -169,8 +170,8 @@ async def show_revenue_statistics(
 - Доходы: {settings.format_price(month_stats['today']['income_kopeks'])}
 
 <b>За все время:</b>
-- Общий доход: {settings.format_price(all_time_stats['totals']['income_kopeks'])}
-- Общая прибыль: {settings.format_price(all_time_stats['totals']['profit_kopeks'])}
+- Общий доход: {settings.format_price(all_time_totals['deposits_kopeks'])}
+- Общая прибыль: {settings.format_price(all_time_totals['deposits_kopeks'] - all_time_totals['refunds_kopeks'])}
 
 <b>Способы оплаты:</b>
 """
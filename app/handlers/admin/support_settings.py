@@ -7,6 +7,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.crud.ticket_sla import reschedule_ticket_sla
 from app.database.models import User
 from app.config import settings
 from app.localization.texts import get_texts
@@ -226,6 +227,7 @@ async def handle_sla_minutes(message: types.Message, db_user: User, db: AsyncSes
         await message.answer(texts.t("ADMIN_SUPPORT_SLA_INVALID", "❌ Введите корректное число минут (1-1440)"))
         return
     SupportSettingsService.set_sla_minutes(minutes)
+    await reschedule_ticket_sla(db, minutes)
     await state.clear()
     markup = types.InlineKeyboardMarkup(
         inline_keyboard=[[types.InlineKeyboardButton(text=texts.t("DELETE_MESSAGE", "🗑 Удалить"), callback_data="admin_support_delete_msg")]]
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.database.models import User
 from app.utils.decorators import admin_required, error_handler
+from app.utils.log_reader import read_tail_text
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +39,7 @@ def _build_logs_message(log_path: Path) -> str:
         return message
 
     try:
-        content = log_path.read_text(encoding="utf-8", errors="ignore")
+        preview_text, truncated, size_bytes = read_tail_text(log_path, LOG_PREVIEW_LIMIT)
     except Exception as error:  # pragma: no cover - защита от проблем чтения
         logger.error("Ошибка чтения лог-файла %s: %s", log_path, error)
         message = (
@@ -47,23 +48,19 @@ def _build_logs_message(log_path: Path) -> str:
         )
         return message
 
-    total_length = len(content)
     stats = log_path.stat()
     updated_at = datetime.fromtimestamp(stats.st_mtime)
 
-    if not content:
+    if not preview_text:
         preview_text = "Лог-файл пуст."
         truncated = False
-    else:
-        preview_text = content[-LOG_PREVIEW_LIMIT:]
-        truncated = total_length > LOG_PREVIEW_LIMIT
 
     details_lines = [
         "🧾 <b>Системные логи</b>",
         "",
         f"📁 <b>Файл:</b> <code>{log_path}</code>",
         f"🕒 <b>Обновлен:</b> {updated_at.strftime('%d.%m.%Y %H:%M:%S')}",
-        f"🧮 <b>Размер:</b> {total_length} символов",
+        f"🧮 <b>Размер:</b> {size_bytes} байт",
         (
             f"👇 Показаны последние {LOG_PREVIEW_LIMIT} символов."
             if truncated
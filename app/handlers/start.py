@@ -5,6 +5,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart, Command
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.crud.broadcast import clear_unreachable_recipient
 from app.database.crud.user import get_user_by_telegram_id, create_user
 from app.keyboards.inline import get_main_menu_keyboard, get_not_opening_menu_keyboard
 from app.localization.texts import get_text
@@ -86,6 +87,9 @@ async def cmd_start(message: Message, db: AsyncSession):
                     logger.info(f"Subscription created for new user {telegram_id}, uuid: {remnawave_user.short_uuid}, balance: {WELCOME_BONUS}₽")
         except Exception as e:
             logger.error(f"Failed to create subscription for user {telegram_id}: {e}")
+    else:
+        # Пользователь снова написал боту - возвращаем его в рассылки
+        await clear_unreachable_recipient(db, telegram_id)
     
     webapp_url = get_webapp_url()
     
@@ -7,9 +7,10 @@ from aiogram.types import Message, CallbackQuery, TelegramObject, User as TgUser
 from aiogram.fsm.context import FSMContext
 
 from app.config import settings
-from app.database.database import get_db
-from app.database.crud.user import get_user_by_telegram_id, create_user
+from app.database.database import AsyncSessionLocal
+from app.database.models import SubscriptionStatus
 from app.services.remnawave_service import RemnaWaveService
+from app.services.user_context_service import user_context_service
 from app.states import RegistrationStates
 from app.utils.check_reg_process import is_registration_process
 from app.utils.validators import sanitize_telegram_name
@@ -35,6 +36,25 @@ async def _refresh_remnawave_description(
         )
 
 
+async def expire_subscription_if_needed(db, db_user) -> bool:
+    subscription = getattr(db_user, 'subscription', None)
+    if not subscription:
+        return False
+    
+    current_time = datetime.utcnow()
+    if (subscription.status == SubscriptionStatus.ACTIVE.value and 
+        subscription.end_date <= current_time):
+        
+        subscription.status = SubscriptionStatus.EXPIRED.value
+        subscription.updated_at = current_time
+        await db.commit()
+        
+        logger.info(f"⏰ Middleware: Статус подписки пользователя {db_user.id} изменен на 'expired' (время истекло)")
+        return True
+    
+    return False
+
+
 class AuthMiddleware(BaseMiddleware):
     
     async def __call__(
@@ -54,162 +74,184 @@ class AuthMiddleware(BaseMiddleware):
         if user.is_bot:
             return await handler(event, data)
         
-        async for db in get_db():
-            try:
-                db_user = await get_user_by_telegram_id(db, user.id)
+        shared_db = data.get('db')
+        if shared_db is not None:
+            return await self._process(handler, event, data, user, shared_db)
+        
+        async with AsyncSessionLocal() as db:
+            return await self._process(handler, event, data, user, db)
+    
+    async def _process(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+        user: TgUser,
+        db
+    ) -> Any:
+        try:
+            user_context = await user_context_service.load(db, user.id)
+            data['user_context'] = user_context
+            db_user = user_context.user
+            
+            if not db_user:
+                state: FSMContext = data.get('state')
+                current_state = None
+                
+                if state:
+                    current_state = await state.get_state()
+
+                is_reg_process = is_registration_process(event, current_state)
                 
-                if not db_user:
+                is_channel_check = (isinstance(event, CallbackQuery) 
+                                   and event.data == "sub_channel_check")
+                
+                is_start_command = (isinstance(event, Message) 
+                                   and event.text 
+                                   and event.text.startswith('/start'))
+                
+                if is_reg_process or is_channel_check or is_start_command:
+                    if is_start_command:
+                        logger.info(f"🚀 Пропускаем команду /start от пользователя {user.id}")
+                    elif is_channel_check:
+                        logger.info(f"🔍 Пропускаем незарегистрированного пользователя {user.id} для проверки канала")
+                    else:
+                        logger.info(f"🔍 Пропускаем пользователя {user.id} в процессе регистрации")
+                    data['db'] = db
+                    data['db_user'] = None
+                    data['is_admin'] = False
+                    return await handler(event, data)
+                else:
+                    if isinstance(event, Message):
+                        await event.answer(
+                            "▶️ Для начала работы необходимо выполнить команду /start"
+                        )
+                    elif isinstance(event, CallbackQuery):
+                        await event.answer(
+                            "▶️ Необходимо начать с команды /start",
+                            show_alert=True
+                        )
+                    logger.info(f"🚫 Заблокирован незарегистрированный пользователь {user.id}")
+                    return
+            else:
+                from app.database.models import UserStatus
+                
+                if db_user.status == UserStatus.BLOCKED.value:
+                    if isinstance(event, Message):
+                        await event.answer("🚫 Ваш аккаунт заблокирован администратором.")
+                    elif isinstance(event, CallbackQuery):
+                        await event.answer("🚫 Ваш аккаунт заблокирован администратором.", show_alert=True)
+                    logger.info(f"🚫 Заблокированный пользователь {user.id} попытался использовать бота")
+                    return
+                
+                if db_user.status == UserStatus.DELETED.value:
                     state: FSMContext = data.get('state')
                     current_state = None
                     
                     if state:
                         current_state = await state.get_state()
-
-                    is_reg_process = is_registration_process(event, current_state)
-                    
-                    is_channel_check = (isinstance(event, CallbackQuery) 
-                                       and event.data == "sub_channel_check")
                     
-                    is_start_command = (isinstance(event, Message) 
-                                       and event.text 
-                                       and event.text.startswith('/start'))
+                    registration_states = [
+                        RegistrationStates.waiting_for_language.state,
+                        RegistrationStates.waiting_for_rules_accept.state,
+                        RegistrationStates.waiting_for_privacy_policy_accept.state,
+                        RegistrationStates.waiting_for_referral_code.state
+                    ]
+
+                    is_start_or_registration = (
+                        (isinstance(event, Message) and event.text and event.text.startswith('/start'))
+                        or (current_state in registration_states)
+                        or (
+                            isinstance(event, CallbackQuery)
+                            and event.data
+                            and (
+                                event.data in ['rules_accept', 'rules_decline', 'privacy_policy_accept', 'privacy_policy_decline', 'referral_skip']
+                                or event.data.startswith('language_select:')
+                            )
+                        )
+                    )
                     
-                    if is_reg_process or is_channel_check or is_start_command:
-                        if is_start_command:
-                            logger.info(f"🚀 Пропускаем команду /start от пользователя {user.id}")
-                        elif is_channel_check:
-                            logger.info(f"🔍 Пропускаем незарегистрированного пользователя {user.id} для проверки канала")
-                        else:
-                            logger.info(f"🔍 Пропускаем пользователя {user.id} в процессе регистрации")
+                    if is_start_or_registration:
+                        logger.info(f"🔄 Удаленный пользователь {user.id} начинает повторную регистрацию")
                         data['db'] = db
-                        data['db_user'] = None
+                        data['db_user'] = None 
                         data['is_admin'] = False
                         return await handler(event, data)
                     else:
                         if isinstance(event, Message):
                             await event.answer(
-                                "▶️ Для начала работы необходимо выполнить команду /start"
+                                "❌ Ваш аккаунт был удален.\n"
+                                "🔄 Для повторной регистрации выполните команду /start"
                             )
                         elif isinstance(event, CallbackQuery):
                             await event.answer(
-                                "▶️ Необходимо начать с команды /start",
+                                "❌ Ваш аккаунт был удален. Для повторной регистрации выполните /start",
                                 show_alert=True
                             )
-                        logger.info(f"🚫 Заблокирован незарегистрированный пользователь {user.id}")
+                        logger.info(f"❌ Удаленный пользователь {user.id} попытался использовать бота без /start")
                         return
-                else:
-                    from app.database.models import UserStatus
-                    
-                    if db_user.status == UserStatus.BLOCKED.value:
-                        if isinstance(event, Message):
-                            await event.answer("🚫 Ваш аккаунт заблокирован администратором.")
-                        elif isinstance(event, CallbackQuery):
-                            await event.answer("🚫 Ваш аккаунт заблокирован администратором.", show_alert=True)
-                        logger.info(f"🚫 Заблокированный пользователь {user.id} попытался использовать бота")
-                        return
-                    
-                    if db_user.status == UserStatus.DELETED.value:
-                        state: FSMContext = data.get('state')
-                        current_state = None
-                        
-                        if state:
-                            current_state = await state.get_state()
-                        
-                        registration_states = [
-                            RegistrationStates.waiting_for_language.state,
-                            RegistrationStates.waiting_for_rules_accept.state,
-                            RegistrationStates.waiting_for_privacy_policy_accept.state,
-                            RegistrationStates.waiting_for_referral_code.state
-                        ]
-
-                        is_start_or_registration = (
-                            (isinstance(event, Message) and event.text and event.text.startswith('/start'))
-                            or (current_state in registration_states)
-                            or (
-                                isinstance(event, CallbackQuery)
-                                and event.data
-                                and (
-                                    event.data in ['rules_accept', 'rules_decline', 'privacy_policy_accept', 'privacy_policy_decline', 'referral_skip']
-                                    or event.data.startswith('language_select:')
-                                )
-                            )
-                        )
-                        
-                        if is_start_or_registration:
-                            logger.info(f"🔄 Удаленный пользователь {user.id} начинает повторную регистрацию")
-                            data['db'] = db
-                            data['db_user'] = None 
-                            data['is_admin'] = False
-                            return await handler(event, data)
-                        else:
-                            if isinstance(event, Message):
-                                await event.answer(
-                                    "❌ Ваш аккаунт был удален.\n"
-                                    "🔄 Для повторной регистрации выполните команду /start"
-                                )
-                            elif isinstance(event, CallbackQuery):
-                                await event.answer(
-                                    "❌ Ваш аккаунт был удален. Для повторной регистрации выполните /start",
-                                    show_alert=True
-                                )
-                            logger.info(f"❌ Удаленный пользователь {user.id} попытался использовать бота без /start")
-                            return
-                    
-                    
-                    profile_updated = False
-                    
-                    if db_user.username != user.username:
-                        old_username = db_user.username
-                        db_user.username = user.username
-                        logger.info(f"🔄 [Middleware] Username обновлен для {user.id}: '{old_username}' → '{db_user.username}'")
-                        profile_updated = True
-                    
-                    safe_first = sanitize_telegram_name(user.first_name)
-                    safe_last = sanitize_telegram_name(user.last_name)
-                    if db_user.first_name != safe_first:
-                        old_first_name = db_user.first_name
-                        db_user.first_name = safe_first
-                        logger.info(f"🔄 [Middleware] Имя обновлено для {user.id}: '{old_first_name}' → '{db_user.first_name}'")
-                        profile_updated = True
-                    
-                    if db_user.last_name != safe_last:
-                        old_last_name = db_user.last_name
-                        db_user.last_name = safe_last
-                        logger.info(f"🔄 [Middleware] Фамилия обновлена для {user.id}: '{old_last_name}' → '{db_user.last_name}'")
-                        profile_updated = True
-                    
-                    db_user.last_activity = datetime.utcnow()
+                
+                
+                profile_updated = False
+                
+                if db_user.username != user.username:
+                    old_username = db_user.username
+                    db_user.username = user.username
+                    logger.info(f"🔄 [Middleware] Username обновлен для {user.id}: '{old_username}' → '{db_user.username}'")
+                    profile_updated = True
+                
+                safe_first = sanitize_telegram_name(user.first_name)
+                safe_last = sanitize_telegram_name(user.last_name)
+                if db_user.first_name != safe_first:
+                    old_first_name = db_user.first_name
+                    db_user.first_name = safe_first
+                    logger.info(f"🔄 [Middleware] Имя обновлено для {user.id}: '{old_first_name}' → '{db_user.first_name}'")
+                    profile_updated = True
+                
+                if db_user.last_name != safe_last:
+                    old_last_name = db_user.last_name
+                    db_user.last_name = safe_last
+                    logger.info(f"🔄 [Middleware] Фамилия обновлена для {user.id}: '{old_last_name}' → '{db_user.last_name}'")
+                    profile_updated = True
+                
+                user_context_service.touch(user.id)
 
-                    if profile_updated:
-                        db_user.updated_at = datetime.utcnow()
-                        logger.info(f"💾 [Middleware] Профиль пользователя {user.id} обновлен в middleware")
+                if profile_updated:
+                    db_user.updated_at = datetime.utcnow()
+                    logger.info(f"💾 [Middleware] Профиль пользователя {user.id} обновлен в middleware")
 
-                        if db_user.remnawave_uuid:
-                            description = settings.format_remnawave_user_description(
-                                full_name=db_user.full_name,
-                                username=db_user.username,
+                    if db_user.remnawave_uuid:
+                        description = settings.format_remnawave_user_description(
+                            full_name=db_user.full_name,
+                            username=db_user.username,
+                            telegram_id=db_user.telegram_id
+                        )
+                        asyncio.create_task(
+                            _refresh_remnawave_description(
+                                remnawave_uuid=db_user.remnawave_uuid,
+                                description=description,
                                 telegram_id=db_user.telegram_id
                             )
-                            asyncio.create_task(
-                                _refresh_remnawave_description(
-                                    remnawave_uuid=db_user.remnawave_uuid,
-                                    description=description,
-                                    telegram_id=db_user.telegram_id
-                                )
-                            )
+                        )
 
                     await db.commit()
 
-                data['db'] = db
-                data['db_user'] = db_user
-                data['is_admin'] = settings.is_admin(user.id)
+                try:
+                    await expire_subscription_if_needed(db, db_user)
+                except Exception as sub_error:
+                    logger.error(f"Ошибка проверки статуса подписки для пользователя {user.id}: {sub_error}")
+                    await db.rollback()
 
-                return await handler(event, data)
-                
-            except Exception as e:
-                logger.error(f"Ошибка в AuthMiddleware: {e}")
-                logger.error(f"Event type: {type(event)}")
-                if hasattr(event, 'data'):
-                    logger.error(f"Callback data: {event.data}")
-                await db.rollback()
-                raise
\ No newline at end of file
+            data['db'] = db
+            data['db_user'] = db_user
+            data['is_admin'] = settings.is_admin(user.id)
+
+            return await handler(event, data)
+            
+        except Exception as e:
+            logger.error(f"Ошибка в AuthMiddleware: {e}")
+            logger.error(f"Event type: {type(event)}")
+            if hasattr(event, 'data'):
+                logger.error(f"Callback data: {event.data}")
+            await db.rollback()
+            raise
\ No newline at end of file
@@ -1,12 +1,11 @@
 import logging
 from typing import Callable, Dict, Any, Awaitable
-from datetime import datetime
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Update, Message, CallbackQuery
 
-from app.database.database import get_db
-from app.database.crud.user import get_user_by_telegram_id
-from app.database.models import SubscriptionStatus
+from app.database.database import AsyncSessionLocal
+from app.middlewares.auth import expire_subscription_if_needed
+from app.services.user_context_service import user_context_service
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +19,10 @@ class SubscriptionStatusMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         
+        # AuthMiddleware уже загрузил пользователя и проверил подписку в рамках этого апдейта
+        if data.get('user_context') is not None:
+            return await handler(event, data)
+        
         telegram_id = None
         if isinstance(event, (Message, CallbackQuery)):
             telegram_id = event.from_user.id
@@ -31,21 +34,17 @@ class SubscriptionStatusMiddleware(BaseMiddleware):
         
         if telegram_id:
             try:
-                async for db in get_db():
-                    user = await get_user_by_telegram_id(db, telegram_id)
-                    if user and user.subscription:
-                        current_time = datetime.utcnow()
-                        subscription = user.subscription
-                        
-                        if (subscription.status == SubscriptionStatus.ACTIVE.value and 
-                            subscription.end_date <= current_time):
-                            
-                            subscription.status = SubscriptionStatus.EXPIRED.value
-                            subscription.updated_at = current_time
-                            await db.commit()
-                            
-                            logger.info(f"⏰ Middleware: Статус подписки пользователя {user.id} изменен на 'expired' (время истекло)")
-                    break
+                shared_db = data.get('db')
+                if shared_db is not None:
+                    user_context = await user_context_service.load(shared_db, telegram_id)
+                    data['user_context'] = user_context
+                    if user_context.user:
+                        await expire_subscription_if_needed(shared_db, user_context.user)
+                else:
+                    async with AsyncSessionLocal() as db:
+                        user_context = await user_context_service.load(db, telegram_id)
+                        if user_context.user:
+                            await expire_subscription_if_needed(db, user_context.user)
                     
             except Exception as e:
                 logger.error(f"Ошибка проверки статуса подписки для пользователя {telegram_id}: {e}")
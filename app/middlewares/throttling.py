@@ -1,19 +1,27 @@
-import asyncio
 import logging
-import time
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
 from aiogram.fsm.context import FSMContext
 
+from app.services.rate_limit_service import (
+    ACTION_CALLBACK,
+    ACTION_MESSAGE,
+    ACTION_PAYMENT,
+    RateLimiter,
+    rate_limiter,
+)
+
 logger = logging.getLogger(__name__)
 
 
+PAYMENT_CALLBACK_PREFIXES = ("deposit", "check_payment", "cancel_payment")
+
+
 class ThrottlingMiddleware(BaseMiddleware):
     
-    def __init__(self, rate_limit: float = 0.5):
-        self.rate_limit = rate_limit
-        self.user_buckets: Dict[int, float] = {}
+    def __init__(self, limiter: Optional[RateLimiter] = None):
+        self.limiter = limiter or rate_limiter
     
     async def __call__(
         self,
@@ -23,16 +31,13 @@ class ThrottlingMiddleware(BaseMiddleware):
     ) -> Any:
         
         user_id = None
-        if isinstance(event, (Message, CallbackQuery)):
+        if isinstance(event, (Message, CallbackQuery)) and event.from_user:
             user_id = event.from_user.id
         
         if not user_id:
             return await handler(event, data)
         
-        now = time.time()
-        last_call = self.user_buckets.get(user_id, 0)
-        
-        if now - last_call < self.rate_limit:
+        if not await self.limiter.hit(self._action(event), user_id):
             logger.warning(f"🚫 Throttling для пользователя {user_id}")
 
             # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
@@ -60,13 +65,12 @@ class ThrottlingMiddleware(BaseMiddleware):
                 await event.answer("⏳ Слишком быстро! Подождите немного.", show_alert=True)
                 return
         
-        self.user_buckets[user_id] = now
-        
-        cleanup_threshold = now - 60
-        self.user_buckets = {
-            uid: timestamp 
-            for uid, timestamp in self.user_buckets.items() 
-            if timestamp > cleanup_threshold
-        }
-        
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
+
+    @staticmethod
+    def _action(event: TelegramObject) -> str:
+        if isinstance(event, CallbackQuery):
+            if (event.data or "").startswith(PAYMENT_CALLBACK_PREFIXES):
+                return ACTION_PAYMENT
+            return ACTION_CALLBACK
+        return ACTION_MESSAGE
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import select
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import User
+from app.services.telegram_send_scheduler import telegram_send_scheduler
+
+
+logger = logging.getLogger(__name__)
+
+
+PRIORITY_NORMAL = "normal"
+PRIORITY_CRITICAL = "critical"
+
+TOPIC_EVENTS = "events"
+TOPIC_TICKETS = "tickets"
+
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n━━━━━━━━━━━━━━\n\n"
+# Буфер одного чата отправляется досрочно, когда в нём столько событий
+DIGEST_MAX_EVENTS = 50
+
+_REFERRER_PATTERN = re.compile(r"\x00referrer:(\d+)\x00")
+
+
+@dataclass
+class _PendingNotification:
+    text: str
+    reply_markup: Optional[types.InlineKeyboardMarkup] = None
+
+
+@dataclass
+class _DigestBuffer:
+    items: List[_PendingNotification] = field(default_factory=list)
+    flush_task: Optional[asyncio.Task] = None
+
+
+class AdminNotificationDispatcher:
+    """Очередь уведомлений в админский чат.
+
+    Обычные события копятся в буфере чата и темы и уходят одной сводкой, когда
+    закрывается окно ``ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS``; код оплаты не ждёт
+    отправки. Данные рефереров подставляются при отправке одним запросом на всю
+    сводку. Критичные события (панель, бекапы, техработы) отправляются сразу.
+    """
+
+    def __init__(self) -> None:
+        self._buffers: Dict[Tuple[int, Optional[int], str], _DigestBuffer] = {}
+        self._bot: Optional[Bot] = None
+        self._flushing: Set[asyncio.Task] = set()
+        self.queued_total = 0
+        self.sent_messages_total = 0
+        self.digests_total = 0
+
+    @property
+    def window(self) -> float:
+        return max(0.0, float(getattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS', 10)))
+
+    @staticmethod
+    def referrer_placeholder(referred_by_id: int) -> str:
+        return f"\x00referrer:{referred_by_id}\x00"
+
+    async def submit(
+        self,
+        bot: Bot,
+        chat_id: int,
+        text: str,
+        *,
+        thread_id: Optional[int] = None,
+        reply_markup: Optional[types.InlineKeyboardMarkup] = None,
+        topic: str = TOPIC_EVENTS,
+        priority: str = PRIORITY_NORMAL,
+    ) -> bool:
+        self._bot = bot
+        notification = _PendingNotification(text=text, reply_markup=reply_markup)
+
+        if priority == PRIORITY_CRITICAL:
+            texts = await self._resolve_placeholders([notification.text])
+            return await self._deliver(chat_id, thread_id, texts[0], reply_markup)
+
+        key = (chat_id, thread_id, topic)
+        buffer = self._buffers.setdefault(key, _DigestBuffer())
+        buffer.items.append(notification)
+        self.queued_total += 1
+
+        if len(buffer.items) >= DIGEST_MAX_EVENTS:
+            self._schedule_flush(key, buffer, 0.0)
+        elif buffer.flush_task is None:
+            self._schedule_flush(key, buffer, self.window)
+        return True
+
+    async def stop(self) -> None:
+        """Отправляет всё накопленное, не дожидаясь окон."""
+        # Буферы ещё в словаре только у задач, которые ждут окончания окна
+        for key, buffer in list(self._buffers.items()):
+            if buffer.flush_task is not None and not buffer.flush_task.done():
+                buffer.flush_task.cancel()
+            await self._flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def _schedule_flush(self, key, buffer: _DigestBuffer, delay: float) -> None:
+        if buffer.flush_task is not None and not buffer.flush_task.done():
+            buffer.flush_task.cancel()
+        buffer.flush_task = asyncio.create_task(self._flush_later(key, delay))
+        self._flushing.add(buffer.flush_task)
+        buffer.flush_task.add_done_callback(self._flushing.discard)
+
+    async def _flush_later(self, key, delay: float) -> None:
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        await self._flush(key)
+
+    async def _flush(self, key) -> None:
+        buffer = self._buffers.pop(key, None)
+        if buffer is None or not buffer.items:
+            return
+
+        chat_id, thread_id, _ = key
+        try:
+            texts = await self._resolve_placeholders([item.text for item in buffer.items])
+            plain: List[str] = []
+            for item, text in zip(buffer.items, texts):
+                # Сообщения с кнопками не объединяются, иначе кнопки потеряют контекст
+                if item.reply_markup is not None:
+                    await self._deliver(chat_id, thread_id, text, item.reply_markup)
+                else:
+                    plain.append(text)
+
+            for message in self._build_digests(plain):
+                await self._deliver(chat_id, thread_id, message)
+        except Exception as e:
+            logger.error(f"Ошибка отправки сводки уведомлений в чат {chat_id}: {e}")
+
+    def _build_digests(self, texts: List[str]) -> Iterable[str]:
+        if len(texts) <= 1:
+            return texts
+
+        self.digests_total += 1
+        messages: List[List[str]] = []
+        current: List[str] = []
+        current_length = 0
+
+        for text in texts:
+            added_length = len(text) + (len(DIGEST_SEPARATOR) if current else 0)
+            if current and current_length + added_length > MESSAGE_LIMIT - 100:
+                messages.append(current)
+                current, current_length = [], 0
+                added_length = len(text)
+            current.append(text)
+            current_length += added_length
+        if current:
+            messages.append(current)
+
+        return [
+            f"📦 <b>Сводка уведомлений</b>: {len(part)} из {len(texts)}"
+            + DIGEST_SEPARATOR
+            + DIGEST_SEPARATOR.join(part)
+            for part in messages
+        ]
+
+    async def _resolve_placeholders(self, texts: List[str]) -> List[str]:
+        referrer_ids = {
+            int(match)
+            for text in texts
+            for match in _REFERRER_PATTERN.findall(text)
+        }
+        if not referrer_ids:
+            return texts
+
+        displays = {referrer_id: f"ID {referrer_id}" for referrer_id in referrer_ids}
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(User.id, User.username, User.telegram_id).where(User.id.in_(referrer_ids))
+                )
+                rows = {row.id: row for row in result.all()}
+            for referrer_id in referrer_ids:
+                row = rows.get(referrer_id)
+                if row is None:
+                    displays[referrer_id] = f"ID {referrer_id} (не найден)"
+                elif row.username:
+                    displays[referrer_id] = f"@{row.username} (ID: {referrer_id})"
+                else:
+                    displays[referrer_id] = f"ID {row.telegram_id}"
+        except Exception as e:
+            logger.error(f"Ошибка получения данных рефереров для уведомлений: {e}")
+
+        return [
+            _REFERRER_PATTERN.sub(lambda match: displays[int(match.group(1))], text)
+            for text in texts
+        ]
+
+    async def _deliver(
+        self,
+        chat_id: int,
+        thread_id: Optional[int],
+        text: str,
+        reply_markup: Optional[types.InlineKeyboardMarkup] = None,
+    ) -> bool:
+        bot = self._bot
+        if bot is None:
+            return False
+
+        message_kwargs = {
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': 'HTML',
+            'disable_web_page_preview': True,
+        }
+        if thread_id:
+            message_kwargs['message_thread_id'] = thread_id
+        if reply_markup is not None:
+            message_kwargs['reply_markup'] = reply_markup
+
+        try:
+            await telegram_send_scheduler.send(
+                chat_id,
+                lambda: bot.send_message(**message_kwargs),
+            )
+            self.sent_messages_total += 1
+            logger.info(f"Уведомление отправлено в чат {chat_id}")
+            return True
+        except TelegramForbiddenError:
+            logger.error(f"Бот не имеет прав для отправки в чат {chat_id}")
+        except TelegramBadRequest as e:
+            logger.error(f"Ошибка отправки уведомления: {e}")
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при отправке уведомления: {e}")
+        return False
+
+
+admin_notification_dispatcher = AdminNotificationDispatcher()
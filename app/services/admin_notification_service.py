@@ -1,13 +1,11 @@
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 from datetime import datetime
 from aiogram import Bot, types
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import MissingGreenlet
 
 from app.config import settings
-from app.database.crud.promo_group import get_promo_group_by_id
 from app.database.crud.subscription_event import create_subscription_event
 from app.database.crud.user import get_user_by_id
 from app.database.crud.transaction import get_transaction_by_id
@@ -20,6 +18,14 @@ from app.database.models import (
     TransactionType,
     User,
 )
+from app.services.admin_notification_dispatcher import (
+    PRIORITY_CRITICAL,
+    PRIORITY_NORMAL,
+    TOPIC_EVENTS,
+    TOPIC_TICKETS,
+    admin_notification_dispatcher,
+)
+from app.services.pricing_catalog_service import CatalogPromoGroup, pricing_catalog_service
 from app.utils.timezone import format_local_datetime
 
 logger = logging.getLogger(__name__)
@@ -38,21 +44,14 @@ class AdminNotificationService:
         if not referred_by_id:
             return "Нет"
 
-        try:
-            referrer = await get_user_by_id(db, referred_by_id)
-            if not referrer:
-                return f"ID {referred_by_id} (не найден)"
+        # Данные реферера подставляются диспетчером одним запросом на всю сводку
+        return admin_notification_dispatcher.referrer_placeholder(referred_by_id)
 
-            if referrer.username:
-                return f"@{referrer.username} (ID: {referred_by_id})"
-            else:
-                return f"ID {referrer.telegram_id}"
-
-        except Exception as e:
-            logger.error(f"Ошибка получения данных рефера {referred_by_id}: {e}")
-            return f"ID {referred_by_id}"
-
-    async def _get_user_promo_group(self, db: AsyncSession, user: User) -> Optional[PromoGroup]:
+    async def _get_user_promo_group(
+        self,
+        db: AsyncSession,
+        user: User,
+    ) -> Optional[Union[PromoGroup, CatalogPromoGroup]]:
         if getattr(user, "promo_group", None):
             return user.promo_group
 
@@ -60,16 +59,8 @@ class AdminNotificationService:
             return None
 
         try:
-            await db.refresh(user, attribute_names=["promo_group"])
-        except Exception:
-            # relationship might not be available — fallback to direct fetch
-            pass
-
-        if getattr(user, "promo_group", None):
-            return user.promo_group
-
-        try:
-            return await get_promo_group_by_id(db, user.promo_group_id)
+            catalog = await pricing_catalog_service.get_catalog()
+            return catalog.promo_groups.get(user.promo_group_id)
         except Exception as e:
             logger.error(
                 "Ошибка загрузки промогруппы %s пользователя %s: %s",
@@ -1016,43 +1007,34 @@ class AdminNotificationService:
             logger.error(f"Ошибка отправки уведомления о смене промогруппы: {e}")
             return False
 
-    async def _send_message(self, text: str, reply_markup: types.InlineKeyboardMarkup | None = None, *, ticket_event: bool = False) -> bool:
+    async def _send_message(
+        self,
+        text: str,
+        reply_markup: types.InlineKeyboardMarkup | None = None,
+        *,
+        ticket_event: bool = False,
+        priority: str = PRIORITY_NORMAL,
+    ) -> bool:
         if not self.chat_id:
             logger.warning("ADMIN_NOTIFICATIONS_CHAT_ID не настроен")
             return False
-        
-        try:
-            message_kwargs = {
-                'chat_id': self.chat_id,
-                'text': text,
-                'parse_mode': 'HTML',
-                'disable_web_page_preview': True
-            }
-            
-            # route to ticket-specific topic if provided
-            thread_id = None
-            if ticket_event and self.ticket_topic_id:
-                thread_id = self.ticket_topic_id
-            elif self.topic_id:
-                thread_id = self.topic_id
-            if thread_id:
-                message_kwargs['message_thread_id'] = thread_id
-            if reply_markup is not None:
-                message_kwargs['reply_markup'] = reply_markup
-            
-            await self.bot.send_message(**message_kwargs)
-            logger.info(f"Уведомление отправлено в чат {self.chat_id}")
-            return True
-            
-        except TelegramForbiddenError:
-            logger.error(f"Бот не имеет прав для отправки в чат {self.chat_id}")
-            return False
-        except TelegramBadRequest as e:
-            logger.error(f"Ошибка отправки уведомления: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка при отправке уведомления: {e}")
-            return False
+
+        # route to ticket-specific topic if provided
+        thread_id = None
+        if ticket_event and self.ticket_topic_id:
+            thread_id = self.ticket_topic_id
+        elif self.topic_id:
+            thread_id = self.topic_id
+
+        return await admin_notification_dispatcher.submit(
+            self.bot,
+            self.chat_id,
+            text,
+            thread_id=thread_id,
+            reply_markup=reply_markup,
+            topic=TOPIC_TICKETS if ticket_event else TOPIC_EVENTS,
+            priority=priority,
+        )
     
     def _is_enabled(self) -> bool:
         return self.enabled and bool(self.chat_id)
@@ -1239,7 +1221,7 @@ class AdminNotificationService:
             
             message = "\n".join(message_parts)
             
-            return await self._send_message(message)
+            return await self._send_message(message, priority=PRIORITY_CRITICAL)
             
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления о техработах: {e}")
@@ -1336,7 +1318,7 @@ class AdminNotificationService:
             
             message = "\n".join(message_parts)
             
-            return await self._send_message(message)
+            return await self._send_message(message, priority=PRIORITY_CRITICAL)
             
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления о статусе панели Remnawave: {e}")
@@ -1,5 +1,6 @@
 import asyncio
 import gzip
+import hashlib
 import json as json_lib
 import logging
 import os
@@ -7,15 +8,17 @@ import shutil
 import tarfile
 import tempfile
 from dataclasses import asdict, dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum as PyEnum
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import aiofiles
 from aiogram.types import FSInputFile
-from sqlalchemy import inspect, select, text
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy import Enum as SQLEnum, Table, bindparam, func, inspect, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
 from app.config import settings
 from app.database.database import get_db, engine
@@ -23,16 +26,51 @@ from app.database.models import (
     User, Subscription, Transaction, PromoCode, PromoCodeUse,
     ReferralEarning, Squad, ServiceRule, SystemSetting, MonitoringLog,
     SubscriptionConversion, SentNotification, BroadcastHistory,
+    BroadcastCheckpoint, UnreachableRecipient,
     ServerSquad, SubscriptionServer, UserMessage, YooKassaPayment,
     CryptoBotPayment, WelcomeText, Base, PromoGroup, AdvertisingCampaign,
     AdvertisingCampaignRegistration, SupportAuditLog, Ticket, TicketMessage,
-    MulenPayPayment, Pal24Payment, DiscountOffer, WebApiToken,
+    MulenPayPayment, Pal24Payment, DiscountOffer, WebApiToken, SubscriptionEvent,
     server_squad_promo_groups
 )
 
 logger = logging.getLogger(__name__)
 
 
+NDJSON_DUMP_FORMAT_VERSION = "orm-ndjson-1.0"
+
+# Таблицы, в которые в основном дописывают: в инкрементальный бекап попадают строки
+# с id выше сохранённого водяного знака и строки, изменённые (по указанной колонке)
+# после начала предыдущего бекапа. Остальные таблицы выгружаются целиком.
+INCREMENTAL_TABLES: Dict[str, Optional[str]] = {
+    "transactions": "completed_at",
+    "monitoring_logs": None,
+    "subscription_events": None,
+    "ticket_messages": None,
+}
+
+ChunkReader = Callable[[str], AsyncIterator[List[Dict[str, Any]]]]
+
+
+def _serialize_backup_value(value: Any) -> Any:
+    # Enum-колонки SQLAlchemy хранят имя члена перечисления, его и выгружаем
+    if isinstance(value, PyEnum):
+        return value.name
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _dialect_insert(table: Table, dialect_name: str):
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert(table)
+
+
 @dataclass
 class BackupMetadata:
     timestamp: str
@@ -55,6 +93,8 @@ class BackupSettings:
     compression_enabled: bool = True
     include_logs: bool = False
     backup_location: str = "/app/data/backups"
+    incremental_enabled: bool = False
+    full_backup_every: int = 7
 
 
 class BackupService:
@@ -82,6 +122,7 @@ class BackupService:
             SubscriptionServer,
             SubscriptionConversion,
             Transaction,
+            SubscriptionEvent,
             YooKassaPayment,
             CryptoBotPayment,
             MulenPayPayment,
@@ -91,6 +132,8 @@ class BackupService:
             SentNotification,
             DiscountOffer,
             BroadcastHistory,
+            BroadcastCheckpoint,
+            UnreachableRecipient,
             AdvertisingCampaign,
             AdvertisingCampaignRegistration,
             Ticket,
@@ -116,7 +159,9 @@ class BackupService:
             max_backups_keep=int(os.getenv("BACKUP_MAX_KEEP", "7")),
             compression_enabled=os.getenv("BACKUP_COMPRESSION", "true").lower() == "true",
             include_logs=os.getenv("BACKUP_INCLUDE_LOGS", "false").lower() == "true",
-            backup_location=os.getenv("BACKUP_LOCATION", "/app/data/backups")
+            backup_location=os.getenv("BACKUP_LOCATION", "/app/data/backups"),
+            incremental_enabled=os.getenv("BACKUP_INCREMENTAL_ENABLED", "false").lower() == "true",
+            full_backup_every=int(os.getenv("BACKUP_FULL_EVERY", "7")),
         )
 
     def _parse_backup_time(self) -> Tuple[int, int]:
@@ -177,6 +222,10 @@ class BackupService:
 
         return models
 
+    @property
+    def _stream_chunk_size(self) -> int:
+        return max(1, int(getattr(settings, 'BACKUP_STREAM_CHUNK_SIZE', 1000)))
+
     def _resolve_command_path(self, command: str, env_var: str) -> Optional[str]:
         override = os.getenv(env_var)
         if override:
@@ -199,13 +248,16 @@ class BackupService:
         self,
         created_by: Optional[int] = None,
         compress: bool = True,
-        include_logs: bool = None
+        include_logs: bool = None,
+        incremental: Optional[bool] = None
     ) -> Tuple[bool, str, Optional[str]]:
         try:
             logger.info("📄 Начинаем создание бекапа...")
 
             if include_logs is None:
                 include_logs = self._settings.include_logs
+            if incremental is None:
+                incremental = self._settings.incremental_enabled
 
             overview = await self._collect_database_overview()
 
@@ -219,15 +271,6 @@ class BackupService:
                 staging_dir = temp_path / "backup"
                 staging_dir.mkdir(parents=True, exist_ok=True)
 
-                database_info = await self._dump_database(
-                    staging_dir,
-                    include_logs=include_logs
-                )
-                database_info.setdefault("tables_count", overview.get("tables_count", 0))
-                database_info.setdefault("total_records", overview.get("total_records", 0))
-                files_info = await self._collect_files(staging_dir, include_logs=include_logs)
-                data_snapshot_info = await self._collect_data_snapshot(staging_dir)
-
                 metadata = {
                     "format_version": self.archive_format_version,
                     "timestamp": datetime.utcnow().isoformat(),
@@ -237,20 +280,39 @@ class BackupService:
                     "total_records": overview.get("total_records", 0),
                     "compressed": True,
                     "created_by": created_by,
-                    "database": database_info,
-                    "files": files_info,
-                    "data_snapshot": data_snapshot_info,
                     "settings": asdict(self._settings),
                 }
 
+                if incremental:
+                    metadata.update(
+                        await self._create_chained_snapshot(staging_dir, include_logs, filename)
+                    )
+                else:
+                    database_info = await self._dump_database(
+                        staging_dir,
+                        include_logs=include_logs
+                    )
+                    database_info.setdefault("tables_count", overview.get("tables_count", 0))
+                    database_info.setdefault("total_records", overview.get("total_records", 0))
+                    metadata["database"] = database_info
+                    metadata["files"] = await self._collect_files(staging_dir, include_logs=include_logs)
+                    metadata["data_snapshot"] = await self._collect_data_snapshot(staging_dir)
+
                 metadata_path = staging_dir / "metadata.json"
                 async with aiofiles.open(metadata_path, "w", encoding="utf-8") as meta_file:
                     await meta_file.write(json_lib.dumps(metadata, ensure_ascii=False, indent=2))
 
                 mode = "w:gz" if compress else "w"
-                with tarfile.open(backup_path, mode) as tar:
-                    for item in staging_dir.iterdir():
-                        tar.add(item, arcname=item.name)
+
+                def _write_archive():
+                    with tarfile.open(backup_path, mode) as tar:
+                        # Метаданные первыми: список бекапов читает только начало архива
+                        tar.add(metadata_path, arcname=metadata_path.name)
+                        for item in staging_dir.iterdir():
+                            if item != metadata_path:
+                                tar.add(item, arcname=item.name)
+
+                await asyncio.to_thread(_write_archive)
 
             file_size = backup_path.stat().st_size
 
@@ -262,6 +324,10 @@ class BackupService:
                       f"📊 Таблиц: {overview.get('tables_count', 0)}\n"
                       f"📈 Записей: {overview.get('total_records', 0):,}\n"
                       f"💾 Размер: {size_mb:.2f} MB")
+            if metadata["backup_type"] == "incremental":
+                chain_info = metadata["chain"]
+                message += (f"\n🧩 Инкремент #{chain_info['position']} к {chain_info['base']}"
+                            f" ({metadata['database']['total_records']:,} записей в архиве)")
 
             logger.info(message)
 
@@ -412,47 +478,38 @@ class BackupService:
 
         logger.info("✅ PostgreSQL dump создан (%s)", dump_path)
 
-    async def _dump_postgres_json(self, staging_dir: Path, include_logs: bool) -> Dict[str, Any]:
+    async def _dump_postgres_json(
+        self,
+        staging_dir: Path,
+        include_logs: bool,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         models_to_backup = self._get_models_for_backup(include_logs)
-        (
-            backup_data,
-            association_data,
-            total_records,
-            tables_count,
-        ) = await self._export_database_via_orm(models_to_backup)
-
-        dump_path = staging_dir / "database.json"
-        dump_structure = {
-            "metadata": {
-                "timestamp": datetime.utcnow().isoformat(),
-                "version": "orm-1.0",
-                "database_type": "postgresql",
-                "tables_count": tables_count,
-                "total_records": total_records,
-            },
-            "data": backup_data,
-            "associations": association_data,
-        }
+        dump_dir = staging_dir / "database"
+        dump_dir.mkdir(parents=True, exist_ok=True)
 
-        async with aiofiles.open(dump_path, "w", encoding="utf-8") as dump_file:
-            await dump_file.write(
-                json_lib.dumps(dump_structure, ensure_ascii=False, indent=2)
-            )
+        tables_info, total_records, tables_count = await self._export_database_via_orm(
+            models_to_backup,
+            dump_dir,
+            filters,
+        )
 
-        size = dump_path.stat().st_size if dump_path.exists() else 0
+        size = sum(item.stat().st_size for item in dump_dir.iterdir() if item.is_file())
 
         logger.info(
-            "✅ PostgreSQL экспортирован через ORM в JSON (%s)",
-            dump_path,
+            "✅ База данных экспортирована через ORM в NDJSON (%s)",
+            dump_dir,
         )
 
         return {
-            "type": "postgresql",
-            "path": dump_path.name,
+            "type": "postgresql" if settings.is_postgresql() else "sqlite",
+            "path": dump_dir.name,
             "size_bytes": size,
-            "format": "json",
+            "format": "ndjson",
+            "compression": "gzip",
             "tool": "orm",
-            "format_version": "orm-1.0",
+            "format_version": NDJSON_DUMP_FORMAT_VERSION,
+            "tables": tables_info,
             "tables_count": tables_count,
             "total_records": total_records,
         }
@@ -469,72 +526,341 @@ class BackupService:
     async def _export_database_via_orm(
         self,
         models_to_backup: List[Any],
-    ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]], int, int]:
-        backup_data: Dict[str, List[Dict[str, Any]]] = {}
+        dump_dir: Path,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, Dict[str, Any]], int, int]:
+        """Выгружает таблицы построчно: курсор на стороне сервера отдаёт строки пачками,
+        пачки сериализуются и сжимаются в отдельном потоке в ``<таблица>.ndjson.gz``.
+
+        ``filters`` ограничивает выгрузку отдельных таблиц условием (инкрементальный бекап).
+        """
+        filters = filters or {}
+        chunk_size = self._stream_chunk_size
+        tables_info: Dict[str, Dict[str, Any]] = {}
         total_records = 0
 
-        async for db in get_db():
-            try:
-                for model in models_to_backup:
-                    table_name = model.__tablename__
-                    logger.info("📊 Экспортируем таблицу: %s", table_name)
-
-                    query = select(model)
-
-                    if model == User:
-                        query = query.options(selectinload(User.subscription))
-                    elif model == Subscription:
-                        query = query.options(selectinload(Subscription.user))
-                    elif model == Transaction:
-                        query = query.options(selectinload(Transaction.user))
-
-                    result = await db.execute(query)
-                    records = result.scalars().all()
-
-                    table_data: List[Dict[str, Any]] = []
-                    for record in records:
-                        record_dict: Dict[str, Any] = {}
-                        for column in model.__table__.columns:
-                            value = getattr(record, column.name)
-
-                            if value is None:
-                                record_dict[column.name] = None
-                            elif isinstance(value, datetime):
-                                record_dict[column.name] = value.isoformat()
-                            elif isinstance(value, (list, dict)):
-                                record_dict[column.name] = (
-                                    json_lib.dumps(value) if value else None
-                                )
-                            elif hasattr(value, "__dict__"):
-                                record_dict[column.name] = str(value)
-                            else:
-                                record_dict[column.name] = value
-
-                        table_data.append(record_dict)
-
-                    backup_data[table_name] = table_data
-                    total_records += len(table_data)
+        async with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                # Один снимок данных на все таблицы, как у pg_dump
+                conn = await conn.execution_options(isolation_level="REPEATABLE READ")
 
-                    logger.info(
-                        "✅ Экспортировано %s записей из %s",
-                        len(table_data),
-                        table_name,
+            for model in models_to_backup:
+                table_name = model.__tablename__
+                logger.info("📊 Экспортируем таблицу: %s", table_name)
+
+                file_name = f"{table_name}.ndjson.gz"
+                try:
+                    rows = await self._stream_table_to_ndjson(
+                        conn, model.__table__, dump_dir / file_name, chunk_size, filters.get(table_name)
+                    )
+                except Exception as exc:
+                    logger.error("Ошибка при экспорте данных: %s", exc)
+                    raise exc
+
+                tables_info[table_name] = {
+                    "path": file_name,
+                    "rows": rows,
+                    "kind": "data",
+                    "incremental": table_name in filters,
+                }
+                if table_name in filters:
+                    # Инкремент выгружает только новые строки, поэтому удаления фиксируются
+                    # полным списком живых id: при восстановлении цепочки строки старых
+                    # архивов, которых в нём нет, отбрасываются
+                    ids_file_name = f"{table_name}.ids.gz"
+                    tables_info[table_name]["live_ids_path"] = ids_file_name
+                    tables_info[table_name]["live_ids"] = await self._stream_ids_to_file(
+                        conn, model.__table__, dump_dir / ids_file_name, chunk_size
                     )
+                total_records += rows
+                logger.info("✅ Экспортировано %s записей из %s", rows, table_name)
 
-                association_data = await self._export_association_tables(db)
-                for records in association_data.values():
-                    total_records += len(records)
+            for table_name, table_obj in self.association_tables.items():
+                logger.info(f"📊 Экспортируем таблицу связей: {table_name}")
 
-                tables_count = len(models_to_backup) + len(association_data)
-                return backup_data, association_data, total_records, tables_count
+                file_name = f"{table_name}.ndjson.gz"
+                try:
+                    rows = await self._stream_table_to_ndjson(
+                        conn, table_obj, dump_dir / file_name, chunk_size
+                    )
+                except Exception as e:
+                    logger.error(f"Ошибка экспорта таблицы связей {table_name}: {e}")
+                    continue
 
-            except Exception as exc:
-                logger.error("Ошибка при экспорте данных: %s", exc)
-                raise exc
-            finally:
-                await db.close()
+                tables_info[table_name] = {"path": file_name, "rows": rows, "kind": "association"}
+                total_records += rows
+                logger.info(f"✅ Экспортировано {rows} связей из {table_name}")
+
+        return tables_info, total_records, len(tables_info)
+
+    async def _stream_table_to_ndjson(
+        self,
+        conn: AsyncConnection,
+        table: Table,
+        dump_path: Path,
+        chunk_size: int,
+        condition: Optional[Any] = None,
+    ) -> int:
+        columns = [column.name for column in table.columns]
+        query = select(table).execution_options(yield_per=chunk_size)
+        if condition is not None:
+            query = query.where(condition)
+        result = await conn.stream(query)
+        dump_file = await asyncio.to_thread(gzip.open, dump_path, "wt", encoding="utf-8")
+        pending: Optional[asyncio.Future] = None
+        written = 0
+
+        try:
+            async for rows in result.partitions(chunk_size):
+                # Следующая пачка читается из БД, пока предыдущая пишется на диск
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(
+                    asyncio.to_thread(self._write_ndjson_chunk, dump_file, columns, rows)
+                )
+                written += len(rows)
+
+            if pending is not None:
+                await pending
+        finally:
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            await result.close()
+            await asyncio.to_thread(dump_file.close)
+
+        return written
+
+    async def _stream_ids_to_file(
+        self,
+        conn: AsyncConnection,
+        table: Table,
+        dump_path: Path,
+        chunk_size: int,
+    ) -> int:
+        result = await conn.stream(
+            select(table.c.id).order_by(table.c.id).execution_options(yield_per=chunk_size)
+        )
+        dump_file = await asyncio.to_thread(gzip.open, dump_path, "wt", encoding="utf-8")
+        written = 0
+
+        try:
+            async for rows in result.partitions(chunk_size):
+                await asyncio.to_thread(dump_file.write, "".join(f"{row[0]}\n" for row in rows))
+                written += len(rows)
+        finally:
+            await result.close()
+            await asyncio.to_thread(dump_file.close)
+
+        return written
+
+    @staticmethod
+    def _read_live_ids(dump_dir: Path, table_info: Dict[str, Any]) -> Optional[set]:
+        ids_path = table_info.get("live_ids_path")
+        if not ids_path:
+            return None
+        with gzip.open(dump_dir / ids_path, "rt", encoding="utf-8") as ids_file:
+            return {int(line) for line in ids_file if line.strip()}
+
+    @staticmethod
+    def _write_ndjson_chunk(dump_file, columns: List[str], rows) -> None:
+        dump_file.write("".join(
+            json_lib.dumps(
+                {column: _serialize_backup_value(value) for column, value in zip(columns, row)},
+                ensure_ascii=False,
+                default=str,
+            ) + "\n"
+            for row in rows
+        ))
+
+    @staticmethod
+    def _read_ndjson_chunk(dump_file, chunk_size: int) -> List[Dict[str, Any]]:
+        return [json_lib.loads(line) for line in islice(dump_file, chunk_size)]
+
+    async def _create_chained_snapshot(
+        self,
+        staging_dir: Path,
+        include_logs: bool,
+        filename: str,
+    ) -> Dict[str, Any]:
+        """Снимок для цепочки бекапов: полный (база цепочки) или инкремент к последнему архиву.
+
+        БД выгружается в NDJSON, дописываемые таблицы инкремента — только новые строки.
+        Файлы хранятся по SHA-256 содержимого, в архив попадает лишь то, чего нет в цепочке.
+        """
+        models_to_backup = self._get_models_for_backup(include_logs)
+        parent = await self._find_chain_parent()
+        watermarks = await self._collect_watermarks(models_to_backup)
+
+        if parent is None:
+            chain = {"base": filename, "parents": [], "position": 0}
+            filters: Dict[str, Any] = {}
+            known_objects: set = set()
+        else:
+            parent_name, parent_metadata = parent
+            parent_chain = parent_metadata["chain"]
+            chain = {
+                "base": parent_chain["base"],
+                "parents": parent_chain.get("parents", []) + [parent_name],
+                "position": parent_chain.get("position", 0) + 1,
+            }
+            filters = self._incremental_filters(models_to_backup, parent_metadata.get("watermarks", {}))
+            known_objects = set(parent_metadata.get("known_objects", []))
+            logger.info("🧩 Инкрементальный бекап #%s к %s", chain["position"], chain["base"])
+
+        database_info = await self._dump_postgres_json(staging_dir, include_logs, filters)
+        file_index, stored_objects = await self._collect_content_addressed_files(
+            staging_dir,
+            include_logs,
+            known_objects,
+        )
+
+        return {
+            "backup_type": "incremental" if chain["position"] else "full",
+            "chain": chain,
+            "watermarks": watermarks,
+            "database": database_info,
+            "file_index": file_index,
+            "objects": stored_objects,
+            "known_objects": sorted(known_objects.union(stored_objects)),
+        }
+
+    async def _find_chain_parent(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        backups = [backup for backup in await self.get_backup_list() if not backup.get("error")]
+        if not backups:
+            return None
+
+        latest = max(backups, key=lambda backup: backup.get("timestamp", ""))
+        metadata = await asyncio.to_thread(self._read_archive_metadata, Path(latest["filepath"]))
+        chain = metadata.get("chain")
+        if not chain or metadata.get("database", {}).get("format") != "ndjson":
+            return None
+
+        if chain.get("position", 0) + 1 >= max(1, self._settings.full_backup_every):
+            return None
+
+        missing = [name for name in chain.get("parents", []) if not (self.backup_dir / name).exists()]
+        if missing:
+            logger.warning(
+                "Цепочка бекапа %s неполная (нет %s), создаём полный бекап",
+                latest["filename"],
+                ", ".join(missing),
+            )
+            return None
+
+        return latest["filename"], metadata
+
+    async def _collect_watermarks(self, models_to_backup: List[Any]) -> Dict[str, Any]:
+        # Снимаем до выгрузки: строки, добавленные во время бекапа, попадут и в следующий
+        started_at = datetime.utcnow()
+        tables: Dict[str, Dict[str, int]] = {}
+
+        async with engine.connect() as conn:
+            for model in models_to_backup:
+                if model.__tablename__ not in INCREMENTAL_TABLES:
+                    continue
+                max_id = await conn.scalar(select(func.max(model.__table__.c.id)))
+                tables[model.__tablename__] = {"id": int(max_id or 0)}
+
+        return {"started_at": started_at.isoformat(), "tables": tables}
+
+    def _incremental_filters(self, models_to_backup: List[Any], watermarks: Dict[str, Any]) -> Dict[str, Any]:
+        started_at = watermarks.get("started_at")
+        table_watermarks = watermarks.get("tables", {})
+        filters: Dict[str, Any] = {}
+
+        for model in models_to_backup:
+            table = model.__table__
+            watermark = table_watermarks.get(table.name)
+            if watermark is None:
+                continue
+
+            condition = table.c.id > watermark.get("id", 0)
+            changed_column = INCREMENTAL_TABLES.get(table.name)
+            if changed_column and started_at:
+                condition = or_(condition, table.c[changed_column] >= datetime.fromisoformat(started_at))
+            filters[table.name] = condition
+
+        return filters
+
+    async def _collect_content_addressed_files(
+        self,
+        staging_dir: Path,
+        include_logs: bool,
+        known_objects: set,
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        objects_dir = staging_dir / "objects"
+        sources: List[Tuple[Dict[str, Any], Path]] = []
+
+        app_config_path = settings.get_app_config_path()
+        if app_config_path and Path(app_config_path).is_file():
+            sources.append(({"kind": "file", "path": str(app_config_path)}, Path(app_config_path)))
+
+        if include_logs and settings.LOG_FILE and Path(settings.LOG_FILE).is_file():
+            sources.append(({"kind": "file", "path": str(settings.LOG_FILE)}, Path(settings.LOG_FILE)))
+
+        def _collect() -> Tuple[List[Dict[str, Any]], List[str]]:
+            objects_dir.mkdir(parents=True, exist_ok=True)
+            entries = list(sources)
+
+            if self.data_dir.exists():
+                backup_dir = self.backup_dir.resolve()
+                for root, dirs, files in os.walk(self.data_dir):
+                    root_path = Path(root)
+                    dirs[:] = [name for name in dirs if (root_path / name).resolve() != backup_dir]
+                    for name in files:
+                        file_path = root_path / name
+                        entries.append((
+                            {"kind": "data", "relative_path": file_path.relative_to(self.data_dir).as_posix()},
+                            file_path,
+                        ))
+
+            seen = set(known_objects)
+            file_index: List[Dict[str, Any]] = []
+            stored: List[str] = []
+            for entry, file_path in entries:
+                try:
+                    digest, size = self._store_object(file_path, objects_dir, seen)
+                except OSError as error:
+                    logger.warning("Не удалось добавить файл %s в бекап: %s", file_path, error)
+                    continue
+
+                if digest not in seen:
+                    seen.add(digest)
+                    stored.append(digest)
+                file_index.append({**entry, "sha256": digest, "size": size})
 
-        return backup_data, {}, total_records, len(models_to_backup)
+            return file_index, stored
+
+        file_index, stored = await asyncio.to_thread(_collect)
+        logger.info(
+            "📁 Файлов в снимке: %s, новых объектов: %s",
+            len(file_index),
+            len(stored),
+        )
+        return file_index, stored
+
+    @staticmethod
+    def _store_object(file_path: Path, objects_dir: Path, seen: set) -> Tuple[str, int]:
+        """Копирует файл в ``objects/<sha256>``, считая хеш за один проход; дубликаты удаляются."""
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = objects_dir / f".tmp-{os.getpid()}-{id(file_path)}"
+
+        with file_path.open("rb") as source, temp_path.open("wb") as target:
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(block)
+                target.write(block)
+                size += len(block)
+
+        hexdigest = digest.hexdigest()
+        object_path = objects_dir / hexdigest
+        if hexdigest in seen or object_path.exists():
+            temp_path.unlink()
+        else:
+            shutil.copystat(file_path, temp_path)
+            temp_path.replace(object_path)
+
+        return hexdigest, size
 
     async def _collect_files(self, staging_dir: Path, include_logs: bool) -> List[Dict[str, Any]]:
         files_info: List[Dict[str, Any]] = []
@@ -613,24 +939,26 @@ class BackupService:
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
 
-            mode = "r:gz" if backup_path.suffixes and backup_path.suffixes[-1] == ".gz" else "r"
-            with tarfile.open(backup_path, mode) as tar:
-                tar.extractall(temp_path)
-
-            metadata_path = temp_path / "metadata.json"
-            if not metadata_path.exists():
+            metadata = await asyncio.to_thread(self._extract_archive, backup_path, temp_path)
+            if metadata is None:
                 return False, "❌ Метаданные бекапа отсутствуют"
 
-            async with aiofiles.open(metadata_path, "r", encoding="utf-8") as meta_file:
-                metadata = json_lib.loads(await meta_file.read())
-
             logger.info("📊 Загружен бекап формата %s", metadata.get("format_version", "unknown"))
 
+            if metadata.get("chain"):
+                return await self._restore_chain(temp_path, metadata, clear_existing)
+
             database_info = metadata.get("database", {})
             data_snapshot_info = metadata.get("data_snapshot", {})
             files_info = metadata.get("files", [])
 
-            if database_info.get("type") == "postgresql":
+            if database_info.get("format") == "ndjson":
+                await self._restore_ndjson(
+                    temp_path / database_info.get("path", "database"),
+                    database_info,
+                    clear_existing,
+                )
+            elif database_info.get("type") == "postgresql":
                 db_format = database_info.get("format", "sql")
                 default_name = "database.json" if db_format == "json" else "database.sql"
                 dump_file = temp_path / database_info.get("path", default_name)
@@ -658,6 +986,134 @@ class BackupService:
             logger.info(message)
             return True, message
 
+    def _extract_archive(self, backup_path: Path, target_dir: Path) -> Optional[Dict[str, Any]]:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        mode = "r:gz" if backup_path.suffixes and backup_path.suffixes[-1] == ".gz" else "r"
+        with tarfile.open(backup_path, mode) as tar:
+            tar.extractall(target_dir)
+
+        metadata_path = target_dir / "metadata.json"
+        if not metadata_path.exists():
+            return None
+
+        with metadata_path.open("r", encoding="utf-8") as meta_file:
+            return json_lib.load(meta_file)
+
+    async def _restore_chain(
+        self,
+        temp_path: Path,
+        metadata: Dict[str, Any],
+        clear_existing: bool,
+    ) -> Tuple[bool, str]:
+        """Восстанавливает бекап цепочки: базовый полный архив и инкременты до указанного."""
+        parents = metadata["chain"].get("parents", [])
+        missing = [name for name in parents if not (self.backup_dir / name).exists()]
+        if missing:
+            return False, (
+                "❌ Для восстановления инкрементального бекапа не хватает архивов: "
+                + ", ".join(missing)
+            )
+
+        layers: List[Tuple[Path, Dict[str, Any]]] = []
+        for position, name in enumerate(parents):
+            layer_dir = temp_path / "_chain" / str(position)
+            layer_metadata = await asyncio.to_thread(
+                self._extract_archive, self.backup_dir / name, layer_dir
+            )
+            if layer_metadata is None:
+                return False, f"❌ Метаданные бекапа {name} отсутствуют"
+            layers.append((layer_dir, layer_metadata))
+        layers.append((temp_path, metadata))
+
+        logger.info("🧩 Восстанавливаем цепочку из %s архивов", len(layers))
+
+        readers = [
+            self._ndjson_chunk_reader(
+                layer_dir / layer_metadata["database"].get("path", "database"),
+                layer_metadata["database"].get("tables", {}),
+            )
+            for layer_dir, layer_metadata in layers
+        ]
+        await self._restore_database_payload(
+            self._chain_chunk_reader(
+                readers,
+                temp_path / metadata["database"].get("path", "database"),
+                metadata["database"].get("tables", {}),
+            ),
+            metadata,
+            clear_existing,
+            drop_orphans=True,
+        )
+
+        restored_files = await self._restore_indexed_files(
+            metadata.get("file_index", []),
+            [layer_dir for layer_dir, _ in reversed(layers)],
+            clear_existing,
+        )
+
+        message = (f"✅ Восстановление завершено!\n"
+                   f"📊 Таблиц: {metadata.get('tables_count', 0)}\n"
+                   f"📈 Записей: {metadata.get('total_records', 0):,}\n"
+                   f"🧩 Архивов в цепочке: {len(layers)}\n"
+                   f"📁 Файлов: {restored_files}\n"
+                   f"📅 Дата бекапа: {metadata.get('timestamp', 'неизвестно')}")
+
+        logger.info(message)
+        return True, message
+
+    async def _restore_indexed_files(
+        self,
+        file_index: List[Dict[str, Any]],
+        layer_dirs: List[Path],
+        clear_existing: bool,
+    ) -> int:
+        def _restore() -> int:
+            if clear_existing:
+                top_level = {
+                    entry["relative_path"].split("/", 1)[0]
+                    for entry in file_index
+                    if entry.get("kind") == "data"
+                }
+                for name in top_level:
+                    destination = self.data_dir / name
+                    if name == self.backup_dir.name or not destination.exists():
+                        continue
+                    if destination.is_dir():
+                        shutil.rmtree(destination)
+                    else:
+                        destination.unlink()
+
+            restored = 0
+            for entry in file_index:
+                source = next(
+                    (
+                        layer_dir / "objects" / entry["sha256"]
+                        for layer_dir in layer_dirs
+                        if (layer_dir / "objects" / entry["sha256"]).exists()
+                    ),
+                    None,
+                )
+                if source is None:
+                    logger.warning(
+                        "Содержимое файла %s отсутствует в цепочке бекапов",
+                        entry.get("relative_path") or entry.get("path"),
+                    )
+                    continue
+
+                if entry.get("kind") == "data":
+                    target_path = self.data_dir / entry["relative_path"]
+                else:
+                    target_path = Path(entry["path"])
+                target_path.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, target_path)
+                restored += 1
+
+            return restored
+
+        restored_files = await asyncio.to_thread(_restore)
+        logger.info("📁 Восстановлено файлов из снимка по хешам: %s", restored_files)
+        return restored_files
+
     async def _restore_postgres(self, dump_path: Path, clear_existing: bool):
         if not dump_path.exists():
             raise FileNotFoundError(f"Dump PostgreSQL не найден: {dump_path}")
@@ -714,6 +1170,27 @@ class BackupService:
 
         logger.info("✅ PostgreSQL восстановлен (%s)", dump_path)
 
+    async def _restore_ndjson(
+        self,
+        dump_dir: Path,
+        database_info: Dict[str, Any],
+        clear_existing: bool,
+    ):
+        if not dump_dir.is_dir():
+            raise FileNotFoundError(f"NDJSON дамп не найден: {dump_dir}")
+
+        tables_info = database_info.get("tables", {})
+        if not tables_info:
+            raise ValueError("❌ Файл бекапа не содержит данных")
+
+        await self._restore_database_payload(
+            self._ndjson_chunk_reader(dump_dir, tables_info),
+            database_info,
+            clear_existing,
+        )
+
+        logger.info("✅ База данных восстановлена из ORM NDJSON (%s)", dump_dir)
+
     async def _restore_postgres_json(self, dump_path: Path, clear_existing: bool):
         if not dump_path.exists():
             raise FileNotFoundError(f"JSON дамп PostgreSQL не найден: {dump_path}")
@@ -725,15 +1202,83 @@ class BackupService:
         backup_data = dump_data.get("data", {})
         association_data = dump_data.get("associations", {})
 
+        if not backup_data:
+            raise ValueError("❌ Файл бекапа не содержит данных")
+
         await self._restore_database_payload(
-            backup_data,
-            association_data,
+            self._payload_chunk_reader(backup_data, association_data),
             metadata,
             clear_existing,
         )
 
         logger.info("✅ PostgreSQL восстановлен из ORM JSON (%s)", dump_path)
 
+    def _ndjson_chunk_reader(self, dump_dir: Path, tables_info: Dict[str, Dict[str, Any]]) -> ChunkReader:
+        chunk_size = self._stream_chunk_size
+
+        async def read_chunks(table_name: str) -> AsyncIterator[List[Dict[str, Any]]]:
+            table_info = tables_info.get(table_name)
+            if not table_info or not table_info.get("rows"):
+                return
+
+            dump_path = dump_dir / table_info.get("path", f"{table_name}.ndjson.gz")
+            if not dump_path.exists():
+                logger.warning("Файл таблицы %s отсутствует в бекапе", dump_path.name)
+                return
+
+            dump_file = await asyncio.to_thread(gzip.open, dump_path, "rt", encoding="utf-8")
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(self._read_ndjson_chunk, dump_file, chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                await asyncio.to_thread(dump_file.close)
+
+        return read_chunks
+
+    def _chain_chunk_reader(
+        self,
+        readers: List[ChunkReader],
+        latest_dump_dir: Path,
+        latest_tables_info: Dict[str, Dict[str, Any]],
+    ) -> ChunkReader:
+        async def read_chunks(table_name: str) -> AsyncIterator[List[Dict[str, Any]]]:
+            # Дописываемые таблицы собираются из базы и всех инкрементов по порядку,
+            # остальные целиком лежат в последнем архиве цепочки
+            if table_name not in INCREMENTAL_TABLES:
+                async for chunk in readers[-1](table_name):
+                    yield chunk
+                return
+
+            # Строки, удалённые после попадания в архив, отсутствуют в списке живых id
+            live_ids = await asyncio.to_thread(
+                self._read_live_ids, latest_dump_dir, latest_tables_info.get(table_name, {})
+            )
+            for reader in readers:
+                async for chunk in reader(table_name):
+                    if live_ids is not None:
+                        chunk = [record for record in chunk if record.get("id") in live_ids]
+                    if chunk:
+                        yield chunk
+
+        return read_chunks
+
+    def _payload_chunk_reader(
+        self,
+        backup_data: Dict[str, List[Dict[str, Any]]],
+        association_data: Dict[str, List[Dict[str, Any]]],
+    ) -> ChunkReader:
+        chunk_size = self._stream_chunk_size
+
+        async def read_chunks(table_name: str) -> AsyncIterator[List[Dict[str, Any]]]:
+            records = backup_data.get(table_name) or association_data.get(table_name) or []
+            for start in range(0, len(records), chunk_size):
+                yield records[start:start + chunk_size]
+
+        return read_chunks
+
     async def _restore_sqlite(self, dump_path: Path, clear_existing: bool):
         if not dump_path.exists():
             raise FileNotFoundError(f"SQLite файл не найден: {dump_path}")
@@ -790,25 +1335,16 @@ class BackupService:
 
     async def _restore_database_payload(
         self,
-        backup_data: Dict[str, List[Dict[str, Any]]],
-        association_data: Dict[str, List[Dict[str, Any]]],
+        read_chunks: ChunkReader,
         metadata: Dict[str, Any],
         clear_existing: bool,
+        drop_orphans: bool = False,
     ) -> Tuple[int, int]:
-        if not backup_data:
-            raise ValueError("❌ Файл бекапа не содержит данных")
-
         logger.info(
             "📊 Загружен дамп: %s",
             metadata.get("timestamp", "неизвестная дата"),
         )
-
-        estimated_records = metadata.get("total_records")
-        if estimated_records is None:
-            estimated_records = sum(len(records) for records in backup_data.values())
-            estimated_records += sum(len(records) for records in association_data.values())
-
-        logger.info("📈 Содержит %s записей", estimated_records)
+        logger.info("📈 Содержит %s записей", metadata.get("total_records", "неизвестно"))
 
         restored_records = 0
         restored_tables = 0
@@ -820,81 +1356,39 @@ class BackupService:
                     await self._clear_database_tables(db)
 
                 models_for_restore = self._get_models_for_backup(True)
-                models_by_table = {
-                    model.__tablename__: model for model in models_for_restore
-                }
 
-                pre_restore_tables = {"promo_groups"}
-                for table_name in pre_restore_tables:
-                    model = models_by_table.get(table_name)
-                    if not model:
-                        continue
-
-                    records = backup_data.get(table_name, [])
-                    if not records:
-                        continue
-
-                    logger.info(
-                        "🔥 Восстанавливаем таблицу %s (%s записей)",
-                        table_name,
-                        len(records),
-                    )
+                # promo_groups нужны пользователям, а реферальные связи пользователей
+                # проставляются отдельным проходом, когда все пользователи уже загружены
+                pre_restore_tables = ("promo_groups", "users")
+                ordered_tables = [
+                    model.__table__
+                    for table_name in pre_restore_tables
+                    for model in models_for_restore
+                    if model.__tablename__ == table_name
+                ]
+                ordered_tables += [
+                    model.__table__
+                    for model in models_for_restore
+                    if model.__tablename__ not in pre_restore_tables
+                ]
+                ordered_tables += list(self.association_tables.values())
+
+                for table in ordered_tables:
+                    logger.info("🔥 Восстанавливаем таблицу %s", table.name)
                     restored = await self._restore_table_records(
                         db,
-                        model,
-                        table_name,
-                        records,
-                        clear_existing,
+                        table,
+                        table.name,
+                        read_chunks(table.name),
+                        drop_orphans=drop_orphans and table.name in INCREMENTAL_TABLES,
                     )
                     restored_records += restored
 
                     if restored:
                         restored_tables += 1
-                        logger.info("✅ Таблица %s восстановлена", table_name)
+                        logger.info("✅ Таблица %s восстановлена (%s записей)", table.name, restored)
 
-                await self._restore_users_without_referrals(
-                    db,
-                    backup_data,
-                    models_by_table,
-                )
-
-                for model in models_for_restore:
-                    table_name = model.__tablename__
-
-                    if table_name == "users" or table_name in pre_restore_tables:
-                        continue
-
-                    records = backup_data.get(table_name, [])
-                    if not records:
-                        continue
-
-                    logger.info(
-                        "🔥 Восстанавливаем таблицу %s (%s записей)",
-                        table_name,
-                        len(records),
-                    )
-                    restored = await self._restore_table_records(
-                        db,
-                        model,
-                        table_name,
-                        records,
-                        clear_existing,
-                    )
-                    restored_records += restored
-
-                    if restored:
-                        restored_tables += 1
-                        logger.info("✅ Таблица %s восстановлена", table_name)
-
-                await self._update_user_referrals(db, backup_data)
-
-                assoc_tables, assoc_records = await self._restore_association_tables(
-                    db,
-                    association_data,
-                    clear_existing,
-                )
-                restored_tables += assoc_tables
-                restored_records += assoc_records
+                await self._update_user_referrals(db, read_chunks("users"))
 
                 await db.commit()
 
@@ -929,15 +1423,14 @@ class BackupService:
         association_data = backup_structure.get("associations", {})
         file_snapshots = backup_structure.get("files", {})
 
-        try:
-            restored_tables, restored_records = await self._restore_database_payload(
-                backup_data,
-                association_data,
-                metadata,
-                clear_existing,
-            )
-        except ValueError as exc:
-            return False, str(exc)
+        if not backup_data:
+            return False, "❌ Файл бекапа не содержит данных"
+
+        restored_tables, restored_records = await self._restore_database_payload(
+            self._payload_chunk_reader(backup_data, association_data),
+            metadata,
+            clear_existing,
+        )
 
         if file_snapshots:
             restored_files = await self._restore_file_snapshots(file_snapshots)
@@ -952,99 +1445,58 @@ class BackupService:
         logger.info(message)
         return True, message
 
-    async def _restore_users_without_referrals(self, db: AsyncSession, backup_data: dict, models_by_table: dict):
-        users_data = backup_data.get("users", [])
-        if not users_data:
-            return
-        
-        logger.info(f"👥 Восстанавливаем {len(users_data)} пользователей без реферальных связей")
-        
-        User = models_by_table["users"]
-        
-        for user_data in users_data:
-            try:
-                processed_data = self._process_record_data(user_data, User, "users")
-                processed_data['referred_by_id'] = None 
-                
-                if 'id' in processed_data:
-                    existing_user = await db.execute(
-                        select(User).where(User.id == processed_data['id'])
-                    )
-                    existing = existing_user.scalar_one_or_none()
-                    
-                    if existing:
-                        for key, value in processed_data.items():
-                            if key != 'id':
-                                setattr(existing, key, value)
-                    else:
-                        instance = User(**processed_data)
-                        db.add(instance)
-                else:
-                    instance = User(**processed_data)
-                    db.add(instance)
-                
-            except Exception as e:
-                logger.error(f"Ошибка при восстановлении пользователя: {e}")
-                await db.rollback()
-                raise e
-        
-        await db.commit()
-        logger.info("✅ Пользователи без реферальных связей восстановлены")
-
-    async def _update_user_referrals(self, db: AsyncSession, backup_data: dict):
-        users_data = backup_data.get("users", [])
-        if not users_data:
-            return
-        
+    async def _update_user_referrals(
+        self,
+        db: AsyncSession,
+        user_chunks: AsyncIterator[List[Dict[str, Any]]],
+    ):
         logger.info("🔗 Обновляем реферальные связи пользователей")
-        
-        for user_data in users_data:
-            try:
-                referred_by_id = user_data.get('referred_by_id')
-                user_id = user_data.get('id')
-                
-                if referred_by_id and user_id:
-                    referrer_result = await db.execute(
-                        select(User).where(User.id == referred_by_id)
-                    )
-                    referrer = referrer_result.scalar_one_or_none()
-                    
-                    if referrer:
-                        user_result = await db.execute(
-                            select(User).where(User.id == user_id)
-                        )
-                        user = user_result.scalar_one_or_none()
-                        
-                        if user:
-                            user.referred_by_id = referred_by_id
-                        else:
-                            logger.warning(f"Пользователь {user_id} не найден для обновления реферальной связи")
-                    else:
-                        logger.warning(f"Реферер {referred_by_id} не найден для пользователя {user_id}")
-                        
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении реферальной связи: {e}")
-                continue
-        
-        await db.commit()
-        logger.info("✅ Реферальные связи обновлены")
+
+        users_table = User.__table__
+        statement = (
+            update(users_table)
+            .where(
+                users_table.c.id == bindparam("b_user_id"),
+                select(users_table.c.id)
+                .where(users_table.c.id == bindparam("b_referrer_id"))
+                .exists(),
+            )
+            .values(referrer_id=bindparam("b_referrer_id"))
+        )
+
+        updated = 0
+        async for chunk in user_chunks:
+            params = [
+                {"b_user_id": int(user_data["id"]), "b_referrer_id": int(user_data["referrer_id"])}
+                for user_data in chunk
+                if user_data.get("id") and user_data.get("referrer_id")
+            ]
+            if params:
+                await db.execute(statement, params)
+                updated += len(params)
+
+        logger.info("✅ Реферальные связи обновлены (%s)", updated)
 
     def _process_record_data(self, record_data: dict, model, table_name: str) -> dict:
         processed_data = {}
+        table = getattr(model, "__table__", model)
         
         for key, value in record_data.items():
-            if value is None:
-                processed_data[key] = None
-                continue
-            
-            column = getattr(model.__table__.columns, key, None)
+            column = table.columns.get(key)
             if column is None:
                 logger.warning(f"Колонка {key} не найдена в модели {table_name}")
                 continue
+
+            if value is None:
+                processed_data[key] = None
+                continue
             
             column_type_str = str(column.type).upper()
             
-            if ('DATETIME' in column_type_str or 'TIMESTAMP' in column_type_str) and isinstance(value, str):
+            if isinstance(column.type, SQLEnum) and isinstance(value, str):
+                # Старые ORM-дампы сохраняли перечисления как "SubscriptionStatus.ACTIVE"
+                processed_data[key] = value.rsplit('.', 1)[-1]
+            elif ('DATETIME' in column_type_str or 'TIMESTAMP' in column_type_str) and isinstance(value, str):
                 try:
                     if 'T' in value:
                         processed_data[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
@@ -1080,159 +1532,112 @@ class BackupService:
         
         return processed_data
 
-    def _get_primary_key_column(self, model) -> Optional[str]:
-        for col in model.__table__.columns:
-            if col.primary_key:
-                return col.name
-        return None
-
-    async def _export_association_tables(self, db: AsyncSession) -> Dict[str, List[Dict[str, Any]]]:
-        association_data: Dict[str, List[Dict[str, Any]]] = {}
-
-        for table_name, table_obj in self.association_tables.items():
-            try:
-                logger.info(f"📊 Экспортируем таблицу связей: {table_name}")
-                result = await db.execute(select(table_obj))
-                rows = result.mappings().all()
-                association_data[table_name] = [dict(row) for row in rows]
-                logger.info(
-                    f"✅ Экспортировано {len(rows)} связей из {table_name}"
-                )
-            except Exception as e:
-                logger.error(f"Ошибка экспорта таблицы связей {table_name}: {e}")
-
-        return association_data
-
-    async def _restore_association_tables(
-        self,
-        db: AsyncSession,
-        association_data: Dict[str, List[Dict[str, Any]]],
-        clear_existing: bool
-    ) -> Tuple[int, int]:
-        if not association_data:
-            return 0, 0
-
-        restored_tables = 0
-        restored_records = 0
-
-        if "server_squad_promo_groups" in association_data:
-            restored = await self._restore_server_squad_promo_groups(
-                db,
-                association_data["server_squad_promo_groups"],
-                clear_existing
-            )
-            restored_tables += 1
-            restored_records += restored
-
-        return restored_tables, restored_records
-
-    async def _restore_server_squad_promo_groups(
+    async def _restore_table_records(
         self,
         db: AsyncSession,
-        records: List[Dict[str, Any]],
-        clear_existing: bool
+        table: Table,
+        table_name: str,
+        chunks: AsyncIterator[List[Dict[str, Any]]],
+        drop_orphans: bool = False,
     ) -> int:
-        if not records:
-            return 0
-
-        if clear_existing:
-            await db.execute(server_squad_promo_groups.delete())
-
-        restored = 0
+        """Вставляет записи пачками; существующие строки обновляются по первичному ключу.
+
+        ``drop_orphans`` отбрасывает строки, чьи обязательные родители уже восстановлены
+        без них (удалены после попадания строки в архив цепочки).
+        """
+        primary_key = [column.name for column in table.primary_key.columns]
+        is_association = table_name in self.association_tables
+        dialect_name = db.bind.dialect.name
+        restored_count = 0
+        dropped_count = 0
+
+        async for chunk in chunks:
+            records: List[Dict[str, Any]] = []
+            for record_data in chunk:
+                processed_data = self._process_record_data(record_data, table, table_name)
+                if table_name == "users":
+                    processed_data["referrer_id"] = None
+                if is_association and any(processed_data.get(key) is None for key in primary_key):
+                    logger.warning("Пропущена некорректная запись %s: %s", table_name, record_data)
+                    continue
+                records.append(processed_data)
 
-        for record in records:
-            server_id = record.get("server_squad_id")
-            promo_id = record.get("promo_group_id")
+            if drop_orphans:
+                kept = await self._drop_orphan_records(db, table, records)
+                dropped_count += len(records) - len(kept)
+                records = kept
 
-            if server_id is None or promo_id is None:
-                logger.warning(
-                    "Пропущена некорректная запись server_squad_promo_groups: %s",
-                    record
-                )
-                continue
+            statements: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+            for processed_data in records:
+                # executemany требует одинакового набора колонок во всех строках пачки
+                statements.setdefault(tuple(sorted(processed_data)), []).append(processed_data)
 
             try:
-                exists_stmt = (
-                    select(server_squad_promo_groups.c.server_squad_id)
-                    .where(
-                        server_squad_promo_groups.c.server_squad_id == server_id,
-                        server_squad_promo_groups.c.promo_group_id == promo_id,
-                    )
-                    .limit(1)
-                )
-                existing = await db.execute(exists_stmt)
-
-                if existing.scalar_one_or_none() is not None:
-                    logger.debug(
-                        "Запись server_squad_promo_groups (%s, %s) уже существует",
-                        server_id,
-                        promo_id,
+                for columns, rows in statements.items():
+                    await db.execute(
+                        self._build_restore_statement(
+                            table, columns, primary_key, dialect_name, is_association
+                        ),
+                        rows,
                     )
-                    continue
-
-                await db.execute(
-                    server_squad_promo_groups.insert().values(
-                        server_squad_id=server_id,
-                        promo_group_id=promo_id
-                    )
-                )
-                restored += 1
+                    restored_count += len(rows)
             except Exception as e:
-                logger.error(
-                    "Ошибка при восстановлении связи server_squad_promo_groups (%s, %s): %s",
-                    server_id,
-                    promo_id,
-                    e
-                )
+                logger.error(f"Ошибка восстановления записей в {table_name}: {e}")
                 await db.rollback()
                 raise e
 
-        return restored
+        if dropped_count:
+            logger.warning("⚠️ %s: пропущено %s записей удалённых родителей", table_name, dropped_count)
 
-    async def _restore_table_records(
+        return restored_count
+
+    async def _drop_orphan_records(
         self,
         db: AsyncSession,
-        model,
-        table_name: str,
+        table: Table,
         records: List[Dict[str, Any]],
-        clear_existing: bool
-    ) -> int:
-        restored_count = 0
-
-        for record_data in records:
-            try:
-                processed_data = self._process_record_data(record_data, model, table_name)
-
-                primary_key_col = self._get_primary_key_column(model)
-
-                if primary_key_col and primary_key_col in processed_data:
-                    existing_record = await db.execute(
-                        select(model).where(
-                            getattr(model, primary_key_col) == processed_data[primary_key_col]
-                        )
-                    )
-                    existing = existing_record.scalar_one_or_none()
+    ) -> List[Dict[str, Any]]:
+        """Проверяет внешние ключи пачки по уже восстановленным таблицам: необязательные
+        ссылки на отсутствующих родителей обнуляются, строки с обязательными — отбрасываются."""
+        for foreign_key in table.foreign_keys:
+            column_name = foreign_key.parent.name
+            referenced = foreign_key.column
+            values = {record[column_name] for record in records if record.get(column_name) is not None}
+            if not values:
+                continue
 
-                    if existing and not clear_existing:
-                        for key, value in processed_data.items():
-                            if key != primary_key_col:
-                                setattr(existing, key, value)
-                    else:
-                        instance = model(**processed_data)
-                        db.add(instance)
-                else:
-                    instance = model(**processed_data)
-                    db.add(instance)
+            existing = set((await db.execute(select(referenced).where(referenced.in_(values)))).scalars())
+            missing = values - existing
+            if not missing:
+                continue
 
-                restored_count += 1
+            if foreign_key.parent.nullable:
+                for record in records:
+                    if record.get(column_name) in missing:
+                        record[column_name] = None
+            else:
+                records = [record for record in records if record.get(column_name) not in missing]
 
-            except Exception as e:
-                logger.error(f"Ошибка восстановления записи в {table_name}: {e}")
-                logger.error(f"Проблемные данные: {record_data}")
-                await db.rollback()
-                raise e
+        return records
 
-        return restored_count
+    def _build_restore_statement(
+        self,
+        table: Table,
+        columns: Tuple[str, ...],
+        primary_key: List[str],
+        dialect_name: str,
+        is_association: bool,
+    ):
+        # Upsert и после очистки: цепочка инкрементов может содержать одну строку несколько раз
+        statement = _dialect_insert(table, dialect_name)
+        update_columns = [column for column in columns if column not in primary_key]
+        if not primary_key or is_association or not update_columns:
+            return statement.on_conflict_do_nothing()
+
+        return statement.on_conflict_do_update(
+            index_elements=primary_key,
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
 
     async def _clear_database_tables(self, db: AsyncSession):
         tables_order = [
@@ -1244,7 +1649,7 @@ class BackupService:
             "referral_earnings", "promocode_uses",
             "yookassa_payments", "cryptobot_payments",
             "mulenpay_payments", "pal24_payments",
-            "transactions", "welcome_texts", "subscriptions",
+            "subscription_events", "transactions", "welcome_texts", "subscriptions",
             "promocodes", "users", "promo_groups",
             "server_squads", "squads", "service_rules",
             "system_settings", "web_api_tokens", "monitoring_logs"
@@ -1320,14 +1725,7 @@ class BackupService:
                     metadata = {}
 
                     if self._is_archive_backup(backup_file):
-                        mode = "r:gz" if backup_file.suffixes and backup_file.suffixes[-1] == ".gz" else "r"
-                        with tarfile.open(backup_file, mode) as tar:
-                            try:
-                                member = tar.getmember("metadata.json")
-                                with tar.extractfile(member) as meta_file:
-                                    metadata = json_lib.load(meta_file)
-                            except KeyError:
-                                metadata = {}
+                        metadata = self._read_archive_metadata(backup_file)
                     else:
                         if backup_file.suffix == '.gz':
                             with gzip.open(backup_file, 'rt', encoding='utf-8') as f:
@@ -1351,6 +1749,9 @@ class BackupService:
                         "created_by": metadata.get("created_by"),
                         "database_type": metadata.get("database_type", metadata.get("database", {}).get("type", "unknown")),
                         "version": metadata.get("format_version", metadata.get("version", "1.0")),
+                        "backup_type": metadata.get("backup_type", "full"),
+                        "chain_position": metadata.get("chain", {}).get("position"),
+                        "parents": metadata.get("chain", {}).get("parents", []),
                     }
 
                     backups.append(backup_info)
@@ -1378,12 +1779,33 @@ class BackupService:
         
         return backups
 
+    def _read_archive_metadata(self, backup_file: Path) -> Dict[str, Any]:
+        mode = "r:gz" if backup_file.suffixes and backup_file.suffixes[-1] == ".gz" else "r"
+        with tarfile.open(backup_file, mode) as tar:
+            # Идём по заголовкам последовательно: в новых архивах metadata.json лежит первым
+            for member in tar:
+                if member.name == "metadata.json":
+                    with tar.extractfile(member) as meta_file:
+                        return json_lib.load(meta_file)
+        return {}
+
     async def delete_backup(self, backup_filename: str) -> Tuple[bool, str]:
         try:
             backup_path = self.backup_dir / backup_filename
             
             if not backup_path.exists():
                 return False, f"❌ Файл бекапа не найден: {backup_filename}"
+
+            dependants = [
+                backup["filename"]
+                for backup in await self.get_backup_list()
+                if backup_filename in backup.get("parents", [])
+            ]
+            if dependants:
+                return False, (
+                    f"❌ Бекап {backup_filename} нужен для восстановления инкрементов: "
+                    + ", ".join(dependants)
+                )
             
             backup_path.unlink()
             message = f"✅ Бекап {backup_filename} удален"
@@ -1402,11 +1824,20 @@ class BackupService:
             
             if len(backups) > self._settings.max_backups_keep:
                 backups.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+                # Базу и промежуточные инкременты оставшихся бекапов не удаляем
+                required = {
+                    name
+                    for backup in backups[:self._settings.max_backups_keep]
+                    for name in backup.get("parents", [])
+                }
                 
                 for backup in backups[self._settings.max_backups_keep:]:
+                    if backup["filename"] in required:
+                        continue
                     try:
-                        await self.delete_backup(backup["filename"])
-                        logger.info(f"🗑️ Удален старый бекап: {backup['filename']}")
+                        success, _ = await self.delete_backup(backup["filename"])
+                        if success:
+                            logger.info(f"🗑️ Удален старый бекап: {backup['filename']}")
                     except Exception as e:
                         logger.error(f"Ошибка удаления старого бекапа {backup['filename']}: {e}")
         
@@ -1516,9 +1947,11 @@ class BackupService:
             notification_text += f"\n\n⏰ <i>{datetime.now().strftime('%d.%m.%Y %H:%M:%S')}</i>"
             
             try:
+                from app.services.admin_notification_dispatcher import PRIORITY_CRITICAL, PRIORITY_NORMAL
                 from app.services.admin_notification_service import AdminNotificationService
                 admin_service = AdminNotificationService(self.bot)
-                await admin_service._send_message(notification_text)
+                priority = PRIORITY_CRITICAL if event_type in ("error", "restore_error") else PRIORITY_NORMAL
+                await admin_service._send_message(notification_text, priority=priority)
             except Exception as e:
                 logger.error(f"Ошибка отправки уведомления через AdminNotificationService: {e}")
         
@@ -4,27 +4,57 @@ import asyncio
 import logging
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.types import InlineKeyboardMarkup
 from sqlalchemy.exc import InterfaceError, SQLAlchemyError
 
+from app.database.crud.broadcast import (
+    close_interrupted_cancellations,
+    get_broadcast_checkpoint,
+    get_resumable_broadcasts,
+    record_unreachable_recipients,
+    save_broadcast_checkpoint,
+)
 from app.database.database import AsyncSessionLocal
-from app.database.models import BroadcastHistory
+from app.database.models import BroadcastCheckpoint, BroadcastHistory
 from app.handlers.admin.messages import (
+    BROADCAST_RECIPIENT_PAGE_SIZE,
+    count_broadcast_recipients,
     create_broadcast_keyboard,
-    get_custom_users,
-    get_target_users,
+    fetch_broadcast_recipient_page,
 )
+from app.services.shared_state_service import shared_state
+from app.services.telegram_send_scheduler import telegram_send_scheduler
 
 
 logger = logging.getLogger(__name__)
 
 
 VALID_MEDIA_TYPES = {"photo", "video", "document"}
-LARGE_BROADCAST_THRESHOLD = 20_000
-PROGRESS_UPDATE_STEP = 5_000
+SEND_BATCH_SIZE = 100
+# Блокировка рассылки продлевается после каждого пакета
+BROADCAST_CLAIM_TTL_SECONDS = 60
+BROADCAST_CLAIM_RETRY_SECONDS = 5
+UNREACHABLE_ERROR_MARKERS = (
+    "bot was blocked by the user",
+    "user is deactivated",
+    "chat not found",
+    "bot can't initiate conversation",
+    "peer id invalid",
+)
+
+
+def _unreachable_reason(error: Exception) -> Optional[str]:
+    if isinstance(error, TelegramForbiddenError):
+        return str(error)
+    if isinstance(error, TelegramBadRequest):
+        message = str(error).lower()
+        if any(marker in message for marker in UNREACHABLE_ERROR_MARKERS):
+            return str(error)
+    return None
 
 
 @dataclass(slots=True)
@@ -43,6 +73,14 @@ class BroadcastConfig:
     initiator_name: Optional[str] = None
 
 
+@dataclass(slots=True)
+class _BroadcastProgress:
+    last_user_id: int = 0
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0
+
+
 @dataclass(slots=True)
 class _BroadcastTask:
     task: asyncio.Task
@@ -56,6 +94,7 @@ class BroadcastService:
         self._bot: Optional[Bot] = None
         self._tasks: dict[int, _BroadcastTask] = {}
         self._lock = asyncio.Lock()
+        self._shutting_down = False
 
     def set_bot(self, bot: Bot) -> None:
         self._bot = bot
@@ -87,24 +126,125 @@ class BroadcastService:
     async def request_stop(self, broadcast_id: int) -> bool:
         async with self._lock:
             task_entry = self._tasks.get(broadcast_id)
-            if not task_entry:
+            if task_entry:
+                task_entry.cancel_event.set()
+                return True
+
+        # Рассылка может выполняться другим воркером: он проверяет флаг перед каждым пакетом
+        if await shared_state.is_claimed(self._claim_name(broadcast_id)):
+            await shared_state.set_flag(self._stop_flag_name(broadcast_id), BROADCAST_CLAIM_TTL_SECONDS * 2)
+            return True
+        return False
+
+    async def resume_pending_broadcasts(self) -> int:
+        """Перезапускает рассылки, прерванные рестартом, с последней сохраненной точки."""
+
+        if self._bot is None:
+            logger.error("Невозможно возобновить рассылки: бот не инициализирован")
+            return 0
+
+        self._shutting_down = False
+        resumed = 0
+        async with AsyncSessionLocal() as session:
+            await close_interrupted_cancellations(session)
+            broadcasts = await get_resumable_broadcasts(session)
+            configs = []
+            for broadcast in broadcasts:
+                checkpoint = await get_broadcast_checkpoint(session, broadcast.id)
+                configs.append((broadcast.id, self._config_from_history(broadcast, checkpoint)))
+
+        for broadcast_id, config in configs:
+            logger.info("▶️ Возобновляем рассылку %s после перезапуска", broadcast_id)
+            await self.start_broadcast(broadcast_id, config)
+            resumed += 1
+        return resumed
+
+    async def shutdown(self) -> None:
+        """Останавливает рассылки без смены статуса, чтобы они продолжились после запуска."""
+
+        self._shutting_down = True
+        tasks = [entry.task for entry in self._tasks.values() if not entry.task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _claim_name(broadcast_id: int) -> str:
+        return f"broadcast:{broadcast_id}"
+
+    @staticmethod
+    def _stop_flag_name(broadcast_id: int) -> str:
+        return f"broadcast_stop:{broadcast_id}"
+
+    async def _acquire_claim(self, broadcast_id: int) -> bool:
+        """Ждёт, пока блокировка рассылки освободится, не дольше её TTL.
+
+        Блокировку держит процесс, который сейчас отправляет рассылку. После падения
+        процесса она истекает сама, и рассылку подхватывает новый лидер.
+        """
+
+        name = self._claim_name(broadcast_id)
+        deadline = asyncio.get_running_loop().time() + BROADCAST_CLAIM_TTL_SECONDS
+        while True:
+            if await shared_state.claim(name, BROADCAST_CLAIM_TTL_SECONDS):
+                return True
+            if asyncio.get_running_loop().time() >= deadline:
                 return False
+            await asyncio.sleep(BROADCAST_CLAIM_RETRY_SECONDS)
 
-            task_entry.cancel_event.set()
+    async def _keep_claim(self, broadcast_id: int) -> bool:
+        name = self._claim_name(broadcast_id)
+        try:
+            if await shared_state.refresh_claim(name, BROADCAST_CLAIM_TTL_SECONDS):
+                return True
+            return await shared_state.claim(name, BROADCAST_CLAIM_TTL_SECONDS)
+        except Exception as exc:  # noqa: BLE001
+            # Без связи с Redis продолжаем: курсор сохранён, дубли ограничены одним пакетом
+            logger.warning("Не удалось продлить блокировку рассылки %s: %s", broadcast_id, exc)
             return True
 
+    async def _release_claim(self, broadcast_id: int) -> None:
+        try:
+            await shared_state.release_claim(self._claim_name(broadcast_id))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Не удалось снять блокировку рассылки %s: %s", broadcast_id, exc)
+
+    @staticmethod
+    def _config_from_history(
+        broadcast: BroadcastHistory,
+        checkpoint: Optional[BroadcastCheckpoint],
+    ) -> BroadcastConfig:
+        media = None
+        if broadcast.has_media and broadcast.media_type and broadcast.media_file_id:
+            media = BroadcastMediaConfig(
+                type=broadcast.media_type,
+                file_id=broadcast.media_file_id,
+                caption=broadcast.media_caption,
+            )
+        return BroadcastConfig(
+            target=broadcast.target_type,
+            message_text=broadcast.message_text or "",
+            selected_buttons=list(checkpoint.selected_buttons or []) if checkpoint else [],
+            media=media,
+            initiator_name=broadcast.admin_name,
+        )
+
     async def _run_broadcast(
         self,
         broadcast_id: int,
         config: BroadcastConfig,
         cancel_event: asyncio.Event,
     ) -> None:
-        sent_count = 0
-        failed_count = 0
+        progress = _BroadcastProgress()
+
+        if not await self._acquire_claim(broadcast_id):
+            logger.info("Рассылка %s выполняется другим воркером, пропускаем", broadcast_id)
+            return
 
         try:
             if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
+                await self._mark_cancelled(broadcast_id, progress.sent, progress.failed)
                 return
 
             async with AsyncSessionLocal() as session:
@@ -113,60 +253,58 @@ class BroadcastService:
                     logger.error("Запись рассылки %s не найдена в БД", broadcast_id)
                     return
 
-                broadcast.status = "in_progress"
-                broadcast.sent_count = 0
-                broadcast.failed_count = 0
-                await session.commit()
-
-            recipients = await self._fetch_recipients(config.target)
-
-            async with AsyncSessionLocal() as session:
-                broadcast = await session.get(BroadcastHistory, broadcast_id)
-                if not broadcast:
-                    logger.error("Запись рассылки %s удалена до запуска", broadcast_id)
-                    return
+                checkpoint = await get_broadcast_checkpoint(session, broadcast_id)
+                if checkpoint is not None:
+                    progress = _BroadcastProgress(
+                        last_user_id=checkpoint.last_user_id or 0,
+                        sent=checkpoint.sent_count or 0,
+                        failed=checkpoint.failed_count or 0,
+                        skipped=checkpoint.skipped_count or 0,
+                    )
+                    total_count = broadcast.total_count or 0
+                    broadcast.status = "in_progress"
+                    await session.commit()
+                    logger.info(
+                        "Рассылка %s продолжается с пользователя #%s (отправлено %s, ошибок %s)",
+                        broadcast_id,
+                        progress.last_user_id,
+                        progress.sent,
+                        progress.failed,
+                    )
+                else:
+                    total_count = await count_broadcast_recipients(session, config.target)
+                    broadcast.status = "in_progress"
+                    broadcast.sent_count = 0
+                    broadcast.failed_count = 0
+                    broadcast.total_count = total_count
+                    await session.commit()
 
-                broadcast.total_count = len(recipients)
-                await session.commit()
+                    await save_broadcast_checkpoint(
+                        session,
+                        broadcast_id,
+                        last_user_id=0,
+                        sent_count=0,
+                        failed_count=0,
+                        selected_buttons=config.selected_buttons,
+                    )
 
             if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
+                await self._mark_cancelled(broadcast_id, progress.sent, progress.failed)
                 return
 
-            if not recipients:
+            if not total_count:
                 logger.info("Рассылка %s: получатели не найдены", broadcast_id)
-                await self._mark_finished(broadcast_id, sent_count, failed_count, cancelled=False)
+                await self._mark_finished(broadcast_id, progress.sent, progress.failed, cancelled=False)
                 return
 
             keyboard = self._build_keyboard(config.selected_buttons)
-
-            if len(recipients) > LARGE_BROADCAST_THRESHOLD:
-                logger.info(
-                    "Запускаем стабильный режим рассылки для %s получателей", len(recipients)
-                )
-                (
-                    sent_count,
-                    failed_count,
-                    cancelled_during_run,
-                ) = await self._run_resilient_broadcast(
-                    broadcast_id,
-                    recipients,
-                    config,
-                    keyboard,
-                    cancel_event,
-                )
-            else:
-                (
-                    sent_count,
-                    failed_count,
-                    cancelled_during_run,
-                ) = await self._run_standard_broadcast(
-                    broadcast_id,
-                    recipients,
-                    config,
-                    keyboard,
-                    cancel_event,
-                )
+            cancelled_during_run = await self._send_batches(
+                broadcast_id,
+                config,
+                keyboard,
+                cancel_event,
+                progress,
+            )
 
             if cancelled_during_run:
                 logger.info(
@@ -183,145 +321,152 @@ class BroadcastService:
 
             await self._mark_finished(
                 broadcast_id,
-                sent_count,
-                failed_count,
+                progress.sent,
+                progress.failed,
                 cancelled=False,
             )
 
         except asyncio.CancelledError:
-            await self._mark_cancelled(broadcast_id, sent_count, failed_count)
+            if self._shutting_down:
+                logger.info(
+                    "Рассылка %s приостановлена на пользователе #%s и продолжится после запуска",
+                    broadcast_id,
+                    progress.last_user_id,
+                )
+            else:
+                await self._mark_cancelled(broadcast_id, progress.sent, progress.failed)
             raise
         except Exception as exc:  # noqa: BLE001
             logger.exception("Критическая ошибка при выполнении рассылки %s: %s", broadcast_id, exc)
-            await self._mark_failed(broadcast_id, sent_count, failed_count)
+            await self._mark_failed(broadcast_id, progress.sent, progress.failed)
+        finally:
+            await self._release_claim(broadcast_id)
 
-    async def _fetch_recipients(self, target: str):
-        async with AsyncSessionLocal() as session:
-            if target.startswith("custom_"):
-                criteria = target[len("custom_"):]
-                return await get_custom_users(session, criteria)
-            return await get_target_users(session, target)
+    async def _iter_recipients(self, target: str, after_id: int = 0) -> AsyncIterator[tuple[int, int]]:
+        """Отдаёт (user_id, telegram_id) получателей постранично по User.id, открывая сессию только на время запроса."""
 
-    async def _run_standard_broadcast(
+        last_id = after_id
+        while True:
+            async with AsyncSessionLocal() as session:
+                page = await fetch_broadcast_recipient_page(
+                    session,
+                    target,
+                    after_id=last_id,
+                    limit=BROADCAST_RECIPIENT_PAGE_SIZE,
+                )
+            if not page:
+                return
+            last_id = page[-1][0]
+            for recipient in page:
+                yield recipient
+
+    @staticmethod
+    async def _iter_batches(recipients: AsyncIterator, size: int) -> AsyncIterator[list]:
+        batch: list = []
+        async for recipient in recipients:
+            batch.append(recipient)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _send_batches(
         self,
         broadcast_id: int,
-        recipients: list,
         config: BroadcastConfig,
         keyboard: Optional[InlineKeyboardMarkup],
         cancel_event: asyncio.Event,
-    ) -> tuple[int, int, bool]:
-        """Базовый режим рассылки для небольших списков."""
-
-        sent_count = 0
-        failed_count = 0
+        progress: "_BroadcastProgress",
+    ) -> bool:
+        """Отправляет рассылку пакетами, сохраняя курсор и счетчики после каждого пакета."""
 
-        # Ограничение на количество одновременных отправок
-        semaphore = asyncio.Semaphore(20)
+        async def send_single_message(telegram_id: Optional[int]) -> tuple[bool, Optional[str]]:
+            if cancel_event.is_set() or telegram_id is None:
+                return False, None
 
-        async def send_single_message(user):
-            """Отправляет одно сообщение с семафором ограничения"""
-            async with semaphore:
-                if cancel_event.is_set():
-                    return False
-
-                telegram_id = getattr(user, "telegram_id", None)
-                if telegram_id is None:
-                    return False
-
-                try:
-                    await self._deliver_message(telegram_id, config, keyboard)
-                    return True
-                except Exception as exc:  # noqa: BLE001
+            try:
+                await self._deliver_message(telegram_id, config, keyboard)
+                return True, None
+            except Exception as exc:  # noqa: BLE001
+                unreachable_reason = _unreachable_reason(exc)
+                if unreachable_reason is None:
                     logger.error(
                         "Ошибка отправки рассылки %s пользователю %s: %s",
                         broadcast_id,
                         telegram_id,
                         exc,
                     )
-                    return False
+                return False, unreachable_reason
 
-        # Отправляем сообщения пакетами для эффективности
-        batch_size = 100
-        for i in range(0, len(recipients), batch_size):
+        recipients = self._iter_recipients(config.target, progress.last_user_id)
+        async for batch in self._iter_batches(recipients, SEND_BATCH_SIZE):
+            if await shared_state.pop_flag(self._stop_flag_name(broadcast_id)):
+                cancel_event.set()
             if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
-                return sent_count, failed_count, True
+                await self._mark_cancelled(broadcast_id, progress.sent, progress.failed)
+                return True
 
-            batch = recipients[i:i + batch_size]
-            tasks = [send_single_message(user) for user in batch]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for result in results:
-                if result is True:
-                    sent_count += 1
-                else:
-                    failed_count += 1
+            results = await asyncio.gather(
+                *(send_single_message(telegram_id) for _, telegram_id in batch),
+                return_exceptions=True,
+            )
 
-            # Небольшая задержка между пакетами для снижения нагрузки на API
-            await asyncio.sleep(0.1)
+            unreachable: dict[int, str] = {}
+            for (_, telegram_id), result in zip(batch, results):
+                if isinstance(result, tuple) and result[0]:
+                    progress.sent += 1
+                    continue
+                progress.failed += 1
+                if isinstance(result, tuple) and result[1]:
+                    unreachable[telegram_id] = result[1]
+
+            progress.last_user_id = batch[-1][0]
+            await self._save_checkpoint(broadcast_id, progress, unreachable)
+            if not await self._keep_claim(broadcast_id):
+                logger.warning(
+                    "Рассылку %s подхватил другой воркер, остановка на пользователе #%s",
+                    broadcast_id,
+                    progress.last_user_id,
+                )
+                return True
 
-        return sent_count, failed_count, False
+        return False
 
-    async def _run_resilient_broadcast(
+    async def _save_checkpoint(
         self,
         broadcast_id: int,
-        recipients: list,
-        config: BroadcastConfig,
-        keyboard: Optional[InlineKeyboardMarkup],
-        cancel_event: asyncio.Event,
-    ) -> tuple[int, int, bool]:
-        """Режим рассылки с периодическим обновлением статуса для больших списков."""
-
-        sent_count = 0
-        failed_count = 0
-
-        # Ограничение на количество одновременных отправок
-        semaphore = asyncio.Semaphore(15)
-
-        async def send_single_message(user):
-            async with semaphore:
-                if cancel_event.is_set():
-                    return False
-
-                telegram_id = getattr(user, "telegram_id", None)
-                if telegram_id is None:
-                    return False
-
-                try:
-                    await self._deliver_message(telegram_id, config, keyboard)
-                    return True
-                except Exception as exc:  # noqa: BLE001
-                    logger.error(
-                        "Ошибка отправки рассылки %s пользователю %s: %s",
+        progress: "_BroadcastProgress",
+        unreachable: dict[int, str],
+    ) -> None:
+        progress.skipped += len(unreachable)
+        attempts = 0
+        while attempts < 2:
+            try:
+                async with AsyncSessionLocal() as session:
+                    if unreachable:
+                        await record_unreachable_recipients(session, unreachable)
+                    await save_broadcast_checkpoint(
+                        session,
                         broadcast_id,
-                        telegram_id,
-                        exc,
+                        last_user_id=progress.last_user_id,
+                        sent_count=progress.sent,
+                        failed_count=progress.failed,
+                        skipped_count=progress.skipped,
                     )
-                    return False
-
-        batch_size = 100
-        for i in range(0, len(recipients), batch_size):
-            if cancel_event.is_set():
-                await self._mark_cancelled(broadcast_id, sent_count, failed_count)
-                return sent_count, failed_count, True
-
-            batch = recipients[i:i + batch_size]
-            tasks = [send_single_message(user) for user in batch]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for result in results:
-                if result is True:
-                    sent_count += 1
-                else:
-                    failed_count += 1
-
-            processed = sent_count + failed_count
-            if processed % PROGRESS_UPDATE_STEP == 0:
-                await self._update_progress(broadcast_id, sent_count, failed_count)
-
-            await asyncio.sleep(0.1)
-
-        return sent_count, failed_count, False
+                    return
+            except InterfaceError as exc:
+                attempts += 1
+                logger.warning(
+                    "Проблемы с соединением при сохранении прогресса рассылки %s: %s. Повтор %s/2",
+                    broadcast_id,
+                    exc,
+                    attempts,
+                )
+                await asyncio.sleep(0.2)
+            except SQLAlchemyError:
+                logger.exception("Не удалось сохранить прогресс рассылки %s", broadcast_id)
+                return
 
     def _build_keyboard(self, selected_buttons: Optional[list[str]]) -> Optional[InlineKeyboardMarkup]:
         if selected_buttons is None:
@@ -337,36 +482,38 @@ class BroadcastService:
         if not self._bot:
             raise RuntimeError("Телеграм-бот не инициализирован")
 
+        bot = self._bot
         if config.media and config.media.type in VALID_MEDIA_TYPES:
             caption = config.media.caption or config.message_text
             if config.media.type == "photo":
-                await self._bot.send_photo(
+                send = lambda: bot.send_photo(
                     chat_id=telegram_id,
                     photo=config.media.file_id,
                     caption=caption,
                     reply_markup=keyboard,
                 )
             elif config.media.type == "video":
-                await self._bot.send_video(
+                send = lambda: bot.send_video(
                     chat_id=telegram_id,
                     video=config.media.file_id,
                     caption=caption,
                     reply_markup=keyboard,
                 )
-            elif config.media.type == "document":
-                await self._bot.send_document(
+            else:
+                send = lambda: bot.send_document(
                     chat_id=telegram_id,
                     document=config.media.file_id,
                     caption=caption,
                     reply_markup=keyboard,
                 )
-            return
+        else:
+            send = lambda: bot.send_message(
+                chat_id=telegram_id,
+                text=config.message_text,
+                reply_markup=keyboard,
+            )
 
-        await self._bot.send_message(
-            chat_id=telegram_id,
-            text=config.message_text,
-            reply_markup=keyboard,
-        )
+        await telegram_send_scheduler.send(telegram_id, send)
 
     async def _mark_finished(
         self,
@@ -411,22 +558,6 @@ class BroadcastService:
             status="failed",
         )
 
-    async def _update_progress(
-        self,
-        broadcast_id: int,
-        sent_count: int,
-        failed_count: int,
-    ) -> None:
-        """Периодически обновляет прогресс рассылки, чтобы держать соединение активным."""
-
-        await self._safe_status_update(
-            broadcast_id,
-            sent_count,
-            failed_count,
-            status="in_progress",
-            update_completed_at=False,
-        )
-
     async def _safe_status_update(
         self,
         broadcast_id: int,
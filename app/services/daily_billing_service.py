@@ -1,21 +1,26 @@
 import asyncio
 import logging
-from dataclasses import dataclass
+import time as time_module
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, time, date
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import case, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal
 from app.database.models import User, Subscription, SubscriptionStatus
-from app.remnawave_api import RemnaWaveAPI
+from app.remnawave_api import RemnaWaveAPI, RemnaWaveUser, UserStatus as RemnaWaveUserStatus
+from app.services.panel_snapshot_service import panel_snapshot_service
 
 
 logger = logging.getLogger(__name__)
 
 
+BILLING_STAGES = ("snapshot", "load", "prefetch", "debit", "panel_update", "disable")
+
+
 @dataclass(frozen=True)
 class DailyBillingStatus:
     enabled: bool
@@ -27,6 +32,18 @@ class DailyBillingStatus:
     users_charged: int
     users_disabled: int
     is_running: bool
+    users_processed: int = 0
+    duration_seconds: Optional[float] = None
+    throughput_per_second: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _BillingCandidate:
+    id: int
+    telegram_id: int
+    balance: float
+    remnawave_uuid: str
 
 
 class DailyBillingService:
@@ -44,6 +61,10 @@ class DailyBillingService:
         self._last_run_error: Optional[str] = None
         self._last_users_charged: int = 0
         self._last_users_disabled: int = 0
+        self._last_users_processed: int = 0
+        self._last_duration_seconds: Optional[float] = None
+        self._last_throughput: float = 0.0
+        self._last_stage_seconds: Dict[str, float] = {}
         self._is_running: bool = False
     
     async def initialize(self) -> None:
@@ -98,7 +119,11 @@ class DailyBillingService:
             last_run_error=self._last_run_error,
             users_charged=self._last_users_charged,
             users_disabled=self._last_users_disabled,
-            is_running=self._is_running
+            is_running=self._is_running,
+            users_processed=self._last_users_processed,
+            duration_seconds=self._last_duration_seconds,
+            throughput_per_second=round(self._last_throughput, 2),
+            stage_seconds=dict(self._last_stage_seconds)
         )
     
     async def _run_scheduler(self, billing_time: time) -> None:
@@ -134,140 +159,278 @@ class DailyBillingService:
             
             users_charged = 0
             users_disabled = 0
-            errors = []
+            users_processed = 0
+            errors: List[str] = []
+            stage_seconds: Dict[str, float] = {stage: 0.0 for stage in BILLING_STAGES}
+            started = time_module.monotonic()
+            
+            chunk_size = max(1, int(getattr(settings, 'DAILY_BILLING_CHUNK_SIZE', 500)))
+            concurrency = max(1, int(getattr(settings, 'DAILY_BILLING_CONCURRENCY', 20)))
+            semaphore = asyncio.Semaphore(concurrency)
             
             try:
-                async with AsyncSessionLocal() as db:
-                    result = await db.execute(
-                        select(User).where(
-                            User.remnawave_uuid.isnot(None),
-                            User.balance > 0
-                        )
-                    )
-                    users = result.scalars().all()
-                    
-                    logger.info(f"Daily billing: processing {len(users)} users with balance")
-                    
-                    async with RemnaWaveAPI(
-                        base_url=settings.REMNAWAVE_URL, 
-                        api_key=settings.REMNAWAVE_API_KEY
-                    ) as api:
-                        for user in users:
-                            try:
-                                charged = await self._charge_user(db, api, user)
-                                if charged:
-                                    users_charged += 1
-                            except Exception as e:
-                                logger.error(f"Error charging user {user.telegram_id}: {e}")
-                                errors.append(str(e))
+                async with RemnaWaveAPI(
+                    base_url=settings.REMNAWAVE_URL, 
+                    api_key=settings.REMNAWAVE_API_KEY
+                ) as api:
+                    stage_started = time_module.monotonic()
+                    snapshot_ready = await panel_snapshot_service.refresh(api)
+                    stage_seconds["snapshot"] += time_module.monotonic() - stage_started
+                    if not snapshot_ready:
+                        logger.warning("Panel snapshot unavailable, falling back to per-user lookups")
                     
-                    result = await db.execute(
-                        select(User).where(
-                            User.remnawave_uuid.isnot(None),
-                            User.balance <= 0
+                    last_id = 0
+                    while True:
+                        stage_started = time_module.monotonic()
+                        async with AsyncSessionLocal() as db:
+                            chunk = await self._load_chunk(db, last_id, chunk_size)
+                        stage_seconds["load"] += time_module.monotonic() - stage_started
+                        
+                        if not chunk:
+                            break
+                        last_id = chunk[-1].id
+                        users_processed += len(chunk)
+                        
+                        charged, disabled, chunk_errors = await self._process_chunk(
+                            api, chunk, semaphore, stage_seconds, snapshot_ready
+                        )
+                        users_charged += charged
+                        users_disabled += disabled
+                        errors.extend(chunk_errors)
+                        
+                        logger.info(
+                            f"Daily billing chunk up to user id {last_id}: "
+                            f"{len(chunk)} users, {charged} charged, {disabled} disabled"
                         )
-                    )
-                    zero_balance_users = result.scalars().all()
-                    
-                    async with RemnaWaveAPI(
-                        base_url=settings.REMNAWAVE_URL, 
-                        api_key=settings.REMNAWAVE_API_KEY
-                    ) as api:
-                        for user in zero_balance_users:
-                            try:
-                                disabled = await self._disable_user_if_expired(db, api, user)
-                                if disabled:
-                                    users_disabled += 1
-                            except Exception as e:
-                                logger.error(f"Error disabling user {user.telegram_id}: {e}")
-                                errors.append(str(e))
                 
+                duration = time_module.monotonic() - started
                 self._last_run_success = True
                 self._last_run_error = None
                 self._last_users_charged = users_charged
                 self._last_users_disabled = users_disabled
+                self._record_metrics(users_processed, duration, stage_seconds)
                 
-                logger.info(f"Daily billing complete: {users_charged} charged, {users_disabled} disabled")
+                logger.info(
+                    f"Daily billing complete: {users_processed} processed, {users_charged} charged, "
+                    f"{users_disabled} disabled in {duration:.1f}s ({self._last_throughput:.1f} users/s)"
+                )
                 
                 return {
                     "status": "ok",
+                    "users_processed": users_processed,
                     "users_charged": users_charged,
                     "users_disabled": users_disabled,
+                    "duration_seconds": round(duration, 3),
+                    "stage_seconds": dict(self._last_stage_seconds),
                     "errors": errors
                 }
                 
             except Exception as e:
                 self._last_run_success = False
                 self._last_run_error = str(e)
+                self._record_metrics(users_processed, time_module.monotonic() - started, stage_seconds)
                 logger.error(f"Daily billing failed: {e}")
                 return {"status": "error", "error": str(e)}
             finally:
                 self._is_running = False
     
-    async def _charge_user(self, db: AsyncSession, api: RemnaWaveAPI, user: User) -> bool:
-        remnawave_user = await api.get_user_by_uuid(user.remnawave_uuid)
-        if not remnawave_user:
-            logger.warning(f"RemnaWave user not found for {user.telegram_id}")
-            return False
+    def _record_metrics(self, users_processed: int, duration: float, stage_seconds: Dict[str, float]) -> None:
+        self._last_users_processed = users_processed
+        self._last_duration_seconds = duration
+        self._last_throughput = users_processed / duration if duration > 0 else 0.0
+        self._last_stage_seconds = {stage: round(value, 3) for stage, value in stage_seconds.items()}
+    
+    async def _load_chunk(self, db: AsyncSession, last_id: int, limit: int) -> List[_BillingCandidate]:
+        result = await db.execute(
+            select(User.id, User.telegram_id, User.balance, User.remnawave_uuid)
+            .where(
+                User.id > last_id,
+                User.remnawave_uuid.isnot(None)
+            )
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [
+            _BillingCandidate(
+                id=row.id,
+                telegram_id=row.telegram_id,
+                balance=float(row.balance or 0),
+                remnawave_uuid=row.remnawave_uuid
+            )
+            for row in result.all()
+        ]
+    
+    async def _process_chunk(
+        self,
+        api: RemnaWaveAPI,
+        chunk: List[_BillingCandidate],
+        semaphore: asyncio.Semaphore,
+        stage_seconds: Dict[str, float],
+        snapshot_ready: bool
+    ) -> Tuple[int, int, List[str]]:
+        errors: List[str] = []
+        
+        stage_started = time_module.monotonic()
+        states = await asyncio.gather(*(
+            self._fetch_panel_state(api, candidate, semaphore, snapshot_ready) for candidate in chunk
+        ), return_exceptions=True)
+        stage_seconds["prefetch"] += time_module.monotonic() - stage_started
         
         now = datetime.utcnow()
-        expire_at = remnawave_user.expire_at
-        if expire_at and expire_at.tzinfo:
-            expire_at = expire_at.replace(tzinfo=None)
+        charges: Dict[int, Tuple[_BillingCandidate, float, datetime, int]] = {}
+        expired: List[_BillingCandidate] = []
         
-        if expire_at and expire_at < now:
-            return False
+        for candidate, state in zip(chunk, states):
+            if isinstance(state, Exception):
+                logger.error(f"Error fetching panel data for user {candidate.telegram_id}: {state}")
+                errors.append(str(state))
+                continue
+            
+            remnawave_user, device_count = state
+            if not remnawave_user:
+                if candidate.balance > 0:
+                    logger.warning(f"RemnaWave user not found for {candidate.telegram_id}")
+                continue
+            
+            expire_at = remnawave_user.expire_at
+            if expire_at and expire_at.tzinfo:
+                expire_at = expire_at.replace(tzinfo=None)
+            is_expired = bool(expire_at and expire_at < now)
+            
+            if candidate.balance > 0:
+                if is_expired:
+                    continue
+                daily_price = settings.SUBSCRIPTION_DAILY_PRICE * max(device_count, 1)
+                if candidate.balance < daily_price:
+                    continue
+                charges[candidate.id] = (candidate, daily_price, (expire_at or now) + timedelta(days=1), max(device_count, 1))
+            elif is_expired:
+                expired.append(candidate)
         
-        devices_info = await api.get_user_devices(user.remnawave_uuid)
-        device_count = devices_info.get('total', 0)
-        if device_count < 1:
-            device_count = 1
+        charged_ids: List[int] = []
+        if charges:
+            stage_started = time_module.monotonic()
+            try:
+                async with AsyncSessionLocal() as db:
+                    charged_ids = await self._apply_debits(
+                        db, {user_id: charge[1] for user_id, charge in charges.items()}
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Error applying debits for chunk: {e}")
+                errors.append(str(e))
+            stage_seconds["debit"] += time_module.monotonic() - stage_started
         
-        daily_price = settings.SUBSCRIPTION_DAILY_PRICE * device_count
+        charged = 0
+        if charged_ids:
+            stage_started = time_module.monotonic()
+            results = await asyncio.gather(*(
+                self._extend_panel_user(api, charges[user_id][0], charges[user_id][2], semaphore)
+                for user_id in charged_ids
+            ), return_exceptions=True)
+            stage_seconds["panel_update"] += time_module.monotonic() - stage_started
+            
+            for user_id, result in zip(charged_ids, results):
+                candidate, daily_price, new_expire, device_count = charges[user_id]
+                if isinstance(result, Exception):
+                    logger.error(f"Error extending user {candidate.telegram_id} after charge: {result}")
+                    errors.append(str(result))
+                    continue
+                charged += 1
+                logger.info(
+                    f"Charged user {candidate.telegram_id}: -{daily_price}₽ ({device_count} devices), expire: {new_expire}"
+                )
         
-        if user.balance < daily_price:
-            return False
+        disabled = 0
+        if expired:
+            stage_started = time_module.monotonic()
+            results = await asyncio.gather(*(
+                self._disable_panel_user(api, candidate, semaphore) for candidate in expired
+            ), return_exceptions=True)
+            
+            disabled_ids: List[int] = []
+            for candidate, result in zip(expired, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error disabling user {candidate.telegram_id}: {result}")
+                    errors.append(str(result))
+                    continue
+                disabled_ids.append(candidate.id)
+                logger.info(f"Disabled expired subscription for user {candidate.telegram_id}")
+            
+            if disabled_ids:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(
+                            update(Subscription)
+                            .where(Subscription.user_id.in_(disabled_ids))
+                            .values(status=SubscriptionStatus.EXPIRED)
+                        )
+                        await db.commit()
+                    disabled = len(disabled_ids)
+                except Exception as e:
+                    logger.error(f"Error expiring subscriptions for chunk: {e}")
+                    errors.append(str(e))
+            stage_seconds["disable"] += time_module.monotonic() - stage_started
         
-        user.balance -= daily_price
-        await db.commit()
+        return charged, disabled, errors
+    
+    async def _fetch_panel_state(
+        self,
+        api: RemnaWaveAPI,
+        candidate: _BillingCandidate,
+        semaphore: asyncio.Semaphore,
+        snapshot_ready: bool
+    ) -> Tuple[Optional[RemnaWaveUser], int]:
+        remnawave_user = panel_snapshot_service.get_by_uuid(candidate.remnawave_uuid) if snapshot_ready else None
+        if remnawave_user and candidate.balance <= 0:
+            return remnawave_user, 0
         
-        new_expire = (expire_at or now) + timedelta(days=1)
-        await api.update_user(
-            uuid=user.remnawave_uuid,
-            expire_at=new_expire
+        async with semaphore:
+            if not remnawave_user:
+                remnawave_user = await api.get_user_by_uuid(candidate.remnawave_uuid)
+            if not remnawave_user or candidate.balance <= 0:
+                return remnawave_user, 0
+            devices_info = await api.get_user_devices(candidate.remnawave_uuid)
+            return remnawave_user, int(devices_info.get('total', 0) or 0)
+    
+    async def _apply_debits(self, db: AsyncSession, debits: Dict[int, float]) -> List[int]:
+        amount = case(debits, value=User.id)
+        result = await db.execute(
+            update(User)
+            .where(
+                User.id.in_(list(debits.keys())),
+                User.balance >= amount
+            )
+            .values(balance=User.balance - amount)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
         )
-        
-        logger.info(f"Charged user {user.telegram_id}: -{daily_price}₽ ({device_count} devices), expire: {new_expire}")
-        return True
+        return [row[0] for row in result.all()]
     
-    async def _disable_user_if_expired(self, db: AsyncSession, api: RemnaWaveAPI, user: User) -> bool:
-        remnawave_user = await api.get_user_by_uuid(user.remnawave_uuid)
-        if not remnawave_user:
-            return False
-        
-        now = datetime.utcnow()
-        expire_at = remnawave_user.expire_at
-        if expire_at and expire_at.tzinfo:
-            expire_at = expire_at.replace(tzinfo=None)
-        
-        if expire_at and expire_at < now:
+    async def _extend_panel_user(
+        self,
+        api: RemnaWaveAPI,
+        candidate: _BillingCandidate,
+        new_expire: datetime,
+        semaphore: asyncio.Semaphore
+    ) -> None:
+        async with semaphore:
             await api.update_user(
-                uuid=user.remnawave_uuid,
-                status="DISABLED"
+                uuid=candidate.remnawave_uuid,
+                expire_at=new_expire
             )
-            
-            result = await db.execute(
-                select(Subscription).where(Subscription.user_id == user.id)
+    
+    async def _disable_panel_user(
+        self,
+        api: RemnaWaveAPI,
+        candidate: _BillingCandidate,
+        semaphore: asyncio.Semaphore
+    ) -> None:
+        async with semaphore:
+            await api.update_user(
+                uuid=candidate.remnawave_uuid,
+                status=RemnaWaveUserStatus.DISABLED
             )
-            subscription = result.scalar_one_or_none()
-            if subscription:
-                subscription.status = SubscriptionStatus.EXPIRED
-                await db.commit()
-            
-            logger.info(f"Disabled expired subscription for user {user.telegram_id}")
-            return True
-        
-        return False
 
 
 daily_billing_service = DailyBillingService()
@@ -67,6 +67,7 @@ class MaintenanceService:
             return False
         
         try:
+            from app.services.admin_notification_dispatcher import PRIORITY_CRITICAL
             from app.services.admin_notification_service import AdminNotificationService
             
             notification_service = AdminNotificationService(self._bot)
@@ -90,7 +91,7 @@ class MaintenanceService:
                 f"{emoji} <b>ТЕХНИЧЕСКИЕ РАБОТЫ</b>\n\n{message}\n\n⏰ <i>{timestamp}</i>"
             )
             
-            return await notification_service._send_message(formatted_message)
+            return await notification_service._send_message(formatted_message, priority=PRIORITY_CRITICAL)
             
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления через AdminNotificationService: {e}")
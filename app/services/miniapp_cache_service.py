@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import FaqPage, FaqSetting, PrivacyPolicy, PublicOffer, ServiceRule
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTENT_MODELS = (FaqPage, FaqSetting, PrivacyPolicy, PublicOffer, ServiceRule)
+
+
+class MiniAppCacheService:
+    """Кеши мини-приложения.
+
+    Общий контент (FAQ, оферта, политика, правила) хранится под номером версии, который
+    увеличивается при любой записи этих моделей. Данные панели кешируются на пользователя
+    с коротким TTL; устаревшее значение в пределах ``panel_stale_seconds`` отдаётся сразу,
+    а обновление уходит в фон. Статусы платежей кешируются коротко, пока платёж в ожидании,
+    и надолго, когда он завершён.
+    """
+
+    def __init__(self) -> None:
+        self._content_version = 0
+        self._content: Dict[Hashable, Tuple[int, float, Any]] = {}
+        self._user_entries: Dict[int, Dict[Hashable, Tuple[float, Any]]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._payment_statuses: Dict[Hashable, Tuple[float, Any]] = {}
+        self.content_hits = 0
+        self.content_misses = 0
+        self.panel_hits = 0
+        self.panel_stale_hits = 0
+        self.panel_misses = 0
+
+    @property
+    def content_ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'MINIAPP_CONTENT_CACHE_TTL_SECONDS', 600)))
+
+    @property
+    def panel_ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'MINIAPP_PANEL_CACHE_TTL_SECONDS', 30)))
+
+    @property
+    def panel_stale_seconds(self) -> float:
+        return max(self.panel_ttl, float(getattr(settings, 'MINIAPP_PANEL_CACHE_STALE_SECONDS', 300)))
+
+    @property
+    def payment_status_ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'MINIAPP_PAYMENT_STATUS_CACHE_SECONDS', 5)))
+
+    @property
+    def payment_status_final_ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'MINIAPP_PAYMENT_STATUS_FINAL_CACHE_SECONDS', 600)))
+
+    @property
+    def content_version(self) -> int:
+        return self._content_version
+
+    def bump_content_version(self) -> None:
+        self._content_version += 1
+        self._content.clear()
+
+    async def get_content(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._content.get(key)
+        if entry is not None:
+            version, expires_at, value = entry
+            if version == self._content_version and expires_at > time.monotonic():
+                self.content_hits += 1
+                return value
+
+        self.content_misses += 1
+        version = self._content_version
+        value = await self._single_flight(('content', key), loader)
+        # Если контент изменился во время загрузки, значение не сохраняем
+        if version == self._content_version and self.content_ttl:
+            self._content[key] = (version, time.monotonic() + self.content_ttl, value)
+        return value
+
+    async def get_user_value(
+        self,
+        telegram_id: int,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        entries = self._user_entries.get(telegram_id, {})
+        entry = entries.get(key)
+        now = time.monotonic()
+
+        if entry is not None:
+            fetched_at, value = entry
+            age = now - fetched_at
+            if age < self.panel_ttl:
+                self.panel_hits += 1
+                return value
+            if age < self.panel_stale_seconds:
+                self.panel_stale_hits += 1
+                self._revalidate(telegram_id, key, loader)
+                return value
+
+        self.panel_misses += 1
+        return await self._load_user_value(telegram_id, key, loader)
+
+    def get_payment_status(self, key: Hashable) -> Optional[Any]:
+        entry = self._payment_statuses.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._payment_statuses.pop(key, None)
+            return None
+        return value
+
+    def set_payment_status(self, key: Hashable, value: Any, *, final: bool) -> None:
+        ttl = self.payment_status_final_ttl if final else self.payment_status_ttl
+        if not ttl:
+            return
+        now = time.monotonic()
+        self._payment_statuses[key] = (now + ttl, value)
+        if len(self._payment_statuses) > 10_000:
+            self._payment_statuses = {
+                cache_key: entry
+                for cache_key, entry in self._payment_statuses.items()
+                if entry[0] > now
+            }
+
+    def invalidate_user(self, telegram_id: Optional[int]) -> None:
+        if telegram_id is None:
+            return
+        self._user_entries.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._content.clear()
+        self._user_entries.clear()
+        self._payment_statuses.clear()
+
+    async def _load_user_value(
+        self,
+        telegram_id: int,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        value = await self._single_flight(('user', telegram_id, key), loader)
+        if self.panel_ttl:
+            self._user_entries.setdefault(telegram_id, {})[key] = (time.monotonic(), value)
+            if len(self._user_entries) > 10_000:
+                self._prune_user_entries()
+        return value
+
+    def _prune_user_entries(self) -> None:
+        border = time.monotonic() - self.panel_stale_seconds
+        self._user_entries = {
+            telegram_id: entries
+            for telegram_id, entries in self._user_entries.items()
+            if any(fetched_at > border for fetched_at, _ in entries.values())
+        }
+
+    def _revalidate(
+        self,
+        telegram_id: int,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if ('user', telegram_id, key) in self._inflight:
+            return
+        task = asyncio.create_task(self._load_user_value(telegram_id, key, loader))
+        self._background.add(task)
+        task.add_done_callback(self._on_revalidated)
+
+    def _on_revalidated(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Не удалось обновить кеш мини-приложения: %s", task.exception())
+
+    async def _single_flight(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as error:
+            future.set_exception(error)
+            # Ожидающих может не быть, исключение всё равно помечаем как полученное
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+
+miniapp_cache_service = MiniAppCacheService()
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_content_flush(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, CONTENT_MODELS):
+            miniapp_cache_service.bump_content_version()
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_on_content_bulk_write(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, CONTENT_MODELS):
+        miniapp_cache_service.bump_content_version()
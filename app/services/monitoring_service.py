@@ -2,12 +2,12 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple
 
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.enums import ChatMemberStatus
 from aiogram.types import FSInputFile
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -21,8 +21,10 @@ from app.database.crud.discount_offer import (
 from app.database.crud.promo_offer_log import log_promo_offer_action
 from app.database.crud.notification import (
     clear_notification_by_type,
+    get_sent_notification_keys,
     notification_sent,
     record_notification,
+    record_notifications_bulk,
 )
 from app.database.crud.subscription import (
     deactivate_subscription,
@@ -31,6 +33,7 @@ from app.database.crud.subscription import (
     get_expiring_subscriptions,
     get_subscriptions_for_autopay,
 )
+from app.database.crud.ticket_sla import get_due_ticket_reminders, mark_ticket_reminders_sent
 from app.database.crud.user import (
     delete_user,
     get_inactive_users,
@@ -48,13 +51,14 @@ from app.database.models import (
     Subscription,
     User,
     Ticket,
-    TicketStatus,
     UserPromoGroup,
 )
 from app.localization.texts import get_texts
 from app.services.notification_settings_service import NotificationSettingsService
+from app.services.panel_snapshot_service import panel_snapshot_service
 from app.services.payment_service import PaymentService
 from app.services.subscription_service import SubscriptionService
+from app.services.telegram_send_scheduler import telegram_send_scheduler
 from app.services.promo_offer_service import promo_offer_service
 from app.utils.pricing_utils import apply_percentage_discount
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
@@ -70,6 +74,10 @@ logger = logging.getLogger(__name__)
 
 
 LOGO_PATH = Path(settings.LOGO_FILE)
+EXPIRING_NOTIFICATION_BATCH_SIZE = 100
+# Сколько просроченных тикетов попадает в одну проверку SLA и сколько символов в странице сводки
+TICKET_SLA_BATCH_SIZE = 200
+TICKET_SLA_PAGE_LENGTH = 3500
 
 
 class MonitoringService:
@@ -100,12 +108,15 @@ class MonitoringService:
             and (text is None or len(text) <= 1000)
         ):
             try:
-                return await self.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=FSInputFile(LOGO_PATH),
-                    caption=text,
-                    reply_markup=reply_markup,
-                    parse_mode=parse_mode,
+                return await telegram_send_scheduler.send(
+                    chat_id,
+                    lambda: self.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=FSInputFile(LOGO_PATH),
+                        caption=text,
+                        reply_markup=reply_markup,
+                        parse_mode=parse_mode,
+                    ),
                 )
             except TelegramBadRequest as exc:
                 logger.warning(
@@ -115,11 +126,14 @@ class MonitoringService:
                     exc,
                 )
 
-        return await self.bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            reply_markup=reply_markup,
-            parse_mode=parse_mode,
+        return await telegram_send_scheduler.send(
+            chat_id,
+            lambda: self.bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+            ),
         )
 
     @staticmethod
@@ -337,56 +351,71 @@ class MonitoringService:
     
     async def _check_expiring_subscriptions(self, db: AsyncSession):
         try:
-            warning_days = settings.get_autopay_warning_days()
-            all_processed_users = set() 
-            
-            for days in warning_days:
-                expiring_subscriptions = await self._get_expiring_paid_subscriptions(db, days)
-                sent_count = 0
-                
-                for subscription in expiring_subscriptions:
-                    user = await get_user_by_id(db, subscription.user_id)
-                    if not user:
-                        continue
-
-                    user_key = f"user_{user.telegram_id}_today"
-
-                    if (await notification_sent(db, user.id, subscription.id, "expiring", days) or
-                        user_key in all_processed_users):
-                        logger.debug(f"🔄 Пропускаем дублирование для пользователя {user.telegram_id} на {days} дней")
-                        continue
-
-                    should_send = True
-                    for other_days in warning_days:
-                        if other_days < days:
-                            other_subs = await self._get_expiring_paid_subscriptions(db, other_days)
-                            if any(s.user_id == user.id for s in other_subs):
-                                should_send = False
-                                logger.debug(f"🎯 Пропускаем уведомление на {days} дней для пользователя {user.telegram_id}, есть более срочное на {other_days} дней")
-                                break
-
-                    if not should_send:
-                        continue
+            warning_days = sorted(set(settings.get_autopay_warning_days()))
+            if not warning_days or not self.bot:
+                return
 
-                    if self.bot:
-                        success = await self._send_subscription_expiring_notification(user, subscription, days)
-                        if success:
-                            await record_notification(db, user.id, subscription.id, "expiring", days)
-                            all_processed_users.add(user_key)
-                            sent_count += 1
-                            logger.info(f"✅ Пользователю {user.telegram_id} отправлено уведомление об истечении подписки через {days} дней")
-                        else:
-                            logger.warning(f"❌ Не удалось отправить уведомление пользователю {user.telegram_id}")
-                
+            candidates = await self._get_expiring_paid_subscriptions(db, warning_days)
+            if not candidates:
+                return
+
+            sent_keys = await get_sent_notification_keys(
+                db,
+                (subscription.user_id for subscription, _ in candidates),
+                {self._expiring_notification_type(subscription.id, days) for subscription, days in candidates},
+            )
+
+            pending = []
+            for subscription, days in candidates:
+                notification_type = self._expiring_notification_type(subscription.id, days)
+                if (subscription.user_id, notification_type) in sent_keys:
+                    logger.debug(
+                        f"🔄 Пропускаем дублирование для пользователя {subscription.user.telegram_id} на {days} дней"
+                    )
+                    continue
+                pending.append((subscription, days, notification_type))
+
+            records = []
+            sent_by_days: Dict[int, int] = {}
+            batch_size = EXPIRING_NOTIFICATION_BATCH_SIZE
+            for offset in range(0, len(pending), batch_size):
+                batch = pending[offset:offset + batch_size]
+                results = await asyncio.gather(
+                    *(
+                        self._send_subscription_expiring_notification(subscription.user, subscription, days)
+                        for subscription, days, _ in batch
+                    ),
+                    return_exceptions=True,
+                )
+                for (subscription, days, notification_type), success in zip(batch, results):
+                    if success is True:
+                        records.append((subscription.user_id, notification_type))
+                        sent_by_days[days] = sent_by_days.get(days, 0) + 1
+                        logger.info(
+                            f"✅ Пользователю {subscription.user.telegram_id} отправлено уведомление об истечении подписки через {days} дней"
+                        )
+                    else:
+                        logger.warning(
+                            f"❌ Не удалось отправить уведомление пользователю {subscription.user.telegram_id}"
+                        )
+
+            await record_notifications_bulk(db, records)
+
+            for days in warning_days:
+                sent_count = sent_by_days.get(days, 0)
                 if sent_count > 0:
                     await self._log_monitoring_event(
                         db, "expiring_notifications_sent",
                         f"Отправлено {sent_count} уведомлений об истечении через {days} дней",
                         {"days": days, "count": sent_count}
                     )
-                    
+
         except Exception as e:
             logger.error(f"Ошибка проверки истекающих подписок: {e}")
+
+    @staticmethod
+    def _expiring_notification_type(subscription_id: int, days: int) -> str:
+        return f"expiring_{days}d:{subscription_id}"
     
     async def _check_trial_expiring_soon(self, db: AsyncSession):
         try:
@@ -801,12 +830,26 @@ class MonitoringService:
         except Exception as e:
             logger.error(f"Ошибка проверки напоминаний об истекшей подписке: {e}")
 
-    async def _get_expiring_paid_subscriptions(self, db: AsyncSession, days_before: int) -> List[Subscription]:
+    async def _get_expiring_paid_subscriptions(
+        self,
+        db: AsyncSession,
+        warning_days: List[int],
+    ) -> List[Tuple[Subscription, int]]:
+        """Платные подписки, истекающие в окне предупреждений, с самым срочным порогом для каждой."""
         current_time = datetime.utcnow()
-        threshold_date = current_time + timedelta(days=days_before)
-        
+        warning_days = sorted(set(warning_days))
+        threshold_date = current_time + timedelta(days=warning_days[-1])
+
+        bucket = case(
+            *[
+                (Subscription.end_date <= current_time + timedelta(days=days), days)
+                for days in warning_days
+            ],
+            else_=warning_days[-1],
+        ).label("warning_days")
+
         result = await db.execute(
-            select(Subscription)
+            select(Subscription, bucket)
             .options(selectinload(Subscription.user))
             .where(
                 and_(
@@ -816,16 +859,24 @@ class MonitoringService:
                     Subscription.end_date <= threshold_date
                 )
             )
+            .order_by(Subscription.user_id, bucket)
         )
-        
-        logger.debug(f"🔍 Поиск платных подписок, истекающих в ближайшие {days_before} дней")
+
+        logger.debug(f"🔍 Поиск платных подписок, истекающих в ближайшие {warning_days[-1]} дней")
         logger.debug(f"📅 Текущее время: {current_time}")
         logger.debug(f"📅 Пороговая дата: {threshold_date}")
-        
-        subscriptions = result.scalars().all()
-        logger.info(f"📊 Найдено {len(subscriptions)} платных подписок для уведомлений")
-        
-        return subscriptions
+
+        candidates: List[Tuple[Subscription, int]] = []
+        seen_users: Set[int] = set()
+        for subscription, days in result.all():
+            if subscription.user is None or subscription.user_id in seen_users:
+                continue
+            seen_users.add(subscription.user_id)
+            candidates.append((subscription, days))
+
+        logger.info(f"📊 Найдено {len(candidates)} платных подписок для уведомлений")
+
+        return candidates
     
     @staticmethod
     def _get_user_promo_offer_discount_percent(user: Optional[User]) -> int:
@@ -1572,11 +1623,17 @@ class MonitoringService:
 
             async with self.subscription_service.get_api_client() as api:
                 system_stats = await api.get_system_stats()
+                await panel_snapshot_service.refresh(api)
+                snapshot_status = panel_snapshot_service.get_status()
                 
                 await self._log_monitoring_event(
                     db, "remnawave_sync",
                     "Синхронизация с RemnaWave завершена",
-                    {"stats": system_stats}
+                    {
+                        "stats": system_stats,
+                        "snapshot_users": snapshot_status.users_count,
+                        "snapshot_generation": snapshot_status.generation,
+                    }
                 )
                 
         except Exception as e:
@@ -1604,80 +1661,78 @@ class MonitoringService:
             if not settings.is_admin_notifications_enabled():
                 return
 
-            from datetime import datetime, timedelta
-            try:
-                from app.services.support_settings_service import SupportSettingsService
-                sla_minutes = max(1, int(SupportSettingsService.get_sla_minutes()))
-            except Exception:
-                sla_minutes = max(1, int(getattr(settings, 'SUPPORT_TICKET_SLA_MINUTES', 5)))
             cooldown_minutes = max(1, int(getattr(settings, 'SUPPORT_TICKET_SLA_REMINDER_COOLDOWN_MINUTES', 15)))
             now = datetime.utcnow()
-            stale_before = now - timedelta(minutes=sla_minutes)
-            cooldown_before = now - timedelta(minutes=cooldown_minutes)
 
-            # Tickets to remind: open, no admin reply yet after user's last message (status OPEN), stale by SLA,
-            # and either never reminded or cooldown passed
-            result = await db.execute(
-                select(Ticket)
-                .options(selectinload(Ticket.user))
-                .where(
-                    and_(
-                        Ticket.status == TicketStatus.OPEN.value,
-                        Ticket.updated_at <= stale_before,
-                        or_(Ticket.last_sla_reminder_at.is_(None), Ticket.last_sla_reminder_at <= cooldown_before),
-                    )
-                )
-            )
-            tickets = result.scalars().all()
-            if not tickets:
+            # Читаем только тикеты, у которых подошёл срок в очереди SLA
+            due = await get_due_ticket_reminders(db, now, TICKET_SLA_BATCH_SIZE)
+            if not due:
                 return
 
             from app.services.admin_notification_service import AdminNotificationService
 
-            reminders_sent = 0
             service = AdminNotificationService(self.bot)
+            pages = self._build_ticket_sla_pages(due, now)
+            reminded_ids: List[int] = []
 
-            for ticket in tickets:
+            for page_number, (page_text, page_ticket_ids) in enumerate(pages, start=1):
+                header = f"⏰ <b>Ожидание ответа на тикеты превышено</b>: {len(due)}"
+                if len(pages) > 1:
+                    header += f" (стр. {page_number}/{len(pages)})"
                 try:
-                    waited_minutes = max(0, int((now - ticket.updated_at).total_seconds() // 60))
-                    title = (ticket.title or '').strip()
-                    if len(title) > 60:
-                        title = title[:57] + '...'
-
-                    # Детали пользователя: имя, Telegram ID и username
-                    full_name = ticket.user.full_name if ticket.user else "Unknown"
-                    telegram_id_display = ticket.user.telegram_id if ticket.user else "—"
-                    username_display = (ticket.user.username or "отсутствует") if ticket.user else "отсутствует"
-
-                    text = (
-                        f"⏰ <b>Ожидание ответа на тикет превышено</b>\n\n"
-                        f"🆔 <b>ID:</b> <code>{ticket.id}</code>\n"
-                        f"👤 <b>Пользователь:</b> {full_name}\n"
-                        f"🆔 <b>Telegram ID:</b> <code>{telegram_id_display}</code>\n"
-                        f"📱 <b>Username:</b> @{username_display}\n"
-                        f"📝 <b>Заголовок:</b> {title or '—'}\n"
-                        f"⏱️ <b>Ожидает ответа:</b> {waited_minutes} мин\n"
-                    )
-
-                    sent = await service.send_ticket_event_notification(text)
-                    if sent:
-                        ticket.last_sla_reminder_at = now
-                        reminders_sent += 1
-                        # commit after each to persist timestamp and avoid duplicate reminders on crash
-                        await db.commit()
+                    if await service.send_ticket_event_notification(f"{header}\n\n{page_text}"):
+                        reminded_ids.extend(page_ticket_ids)
                 except Exception as notify_error:
-                    logger.error(f"Ошибка отправки SLA-уведомления по тикету {ticket.id}: {notify_error}")
+                    logger.error(f"Ошибка отправки сводки SLA по тикетам: {notify_error}")
 
-            if reminders_sent > 0:
+            if reminded_ids:
+                await mark_ticket_reminders_sent(db, reminded_ids, now, cooldown_minutes)
                 await self._log_monitoring_event(
                     db,
                     "ticket_sla_reminders_sent",
-                    f"Отправлено {reminders_sent} SLA-напоминаний по тикетам",
-                    {"count": reminders_sent},
+                    f"Отправлено {len(reminded_ids)} SLA-напоминаний по тикетам",
+                    {"count": len(reminded_ids)},
                 )
         except Exception as e:
             logger.error(f"Ошибка проверки SLA тикетов: {e}")
 
+    @staticmethod
+    def _build_ticket_sla_pages(
+        due: List[Tuple[Ticket, datetime]],
+        now: datetime,
+    ) -> List[Tuple[str, List[int]]]:
+        pages: List[Tuple[str, List[int]]] = []
+        lines: List[str] = []
+        ticket_ids: List[int] = []
+        length = 0
+
+        for ticket, waiting_since in due:
+            waited_minutes = max(0, int((now - waiting_since).total_seconds() // 60))
+            title = (ticket.title or '').strip()
+            if len(title) > 60:
+                title = title[:57] + '...'
+
+            # Детали пользователя: имя, Telegram ID и username
+            full_name = ticket.user.full_name if ticket.user else "Unknown"
+            telegram_id_display = ticket.user.telegram_id if ticket.user else "—"
+            username_display = (ticket.user.username or "отсутствует") if ticket.user else "отсутствует"
+
+            line = (
+                f"🆔 <code>{ticket.id}</code> · ⏱️ {waited_minutes} мин\n"
+                f"👤 {full_name} (<code>{telegram_id_display}</code>, @{username_display})\n"
+                f"📝 {title or '—'}"
+            )
+            if lines and length + len(line) + 2 > TICKET_SLA_PAGE_LENGTH:
+                pages.append(("\n\n".join(lines), ticket_ids))
+                lines, ticket_ids, length = [], [], 0
+            lines.append(line)
+            ticket_ids.append(ticket.id)
+            length += len(line) + 2
+
+        if lines:
+            pages.append(("\n\n".join(lines), ticket_ids))
+        return pages
+
     async def _sla_loop(self):
         try:
             interval_seconds = max(10, int(getattr(settings, 'SUPPORT_TICKET_SLA_CHECK_INTERVAL_SECONDS', 60)))
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.external import remnawave_api as external_remnawave_api
+from app.external.remnawave_api import RemnaWaveUser
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PanelSnapshotStatus:
+    generation: int
+    revision: int
+    users_count: int
+    refreshed_at: Optional[datetime]
+    age_seconds: Optional[float]
+    ttl_seconds: int
+    is_fresh: bool
+    is_refreshing: bool
+    last_refresh_duration: Optional[float]
+    last_error: Optional[str]
+
+
+def panel_user_to_dict(user: RemnaWaveUser) -> Dict[str, Any]:
+    return {
+        'uuid': user.uuid,
+        'shortUuid': user.short_uuid,
+        'username': user.username,
+        'status': user.status.value,
+        'telegramId': user.telegram_id,
+        'description': user.description,
+        'expireAt': user.expire_at.isoformat() + 'Z',
+        'trafficLimitBytes': user.traffic_limit_bytes,
+        'usedTrafficBytes': user.used_traffic_bytes,
+        'hwidDeviceLimit': user.hwid_device_limit,
+        'subscriptionUrl': user.subscription_url,
+        'subscriptionCryptoLink': user.happ_crypto_link,
+        'activeInternalSquads': user.active_internal_squads,
+        'updatedAt': user.updated_at.isoformat() + 'Z' if user.updated_at else None,
+    }
+
+
+class PanelSnapshotService:
+    """Снимок всех пользователей панели RemnaWave, проиндексированный по uuid, short_uuid и telegram_id.
+
+    Снимок строится постраничным обходом ``get_all_users`` и живёт ``ttl_seconds``.
+    Каждая полная перестройка увеличивает ``generation``, а точечные изменения,
+    пришедшие через ``update_user``/``create_user``/``delete_user``, увеличивают ``revision``.
+    """
+
+    def __init__(self) -> None:
+        self._users_by_uuid: Dict[str, RemnaWaveUser] = {}
+        self._uuid_by_short_uuid: Dict[str, str] = {}
+        self._uuids_by_telegram_id: Dict[int, List[str]] = {}
+
+        self._generation = 0
+        self._revision = 0
+        self._refreshed_at: Optional[datetime] = None
+        self._refreshed_monotonic: Optional[float] = None
+        self._last_refresh_duration: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+        self._refresh_lock = asyncio.Lock()
+        self._is_refreshing = False
+        self._pending_changes: Dict[str, Optional[RemnaWaveUser]] = {}
+
+    @property
+    def ttl_seconds(self) -> int:
+        return max(0, int(getattr(settings, 'REMNAWAVE_SNAPSHOT_TTL_SECONDS', 300)))
+
+    @property
+    def page_size(self) -> int:
+        return max(1, int(getattr(settings, 'REMNAWAVE_SNAPSHOT_PAGE_SIZE', 500)))
+
+    @property
+    def page_concurrency(self) -> int:
+        return max(1, int(getattr(settings, 'REMNAWAVE_SNAPSHOT_PAGE_CONCURRENCY', 4)))
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._refreshed_monotonic is not None
+
+    def is_fresh(self) -> bool:
+        if self._refreshed_monotonic is None:
+            return False
+        return (time.monotonic() - self._refreshed_monotonic) < self.ttl_seconds
+
+    def get_status(self) -> PanelSnapshotStatus:
+        age = None
+        if self._refreshed_monotonic is not None:
+            age = round(time.monotonic() - self._refreshed_monotonic, 3)
+        return PanelSnapshotStatus(
+            generation=self._generation,
+            revision=self._revision,
+            users_count=len(self._users_by_uuid),
+            refreshed_at=self._refreshed_at,
+            age_seconds=age,
+            ttl_seconds=self.ttl_seconds,
+            is_fresh=self.is_fresh(),
+            is_refreshing=self._is_refreshing,
+            last_refresh_duration=self._last_refresh_duration,
+            last_error=self._last_error,
+        )
+
+    def get_by_uuid(self, uuid: Optional[str]) -> Optional[RemnaWaveUser]:
+        if not uuid:
+            return None
+        return self._users_by_uuid.get(uuid)
+
+    def get_by_short_uuid(self, short_uuid: Optional[str]) -> Optional[RemnaWaveUser]:
+        if not short_uuid:
+            return None
+        uuid = self._uuid_by_short_uuid.get(short_uuid)
+        return self._users_by_uuid.get(uuid) if uuid else None
+
+    def get_by_telegram_id(self, telegram_id: Optional[int]) -> List[RemnaWaveUser]:
+        if telegram_id is None:
+            return []
+        uuids = self._uuids_by_telegram_id.get(int(telegram_id), [])
+        return [self._users_by_uuid[uuid] for uuid in uuids if uuid in self._users_by_uuid]
+
+    def iter_users(self) -> List[RemnaWaveUser]:
+        return list(self._users_by_uuid.values())
+
+    async def ensure_fresh(self, api) -> bool:
+        if self.is_fresh():
+            return True
+        return await self.refresh(api, force=False)
+
+    async def refresh(self, api, force: bool = True) -> bool:
+        generation_before = self._generation
+        async with self._refresh_lock:
+            if self._generation != generation_before and self.is_fresh():
+                return True
+            if not force and self.is_fresh():
+                return True
+
+            self._is_refreshing = True
+            self._pending_changes = {}
+            started = time.monotonic()
+            try:
+                users = await self._fetch_all_users(api)
+
+                users_by_uuid: Dict[str, RemnaWaveUser] = {}
+                uuid_by_short_uuid: Dict[str, str] = {}
+                uuids_by_telegram_id: Dict[int, List[str]] = {}
+                for user in users:
+                    self._index_user(user, users_by_uuid, uuid_by_short_uuid, uuids_by_telegram_id)
+
+                self._users_by_uuid = users_by_uuid
+                self._uuid_by_short_uuid = uuid_by_short_uuid
+                self._uuids_by_telegram_id = uuids_by_telegram_id
+
+                for uuid, user in self._pending_changes.items():
+                    self._apply_change(uuid, user)
+
+                self._generation += 1
+                self._refreshed_at = datetime.utcnow()
+                self._refreshed_monotonic = time.monotonic()
+                self._last_refresh_duration = round(time.monotonic() - started, 3)
+                self._last_error = None
+
+                logger.info(
+                    "📸 Снимок панели обновлен: %s пользователей за %.2fс (поколение %s)",
+                    len(users_by_uuid),
+                    self._last_refresh_duration,
+                    self._generation,
+                )
+                return True
+            except Exception as error:
+                self._last_error = str(error)
+                logger.error("❌ Не удалось обновить снимок панели: %s", error)
+                return False
+            finally:
+                self._pending_changes = {}
+                self._is_refreshing = False
+
+    def invalidate(self) -> None:
+        self._refreshed_monotonic = None
+
+    def on_user_changed(self, uuid: str, user: Optional[RemnaWaveUser]) -> None:
+        if not uuid:
+            return
+        if self._is_refreshing:
+            self._pending_changes[uuid] = user
+        if self.is_loaded:
+            self._apply_change(uuid, user)
+
+    async def _fetch_all_users(self, api) -> List[RemnaWaveUser]:
+        size = self.page_size
+        first_page = await api.get_all_users(start=0, size=size)
+        users: List[RemnaWaveUser] = list(first_page['users'])
+        total = int(first_page.get('total') or 0)
+
+        if len(first_page['users']) < size or total <= size:
+            return users
+
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+
+        async def fetch_page(start: int) -> List[RemnaWaveUser]:
+            async with semaphore:
+                response = await api.get_all_users(start=start, size=size)
+                return response['users']
+
+        pages = await asyncio.gather(*(
+            fetch_page(start) for start in range(size, total, size)
+        ))
+        for page in pages:
+            users.extend(page)
+        return users
+
+    def _apply_change(self, uuid: str, user: Optional[RemnaWaveUser]) -> None:
+        self._remove_user(uuid)
+        if user is not None:
+            self._index_user(
+                user,
+                self._users_by_uuid,
+                self._uuid_by_short_uuid,
+                self._uuids_by_telegram_id,
+            )
+        self._revision += 1
+
+    def _remove_user(self, uuid: str) -> None:
+        existing = self._users_by_uuid.pop(uuid, None)
+        if not existing:
+            return
+        if existing.short_uuid and self._uuid_by_short_uuid.get(existing.short_uuid) == uuid:
+            self._uuid_by_short_uuid.pop(existing.short_uuid, None)
+        if existing.telegram_id is not None:
+            telegram_id = int(existing.telegram_id)
+            uuids = self._uuids_by_telegram_id.get(telegram_id)
+            if uuids and uuid in uuids:
+                uuids.remove(uuid)
+                if not uuids:
+                    self._uuids_by_telegram_id.pop(telegram_id, None)
+
+    @staticmethod
+    def _index_user(
+        user: RemnaWaveUser,
+        users_by_uuid: Dict[str, RemnaWaveUser],
+        uuid_by_short_uuid: Dict[str, str],
+        uuids_by_telegram_id: Dict[int, List[str]],
+    ) -> None:
+        if not user.uuid:
+            return
+        users_by_uuid[user.uuid] = user
+        if user.short_uuid:
+            uuid_by_short_uuid[user.short_uuid] = user.uuid
+        if user.telegram_id is not None:
+            uuids = uuids_by_telegram_id.setdefault(int(user.telegram_id), [])
+            if user.uuid not in uuids:
+                uuids.append(user.uuid)
+
+
+panel_snapshot_service = PanelSnapshotService()
+
+external_remnawave_api.add_user_change_listener(panel_snapshot_service.on_user_changed)
@@ -5,14 +5,14 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
-from collections import Counter
-from dataclasses import dataclass
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy import desc, select
+from sqlalchemy import Integer, String, case, cast, desc, func, literal, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal
@@ -24,7 +24,6 @@ from app.database.models import (
     PlategaPayment,
     PaymentMethod,
     Transaction,
-    TransactionType,
     User,
     WataPayment,
     YooKassaPayment,
@@ -34,6 +33,37 @@ logger = logging.getLogger(__name__)
 
 
 PENDING_MAX_AGE = timedelta(hours=24)
+LATENCY_WINDOW = 200
+MIN_POLL_INTERVAL = 10.0
+
+
+PAYMENT_MODELS: Dict[PaymentMethod, Any] = {
+    PaymentMethod.YOOKASSA: YooKassaPayment,
+    PaymentMethod.PAL24: Pal24Payment,
+    PaymentMethod.MULENPAY: MulenPayPayment,
+    PaymentMethod.WATA: WataPayment,
+    PaymentMethod.PLATEGA: PlategaPayment,
+    PaymentMethod.HELEKET: HeleketPayment,
+    PaymentMethod.CRYPTOBOT: CryptoBotPayment,
+}
+
+
+# Lower-cased statuses in which a payment can still be paid
+PENDING_PAYMENT_STATUSES: Dict[PaymentMethod, frozenset[str]] = {
+    PaymentMethod.PAL24: frozenset({"new", "process"}),
+    PaymentMethod.MULENPAY: frozenset({"created", "processing", "hold"}),
+    PaymentMethod.PLATEGA: frozenset({"pending", "inprogress", "in_progress"}),
+    PaymentMethod.YOOKASSA: frozenset({"pending", "waiting_for_capture"}),
+    # Paid CryptoBot invoices stay listed; auto checks skip them via is_paid
+    PaymentMethod.CRYPTOBOT: frozenset({"active", "paid"}),
+}
+
+
+# For these providers every status except the final ones is pending
+FINAL_PAYMENT_STATUSES: Dict[PaymentMethod, frozenset[str]] = {
+    PaymentMethod.WATA: frozenset({"paid", "closed", "declined", "canceled", "cancelled", "expired"}),
+    PaymentMethod.HELEKET: frozenset({"paid", "paid_over", "cancel", "canceled", "failed", "fail", "expired"}),
+}
 
 
 @dataclass(slots=True)
@@ -55,6 +85,20 @@ class PendingPayment:
         return (datetime.utcnow() - self.created_at) <= max_age
 
 
+@dataclass(slots=True)
+class PendingPaymentRef:
+    """Row of the combined pending payments query, without ORM objects."""
+
+    method: PaymentMethod
+    local_id: int
+    user_id: int
+    identifier: str
+    amount_kopeks: int
+    status: str
+    is_paid: bool
+    created_at: datetime
+
+
 SUPPORTED_MANUAL_CHECK_METHODS: frozenset[PaymentMethod] = frozenset(
     {
         PaymentMethod.YOOKASSA,
@@ -126,12 +170,87 @@ def get_enabled_auto_methods() -> List[PaymentMethod]:
     ]
 
 
+@dataclass(frozen=True)
+class ProviderCheckStats:
+    backlog: int
+    due: int
+    in_flight: int
+    checked_total: int
+    changed_total: int
+    timeouts_total: int
+    errors_total: int
+    avg_latency: Optional[float]
+    p95_latency: Optional[float]
+    last_run_at: Optional[datetime]
+    last_run_duration: Optional[float]
+
+
+@dataclass
+class _ProviderState:
+    backlog: int = 0
+    due: int = 0
+    in_flight: int = 0
+    checked_total: int = 0
+    changed_total: int = 0
+    timeouts_total: int = 0
+    errors_total: int = 0
+    last_run_at: Optional[datetime] = None
+    last_run_duration: Optional[float] = None
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def snapshot(self) -> ProviderCheckStats:
+        avg_latency = p95_latency = None
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            avg_latency = round(sum(ordered) / len(ordered), 3)
+            p95_latency = round(ordered[int(round(0.95 * (len(ordered) - 1)))], 3)
+        return ProviderCheckStats(
+            backlog=self.backlog,
+            due=self.due,
+            in_flight=self.in_flight,
+            checked_total=self.checked_total,
+            changed_total=self.changed_total,
+            timeouts_total=self.timeouts_total,
+            errors_total=self.errors_total,
+            avg_latency=avg_latency,
+            p95_latency=p95_latency,
+            last_run_at=self.last_run_at,
+            last_run_duration=self.last_run_duration,
+        )
+
+
+def _provider_setting(name: str, method: PaymentMethod, default: float) -> float:
+    """Read a ``"3,pal24=2"`` style setting: a default value plus per-provider overrides."""
+
+    value = default
+    for chunk in str(getattr(settings, name, "") or "").split(","):
+        key, separator, raw_value = chunk.strip().rpartition("=")
+        try:
+            parsed = float(raw_value)
+        except ValueError:
+            continue
+        if not separator:
+            value = parsed
+        elif key.strip().lower() == method.value:
+            return parsed
+    return value
+
+
 class AutoPaymentVerificationService:
-    """Background checker that periodically refreshes pending payments."""
+    """Background checker that periodically refreshes pending payments.
+
+    Pending payments of all providers are selected with one query, then every provider
+    is checked in its own pool with its own concurrency limit and timeout, so a slow
+    provider does not hold back the others. Fresh payments are polled more often than
+    old ones according to ``PAYMENT_VERIFICATION_AGE_TIERS``.
+    """
 
     def __init__(self) -> None:
         self._task: Optional[asyncio.Task[None]] = None
         self._payment_service: Optional["PaymentService"] = None
+        self._provider_tasks: Dict[PaymentMethod, asyncio.Task[None]] = {}
+        self._last_checked: Dict[Tuple[PaymentMethod, int], float] = {}
+        self._providers: Dict[PaymentMethod, _ProviderState] = {}
 
     def set_payment_service(self, payment_service: "PaymentService") -> None:
         self._payment_service = payment_service
@@ -139,6 +258,43 @@ class AutoPaymentVerificationService:
     def is_running(self) -> bool:
         return self._task is not None and not self._task.done()
 
+    @property
+    def base_interval(self) -> float:
+        return max(1, settings.get_payment_verification_auto_check_interval()) * 60.0
+
+    @property
+    def age_tiers(self) -> List[Tuple[float, float]]:
+        """(max age, poll interval) pairs in seconds, ordered by age."""
+
+        tiers: List[Tuple[float, float]] = []
+        for chunk in str(getattr(settings, "PAYMENT_VERIFICATION_AGE_TIERS", "") or "").split(","):
+            age, separator, interval = chunk.strip().partition(":")
+            if not separator:
+                continue
+            try:
+                tiers.append((float(age) * 60, max(MIN_POLL_INTERVAL, float(interval) * 60)))
+            except ValueError:
+                logger.warning("Некорректная ступень PAYMENT_VERIFICATION_AGE_TIERS: %s", chunk)
+        return sorted(tiers)
+
+    def interval_for_age(self, age_seconds: float) -> float:
+        for max_age, interval in self.age_tiers:
+            if age_seconds < max_age:
+                return interval
+        return self.base_interval
+
+    def tick_interval(self) -> float:
+        return min([interval for _, interval in self.age_tiers] + [self.base_interval])
+
+    def provider_concurrency(self, method: PaymentMethod) -> int:
+        return max(1, int(_provider_setting("PAYMENT_VERIFICATION_PROVIDER_CONCURRENCY", method, 3)))
+
+    def provider_timeout(self, method: PaymentMethod) -> float:
+        return max(1.0, _provider_setting("PAYMENT_VERIFICATION_CHECK_TIMEOUT_SECONDS", method, 30))
+
+    def get_stats(self) -> Dict[PaymentMethod, ProviderCheckStats]:
+        return {method: state.snapshot() for method, state in self._providers.items()}
+
     async def start(self) -> None:
         await self.stop()
 
@@ -166,7 +322,7 @@ class AutoPaymentVerificationService:
 
         self._task = asyncio.create_task(self._auto_check_loop())
         logger.info(
-            "🔄 Автопроверка пополнений запущена (каждые %s мин) для: %s",
+            "🔄 Автопроверка пополнений запущена (каждые %s мин, свежие платежи чаще) для: %s",
             interval_minutes,
             display_names,
         )
@@ -180,10 +336,16 @@ class AutoPaymentVerificationService:
                 pass
         self._task = None
 
+        provider_tasks = list(self._provider_tasks.values())
+        self._provider_tasks.clear()
+        for task in provider_tasks:
+            task.cancel()
+        if provider_tasks:
+            await asyncio.gather(*provider_tasks, return_exceptions=True)
+
     async def _auto_check_loop(self) -> None:
         try:
             while True:
-                interval_minutes = settings.get_payment_verification_auto_check_interval()
                 try:
                     if (
                         settings.is_payment_verification_auto_check_enabled()
@@ -209,7 +371,7 @@ class AutoPaymentVerificationService:
                         exc_info=True,
                     )
 
-                await asyncio.sleep(max(1, interval_minutes) * 60)
+                await asyncio.sleep(self.tick_interval())
         except asyncio.CancelledError:
             logger.info("Автопроверка пополнений остановлена")
             raise
@@ -218,138 +380,173 @@ class AutoPaymentVerificationService:
         if not self._payment_service:
             return
 
+        cutoff = datetime.utcnow() - PENDING_MAX_AGE
         async with AsyncSessionLocal() as session:
-            try:
-                pending = await list_recent_pending_payments(session)
-                candidates = [
-                    record
-                    for record in pending
-                    if record.method in methods and not record.is_paid
-                ]
-
-                if not candidates:
-                    logger.debug(
-                        "Автопроверка пополнений: подходящих ожидающих платежей нет"
-                    )
-                    return
-
-                counts = Counter(record.method for record in candidates)
-                summary = ", ".join(
-                    f"{method_display_name(method)}: {count}"
-                    for method, count in sorted(
-                        counts.items(), key=lambda item: method_display_name(item[0])
-                    )
+            refs = await fetch_pending_payment_refs(session, cutoff, methods=methods)
+
+        candidates = [ref for ref in refs if not ref.is_paid]
+        active_keys = {(ref.method, ref.local_id) for ref in candidates}
+        self._last_checked = {
+            key: checked_at
+            for key, checked_at in self._last_checked.items()
+            if key in active_keys
+        }
+
+        now = time.monotonic()
+        now_utc = datetime.utcnow()
+        backlog = Counter(ref.method for ref in candidates)
+        due_by_method: Dict[PaymentMethod, List[PendingPaymentRef]] = {}
+        for ref in candidates:
+            if self._is_due(ref, now, now_utc):
+                due_by_method.setdefault(ref.method, []).append(ref)
+
+        scheduled: Dict[PaymentMethod, int] = {}
+        for method in methods:
+            state = self._providers.setdefault(method, _ProviderState())
+            state.backlog = backlog.get(method, 0)
+            due = due_by_method.get(method, [])
+            state.due = len(due)
+            if not due:
+                continue
+
+            running = self._provider_tasks.get(method)
+            if running is not None and not running.done():
+                logger.debug(
+                    "Автопроверка пополнений: %s ещё проверяет предыдущую партию",
+                    method_display_name(method),
                 )
-                logger.info(
-                    "🔄 Автопроверка пополнений: найдено %s инвойсов (%s)",
-                    len(candidates),
-                    summary,
-                )
-
-                for record in candidates:
-                    refreshed = await run_manual_check(
-                        session,
-                        record.method,
-                        record.local_id,
-                        self._payment_service,
-                    )
-
-                    if not refreshed:
-                        logger.debug(
-                            "Автопроверка пополнений: не удалось обновить %s %s",
-                            method_display_name(record.method),
-                            record.identifier,
-                        )
-                        continue
-
-                    if refreshed.is_paid and not record.is_paid:
-                        logger.info(
-                            "✅ %s %s отмечен как оплаченный после автопроверки",
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                        )
-                    elif refreshed.status != record.status:
-                        logger.info(
-                            "ℹ️ %s %s обновлён: %s → %s",
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                            record.status or "—",
-                            refreshed.status or "—",
-                        )
-                    else:
-                        logger.debug(
-                            "Автопроверка пополнений: %s %s без изменений (%s)",
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                            refreshed.status or "—",
-                        )
-
-                if session.in_transaction():
-                    await session.commit()
-            except Exception:
-                if session.in_transaction():
-                    await session.rollback()
-                raise
+                continue
 
+            for ref in due:
+                self._last_checked[(ref.method, ref.local_id)] = now
+            self._provider_tasks[method] = asyncio.create_task(
+                self._check_provider(method, due),
+                name=f"payment-verification-{method.value}",
+            )
+            scheduled[method] = len(due)
 
-auto_payment_verification_service = AutoPaymentVerificationService()
-
-def _is_pal24_pending(payment: Pal24Payment) -> bool:
-    if payment.is_paid:
-        return False
-    status = (payment.status or "").upper()
-    return status in {"NEW", "PROCESS"}
-
-
-def _is_mulenpay_pending(payment: MulenPayPayment) -> bool:
-    if payment.is_paid:
-        return False
-    status = (payment.status or "").lower()
-    return status in {"created", "processing", "hold"}
-
-
-def _is_wata_pending(payment: WataPayment) -> bool:
-    if payment.is_paid:
-        return False
-    status = (payment.status or "").lower()
-    return status not in {
-        "paid",
-        "closed",
-        "declined",
-        "canceled",
-        "cancelled",
-        "expired",
-    }
+        if not scheduled:
+            logger.debug(
+                "Автопроверка пополнений: подходящих ожидающих платежей нет"
+            )
+            return
 
+        summary = ", ".join(
+            f"{method_display_name(method)}: {count}/{backlog[method]}"
+            for method, count in sorted(
+                scheduled.items(), key=lambda item: method_display_name(item[0])
+            )
+        )
+        logger.info(
+            "🔄 Автопроверка пополнений: к проверке %s из %s инвойсов (%s)",
+            sum(scheduled.values()),
+            len(candidates),
+            summary,
+        )
 
-def _is_platega_pending(payment: PlategaPayment) -> bool:
-    if payment.is_paid:
-        return False
-    status = (payment.status or "").lower()
-    return status in {"pending", "inprogress", "in_progress"}
+    def _is_due(self, ref: PendingPaymentRef, now: float, now_utc: datetime) -> bool:
+        checked_at = self._last_checked.get((ref.method, ref.local_id))
+        if checked_at is None:
+            return True
+        age = max(0.0, (now_utc - ref.created_at).total_seconds())
+        # Небольшой запас, чтобы дрожание тиков не сдвигало проверку на целый тик
+        return now - checked_at >= self.interval_for_age(age) - 1
 
+    async def _check_provider(self, method: PaymentMethod, refs: List[PendingPaymentRef]) -> None:
+        state = self._providers.setdefault(method, _ProviderState())
+        semaphore = asyncio.Semaphore(self.provider_concurrency(method))
+        timeout = self.provider_timeout(method)
+        started = time.monotonic()
 
-def _is_heleket_pending(payment: HeleketPayment) -> bool:
-    if payment.is_paid:
-        return False
-    status = (payment.status or "").lower()
-    return status not in {"paid", "paid_over", "cancel", "canceled", "failed", "fail", "expired"}
+        async def check(ref: PendingPaymentRef) -> None:
+            async with semaphore:
+                await self._check_payment(ref, timeout, state)
 
+        try:
+            await asyncio.gather(*(check(ref) for ref in refs))
+        finally:
+            state.last_run_at = datetime.utcnow()
+            state.last_run_duration = round(time.monotonic() - started, 3)
+
+    async def _check_payment(
+        self,
+        ref: PendingPaymentRef,
+        timeout: float,
+        state: _ProviderState,
+    ) -> None:
+        state.in_flight += 1
+        started = time.monotonic()
+        try:
+            async with AsyncSessionLocal() as session:
+                refreshed = await asyncio.wait_for(
+                    run_manual_check(session, ref.method, ref.local_id, self._payment_service),
+                    timeout,
+                )
+                if session.in_transaction():
+                    await session.commit()
+        except asyncio.TimeoutError:
+            state.timeouts_total += 1
+            logger.warning(
+                "⏱️ Автопроверка пополнений: %s не ответил по %s за %.0f с",
+                method_display_name(ref.method),
+                ref.identifier,
+                timeout,
+            )
+            return
+        except Exception as error:  # noqa: BLE001 - одна ошибка не должна останавливать пул
+            state.errors_total += 1
+            logger.error(
+                "Ошибка автопроверки %s %s: %s",
+                method_display_name(ref.method),
+                ref.identifier,
+                error,
+                exc_info=True,
+            )
+            return
+        finally:
+            state.in_flight -= 1
+            state.latencies.append(time.monotonic() - started)
+
+        if not refreshed:
+            state.errors_total += 1
+            logger.debug(
+                "Автопроверка пополнений: не удалось обновить %s %s",
+                method_display_name(ref.method),
+                ref.identifier,
+            )
+            return
 
-def _is_yookassa_pending(payment: YooKassaPayment) -> bool:
-    if getattr(payment, "is_paid", False) and payment.status == "succeeded":
-        return False
-    status = (payment.status or "").lower()
-    return status in {"pending", "waiting_for_capture"}
+        state.checked_total += 1
+        if refreshed.is_paid and not ref.is_paid:
+            state.changed_total += 1
+            logger.info(
+                "✅ %s %s отмечен как оплаченный после автопроверки",
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+            )
+        elif refreshed.status != ref.status:
+            state.changed_total += 1
+            logger.info(
+                "ℹ️ %s %s обновлён: %s → %s",
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+                ref.status or "—",
+                refreshed.status or "—",
+            )
+        else:
+            logger.debug(
+                "Автопроверка пополнений: %s %s без изменений (%s)",
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+                refreshed.status or "—",
+            )
 
 
-def _is_cryptobot_pending(payment: CryptoBotPayment) -> bool:
-    status = (payment.status or "").lower()
-    return status == "active"
+auto_payment_verification_service = AutoPaymentVerificationService()
 
 
 def _parse_cryptobot_amount_kopeks(payment: CryptoBotPayment) -> int:
-    payload = payment.payload or ""
+    payload = getattr(payment, "payload", None) or ""
     match = re.search(r"_(\d+)$", payload)
     if match:
         try:
@@ -359,12 +556,6 @@ def _parse_cryptobot_amount_kopeks(payment: CryptoBotPayment) -> int:
     return 0
 
 
-def _metadata_is_balance(payment: YooKassaPayment) -> bool:
-    metadata = getattr(payment, "metadata_json", {}) or {}
-    payment_type = str(metadata.get("type") or metadata.get("payment_type") or "").lower()
-    return payment_type.startswith("balance_topup")
-
-
 def _build_record(method: PaymentMethod, payment: Any, *, identifier: str, amount_kopeks: int,
                   status: str, is_paid: bool, expires_at: Optional[datetime] = None) -> Optional[PendingPayment]:
     user = getattr(payment, "user", None)
@@ -396,217 +587,67 @@ def _build_record(method: PaymentMethod, payment: Any, *, identifier: str, amoun
     )
 
 
-async def _fetch_pal24_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(Pal24Payment)
-        .options(selectinload(Pal24Payment.user))
-        .where(Pal24Payment.created_at >= cutoff)
-        .order_by(desc(Pal24Payment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if not _is_pal24_pending(payment):
-            continue
-        record = _build_record(
-            PaymentMethod.PAL24,
-            payment,
-            identifier=payment.bill_id,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-            expires_at=getattr(payment, "expires_at", None),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_mulenpay_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(MulenPayPayment)
-        .options(selectinload(MulenPayPayment.user))
-        .where(MulenPayPayment.created_at >= cutoff)
-        .order_by(desc(MulenPayPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if not _is_mulenpay_pending(payment):
-            continue
-        record = _build_record(
-            PaymentMethod.MULENPAY,
-            payment,
-            identifier=payment.uuid,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_wata_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(WataPayment)
-        .options(selectinload(WataPayment.user))
-        .where(WataPayment.created_at >= cutoff)
-        .order_by(desc(WataPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if not _is_wata_pending(payment):
-            continue
-        record = _build_record(
-            PaymentMethod.WATA,
-            payment,
-            identifier=payment.payment_link_id,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-            expires_at=getattr(payment, "expires_at", None),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_platega_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(PlategaPayment)
-        .options(selectinload(PlategaPayment.user))
-        .where(PlategaPayment.created_at >= cutoff)
-        .order_by(desc(PlategaPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if not _is_platega_pending(payment):
-            continue
-        identifier = payment.platega_transaction_id or payment.correlation_id or str(payment.id)
-        record = _build_record(
-            PaymentMethod.PLATEGA,
-            payment,
-            identifier=identifier,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-            expires_at=getattr(payment, "expires_at", None),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_heleket_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(HeleketPayment)
-        .options(selectinload(HeleketPayment.user))
-        .where(HeleketPayment.created_at >= cutoff)
-        .order_by(desc(HeleketPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if not _is_heleket_pending(payment):
-            continue
-        record = _build_record(
-            PaymentMethod.HELEKET,
-            payment,
-            identifier=payment.uuid,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-            expires_at=getattr(payment, "expires_at", None),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_yookassa_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(YooKassaPayment)
-        .options(selectinload(YooKassaPayment.user))
-        .where(YooKassaPayment.created_at >= cutoff)
-        .order_by(desc(YooKassaPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        if payment.transaction_id:
-            continue
-        if not _metadata_is_balance(payment):
-            continue
-        if not _is_yookassa_pending(payment):
-            continue
-        record = _build_record(
-            PaymentMethod.YOOKASSA,
-            payment,
-            identifier=payment.yookassa_payment_id,
-            amount_kopeks=payment.amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(getattr(payment, "is_paid", False)),
-        )
-        if record:
-            records.append(record)
-    return records
-
-
-async def _fetch_cryptobot_payments(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(CryptoBotPayment)
-        .options(selectinload(CryptoBotPayment.user))
-        .where(CryptoBotPayment.created_at >= cutoff)
-        .order_by(desc(CryptoBotPayment.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for payment in result.scalars().all():
-        status = (payment.status or "").lower()
-        if not _is_cryptobot_pending(payment) and status != "paid":
-            continue
-        amount_kopeks = _parse_cryptobot_amount_kopeks(payment)
-        record = _build_record(
-            PaymentMethod.CRYPTOBOT,
-            payment,
-            identifier=payment.invoice_id,
-            amount_kopeks=amount_kopeks,
-            status=payment.status or "",
-            is_paid=bool(payment.is_paid),
-        )
-        if record:
-            records.append(record)
-    return records
+def _pending_refs_select(method: PaymentMethod, model: Any, cutoff: datetime):
+    status = func.lower(func.coalesce(model.status, ""))
+    if method in FINAL_PAYMENT_STATUSES:
+        status_condition = status.notin_(FINAL_PAYMENT_STATUSES[method])
+    else:
+        status_condition = status.in_(PENDING_PAYMENT_STATUSES[method])
 
+    if method == PaymentMethod.CRYPTOBOT:
+        identifier = model.invoice_id
+        # Сумма в рублях хранится в payload, её подставляет list_recent_pending_payments
+        amount_kopeks = literal(0, Integer)
+        is_paid = or_(model.paid_at.isnot(None), status == "paid")
+    else:
+        identifier = model.payment_id
+        amount_kopeks = model.amount_kopeks
+        is_paid = model.paid_at.isnot(None)
+
+    return select(
+        literal(method.value, String).label("method"),
+        model.id.label("local_id"),
+        model.user_id.label("user_id"),
+        cast(identifier, String).label("identifier"),
+        cast(amount_kopeks, Integer).label("amount_kopeks"),
+        func.coalesce(model.status, "").label("status"),
+        case((is_paid, True), else_=False).label("is_paid"),
+        model.created_at.label("created_at"),
+    ).where(model.created_at >= cutoff, status_condition)
+
+
+async def fetch_pending_payment_refs(
+    db: AsyncSession,
+    cutoff: datetime,
+    *,
+    methods: Optional[Iterable[PaymentMethod]] = None,
+) -> List[PendingPaymentRef]:
+    """Select pending payments of all providers with a single UNION ALL query."""
+
+    wanted = set(methods) if methods is not None else set(PAYMENT_MODELS)
+    selects = [
+        _pending_refs_select(method, model, cutoff)
+        for method, model in PAYMENT_MODELS.items()
+        if method in wanted
+    ]
+    if not selects:
+        return []
 
-async def _fetch_stars_transactions(db: AsyncSession, cutoff: datetime) -> List[PendingPayment]:
-    stmt = (
-        select(Transaction)
-        .options(selectinload(Transaction.user))
-        .where(
-            Transaction.created_at >= cutoff,
-            Transaction.type == TransactionType.DEPOSIT.value,
-            Transaction.payment_method == PaymentMethod.TELEGRAM_STARS.value,
-        )
-        .order_by(desc(Transaction.created_at))
-    )
-    result = await db.execute(stmt)
-    records: List[PendingPayment] = []
-    for transaction in result.scalars().all():
-        record = _build_record(
-            PaymentMethod.TELEGRAM_STARS,
-            transaction,
-            identifier=transaction.external_id or str(transaction.id),
-            amount_kopeks=transaction.amount_kopeks,
-            status="paid" if transaction.is_completed else "pending",
-            is_paid=bool(transaction.is_completed),
+    pending = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+    result = await db.execute(select(pending).order_by(desc(pending.c.created_at)))
+    return [
+        PendingPaymentRef(
+            method=PaymentMethod(row.method),
+            local_id=int(row.local_id),
+            user_id=row.user_id,
+            identifier=row.identifier or str(row.local_id),
+            amount_kopeks=int(row.amount_kopeks or 0),
+            status=row.status or "",
+            is_paid=bool(row.is_paid),
+            created_at=row.created_at,
         )
-        if record:
-            records.append(record)
-    return records
+        for row in result
+    ]
 
 
 async def list_recent_pending_payments(
@@ -617,23 +658,50 @@ async def list_recent_pending_payments(
     """Return pending payments (top-ups) from supported providers within the age window."""
 
     cutoff = datetime.utcnow() - max_age
+    refs = await fetch_pending_payment_refs(db, cutoff)
+    if not refs:
+        return []
 
-    tasks: Iterable[List[PendingPayment]] = (
-        await _fetch_yookassa_payments(db, cutoff),
-        await _fetch_pal24_payments(db, cutoff),
-        await _fetch_mulenpay_payments(db, cutoff),
-        await _fetch_wata_payments(db, cutoff),
-        await _fetch_platega_payments(db, cutoff),
-        await _fetch_heleket_payments(db, cutoff),
-        await _fetch_cryptobot_payments(db, cutoff),
-        await _fetch_stars_transactions(db, cutoff),
+    users_result = await db.execute(
+        select(User).where(User.id.in_({ref.user_id for ref in refs}))
     )
+    users = {user.id: user for user in users_result.scalars().all()}
 
-    records: List[PendingPayment] = []
-    for batch in tasks:
-        records.extend(batch)
+    ids_by_method: Dict[PaymentMethod, List[int]] = {}
+    for ref in refs:
+        ids_by_method.setdefault(ref.method, []).append(ref.local_id)
+
+    payments: Dict[Tuple[PaymentMethod, int], Any] = {}
+    for method, local_ids in ids_by_method.items():
+        model = PAYMENT_MODELS[method]
+        result = await db.execute(select(model).where(model.id.in_(local_ids)))
+        for payment in result.scalars().all():
+            payments[(method, payment.id)] = payment
 
-    records.sort(key=lambda item: item.created_at, reverse=True)
+    records: List[PendingPayment] = []
+    for ref in refs:
+        user = users.get(ref.user_id)
+        payment = payments.get((ref.method, ref.local_id))
+        if user is None or payment is None:
+            logger.debug("Skipping %s payment %s without linked user", ref.method.value, ref.identifier)
+            continue
+        amount_kopeks = ref.amount_kopeks
+        if ref.method == PaymentMethod.CRYPTOBOT:
+            amount_kopeks = _parse_cryptobot_amount_kopeks(payment)
+        records.append(
+            PendingPayment(
+                method=ref.method,
+                local_id=ref.local_id,
+                identifier=ref.identifier,
+                amount_kopeks=amount_kopeks,
+                status=ref.status,
+                is_paid=ref.is_paid,
+                created_at=ref.created_at,
+                user=user,
+                payment=payment,
+                expires_at=getattr(payment, "expires_at", None),
+            )
+        )
     return records
 
 
@@ -1,15 +1,17 @@
 import asyncio
 import logging
+from datetime import datetime
 from types import SimpleNamespace
-from typing import Iterable
+from typing import Iterable, Optional
 
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import and_, select
+from sqlalchemy import and_, delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.database.crud.broadcast import record_unreachable_recipients
 from app.database.crud.user import add_user_balance
 from app.database.models import (
     Poll,
@@ -20,10 +22,17 @@ from app.database.models import (
     User,
 )
 from app.localization.texts import get_texts
+from app.services.shared_state_service import shared_state
+from app.services.telegram_send_scheduler import telegram_send_scheduler
 
 logger = logging.getLogger(__name__)
 
 
+POLL_SEND_CHUNK_SIZE = 500
+# Блокировка рассылки опроса продлевается после каждого пакета
+POLL_SEND_CLAIM_TTL_SECONDS = 120
+
+
 def _build_poll_invitation_text(poll: Poll, language: str) -> str:
     texts = get_texts(language)
 
@@ -68,13 +77,15 @@ async def send_poll_to_users(
     poll: Poll,
     users: Iterable[User],
 ) -> dict:
-    from app.database.database import AsyncSessionLocal
-    
-    sent = 0
-    failed = 0
-    skipped = 0
+    """Рассылает приглашения к опросу пакетами через общий планировщик отправки.
 
+    Строки ``PollResponse`` для пакета создаются одним INSERT ... RETURNING, отправка
+    идёт без открытых транзакций, а неудачные приглашения удаляются одним DELETE.
+    Все запросы идут через переданную сессию, поэтому размер рассылки не влияет
+    на число соединений с БД.
+    """
     poll_id = poll.id
+    claim_name = f"poll_send:{poll_id}"
 
     user_snapshots = [
         SimpleNamespace(
@@ -84,116 +95,120 @@ async def send_poll_to_users(
         )
         for user in users
     ]
+    stats = {"sent": 0, "failed": 0, "skipped": 0}
+
+    if not await shared_state.claim(claim_name, POLL_SEND_CLAIM_TTL_SECONDS):
+        logger.warning("⚠️ Опрос %s уже рассылается другим процессом", poll_id)
+        stats["skipped"] = len(user_snapshots)
+        stats["total"] = len(user_snapshots)
+        return stats
+
+    invitation_texts: dict[str, str] = {}
+
+    async def send_invitation(response_id: int, user_snapshot) -> tuple[bool, Optional[str]]:
+        language = user_snapshot.language
+        if language not in invitation_texts:
+            invitation_texts[language] = _build_poll_invitation_text(poll, language)
+        keyboard = build_start_keyboard(response_id, language)
+
+        try:
+            await telegram_send_scheduler.send(
+                user_snapshot.telegram_id,
+                lambda: bot.send_message(
+                    chat_id=user_snapshot.telegram_id,
+                    text=invitation_texts[language],
+                    reply_markup=keyboard,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True,
+                ),
+            )
+            return True, None
+        except Exception as error:  # noqa: BLE001
+            reason = _unreachable_reason(error)
+            if reason is None:
+                logger.error(
+                    "❌ Ошибка отправки опроса %s пользователю %s: %s",
+                    poll_id,
+                    user_snapshot.telegram_id,
+                    error,
+                )
+            return False, reason
+
+    try:
+        for start in range(0, len(user_snapshots), POLL_SEND_CHUNK_SIZE):
+            chunk = user_snapshots[start:start + POLL_SEND_CHUNK_SIZE]
+            response_ids = await _create_poll_responses(db, poll_id, [item.id for item in chunk])
+            recipients = [item for item in chunk if item.id in response_ids]
+            stats["skipped"] += len(chunk) - len(recipients)
+            if not recipients:
+                continue
+
+            results = await asyncio.gather(
+                *(send_invitation(response_ids[item.id], item) for item in recipients),
+                return_exceptions=True,
+            )
 
-    # Получаем список пользователей, которые уже прошли опрос, за один запрос
-    user_ids = [user_snapshot.id for user_snapshot in user_snapshots]
-    existing_responses_result = await db.execute(
+            dropped_response_ids: list[int] = []
+            unreachable: dict[int, str] = {}
+            for item, result in zip(recipients, results):
+                if isinstance(result, tuple) and result[0]:
+                    stats["sent"] += 1
+                    continue
+                dropped_response_ids.append(response_ids[item.id])
+                if isinstance(result, tuple) and result[1]:
+                    unreachable[item.telegram_id] = result[1]
+                    stats["skipped"] += 1
+                else:
+                    stats["failed"] += 1
+
+            # Неотправленные приглашения удаляются, чтобы их можно было разослать повторно
+            if dropped_response_ids:
+                await db.execute(delete(PollResponse).where(PollResponse.id.in_(dropped_response_ids)))
+                await db.commit()
+            if unreachable:
+                await record_unreachable_recipients(db, unreachable)
+
+            await shared_state.refresh_claim(claim_name, POLL_SEND_CLAIM_TTL_SECONDS)
+    finally:
+        await shared_state.release_claim(claim_name)
+
+    stats["total"] = stats["sent"] + stats["failed"] + stats["skipped"]
+    return stats
+
+
+def _unreachable_reason(error: Exception) -> Optional[str]:
+    if isinstance(error, TelegramForbiddenError):
+        return str(error)
+    if isinstance(error, TelegramBadRequest):
+        error_text = str(error).lower()
+        if "chat not found" in error_text or "bot was blocked by the user" in error_text:
+            return str(error)
+    return None
+
+
+async def _create_poll_responses(db: AsyncSession, poll_id: int, user_ids: list[int]) -> dict[int, int]:
+    """Создаёт строки ответов для пользователей без приглашения; возвращает ``user_id -> response_id``."""
+    existing_result = await db.execute(
         select(PollResponse.user_id).where(
             and_(
                 PollResponse.poll_id == poll_id,
-                PollResponse.user_id.in_(user_ids)
+                PollResponse.user_id.in_(user_ids),
             )
         )
     )
-    existing_user_ids = set(existing_responses_result.scalars().all())
-
-    # Используем умеренный семафор, чтобы не превышать лимиты подключений к БД
-    semaphore = asyncio.Semaphore(30)  # Баланс между производительностью и нагрузкой на БД
-
-    # Создаем отдельную функцию для создания отдельной сессии для каждой отправки
-    async def send_poll_invitation(user_snapshot):
-        """Отправляет приглашение к опросу одному пользователю"""
-        async with semaphore:
-            # Пропускаем пользователей, которые уже прошли опрос
-            if user_snapshot.id in existing_user_ids:
-                return "skipped"
-                
-            # Создаем новую сессию для изоляции транзакции
-            async with AsyncSessionLocal() as new_db:
-                try:
-                    # Проверяем еще раз в новой сессии на случай гонки
-                    existing_response = await new_db.execute(
-                        select(PollResponse.id).where(
-                            and_(
-                                PollResponse.poll_id == poll_id,
-                                PollResponse.user_id == user_snapshot.id,
-                            )
-                        )
-                    )
-                    existing_id = existing_response.scalar_one_or_none()
-                    if existing_id:
-                        return "skipped"
-
-                    response = PollResponse(
-                        poll_id=poll_id,
-                        user_id=user_snapshot.id,
-                    )
-                    new_db.add(response)
-
-                    await new_db.flush()
-
-                    text = _build_poll_invitation_text(poll, user_snapshot.language)
-                    keyboard = build_start_keyboard(response.id, user_snapshot.language)
-
-                    await bot.send_message(
-                        chat_id=user_snapshot.telegram_id,
-                        text=text,
-                        reply_markup=keyboard,
-                        parse_mode="HTML",
-                        disable_web_page_preview=True,
-                    )
-
-                    await new_db.commit()
-                    return "sent"
-                except TelegramBadRequest as error:
-                    error_text = str(error).lower()
-                    if "chat not found" in error_text or "bot was blocked by the user" in error_text:
-                        await new_db.rollback()
-                        return "skipped"
-                    else:  # pragma: no cover - unexpected telegram error
-                        await new_db.rollback()
-                        return "failed"
-                except Exception as error:  # pragma: no cover - defensive logging
-                    await new_db.rollback()
-                    # Проверяем, является ли ошибка связанной с лимитом подключений
-                    if "too many clients" in str(error).lower():
-                        logger.warning(
-                            "⚠️ Ограничение на количество подключений к БД: %s пользователю %s",
-                            poll_id,
-                            user_snapshot.telegram_id,
-                        )
-                        # Уменьшаем вероятность переполнения, делая небольшую задержку
-                        await asyncio.sleep(0.1)
-                    else:
-                        logger.error(
-                            "❌ Ошибка отправки опроса %s пользователю %s: %s",
-                            poll_id,
-                            user_snapshot.telegram_id,
-                            error,
-                        )
-                    return "failed"
-
-    # Отправляем все приглашения одновременно без задержек для максимальной скорости
-    tasks = [send_poll_invitation(user_snapshot) for user_snapshot in user_snapshots]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    for result in results:
-        if isinstance(result, str):  # Успешно выполненная задача
-            if result == "sent":
-                sent += 1
-            elif result == "failed":
-                failed += 1
-            elif result == "skipped":
-                skipped += 1
-        elif isinstance(result, Exception):  # Ошибка выполнения задачи
-            failed += 1
-
-    return {
-        "sent": sent,
-        "failed": failed,
-        "skipped": skipped,
-        "total": sent + failed + skipped,
-    }
+    existing_user_ids = set(existing_result.scalars().all())
+    new_user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in existing_user_ids]
+    if not new_user_ids:
+        return {}
+
+    now = datetime.utcnow()
+    result = await db.execute(
+        insert(PollResponse).returning(PollResponse.user_id, PollResponse.id),
+        [{"poll_id": poll_id, "user_id": user_id, "sent_at": now} for user_id in new_user_ids],
+    )
+    response_ids = {user_id: response_id for user_id, response_id in result.all()}
+    await db.commit()
+    return response_ids
 
 
 async def reward_user_for_poll(
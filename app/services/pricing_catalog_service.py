@@ -0,0 +1,427 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from itertools import chain, product
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import PERIOD_PRICES, TRAFFIC_PRICES, settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import PromoGroup, ServerSquad, Tariff, server_squad_promo_groups
+from app.utils.pricing_utils import calculate_months_from_days, resolve_discount_percent
+
+
+logger = logging.getLogger(__name__)
+
+
+PRICING_MODELS = (ServerSquad, Tariff, PromoGroup)
+PRICING_TABLES = frozenset({"server_squads", "tariffs", "promo_groups", "server_squad_promo_groups"})
+
+DiscountResolver = Callable[[str, Optional[int]], int]
+
+
+@dataclass(frozen=True)
+class CatalogServer:
+    id: int
+    squad_uuid: str
+    display_name: str
+    price_kopeks: int
+    is_available: bool
+    is_full: bool
+    allowed_promo_group_ids: FrozenSet[int]
+
+    @property
+    def is_purchasable(self) -> bool:
+        return self.is_available and not self.is_full
+
+    def is_allowed_for(self, promo_group_id: Optional[int]) -> bool:
+        return promo_group_id is None or promo_group_id in self.allowed_promo_group_ids
+
+
+@dataclass(frozen=True)
+class CatalogTariff:
+    id: int
+    name: str
+    price_kopeks: int
+    duration_days: int
+    traffic_gb: Optional[int]
+    device_limit: Optional[int]
+    is_active: bool
+    sort_order: int
+
+
+class CatalogPromoGroup:
+    """Снимок промогруппы: те же атрибуты колонок и расчёт скидок, что у модели."""
+
+    def __init__(self, group: PromoGroup) -> None:
+        for column in PromoGroup.__table__.columns:
+            setattr(self, column.key, getattr(group, column.key))
+
+    def get_discount_percent(self, category, period_days=None):
+        return PromoGroup.get_discount_percent(self, category, period_days)
+
+
+@dataclass(frozen=True)
+class PricingCatalog:
+    version: int
+    loaded_at: float
+    servers_by_id: Dict[int, CatalogServer]
+    servers_by_uuid: Dict[str, CatalogServer]
+    tariffs: Tuple[CatalogTariff, ...]
+    promo_groups: Dict[int, CatalogPromoGroup]
+    period_prices: Dict[int, int]
+    traffic_prices: Dict[int, int]
+    price_per_device: int
+    default_device_limit: int
+
+    def period_price(self, period_days: int) -> int:
+        return self.period_prices.get(period_days, 0)
+
+    def traffic_price(self, traffic_gb: Optional[int]) -> int:
+        return self.traffic_prices.get(traffic_gb or 0, 0)
+
+    def devices_price(self, devices: int) -> int:
+        return max(0, devices - self.default_device_limit) * self.price_per_device
+
+    def available_servers(self, promo_group_id: Optional[int] = None) -> List[CatalogServer]:
+        """Включённые серверы, доступные промогруппе; заполненные остаются в списке."""
+        return [
+            server
+            for server in self.servers_by_id.values()
+            if server.is_available and server.is_allowed_for(promo_group_id)
+        ]
+
+
+@dataclass(frozen=True)
+class PriceQuote:
+    period_days: int
+    months: int
+    traffic_gb: int
+    devices: int
+    server_ids: Tuple[int, ...]
+    base_price_original: int
+    base_discount_percent: int
+    base_discount_total: int
+    base_price: int
+    traffic_price_per_month: int
+    traffic_discount_percent: int
+    traffic_discount_total: int
+    total_traffic_price: int
+    servers_price_per_month: int
+    servers_discount_percent: int
+    servers_discount_total: int
+    total_servers_price: int
+    server_prices: Tuple[int, ...]
+    devices_price_per_month: int
+    devices_discount_percent: int
+    devices_discount_total: int
+    total_devices_price: int
+    total_price: int
+
+    def to_details(self) -> Dict[str, object]:
+        return {
+            "base_price_original": self.base_price_original,
+            "base_discount_percent": self.base_discount_percent,
+            "base_discount_total": self.base_discount_total,
+            "base_price": self.base_price,
+            "traffic_price_per_month": self.traffic_price_per_month,
+            "traffic_discount_percent": self.traffic_discount_percent,
+            "traffic_discount_total": self.traffic_discount_total,
+            "total_traffic_price": self.total_traffic_price,
+            "servers_price_per_month": self.servers_price_per_month,
+            "servers_discount_percent": self.servers_discount_percent,
+            "servers_discount_total": self.servers_discount_total,
+            "total_servers_price": self.total_servers_price,
+            "servers_individual_prices": list(self.server_prices),
+            "devices_price_per_month": self.devices_price_per_month,
+            "devices_discount_percent": self.devices_discount_percent,
+            "devices_discount_total": self.devices_discount_total,
+            "total_devices_price": self.total_devices_price,
+            "months_in_period": self.months,
+            "total_price": self.total_price,
+        }
+
+
+def build_discount_resolver(user=None, promo_group=None) -> DiscountResolver:
+    """Скидки пользователя или промогруппы; каждая пара (категория, период) считается один раз."""
+    if promo_group is None and user is not None:
+        promo_group = user.get_primary_promo_group()
+    resolved: Dict[Tuple[str, Optional[int]], int] = {}
+
+    def resolve(category: str, period_days: Optional[int]) -> int:
+        key = (category, period_days)
+        if key not in resolved:
+            resolved[key] = max(0, int(resolve_discount_percent(
+                user,
+                promo_group,
+                category,
+                period_days=period_days,
+            ) or 0))
+        return resolved[key]
+
+    return resolve
+
+
+def _discounted(price_per_month: int, percent: int, months: int) -> Tuple[int, int]:
+    discount_per_month = price_per_month * percent // 100
+    return (price_per_month - discount_per_month) * months, discount_per_month * months
+
+
+def quote_matrix(
+    catalog: PricingCatalog,
+    discounts: DiscountResolver,
+    periods: Iterable[int],
+    traffic_options: Iterable[int],
+    device_options: Iterable[int],
+    server_sets: Iterable[Sequence[int]],
+    *,
+    per_month: bool = True,
+) -> Dict[Tuple[int, int, int, Tuple[int, ...]], PriceQuote]:
+    """Цены всех сочетаний период × трафик × устройства × серверы без обращений к БД.
+
+    Составляющие считаются один раз на период и значение опции, затем складываются.
+    С ``per_month=False`` помесячные составляющие берутся за один месяц, как в
+    расчёте без учёта длительности.
+    """
+    traffic_options = list(traffic_options)
+    device_options = list(device_options)
+    server_sets = [tuple(server_ids) for server_ids in server_sets]
+    quotes: Dict[Tuple[int, int, int, Tuple[int, ...]], PriceQuote] = {}
+
+    for period_days in periods:
+        months = calculate_months_from_days(period_days) if per_month else 1
+
+        base_original = catalog.period_price(period_days)
+        base_percent = discounts("period", period_days)
+        base_discount = base_original * base_percent // 100
+
+        traffic_percent = discounts("traffic", period_days)
+        traffic_parts = {}
+        for traffic_gb in traffic_options:
+            per_month_price = catalog.traffic_price(traffic_gb)
+            traffic_parts[traffic_gb] = (per_month_price, *_discounted(per_month_price, traffic_percent, months))
+
+        devices_percent = discounts("devices", period_days)
+        devices_parts = {}
+        for devices in device_options:
+            per_month_price = catalog.devices_price(devices)
+            devices_parts[devices] = (per_month_price, *_discounted(per_month_price, devices_percent, months))
+
+        servers_percent = discounts("servers", period_days)
+        server_totals: Dict[int, Tuple[int, int, int]] = {}
+        servers_parts = {}
+        for server_ids in server_sets:
+            prices: List[int] = []
+            per_month_total = total = discount_total = 0
+            for server_id in server_ids:
+                if server_id not in server_totals:
+                    server = catalog.servers_by_id.get(server_id)
+                    if server is not None and server.is_purchasable:
+                        server_totals[server_id] = (
+                            server.price_kopeks,
+                            *_discounted(server.price_kopeks, servers_percent, months),
+                        )
+                    else:
+                        server_totals[server_id] = (0, 0, 0)
+                price_per_month, server_total, server_discount = server_totals[server_id]
+                prices.append(server_total)
+                per_month_total += price_per_month
+                total += server_total
+                discount_total += server_discount
+            servers_parts[server_ids] = (per_month_total, total, discount_total, tuple(prices))
+
+        for traffic_gb, devices, server_ids in product(traffic_options, device_options, server_sets):
+            traffic_per_month, traffic_total, traffic_discount = traffic_parts[traffic_gb]
+            devices_per_month, devices_total, devices_discount = devices_parts[devices]
+            servers_per_month, servers_total, servers_discount, server_prices = servers_parts[server_ids]
+            base_price = base_original - base_discount
+            quotes[(period_days, traffic_gb, devices, server_ids)] = PriceQuote(
+                period_days=period_days,
+                months=months,
+                traffic_gb=traffic_gb,
+                devices=devices,
+                server_ids=server_ids,
+                base_price_original=base_original,
+                base_discount_percent=base_percent,
+                base_discount_total=base_discount,
+                base_price=base_price,
+                traffic_price_per_month=traffic_per_month,
+                traffic_discount_percent=traffic_percent,
+                traffic_discount_total=traffic_discount,
+                total_traffic_price=traffic_total,
+                servers_price_per_month=servers_per_month,
+                servers_discount_percent=servers_percent,
+                servers_discount_total=servers_discount,
+                total_servers_price=servers_total,
+                server_prices=server_prices,
+                devices_price_per_month=devices_per_month,
+                devices_discount_percent=devices_percent,
+                devices_discount_total=devices_discount,
+                total_devices_price=devices_total,
+                total_price=base_price + traffic_total + servers_total + devices_total,
+            )
+
+    return quotes
+
+
+def quote_price(
+    catalog: PricingCatalog,
+    discounts: DiscountResolver,
+    period_days: int,
+    traffic_gb: int,
+    devices: int,
+    server_ids: Sequence[int],
+    *,
+    per_month: bool = True,
+) -> PriceQuote:
+    quotes = quote_matrix(
+        catalog,
+        discounts,
+        [period_days],
+        [traffic_gb],
+        [devices],
+        [server_ids],
+        per_month=per_month,
+    )
+    return next(iter(quotes.values()))
+
+
+class PricingCatalogService:
+    """Каталог цен для расчёта стоимости подписок без запросов к БД.
+
+    Серверы (цены, доступность, допуск промогрупп), тарифы, промогруппы и цены
+    периодов загружаются одним снимком. Снимок получает новую версию при любой
+    записи серверов, тарифов и промогрупп через ORM и при смене ценовых настроек;
+    TTL ограничивает расхождение с изменениями, сделанными другими воркерами.
+    """
+
+    def __init__(self) -> None:
+        self._version = 0
+        self._catalog: Optional[PricingCatalog] = None
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    @property
+    def ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'PRICING_CATALOG_TTL_SECONDS', 300)))
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        self._version += 1
+
+    def _is_fresh(self, catalog: Optional[PricingCatalog]) -> bool:
+        return (
+            catalog is not None
+            and catalog.version == self._version
+            and time.monotonic() - catalog.loaded_at < self.ttl
+        )
+
+    async def get_catalog(self) -> PricingCatalog:
+        catalog = self._catalog
+        if self._is_fresh(catalog):
+            return catalog
+
+        async with self._lock:
+            catalog = self._catalog
+            if self._is_fresh(catalog):
+                return catalog
+
+            version = self._version
+            catalog = await self._load(version)
+            # Если данные изменились во время загрузки, снимок используется один раз
+            if version == self._version:
+                self._catalog = catalog
+            return catalog
+
+    async def _load(self, version: int) -> PricingCatalog:
+        async with AsyncSessionLocal() as db:
+            servers = (await db.execute(select(ServerSquad))).scalars().all()
+            allowed_rows = (await db.execute(select(server_squad_promo_groups))).all()
+            tariffs = (await db.execute(
+                select(Tariff).order_by(Tariff.sort_order, Tariff.id)
+            )).scalars().all()
+            groups = (await db.execute(select(PromoGroup))).scalars().all()
+
+        allowed: Dict[int, set] = {}
+        for server_id, promo_group_id in allowed_rows:
+            allowed.setdefault(server_id, set()).add(promo_group_id)
+
+        catalog_servers = [
+            CatalogServer(
+                id=server.id,
+                squad_uuid=server.squad_uuid,
+                display_name=server.display_name or server.squad_uuid,
+                price_kopeks=int(server.price_kopeks or 0),
+                is_available=bool(server.is_available),
+                is_full=bool(
+                    server.max_users is not None
+                    and (server.current_users or 0) >= server.max_users
+                ),
+                allowed_promo_group_ids=frozenset(allowed.get(server.id, ())),
+            )
+            for server in sorted(servers, key=lambda item: (item.sort_order or 0, item.id))
+        ]
+
+        catalog = PricingCatalog(
+            version=version,
+            loaded_at=time.monotonic(),
+            servers_by_id={server.id: server for server in catalog_servers},
+            servers_by_uuid={server.squad_uuid: server for server in catalog_servers},
+            tariffs=tuple(
+                CatalogTariff(
+                    id=tariff.id,
+                    name=tariff.name,
+                    price_kopeks=int(tariff.price_kopeks or 0),
+                    duration_days=int(tariff.duration_days or 0),
+                    traffic_gb=tariff.traffic_gb,
+                    device_limit=tariff.device_limit,
+                    is_active=bool(tariff.is_active),
+                    sort_order=int(tariff.sort_order or 0),
+                )
+                for tariff in tariffs
+            ),
+            promo_groups={group.id: CatalogPromoGroup(group) for group in groups},
+            period_prices=dict(PERIOD_PRICES),
+            traffic_prices=dict(TRAFFIC_PRICES),
+            price_per_device=int(getattr(settings, 'PRICE_PER_DEVICE', 0) or 0),
+            default_device_limit=int(settings.DEFAULT_DEVICE_LIMIT),
+        )
+        self.loads += 1
+        logger.debug(
+            "💰 Каталог цен загружен (версия %s): серверов %s, тарифов %s, промогрупп %s",
+            version,
+            len(catalog.servers_by_id),
+            len(catalog.tariffs),
+            len(catalog.promo_groups),
+        )
+        return catalog
+
+
+pricing_catalog_service = PricingCatalogService()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_pricing_flush(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, PRICING_MODELS):
+            pricing_catalog_service.invalidate()
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_pricing_bulk_write(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, PRICING_MODELS):
+        pricing_catalog_service.invalidate()
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in PRICING_TABLES:
+        pricing_catalog_service.invalidate()
@@ -0,0 +1,157 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable
+
+from app.config import settings
+from app.services.shared_state_service import shared_state
+
+
+logger = logging.getLogger(__name__)
+
+
+ACTION_MESSAGE = "message"
+ACTION_CALLBACK = "callback"
+ACTION_PAYMENT = "payment"
+
+# Возвращает -1, если событие разрешено, иначе сколько миллисекунд ждать
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+if tat - now > tolerance then
+    return tat - tolerance - now
+end
+local next_tat = tat + interval
+redis.call('SET', KEYS[1], next_tat, 'PX', next_tat - now)
+return -1
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    interval: float
+    burst: int
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * self.burst
+
+
+@dataclass(frozen=True)
+class RateLimitStats:
+    backend: str
+    tracked_keys: int
+    allowed_total: int
+    throttled_total: int
+    throttled_by_action: Dict[str, int]
+    backend_errors_total: int
+
+
+class RateLimiter:
+    """Ограничитель частоты событий по скользящему окну (GCRA).
+
+    На ключ хранится одно число — теоретическое время следующего события. Действие
+    разрешено, пока оно опережает это время не больше чем на ``burst`` интервалов,
+    так что короткие всплески проходят, а средняя частота не превышает одного события
+    за ``interval``. Ключи каждого действия лежат в ``OrderedDict`` в порядке
+    обновления и вытесняются с начала, поэтому очистка амортизированно O(1).
+    С Redis окно общее для всех воркеров.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, "OrderedDict[Hashable, float]"] = {}
+        self.allowed_total = 0
+        self.throttled_total = 0
+        self.throttled_by_action: Dict[str, int] = {}
+        self.backend_errors_total = 0
+
+    @property
+    def limits(self) -> Dict[str, RateLimit]:
+        return {
+            ACTION_MESSAGE: RateLimit(
+                interval=max(0.0, float(getattr(settings, 'THROTTLE_MESSAGE_INTERVAL', 0.5))),
+                burst=max(0, int(getattr(settings, 'THROTTLE_MESSAGE_BURST', 3))),
+            ),
+            ACTION_CALLBACK: RateLimit(
+                interval=max(0.0, float(getattr(settings, 'THROTTLE_CALLBACK_INTERVAL', 0.3))),
+                burst=max(0, int(getattr(settings, 'THROTTLE_CALLBACK_BURST', 5))),
+            ),
+            ACTION_PAYMENT: RateLimit(
+                interval=max(0.0, float(getattr(settings, 'THROTTLE_PAYMENT_INTERVAL', 2.0))),
+                burst=max(0, int(getattr(settings, 'THROTTLE_PAYMENT_BURST', 1))),
+            ),
+        }
+
+    async def hit(self, action: str, key: Hashable) -> bool:
+        """Регистрирует событие; ``False``, если лимит действия исчерпан."""
+        limit = self.limits.get(action)
+        if limit is None or limit.interval <= 0:
+            return True
+
+        allowed = await self._hit_redis(action, key, limit)
+        if allowed is None:
+            allowed = self._hit_local(action, key, limit)
+
+        if allowed:
+            self.allowed_total += 1
+        else:
+            self.throttled_total += 1
+            self.throttled_by_action[action] = self.throttled_by_action.get(action, 0) + 1
+        return allowed
+
+    async def _hit_redis(self, action: str, key: Hashable, limit: RateLimit):
+        redis = shared_state.redis
+        if redis is None:
+            return None
+        try:
+            retry_after = await redis.eval(
+                _GCRA_SCRIPT,
+                1,
+                shared_state.key("throttle", action, key),
+                int(limit.interval * 1000),
+                int(limit.tolerance * 1000),
+            )
+            return int(retry_after) < 0
+        except Exception as e:
+            self.backend_errors_total += 1
+            logger.warning(f"Ошибка троттлинга в Redis, используется память процесса: {e}")
+            return None
+
+    def _hit_local(self, action: str, key: Hashable, limit: RateLimit) -> bool:
+        now = time.monotonic()
+        buckets = self._buckets.setdefault(action, OrderedDict())
+
+        # Ключи упорядочены по обновлению: истёкшие собираются с начала словаря
+        while buckets:
+            oldest_key, oldest_tat = next(iter(buckets.items()))
+            if oldest_tat > now:
+                break
+            del buckets[oldest_key]
+
+        tat = max(buckets.get(key, now), now)
+        if tat - now > limit.tolerance:
+            return False
+
+        buckets[key] = tat + limit.interval
+        buckets.move_to_end(key)
+        return True
+
+    def get_stats(self) -> RateLimitStats:
+        return RateLimitStats(
+            backend=shared_state.backend,
+            tracked_keys=sum(len(buckets) for buckets in self._buckets.values()),
+            allowed_total=self.allowed_total,
+            throttled_total=self.throttled_total,
+            throttled_by_action=dict(self.throttled_by_action),
+            backend_errors_total=self.backend_errors_total,
+        )
+
+
+rate_limiter = RateLimiter()
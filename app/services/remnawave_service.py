@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import re
+import time
 from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
@@ -12,14 +13,11 @@ from app.external.remnawave_api import (
     RemnaWaveAPI, RemnaWaveUser, RemnaWaveInternalSquad,
     RemnaWaveNode, UserStatus, TrafficLimitStrategy, RemnaWaveAPIError
 )
-from sqlalchemy import and_, cast, delete, func, select, update, String
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, delete, select, update
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.crud.user import (
-    create_user_no_commit,
     get_users_list,
-    get_user_by_telegram_id,
     update_user,
 )
 from app.database.crud.subscription import (
@@ -28,6 +26,11 @@ from app.database.crud.subscription import (
     decrement_subscription_server_counts,
 )
 from app.database.crud.server_squad import get_server_squad_by_uuid
+from app.database.crud.subscription_squad import (
+    SQUADS_COLUMN_MAPPED,
+    get_squad_subscription_ids,
+    get_subscription_squads,
+)
 from app.database.models import (
     User,
     Subscription,
@@ -41,79 +44,12 @@ from app.database.models import (
 from app.utils.subscription_utils import (
     resolve_hwid_device_limit_for_payload,
 )
+from app.services.panel_snapshot_service import panel_snapshot_service, panel_user_to_dict
 from app.utils.timezone import get_local_timezone
 
 logger = logging.getLogger(__name__)
 
 
-_UUID_MAP_MISSING = object()
-
-
-class _UUIDMapMutation:
-    """Tracks in-memory UUID map/user changes so they can be rolled back."""
-
-    __slots__ = ("uuid_map", "_map_original", "_user_original")
-
-    def __init__(self, uuid_map: Dict[str, "User"]):
-        self.uuid_map = uuid_map
-        self._map_original: Dict[str, Any] = {}
-        self._user_original: Dict["User", Tuple[Optional[str], Optional[datetime]]] = {}
-
-    def _capture_user_state(self, user: Optional["User"]) -> None:
-        if not user or user in self._user_original:
-            return
-        self._user_original[user] = (
-            getattr(user, "remnawave_uuid", None),
-            getattr(user, "updated_at", None),
-        )
-
-    def _capture_map_entry(self, key: Optional[str]) -> None:
-        if key is None or key in self._map_original:
-            return
-        self._map_original[key] = self.uuid_map.get(key, _UUID_MAP_MISSING)
-
-    def set_user_uuid(self, user: Optional["User"], value: Optional[str]) -> None:
-        if not user:
-            return
-        self._capture_user_state(user)
-        user.remnawave_uuid = value
-
-    def set_user_updated_at(self, user: Optional["User"], value: datetime) -> None:
-        if not user:
-            return
-        self._capture_user_state(user)
-        user.updated_at = value
-
-    def remove_map_entry(self, key: Optional[str]) -> None:
-        if key is None:
-            return
-        self._capture_map_entry(key)
-        self.uuid_map.pop(key, None)
-
-    def set_map_entry(self, key: Optional[str], value: Optional["User"]) -> None:
-        if key is None:
-            return
-        self._capture_map_entry(key)
-        if value is None:
-            self.uuid_map.pop(key, None)
-        else:
-            self.uuid_map[key] = value
-
-    def has_changes(self) -> bool:
-        return bool(self._map_original or self._user_original)
-
-    def rollback(self) -> None:
-        for user, (uuid_value, updated_at) in self._user_original.items():
-            user.remnawave_uuid = uuid_value
-            user.updated_at = updated_at
-
-        for key, original in self._map_original.items():
-            if original is _UUID_MAP_MISSING:
-                self.uuid_map.pop(key, None)
-            else:
-                self.uuid_map[key] = original
-
-
 class RemnaWaveConfigurationError(Exception):
     """Raised when RemnaWave API configuration is missing."""
 
@@ -161,54 +97,6 @@ class RemnaWaveService:
                 self._config_error or "RemnaWave API не настроен"
             )
 
-    def _ensure_user_remnawave_uuid(
-        self,
-        user: "User",
-        panel_uuid: Optional[str],
-        uuid_map: Dict[str, "User"],
-    ) -> Tuple[bool, Optional[_UUIDMapMutation]]:
-        """Обновляет UUID пользователя, если он изменился в панели."""
-
-        if not panel_uuid:
-            return False, None
-
-        current_uuid = getattr(user, "remnawave_uuid", None)
-        if current_uuid == panel_uuid:
-            return False, None
-
-        mutation = _UUIDMapMutation(uuid_map)
-
-        conflicting_user = uuid_map.get(panel_uuid)
-        if conflicting_user and conflicting_user is not user:
-            logger.warning(
-                "♻️ Обнаружен конфликт UUID %s между пользователями %s и %s. Сбрасываем у старой записи.",
-                panel_uuid,
-                getattr(conflicting_user, "telegram_id", "?"),
-                getattr(user, "telegram_id", "?"),
-            )
-            mutation.set_user_uuid(conflicting_user, None)
-            mutation.set_user_updated_at(conflicting_user, datetime.utcnow())
-            mutation.remove_map_entry(panel_uuid)
-
-        if current_uuid:
-            mutation.remove_map_entry(current_uuid)
-
-        mutation.set_user_uuid(user, panel_uuid)
-        mutation.set_user_updated_at(user, datetime.utcnow())
-        mutation.set_map_entry(panel_uuid, user)
-
-        logger.info(
-            "🔁 Обновлен RemnaWave UUID пользователя %s: %s → %s",
-            getattr(user, "telegram_id", "?"),
-            current_uuid,
-            panel_uuid,
-        )
-
-        if mutation.has_changes():
-            return True, mutation
-
-        return True, None
-
     @asynccontextmanager
     async def get_api_client(self):
         self._ensure_configured()
@@ -421,86 +309,6 @@ class RemnaWaveService:
         logger.debug(f"✅ Результат парсинга: first_name='{first_name}', last_name='{last_name}', username='{username}'")
         return first_name, last_name, username
 
-    async def _get_or_create_bot_user_from_panel(
-        self,
-        db: AsyncSession,
-        panel_user: Dict[str, Any],
-    ) -> Tuple[Optional[User], bool]:
-        """Возвращает пользователя бота, создавая его при необходимости.
-
-        При конфликте уникальности telegram_id повторно загружает пользователя
-        из базы данных и сообщает, что запись не была создана заново.
-        """
-
-        telegram_id = panel_user.get("telegramId")
-        if telegram_id is None:
-            return None, False
-
-        # Извлекаем настоящее имя пользователя из описания
-        description = panel_user.get("description") or ""
-        first_name_from_desc, last_name_from_desc, username_from_desc = self._extract_user_data_from_description(description)
-        
-        # Используем извлеченное имя или дефолтное значение
-        fallback_first_name = f"User {telegram_id}"
-        full_first_name = fallback_first_name
-        full_last_name = None
-
-        if first_name_from_desc and last_name_from_desc:
-            full_first_name = first_name_from_desc
-            full_last_name = last_name_from_desc
-        elif first_name_from_desc:
-            full_first_name = first_name_from_desc
-            full_last_name = last_name_from_desc
-
-        username = username_from_desc or panel_user.get("username")
-
-        try:
-            create_kwargs = dict(
-                db=db,
-                telegram_id=telegram_id,
-                username=username,
-                first_name=full_first_name,
-                last_name=full_last_name,
-                language="ru",
-            )
-
-            db_user = await create_user_no_commit(**create_kwargs)
-            return db_user, True
-        except IntegrityError as create_error:
-            logger.info(
-                "♻️ Пользователь с telegram_id %s уже существует. Используем существующую запись.",
-                telegram_id,
-            )
-
-            try:
-                await db.rollback()
-            except Exception:
-                # create_user_no_commit уже выполняет rollback при необходимости
-                pass
-
-            try:
-                existing_user = await get_user_by_telegram_id(db, telegram_id)
-                if existing_user is None:
-                    logger.error("❌ Не удалось найти существующего пользователя с telegram_id %s", telegram_id)
-                    return None, False
-
-                logger.debug(
-                    "Используется существующий пользователь %s после конфликта уникальности: %s",
-                    telegram_id,
-                    create_error,
-                )
-                return existing_user, False
-            except Exception as load_error:
-                logger.error("❌ Ошибка загрузки существующего пользователя %s: %s", telegram_id, load_error)
-                return None, False
-        except Exception as general_error:
-            logger.error("❌ Общая ошибка создания/загрузки пользователя %s: %s", telegram_id, general_error)
-            try:
-                await db.rollback()
-            except:
-                pass
-            return None, False
-    
     async def get_system_statistics(self) -> Dict[str, Any]:
             try:
                 async with self.get_api_client() as api:
@@ -880,7 +688,12 @@ class RemnaWaveService:
         source_uuid: str,
         target_uuid: str,
     ) -> Dict[str, Any]:
-        """Переносит активных подписок с одного сквада на другой."""
+        """Переносит активных подписок с одного сквада на другой.
+
+        Подписки выбираются из индекса сквадов страницами по id, панель обновляется
+        параллельно, а каждая страница фиксируется отдельной транзакцией, чтобы
+        переезд большого сквада не держал блокировки до конца.
+        """
 
         if source_uuid == target_uuid:
             return {
@@ -902,161 +715,174 @@ class RemnaWaveService:
                 "message": "Сквады не найдены",
             }
 
-        subscription_query = (
-            select(Subscription)
-            .options(selectinload(Subscription.user))
-            .where(
-                Subscription.status.in_(
-                    [
-                        SubscriptionStatus.ACTIVE.value,
-                        SubscriptionStatus.TRIAL.value,
-                    ]
-                ),
-                cast(Subscription.connected_squads, String).like(
-                    f'%"{source_uuid}"%'
-                ),
-            )
-        )
-
-        result = await db.execute(subscription_query)
-        subscriptions = result.scalars().unique().all()
-
-        total_candidates = len(subscriptions)
-        if not subscriptions:
-            logger.info(
-                "🚚 Переезд сквада %s → %s: подходящих подписок не найдено",
-                source_uuid,
-                target_uuid,
-            )
-            return {
-                "success": True,
-                "total": 0,
-                "updated": 0,
-                "panel_updated": 0,
-                "panel_failed": 0,
-            }
+        source_server_id = source_server.id
+        target_server_id = target_server.id
+        chunk_size = max(1, int(getattr(settings, 'SQUAD_MIGRATION_CHUNK_SIZE', 500)))
+        semaphore = asyncio.Semaphore(max(1, int(getattr(settings, 'SQUAD_MIGRATION_CONCURRENCY', 10))))
 
         exit_stack = AsyncExitStack()
+        api = None
+        total_candidates = 0
         panel_updated = 0
         panel_failed = 0
         updated_subscriptions = 0
         source_decrement = 0
         target_increment = 0
+        last_id = 0
 
         try:
-            needs_panel_update = any(
-                subscription.user and subscription.user.remnawave_uuid
-                for subscription in subscriptions
-            )
-
-            api = None
-            if needs_panel_update:
-                api = await exit_stack.enter_async_context(self.get_api_client())
-
-            for subscription in subscriptions:
-                current_squads = list(subscription.connected_squads or [])
-                if source_uuid not in current_squads:
-                    continue
+            while True:
+                subscription_ids = await get_squad_subscription_ids(
+                    db,
+                    source_uuid,
+                    after_id=last_id,
+                    limit=chunk_size,
+                )
+                if not subscription_ids:
+                    break
+                last_id = subscription_ids[-1]
+                total_candidates += len(subscription_ids)
+
+                result = await db.execute(
+                    select(Subscription)
+                    .options(selectinload(Subscription.user))
+                    .where(Subscription.id.in_(subscription_ids))
+                    .order_by(Subscription.id)
+                )
 
-                had_target_before = target_uuid in current_squads
-                new_squads = [
-                    squad_uuid for squad_uuid in current_squads if squad_uuid != source_uuid
-                ]
-                if not had_target_before:
-                    new_squads.append(target_uuid)
+                squads_by_subscription = await get_subscription_squads(db, subscription_ids)
 
-                if subscription.user and subscription.user.remnawave_uuid:
-                    if api is None:
-                        panel_failed += 1
-                        logger.error(
-                            "❌ RemnaWave API недоступен для обновления пользователя %s",
-                            subscription.user.telegram_id,
-                        )
+                moves: List[Tuple[Subscription, List[str], bool]] = []
+                for subscription in result.scalars().unique().all():
+                    current_squads = squads_by_subscription.get(subscription.id, [])
+                    if source_uuid not in current_squads:
                         continue
 
-                    try:
-                        await api.update_user(
-                            uuid=subscription.user.remnawave_uuid,
-                            active_internal_squads=new_squads,
-                        )
+                    had_target_before = target_uuid in current_squads
+                    new_squads = [
+                        squad_uuid for squad_uuid in current_squads if squad_uuid != source_uuid
+                    ]
+                    if not had_target_before:
+                        new_squads.append(target_uuid)
+                    moves.append((subscription, new_squads, had_target_before))
+
+                if api is None and any(
+                    subscription.user and subscription.user.remnawave_uuid
+                    for subscription, _, _ in moves
+                ):
+                    api = await exit_stack.enter_async_context(self.get_api_client())
+
+                panel_results = await asyncio.gather(*(
+                    self._push_migrated_squads(api, semaphore, subscription, new_squads)
+                    for subscription, new_squads, _ in moves
+                ))
+
+                applied = []
+                for move, panel_result in zip(moves, panel_results):
+                    if panel_result is None:
+                        applied.append(move)
+                    elif panel_result:
                         panel_updated += 1
-                    except Exception as error:
+                        applied.append(move)
+                    else:
                         panel_failed += 1
-                        logger.error(
-                            "❌ Ошибка обновления сквадов пользователя %s: %s",
-                            subscription.user.telegram_id,
-                            error,
-                        )
-                        continue
 
-                subscription.connected_squads = new_squads
-                subscription.updated_at = datetime.utcnow()
+                if not applied:
+                    await db.rollback()
+                    continue
 
-                source_decrement += 1
-                if not had_target_before:
-                    target_increment += 1
+                now = datetime.utcnow()
+                for subscription, new_squads, _ in applied:
+                    if SQUADS_COLUMN_MAPPED:
+                        subscription.connected_squads = new_squads
+                    subscription.updated_at = now
 
-                updated_subscriptions += 1
+                with_target_ids = [
+                    subscription.id for subscription, _, had_target in applied if had_target
+                ]
+                moved_ids = [
+                    subscription.id for subscription, _, had_target in applied if not had_target
+                ]
 
-                link_result = await db.execute(
-                    select(SubscriptionServer)
-                    .where(
-                        and_(
-                            SubscriptionServer.subscription_id == subscription.id,
-                            SubscriptionServer.server_squad_id == source_server.id,
+                if with_target_ids:
+                    await db.execute(
+                        delete(SubscriptionServer).where(
+                            SubscriptionServer.subscription_id.in_(with_target_ids),
+                            SubscriptionServer.server_squad_id == source_server_id,
                         )
                     )
-                    .limit(1)
-                )
-                link = link_result.scalars().first()
 
-                if link:
-                    if had_target_before:
+                if moved_ids:
+                    linked_result = await db.execute(
+                        select(SubscriptionServer.subscription_id).where(
+                            SubscriptionServer.subscription_id.in_(moved_ids),
+                            SubscriptionServer.server_squad_id == source_server_id,
+                        )
+                    )
+                    linked_ids = set(linked_result.scalars().all())
+                    if linked_ids:
                         await db.execute(
-                            delete(SubscriptionServer).where(
-                                and_(
-                                    SubscriptionServer.subscription_id
-                                    == subscription.id,
-                                    SubscriptionServer.server_squad_id
-                                    == source_server.id,
-                                )
+                            update(SubscriptionServer)
+                            .where(
+                                SubscriptionServer.subscription_id.in_(linked_ids),
+                                SubscriptionServer.server_squad_id == source_server_id,
                             )
+                            .values(server_squad_id=target_server_id)
                         )
-                    else:
-                        link.server_squad_id = target_server.id
-                elif not had_target_before:
-                    db.add(
-                        SubscriptionServer(
-                            subscription_id=subscription.id,
-                            server_squad_id=target_server.id,
-                            paid_price_kopeks=0,
-                        )
-                    )
-
-            if updated_subscriptions:
-                if source_decrement:
-                    await db.execute(
-                        update(ServerSquad)
-                        .where(ServerSquad.id == source_server.id)
-                        .values(
-                            current_users=func.greatest(
-                                ServerSquad.current_users - source_decrement,
-                                0,
+                    for subscription_id in moved_ids:
+                        if subscription_id not in linked_ids:
+                            db.add(
+                                SubscriptionServer(
+                                    subscription_id=subscription_id,
+                                    server_squad_id=target_server_id,
+                                )
                             )
+
+                await db.execute(
+                    update(ServerSquad)
+                    .where(ServerSquad.id == source_server_id)
+                    .values(
+                        current_users=case(
+                            (ServerSquad.current_users > len(applied), ServerSquad.current_users - len(applied)),
+                            else_=0,
                         )
                     )
-                if target_increment:
+                )
+                if moved_ids:
                     await db.execute(
                         update(ServerSquad)
-                        .where(ServerSquad.id == target_server.id)
+                        .where(ServerSquad.id == target_server_id)
                         .values(
-                            current_users=ServerSquad.current_users + target_increment
+                            current_users=ServerSquad.current_users + len(moved_ids)
                         )
                     )
 
                 await db.commit()
-            else:
-                await db.rollback()
+
+                updated_subscriptions += len(applied)
+                source_decrement += len(applied)
+                target_increment += len(moved_ids)
+                logger.info(
+                    "🚚 Переезд сквада %s → %s: обработано %s подписок, перенесено %s",
+                    source_uuid,
+                    target_uuid,
+                    total_candidates,
+                    updated_subscriptions,
+                )
+
+            if not total_candidates:
+                logger.info(
+                    "🚚 Переезд сквада %s → %s: подходящих подписок не найдено",
+                    source_uuid,
+                    target_uuid,
+                )
+                return {
+                    "success": True,
+                    "total": 0,
+                    "updated": 0,
+                    "panel_updated": 0,
+                    "panel_failed": 0,
+                }
 
             logger.info(
                 "🚚 Завершен переезд сквада %s → %s: обновлено %s подписок (%s не обновлены в панели)",
@@ -1091,357 +917,474 @@ class RemnaWaveService:
                 "success": False,
                 "error": "unexpected",
                 "message": str(error),
+                "updated": updated_subscriptions,
             }
         finally:
             await exit_stack.aclose()
 
-    async def sync_users_from_panel(self, db: AsyncSession, sync_type: str = "all") -> Dict[str, int]:
-        try:
-            stats = {"created": 0, "updated": 0, "errors": 0, "deleted": 0}
-            
-            logger.info(f"🔄 Начинаем синхронизацию типа: {sync_type}")
-            
-            async with self.get_api_client() as api:
-                panel_users = []
-                start = 0
-                size = 100 
-                
-                while True:
-                    logger.info(f"📥 Загружаем пользователей: start={start}, size={size}")
-                    
-                    response = await api.get_all_users(start=start, size=size)
-                    users_batch = response['users']
-                    total_users = response['total']
-                    
-                    logger.info(f"📊 Получено {len(users_batch)} пользователей из {total_users}")
-                    
-                    for user_obj in users_batch:
-                        user_dict = {
-                            'uuid': user_obj.uuid,
-                            'shortUuid': user_obj.short_uuid,
-                            'username': user_obj.username,
-                            'status': user_obj.status.value,
-                            'telegramId': user_obj.telegram_id,
-                            'expireAt': user_obj.expire_at.isoformat() + 'Z',
-                            'trafficLimitBytes': user_obj.traffic_limit_bytes,
-                            'usedTrafficBytes': user_obj.used_traffic_bytes,
-                            'hwidDeviceLimit': user_obj.hwid_device_limit,
-                            'subscriptionUrl': user_obj.subscription_url,
-                            'subscriptionCryptoLink': user_obj.happ_crypto_link,
-                            'activeInternalSquads': user_obj.active_internal_squads
-                        }
-                        panel_users.append(user_dict)
-                    
-                    if len(users_batch) < size:
-                        break
-                        
-                    start += size
-                    
-                    if start > total_users:
-                        break
-                
-                logger.info(f"✅ Всего загружено пользователей из панели: {len(panel_users)}")
-            
-            # Загрузка пользователей с их подписками за один запрос (bulk loading)
-            from sqlalchemy.orm import selectinload
-            from app.database.models import User, Subscription
-            from sqlalchemy import select
-            
-            # Получаем всех пользователей с их подписками за один запрос
-            bot_users_result = await db.execute(
-                select(User)
-                .options(selectinload(User.subscription))
+    async def _push_migrated_squads(
+        self,
+        api: Optional[RemnaWaveAPI],
+        semaphore: asyncio.Semaphore,
+        subscription: Subscription,
+        new_squads: List[str],
+    ) -> Optional[bool]:
+        """Обновляет сквады пользователя в панели; ``None``, если пользователя в панели нет."""
+        user = subscription.user
+        if not user or not user.remnawave_uuid:
+            return None
+
+        if api is None:
+            logger.error(
+                "❌ RemnaWave API недоступен для обновления пользователя %s",
+                user.telegram_id,
             )
-            bot_users = bot_users_result.scalars().all()
-            bot_users_by_telegram_id = {user.telegram_id: user for user in bot_users}
-            bot_users_by_uuid = {
-                user.remnawave_uuid: user
-                for user in bot_users
-                if getattr(user, "remnawave_uuid", None)
-            }
+            return False
 
-            logger.info(f"📊 Пользователей в боте: {len(bot_users)}")
-            
-            panel_users_with_tg = [
-                user for user in panel_users
-                if user.get('telegramId') is not None
-            ]
+        async with semaphore:
+            try:
+                await api.update_user(
+                    uuid=user.remnawave_uuid,
+                    active_internal_squads=new_squads,
+                )
+                return True
+            except Exception as error:
+                logger.error(
+                    "❌ Ошибка обновления сквадов пользователя %s: %s",
+                    user.telegram_id,
+                    error,
+                )
+                return False
+
+    async def sync_users_from_panel(
+        self,
+        db: AsyncSession,
+        sync_type: str = "all",
+        *,
+        changed_since: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Синхронизирует пользователей панели с ботом.
 
-            logger.info(f"📊 Пользователей в панели с Telegram ID: {len(panel_users_with_tg)}")
+        С ``changed_since`` сверяются только пользователи, у которых после этой метки
+        изменился ``updatedAt`` или наступил ``expireAt``; удаление пропавших из панели
+        пользователей в этом режиме не выполняется.
+        """
 
-            unique_panel_users_map = self._deduplicate_panel_users_by_telegram_id(panel_users_with_tg)
-            unique_panel_users = list(unique_panel_users_map.values())
-            duplicates_count = len(panel_users_with_tg) - len(unique_panel_users)
+        stats = self._empty_sync_stats()
+        stats["mode"] = "incremental" if changed_since else "full"
+        started = time.monotonic()
 
-            if duplicates_count:
+        try:
+            logger.info(f"🔄 Начинаем синхронизацию типа: {sync_type} ({stats['mode']})")
+
+            phase_started = time.monotonic()
+            async with self.get_api_client() as api:
+                if not await panel_snapshot_service.refresh(api, force=True):
+                    raise RemnaWaveAPIError(
+                        panel_snapshot_service.get_status().last_error or "не удалось загрузить пользователей панели"
+                    )
+            panel_users = [panel_user_to_dict(user) for user in panel_snapshot_service.iter_users()]
+            stats["phase_seconds"]["fetch"] = round(time.monotonic() - phase_started, 3)
+            logger.info(f"✅ Всего загружено пользователей из панели: {len(panel_users)}")
+
+            stats["watermark"] = self._panel_users_watermark(panel_users)
+            if changed_since:
+                panel_users = self._filter_changed_panel_users(panel_users, changed_since)
                 logger.info(
-                    "♻️ Обнаружено %s дубликатов пользователей по Telegram ID. Используем самые свежие записи.",
-                    duplicates_count,
+                    f"🔎 Изменено после {changed_since.isoformat()}: {len(panel_users)} пользователей"
                 )
 
-            panel_telegram_ids = set(unique_panel_users_map.keys())
-
-            # Для ускорения - подготовим данные о подписках
-            # Соберем все существующие подписки за один запрос
-            existing_subscriptions_result = await db.execute(
-                select(Subscription)
-                .join(User)
-                .options(selectinload(Subscription.user))
+            await self._apply_panel_users(
+                db,
+                panel_users,
+                sync_type=sync_type,
+                deactivate_missing=sync_type == "all" and not changed_since,
+                stats=stats,
             )
-            existing_subscriptions = existing_subscriptions_result.scalars().all()
-            
-            # Создадим словарь для быстрого доступа к подпискам
-            subscriptions_by_user_id = {sub.user_id: sub for sub in existing_subscriptions}
 
-            # Для оптимизации коммитим изменения каждые N пользователей
-            batch_size = 50
-            pending_uuid_mutations: List[_UUIDMapMutation] = []
+        except Exception as e:
+            logger.error(f"❌ Критическая ошибка синхронизации пользователей: {e}")
+            stats["errors"] += 1
 
-            for i, panel_user in enumerate(unique_panel_users):
-                uuid_mutation: Optional[_UUIDMapMutation] = None
-                try:
-                    telegram_id = panel_user.get('telegramId')
-                    if not telegram_id:
-                        continue
+        self._finalize_sync_stats(stats, started)
+        logger.info(
+            f"🎯 Синхронизация завершена: создано {stats['created']}, обновлено {stats['updated']}, "
+            f"деактивировано {stats['deleted']}, ошибок {stats['errors']} "
+            f"({stats['rows_per_second']} строк/с, этапы: {stats['phase_seconds']})"
+        )
+        return stats
 
-                    if (i + 1) % 10 == 0:
-                        logger.info(f"🔄 Обрабатываем пользователя {i+1}/{len(unique_panel_users)}: {telegram_id}")
-                    
-                    db_user = bot_users_by_telegram_id.get(telegram_id)
-                    
-                    if not db_user:
-                        if sync_type in ["new_only", "all"]:
-                            logger.info(f"🆕 Создание пользователя для telegram_id {telegram_id}")
+    def _panel_users_watermark(self, panel_users: List[Dict[str, Any]]) -> Optional[datetime]:
+        watermark = None
+        for panel_user in panel_users:
+            if not panel_user.get('updatedAt'):
+                continue
+            updated_at = self._parse_remnawave_date(panel_user['updatedAt'])
+            if watermark is None or updated_at > watermark:
+                watermark = updated_at
+        return watermark
 
-                            db_user, is_created = await self._get_or_create_bot_user_from_panel(db, panel_user)
+    def _filter_changed_panel_users(
+        self,
+        panel_users: List[Dict[str, Any]],
+        changed_since: datetime,
+    ) -> List[Dict[str, Any]]:
+        now = self._now_utc()
+        changed = []
+        for panel_user in panel_users:
+            updated_raw = panel_user.get('updatedAt')
+            if not updated_raw or self._parse_remnawave_date(updated_raw) > changed_since:
+                changed.append(panel_user)
+                continue
+            # Истечение подписки не меняет updatedAt, но переводит её в EXPIRED
+            expire_at = self._parse_remnawave_date(panel_user.get('expireAt', ''))
+            if changed_since < expire_at <= now:
+                changed.append(panel_user)
+        return changed
+
+    @staticmethod
+    def _empty_sync_stats() -> Dict[str, Any]:
+        return {
+            "mode": "full",
+            "watermark": None,
+            "created": 0,
+            "updated": 0,
+            "deleted": 0,
+            "unchanged": 0,
+            "errors": 0,
+            "panel_users": 0,
+            "duration_seconds": 0.0,
+            "rows_per_second": 0.0,
+            "phase_seconds": {},
+        }
 
-                            if not db_user:
-                                logger.error(
-                                    "❌ Не удалось создать или получить пользователя для telegram_id %s",
-                                    telegram_id,
-                                )
-                                stats["errors"] += 1
-                                continue
-
-                            bot_users_by_telegram_id[telegram_id] = db_user
-
-                            # При синхронизации не обновляем имя и username пользователя
-                            # только сохраняем изменения, если были обновлены другие поля (подписка и т.д.)
-                            updated_fields = []
-                            # Если были обновлены другие поля (подписка, статус и т.д.), сохраняем изменения
-                            if updated_fields:
-                                logger.info(f"🔄 Обновлены поля {updated_fields} для пользователя {telegram_id}")
-                                await db.flush()  # Сохраняем изменения без коммита
-
-                            _, uuid_mutation = self._ensure_user_remnawave_uuid(
-                                db_user,
-                                panel_user.get('uuid'),
-                                bot_users_by_uuid,
-                            )
+    @staticmethod
+    def _finalize_sync_stats(stats: Dict[str, Any], started: float) -> None:
+        duration = time.monotonic() - started
+        stats["duration_seconds"] = round(duration, 3)
+        stats["rows_per_second"] = round(stats["panel_users"] / duration, 1) if duration > 0 else 0.0
 
-                            if is_created:
-                                await self._create_subscription_from_panel_data(db, db_user, panel_user)
-                                stats["created"] += 1
-                                logger.info(f"✅ Создан пользователь {telegram_id} с подпиской")
-                            else:
-                                # Обновляем данные существующего пользователя
-                                # Но теперь мы уже загрузили подписку с пользователем, нет необходимости перезагружать
-                                await self._update_subscription_from_panel_data(db, db_user, panel_user)
-                                stats["updated"] += 1
-                                logger.info(
-                                    f"♻️ Обновлена подписка существующего пользователя {telegram_id}"
-                                )
-                    
-                    else:
-                        if sync_type in ["update_only", "all"]:
-                            logger.debug(f"🔄 Обновление пользователя {telegram_id}")
-                            
-                            # При синхронизации не обновляем имя и username пользователя
-                            # только сохраняем изменения, если были обновлены другие поля (подписка и т.д.)
-                            updated_fields = []
-                            # Если были обновлены другие поля (подписка, статус и т.д.), сохраняем изменения
-                            if updated_fields:
-                                logger.info(f"🔄 Обновлены поля {updated_fields} для пользователя {telegram_id}")
-                                await db.flush()  # Сохраняем изменения без коммита
-                            
-                            # Проверяем, есть ли у пользователя подписка, загруженная с пользователем
-                            if hasattr(db_user, 'subscription') and db_user.subscription:
-                                # Используем уже загруженную подписку
-                                await self._update_subscription_from_panel_data(db, db_user, panel_user)
-                            else:
-                                # Если подписки нет, создаем новую
-                                await self._create_subscription_from_panel_data(db, db_user, panel_user)
+    @property
+    def _sync_chunk_size(self) -> int:
+        return max(1, int(getattr(settings, 'REMNAWAVE_SYNC_CHUNK_SIZE', 1000)))
 
-                            _, uuid_mutation = self._ensure_user_remnawave_uuid(
-                                db_user,
-                                panel_user.get('uuid'),
-                                bot_users_by_uuid,
-                            )
+    async def _apply_panel_users(
+        self,
+        db: AsyncSession,
+        panel_users: List[Dict[str, Any]],
+        *,
+        sync_type: str,
+        deactivate_missing: bool,
+        stats: Dict[str, Any],
+    ) -> None:
+        """Сверяет пользователей панели с базой и применяет разницу пачками.
+
+        Состояние бота загружается только колонками, разница считается по telegram_id/uuid,
+        а изменения пишутся chunked ``INSERT ... ON CONFLICT`` и bulk ``UPDATE``.
+        """
 
-                            stats["updated"] += 1
-                            logger.debug(f"✅ Обновлён пользователь {telegram_id}")
-
-                except Exception as user_error:
-                    logger.error(f"❌ Ошибка обработки пользователя {telegram_id}: {user_error}")
-                    stats["errors"] += 1
-                    if uuid_mutation:
-                        uuid_mutation.rollback()
-                    if pending_uuid_mutations:
-                        for mutation in reversed(pending_uuid_mutations):
-                            mutation.rollback()
-                        pending_uuid_mutations.clear()
-                    try:
-                        await db.rollback()  # Выполняем rollback при ошибке
-                    except:
-                        pass
+        phases = stats["phase_seconds"]
+
+        phase_started = time.monotonic()
+        unique_panel_users = self._deduplicate_panel_users_by_telegram_id(panel_users)
+        duplicates_count = sum(1 for user in panel_users if user.get('telegramId') is not None) - len(unique_panel_users)
+        if duplicates_count:
+            logger.info(
+                "♻️ Обнаружено %s дубликатов пользователей по Telegram ID. Используем самые свежие записи.",
+                duplicates_count,
+            )
+        stats["panel_users"] += len(unique_panel_users)
+
+        bot_users, bot_subscriptions = await self._load_sync_state(
+            db,
+            None if deactivate_missing else list(unique_panel_users.keys()),
+        )
+        phases["load"] = round(time.monotonic() - phase_started, 3)
+        logger.info(f"📊 Пользователей в боте: {len(bot_users)}, в панели с Telegram ID: {len(unique_panel_users)}")
+
+        phase_started = time.monotonic()
+        now = self._now_utc()
+        user_ids_by_uuid = {
+            row["remnawave_uuid"]: row["id"]
+            for row in bot_users.values()
+            if row["remnawave_uuid"]
+        }
+        user_inserts: List[Dict[str, Any]] = []
+        user_updates: Dict[int, Dict[str, Any]] = {}
+        subscription_upserts: List[Dict[str, Any]] = []
+        pending_subscriptions: Dict[int, Dict[str, Any]] = {}
+
+        for telegram_id, panel_user in unique_panel_users.items():
+            subscription_values = self._subscription_values_from_panel(panel_user, now)
+            bot_user = bot_users.get(telegram_id)
+
+            if bot_user is None:
+                if sync_type not in ("new_only", "all"):
                     continue
+                first_name, last_name, username = self._extract_user_data_from_description(
+                    panel_user.get("description") or ""
+                )
+                user_inserts.append({
+                    "telegram_id": telegram_id,
+                    "username": username or panel_user.get("username"),
+                    "first_name": first_name or f"User {telegram_id}",
+                    "last_name": last_name if first_name else None,
+                    "language_code": "ru",
+                    "remnawave_uuid": panel_user.get("uuid"),
+                    "remnawave_short_uuid": panel_user.get("shortUuid"),
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                pending_subscriptions[telegram_id] = subscription_values
+                continue
 
-                else:
-                    if uuid_mutation and uuid_mutation.has_changes():
-                        pending_uuid_mutations.append(uuid_mutation)
+            if sync_type not in ("update_only", "all"):
+                continue
 
-                # Коммитим изменения каждые N пользователей для ускорения
-                if (i + 1) % batch_size == 0:
-                    try:
-                        await db.commit()
-                        logger.debug(f"📦 Коммит изменений после обработки {i+1} пользователей")
-                        pending_uuid_mutations.clear()
-                    except Exception as commit_error:
-                        logger.error(f"❌ Ошибка коммита после обработки {i+1} пользователей: {commit_error}")
-                        await db.rollback()
-                        for mutation in reversed(pending_uuid_mutations):
-                            mutation.rollback()
-                        pending_uuid_mutations.clear()
-                        stats["errors"] += batch_size  # Учитываем ошибки за всю группу
+            changed = False
+            panel_uuid = panel_user.get("uuid")
+            panel_short_uuid = panel_user.get("shortUuid")
+            if panel_uuid and (
+                bot_user["remnawave_uuid"] != panel_uuid
+                or (panel_short_uuid and bot_user["remnawave_short_uuid"] != panel_short_uuid)
+            ):
+                conflicting_user_id = user_ids_by_uuid.get(panel_uuid)
+                if conflicting_user_id and conflicting_user_id != bot_user["id"]:
+                    logger.warning(
+                        "♻️ Обнаружен конфликт UUID %s между пользователями. Сбрасываем у старой записи.",
+                        panel_uuid,
+                    )
+                    user_updates.setdefault(conflicting_user_id, {"id": conflicting_user_id}).update(
+                        remnawave_uuid=None,
+                        remnawave_short_uuid=None,
+                        updated_at=now,
+                    )
+                user_updates.setdefault(bot_user["id"], {"id": bot_user["id"]}).update(
+                    remnawave_uuid=panel_uuid,
+                    remnawave_short_uuid=panel_short_uuid or bot_user["remnawave_short_uuid"],
+                    updated_at=now,
+                )
+                user_ids_by_uuid[panel_uuid] = bot_user["id"]
+                changed = True
+
+            subscription = bot_subscriptions.get(bot_user["id"])
+            if subscription is None or self._subscription_differs(subscription, subscription_values):
+                subscription_upserts.append({"user_id": bot_user["id"], **subscription_values})
+                changed = True
 
-            # Коммитим оставшиеся изменения
+            if changed:
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+
+        panel_telegram_ids = set(unique_panel_users.keys())
+        missing_users = []
+        if deactivate_missing:
+            missing_users = [
+                row for telegram_id, row in bot_users.items()
+                if telegram_id not in panel_telegram_ids
+                and row["id"] in bot_subscriptions
+                and (
+                    row["remnawave_uuid"]
+                    or bot_subscriptions[row["id"]]["status"] != SubscriptionStatus.INACTIVE
+                )
+            ]
+            if missing_users and not unique_panel_users:
+                logger.warning(
+                    "⚠️ Панель вернула 0 пользователей — деактивация %s подписок пропущена",
+                    len(missing_users),
+                )
+                missing_users = []
+        phases["diff"] = round(time.monotonic() - phase_started, 3)
+
+        phase_started = time.monotonic()
+        chunk_size = self._sync_chunk_size
+        for offset in range(0, len(user_inserts), chunk_size):
+            chunk = user_inserts[offset:offset + chunk_size]
             try:
+                statement = self._upsert_statement(db, User)
+                result = await db.execute(
+                    statement
+                    .on_conflict_do_update(
+                        index_elements=[User.telegram_id],
+                        set_={
+                            "remnawave_uuid": statement.excluded.remnawave_uuid,
+                            "remnawave_short_uuid": statement.excluded.remnawave_short_uuid,
+                            "updated_at": now,
+                        },
+                    )
+                    .returning(User.id, User.telegram_id),
+                    chunk,
+                )
+                for user_id, telegram_id in result.all():
+                    subscription_upserts.append({"user_id": user_id, **pending_subscriptions[telegram_id]})
                 await db.commit()
-                pending_uuid_mutations.clear()
-            except Exception as final_commit_error:
-                logger.error(f"❌ Ошибка финального коммита: {final_commit_error}")
+                stats["created"] += len(chunk)
+            except Exception as chunk_error:
                 await db.rollback()
-                for mutation in reversed(pending_uuid_mutations):
-                    mutation.rollback()
-                pending_uuid_mutations.clear()
+                logger.error(f"❌ Ошибка создания пачки из {len(chunk)} пользователей: {chunk_error}")
+                stats["errors"] += len(chunk)
 
-            if sync_type == "all":
-                logger.info("🗑️ Деактивация подписок пользователей, отсутствующих в панели...")
-
-                batch_size = 50
-                processed_count = 0
-                cleanup_uuid_mutations: List[_UUIDMapMutation] = []
+        update_rows = list(user_updates.values())
+        for offset in range(0, len(update_rows), chunk_size):
+            chunk = update_rows[offset:offset + chunk_size]
+            try:
+                await db.execute(update(User), chunk)
+                await db.commit()
+            except Exception as chunk_error:
+                await db.rollback()
+                logger.error(f"❌ Ошибка обновления пачки из {len(chunk)} пользователей: {chunk_error}")
+                stats["errors"] += len(chunk)
+        phases["apply_users"] = round(time.monotonic() - phase_started, 3)
 
-                for telegram_id, db_user in bot_users_by_telegram_id.items():
-                    if telegram_id not in panel_telegram_ids and hasattr(db_user, 'subscription') and db_user.subscription:
-                        cleanup_mutation: Optional[_UUIDMapMutation] = None
-                        try:
-                            logger.info(f"🗑️ Деактивация подписки пользователя {telegram_id} (нет в панели)")
+        phase_started = time.monotonic()
+        for offset in range(0, len(subscription_upserts), chunk_size):
+            chunk = subscription_upserts[offset:offset + chunk_size]
+            try:
+                statement = self._upsert_statement(db, Subscription)
+                await db.execute(
+                    statement
+                    .on_conflict_do_update(
+                        index_elements=[Subscription.user_id],
+                        set_={
+                            "status": statement.excluded.status,
+                            "expires_at": statement.excluded.expires_at,
+                            "updated_at": now,
+                        },
+                    ),
+                    chunk,
+                )
+                await db.commit()
+            except Exception as chunk_error:
+                await db.rollback()
+                logger.error(f"❌ Ошибка записи пачки из {len(chunk)} подписок: {chunk_error}")
+                stats["errors"] += len(chunk)
+        phases["apply_subscriptions"] = round(time.monotonic() - phase_started, 3)
 
-                            subscription = db_user.subscription
-                            
-                            if db_user.remnawave_uuid:
-                                try:
-                                    async with self.get_api_client() as api:
-                                        devices_reset = await api.reset_user_devices(db_user.remnawave_uuid)
-                                        if devices_reset:
-                                            logger.info(f"🔧 Сброшены HWID устройства для пользователя {telegram_id}")
-                                except Exception as hwid_error:
-                                    logger.error(f"❌ Ошибка сброса HWID устройств для {telegram_id}: {hwid_error}")
-                            
-                            try:
-                                from sqlalchemy import delete
-                                from app.database.models import SubscriptionServer
+        if missing_users:
+            phase_started = time.monotonic()
+            logger.info(f"🗑️ Деактивация подписок {len(missing_users)} пользователей, отсутствующих в панели...")
+            await self._deactivate_missing_users(db, missing_users, bot_subscriptions, stats)
+            phases["deactivate"] = round(time.monotonic() - phase_started, 3)
 
-                                await decrement_subscription_server_counts(db, subscription)
+    async def _load_sync_state(
+        self,
+        db: AsyncSession,
+        telegram_ids: Optional[List[int]],
+    ) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+        """Загружает пользователей и подписки бота только нужными колонками."""
+
+        user_query = select(
+            User.id,
+            User.telegram_id,
+            User.remnawave_uuid,
+            User.remnawave_short_uuid,
+        )
+        subscription_query = select(
+            Subscription.id,
+            Subscription.user_id,
+            Subscription.status,
+            Subscription.expires_at,
+        )
 
-                                await db.execute(
-                                    delete(SubscriptionServer).where(
-                                        SubscriptionServer.subscription_id == subscription.id
-                                    )
-                                )
-                                logger.info(f"🗑️ Удалены серверы подписки для {telegram_id}")
-                            except Exception as servers_error:
-                                logger.warning(f"⚠️ Не удалось удалить серверы подписки: {servers_error}")
-                            
-                            from app.database.models import SubscriptionStatus
-                            
-                            subscription.status = SubscriptionStatus.DISABLED.value
-                            subscription.is_trial = True 
-                            subscription.end_date = datetime.utcnow()
-                            subscription.traffic_limit_gb = 0
-                            subscription.traffic_used_gb = 0.0
-                            subscription.device_limit = 1
-                            subscription.connected_squads = []
-                            subscription.autopay_enabled = False
-                            subscription.remnawave_short_uuid = None
-                            subscription.subscription_url = ""
-                            subscription.subscription_crypto_link = ""
+        if telegram_ids is None:
+            user_rows = (await db.execute(user_query)).all()
+            subscription_rows = (await db.execute(subscription_query)).all()
+        else:
+            user_rows = []
+            subscription_rows = []
+            chunk_size = self._sync_chunk_size
+            for offset in range(0, len(telegram_ids), chunk_size):
+                chunk = telegram_ids[offset:offset + chunk_size]
+                user_rows.extend((await db.execute(user_query.where(User.telegram_id.in_(chunk)))).all())
+                subscription_rows.extend((await db.execute(
+                    subscription_query.join(User, User.id == Subscription.user_id).where(User.telegram_id.in_(chunk))
+                )).all())
+
+        bot_users = {row.telegram_id: dict(row._mapping) for row in user_rows}
+        bot_subscriptions = {row.user_id: dict(row._mapping) for row in subscription_rows}
+        return bot_users, bot_subscriptions
+
+    def _subscription_values_from_panel(self, panel_user: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        expire_at = self._parse_remnawave_date(panel_user.get('expireAt', ''))
+        panel_status = (panel_user.get('status') or 'ACTIVE').upper()
+
+        if panel_status == 'ACTIVE' and expire_at > now:
+            status = SubscriptionStatus.ACTIVE
+        elif expire_at <= now:
+            status = SubscriptionStatus.EXPIRED
+        else:
+            status = SubscriptionStatus.INACTIVE
 
-                            old_uuid = getattr(db_user, "remnawave_uuid", None)
-                            cleanup_mutation = _UUIDMapMutation(bot_users_by_uuid)
-                            if old_uuid:
-                                cleanup_mutation.remove_map_entry(old_uuid)
-                            cleanup_mutation.set_user_uuid(db_user, None)
-                            cleanup_mutation.set_user_updated_at(db_user, datetime.utcnow())
+        return {"status": status, "expires_at": expire_at, "updated_at": now}
 
-                            stats["deleted"] += 1
-                            logger.info(f"✅ Деактивирована подписка пользователя {telegram_id} (сохранен баланс)")
+    @staticmethod
+    def _subscription_differs(current: Dict[str, Any], values: Dict[str, Any]) -> bool:
+        if current["status"] != values["status"]:
+            return True
+        current_expire = current["expires_at"]
+        if current_expire is None:
+            return True
+        return abs((current_expire - values["expires_at"]).total_seconds()) > 60
 
-                            processed_count += 1
+    @staticmethod
+    def _upsert_statement(db: AsyncSession, model):
+        if db.bind.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert(model)
 
-                        except Exception as delete_error:
-                            logger.error(f"❌ Ошибка деактивации подписки {telegram_id}: {delete_error}")
-                            stats["errors"] += 1
-                            if cleanup_mutation:
-                                cleanup_mutation.rollback()
-                            if cleanup_uuid_mutations:
-                                for mutation in reversed(cleanup_uuid_mutations):
-                                    mutation.rollback()
-                                cleanup_uuid_mutations.clear()
-                            try:
-                                await db.rollback()
-                            except:
-                                pass
-                        else:
-                            if cleanup_mutation and cleanup_mutation.has_changes():
-                                cleanup_uuid_mutations.append(cleanup_mutation)
+    async def _deactivate_missing_users(
+        self,
+        db: AsyncSession,
+        missing_users: List[Dict[str, Any]],
+        bot_subscriptions: Dict[int, Dict[str, Any]],
+        stats: Dict[str, Any],
+    ) -> None:
+        uuids = [row["remnawave_uuid"] for row in missing_users if row["remnawave_uuid"]]
+        if uuids:
+            semaphore = asyncio.Semaphore(max(1, int(getattr(settings, 'REMNAWAVE_SYNC_CONCURRENCY', 10))))
+
+            async def reset_devices(api, uuid: str) -> None:
+                async with semaphore:
+                    try:
+                        await api.reset_user_devices(uuid)
+                    except Exception as hwid_error:
+                        logger.error(f"❌ Ошибка сброса HWID устройств для {uuid}: {hwid_error}")
 
-                            # Коммитим изменения каждые N пользователей
-                            if processed_count % batch_size == 0:
-                                try:
-                                    await db.commit()
-                                    logger.debug(f"📦 Коммит изменений после деактивации {processed_count} подписок")
-                                    cleanup_uuid_mutations.clear()
-                                except Exception as commit_error:
-                                    logger.error(f"❌ Ошибка коммита после деактивации {processed_count} подписок: {commit_error}")
-                                    await db.rollback()
-                                    for mutation in reversed(cleanup_uuid_mutations):
-                                        mutation.rollback()
-                                    cleanup_uuid_mutations.clear()
-                                    stats["errors"] += batch_size
-                                    break  # Прерываем цикл при ошибке коммита
-                    else:
-                        # Увеличиваем счетчик для отслеживания прогресса
-                        processed_count += 1
+            try:
+                async with self.get_api_client() as api:
+                    await asyncio.gather(*(reset_devices(api, uuid) for uuid in uuids))
+            except Exception as api_error:
+                logger.error(f"❌ Не удалось сбросить HWID устройства: {api_error}")
 
-                # Коммитим оставшиеся изменения
-                try:
-                    await db.commit()
-                    cleanup_uuid_mutations.clear()
-                except Exception as final_commit_error:
-                    logger.error(f"❌ Ошибка финального коммита при деактивации: {final_commit_error}")
-                    await db.rollback()
-                    for mutation in reversed(cleanup_uuid_mutations):
-                        mutation.rollback()
-                    cleanup_uuid_mutations.clear()
-            
-            logger.info(f"🎯 Синхронизация завершена: создано {stats['created']}, обновлено {stats['updated']}, деактивировано {stats['deleted']}, ошибок {stats['errors']}")
-            return stats
-        
-        except Exception as e:
-            logger.error(f"❌ Критическая ошибка синхронизации пользователей: {e}")
-            return {"created": 0, "updated": 0, "errors": 1, "deleted": 0}
+        now = self._now_utc()
+        chunk_size = self._sync_chunk_size
+        for offset in range(0, len(missing_users), chunk_size):
+            chunk = missing_users[offset:offset + chunk_size]
+            user_ids = [row["id"] for row in chunk]
+            subscription_ids = [bot_subscriptions[user_id]["id"] for user_id in user_ids]
+            try:
+                await db.execute(
+                    delete(SubscriptionServer).where(SubscriptionServer.subscription_id.in_(subscription_ids))
+                )
+                await db.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(subscription_ids))
+                    .values(status=SubscriptionStatus.INACTIVE, expires_at=now, updated_at=now)
+                )
+                await db.execute(
+                    update(User)
+                    .where(User.id.in_(user_ids))
+                    .values(remnawave_uuid=None, remnawave_short_uuid=None, updated_at=now)
+                )
+                await db.commit()
+                stats["deleted"] += len(chunk)
+            except Exception as delete_error:
+                await db.rollback()
+                logger.error(f"❌ Ошибка деактивации пачки из {len(chunk)} подписок: {delete_error}")
+                stats["errors"] += len(chunk)
 
     async def _create_subscription_from_panel_data(self, db: AsyncSession, user, panel_user):
         try:
@@ -2125,14 +2068,13 @@ class RemnaWaveService:
             logger.info("🔄 Начинаем синхронизацию статусов подписок...")
         
             async with self.get_api_client() as api:
-                panel_users_data = await api._make_request('GET', '/api/users')
-                panel_users = panel_users_data['response']['users']
+                if not await panel_snapshot_service.ensure_fresh(api):
+                    raise RemnaWaveAPIError("Не удалось получить снимок пользователей панели")
         
             panel_users_dict = {}
-            for panel_user in panel_users:
-                telegram_id = panel_user.get('telegramId')
-                if telegram_id:
-                    panel_users_dict[telegram_id] = panel_user
+            for panel_user in panel_snapshot_service.iter_users():
+                if panel_user.telegram_id:
+                    panel_users_dict[panel_user.telegram_id] = panel_user_to_dict(panel_user)
         
             logger.info(f"📊 Найдено {len(panel_users_dict)} пользователей в панели для синхронизации")
         
@@ -2188,6 +2130,12 @@ class RemnaWaveService:
         
             logger.info("🔍 Начинаем валидацию подписок...")
             
+            try:
+                async with self.get_api_client() as api:
+                    await panel_snapshot_service.ensure_fresh(api)
+            except Exception as snapshot_error:
+                logger.warning(f"⚠️ Снимок панели недоступен, используем точечные запросы: {snapshot_error}")
+            
             from app.database.crud.subscription import get_all_subscriptions
             from app.database.models import SubscriptionStatus
         
@@ -2214,14 +2162,16 @@ class RemnaWaveService:
                 
                         if not subscription.remnawave_short_uuid and user.remnawave_uuid:
                             try:
-                                async with self.get_api_client() as api:
-                                    rw_user = await api.get_user_by_uuid(user.remnawave_uuid)
-                                    if rw_user:
-                                        subscription.remnawave_short_uuid = rw_user.short_uuid
-                                        subscription.subscription_url = rw_user.subscription_url
-                                        subscription.subscription_crypto_link = rw_user.happ_crypto_link
-                                        logger.info(f"🔧 Восстановлены данные Remnawave для {user.telegram_id}")
-                                        issues_fixed += 1
+                                rw_user = panel_snapshot_service.get_by_uuid(user.remnawave_uuid)
+                                if not rw_user and not panel_snapshot_service.is_fresh():
+                                    async with self.get_api_client() as api:
+                                        rw_user = await api.get_user_by_uuid(user.remnawave_uuid)
+                                if rw_user:
+                                    subscription.remnawave_short_uuid = rw_user.short_uuid
+                                    subscription.subscription_url = rw_user.subscription_url
+                                    subscription.subscription_crypto_link = rw_user.happ_crypto_link
+                                    logger.info(f"🔧 Восстановлены данные Remnawave для {user.telegram_id}")
+                                    issues_fixed += 1
                             except Exception as rw_error:
                                 logger.warning(f"⚠️ Не удалось получить данные Remnawave для {user.telegram_id}: {rw_error}")
                     
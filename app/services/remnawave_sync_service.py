@@ -32,6 +32,12 @@ class RemnaWaveAutoSyncStatus:
     last_user_stats: Optional[Dict[str, Any]]
     last_server_stats: Optional[Dict[str, Any]]
     is_running: bool
+    incremental_enabled: bool
+    last_run_mode: Optional[str]
+    watermark: Optional[datetime]
+    last_full_sync_at: Optional[datetime]
+    next_full_sync_due: Optional[datetime]
+    full_sync_interval_hours: int
 
 
 class RemnaWaveAutoSyncService:
@@ -58,6 +64,21 @@ class RemnaWaveAutoSyncService:
         self._last_run_error: Optional[str] = None
         self._last_user_stats: Optional[Dict[str, Any]] = None
         self._last_server_stats: Optional[Dict[str, Any]] = None
+        self._last_run_mode: Optional[str] = None
+        self._watermark: Optional[datetime] = None
+        self._last_full_sync_at: Optional[datetime] = None
+
+    @property
+    def incremental_enabled(self) -> bool:
+        return bool(getattr(settings, 'REMNAWAVE_INCREMENTAL_SYNC_ENABLED', True))
+
+    @property
+    def full_sync_interval(self) -> timedelta:
+        return timedelta(hours=max(0, int(getattr(settings, 'REMNAWAVE_FULL_SYNC_INTERVAL_HOURS', 24))))
+
+    @property
+    def watermark_overlap(self) -> timedelta:
+        return timedelta(seconds=max(0, int(getattr(settings, 'REMNAWAVE_SYNC_WATERMARK_OVERLAP_SECONDS', 300))))
 
     async def initialize(self) -> None:
         self._loop = asyncio.get_running_loop()
@@ -124,19 +145,38 @@ class RemnaWaveAutoSyncService:
             self._scheduler_task = None
             self._next_run = None
 
-    async def run_sync_now(self, *, reason: str = "manual") -> Dict[str, Any]:
+    async def run_sync_now(
+        self,
+        *,
+        reason: str = "manual",
+        full: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """Запускает синхронизацию.
+
+        ``full=None`` выбирает режим автоматически: инкрементальный, если есть метка
+        и полная синхронизация проводилась не раньше ``REMNAWAVE_FULL_SYNC_INTERVAL_HOURS``.
+        """
+
         if self._sync_lock.locked():
             return {"started": False, "reason": "already_running"}
 
         async with self._sync_lock:
-            self._last_run_started_at = datetime.utcnow()
+            started_at = datetime.utcnow()
+            self._last_run_started_at = started_at
             self._last_run_finished_at = None
             self._last_run_reason = reason
             self._last_run_error = None
             self._last_run_success = None
 
+            if full is None:
+                full = reason == "manual" or self._is_full_sync_due(started_at)
+            changed_since = None
+            if not full and self._watermark is not None:
+                changed_since = self._watermark - self.watermark_overlap
+            self._last_run_mode = "incremental" if changed_since else "full"
+
             try:
-                user_stats, server_stats = await self._perform_sync()
+                user_stats, server_stats = await self._perform_sync(changed_since)
             except RemnaWaveConfigurationError as error:
                 message = str(error)
                 self._last_run_error = message
@@ -168,6 +208,8 @@ class RemnaWaveAutoSyncService:
                     "server_stats": None,
                 }
 
+            self._advance_watermark(user_stats, full=changed_since is None, started_at=started_at)
+
             self._last_run_success = True
             self._last_run_error = None
             self._last_user_stats = user_stats
@@ -198,8 +240,42 @@ class RemnaWaveAutoSyncService:
             last_user_stats=self._last_user_stats,
             last_server_stats=self._last_server_stats,
             is_running=self._sync_lock.locked(),
+            incremental_enabled=self.incremental_enabled,
+            last_run_mode=self._last_run_mode,
+            watermark=self._watermark,
+            last_full_sync_at=self._last_full_sync_at,
+            next_full_sync_due=(
+                self._last_full_sync_at + self.full_sync_interval
+                if self._last_full_sync_at
+                else None
+            ),
+            full_sync_interval_hours=int(self.full_sync_interval.total_seconds() // 3600),
         )
 
+    def _is_full_sync_due(self, now: datetime) -> bool:
+        if not self.incremental_enabled or self._watermark is None:
+            return True
+        if self._last_full_sync_at is None:
+            return True
+        return now - self._last_full_sync_at >= self.full_sync_interval
+
+    def _advance_watermark(
+        self,
+        user_stats: Dict[str, Any],
+        *,
+        full: bool,
+        started_at: datetime,
+    ) -> None:
+        # Метка двигается только после прогона без ошибок, иначе изменения будут потеряны
+        if not user_stats or user_stats.get("errors"):
+            return
+
+        watermark = user_stats.get("watermark")
+        if watermark and (self._watermark is None or watermark > self._watermark):
+            self._watermark = watermark
+        if full:
+            self._last_full_sync_at = started_at
+
     async def _run_scheduler(self, times: List[time]) -> None:
         try:
             while True:
@@ -220,7 +296,10 @@ class RemnaWaveAutoSyncService:
         self._service = self._service_factory()
         return self._service
 
-    async def _perform_sync(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    async def _perform_sync(
+        self,
+        changed_since: Optional[datetime] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         service = self._refresh_service()
 
         if not service.is_configured:
@@ -229,7 +308,11 @@ class RemnaWaveAutoSyncService:
             )
 
         async with AsyncSessionLocal() as session:
-            user_stats = await service.sync_users_from_panel(session, "all")
+            user_stats = await service.sync_users_from_panel(
+                session,
+                "all",
+                changed_since=changed_since,
+            )
             server_stats = await self._sync_servers(session, service)
 
         return user_stats, server_stats
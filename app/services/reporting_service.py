@@ -10,23 +10,22 @@ from zoneinfo import ZoneInfo
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from sqlalchemy import cast, func, not_, or_, select
+from sqlalchemy import cast, func, or_, select
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.sql import false, true
+from sqlalchemy.sql import false
 
 from app.config import settings
+from app.database.crud.stats import stats_day
 from app.database.crud.subscription import get_subscriptions_statistics
 from app.database.database import AsyncSessionLocal
 from app.database.models import (
     Subscription,
-    SubscriptionConversion,
     SubscriptionStatus,
     Ticket,
     TicketStatus,
-    Transaction,
-    TransactionType,
     User,
 )
+from app.services.stats_rollup_service import stats_rollup_service
 
 
 logger = logging.getLogger(__name__)
@@ -181,58 +180,6 @@ class ReportingService:
             logger.error("Не удалось отправить отчет: %s", exc)
             raise ReportingServiceError("Не удалось отправить отчет в чат") from exc
 
-    # ---------- referral helpers ----------
-
-    def _referral_markers(self) -> List:
-        """
-        Набор условий, по которым операция помечается как реферальная (если вдруг записана типом DEPOSIT).
-        """
-        clauses = []
-
-        # Явные флаги
-        if hasattr(Transaction, "is_referral_bonus"):
-            clauses.append(Transaction.is_referral_bonus == true())
-        if hasattr(Transaction, "is_bonus"):
-            clauses.append(Transaction.is_bonus == true())
-
-        # Источник/причина
-        if hasattr(Transaction, "source"):
-            clauses.append(Transaction.source == "referral")
-            clauses.append(Transaction.source == "referral_bonus")
-        if hasattr(Transaction, "reason"):
-            clauses.append(Transaction.reason == "referral")
-            clauses.append(Transaction.reason == "referral_bonus")
-            clauses.append(Transaction.reason == "referral_reward")
-
-        # Текстовые поля
-        like_patterns = ["%реферал%", "%реферальн%", "%referral%"]
-        if hasattr(Transaction, "description"):
-            for pattern in like_patterns:
-                try:
-                    clauses.append(Transaction.description.ilike(pattern))
-                except Exception:  # noqa: BLE001 - best effort
-                    pass
-        if hasattr(Transaction, "comment"):
-            for pattern in like_patterns:
-                try:
-                    clauses.append(Transaction.comment.ilike(pattern))
-                except Exception:  # noqa: BLE001 - best effort
-                    pass
-
-        return [clause for clause in clauses if clause is not None]
-
-    def _exclude_referral_deposits_condition(self):
-        """
-        Условие «это НЕ реферальный бонус».
-        Если нет ни одного маркера — ничего не исключаем.
-        """
-        markers = self._referral_markers()
-        if not markers:
-            return true()
-        return not_(or_(*markers))
-
-    # --------------------------------------
-
     async def _build_report(
         self,
         period: ReportPeriod,
@@ -384,123 +331,25 @@ class ReportingService:
         start_utc: datetime,
         end_utc: datetime,
     ) -> dict:
-        new_users = int(
-            (
-                await session.execute(
-                    select(func.count(User.id)).where(
-                        User.created_at >= start_utc,
-                        User.created_at < end_utc,
-                    )
-                )
-            ).scalar()
-            or 0
-        )
-
-        new_trials = int(
-            (
-                await session.execute(
-                    select(func.count(Subscription.id)).where(
-                        Subscription.created_at >= start_utc,
-                        Subscription.created_at < end_utc,
-                        Subscription.is_trial == true(),
-                    )
-                )
-            ).scalar()
-            or 0
-        )
-
-        direct_paid = int(
-            (
-                await session.execute(
-                    select(func.count(Subscription.id)).where(
-                        Subscription.created_at >= start_utc,
-                        Subscription.created_at < end_utc,
-                        Subscription.is_trial == false(),
-                    )
-                )
-            ).scalar()
-            or 0
-        )
-
-        trial_to_paid_conversions = int(
-            (
-                await session.execute(
-                    select(func.count(SubscriptionConversion.id)).where(
-                        SubscriptionConversion.converted_at >= start_utc,
-                        SubscriptionConversion.converted_at < end_utc,
-                    )
-                )
-            ).scalar()
-            or 0
-        )
-
-        subscription_payments_count, subscription_payments_amount = (
-            (
-                await session.execute(
-                    self._txn_query_base(
-                        TransactionType.SUBSCRIPTION_PAYMENT.value,
-                        start_utc,
-                        end_utc,
-                    )
-                )
-            ).one()
-        )
-
-        deposits_count, deposits_amount = (
-            (
-                await session.execute(
-                    self._deposit_query_excluding_referrals(start_utc, end_utc)
-                )
-            ).one()
-        )
-
-        new_tickets = int(
-            (
-                await session.execute(
-                    select(func.count(Ticket.id)).where(
-                        Ticket.created_at >= start_utc,
-                        Ticket.created_at < end_utc,
-                    )
-                )
-            ).scalar()
-            or 0
+        # Границы периодов совпадают с полуночью по МСК, поэтому отчёт читает суточные агрегаты
+        totals = await stats_rollup_service.get_totals(
+            session,
+            stats_day(start_utc),
+            stats_day(end_utc),
         )
 
         return {
-            "new_users": new_users,
-            "new_trials": new_trials,
-            "new_paid_subscriptions": direct_paid + trial_to_paid_conversions,
-            "trial_to_paid_conversions": trial_to_paid_conversions,
-            "subscription_payments_count": int(subscription_payments_count or 0),
-            "subscription_payments_amount": int(subscription_payments_amount or 0),
-            "deposits_count": int(deposits_count or 0),
-            "deposits_amount": int(deposits_amount or 0),
-            "new_tickets": new_tickets,
+            "new_users": totals["new_users"],
+            "new_trials": totals["new_trials"],
+            "new_paid_subscriptions": totals["new_paid_subscriptions"] + totals["trial_conversions"],
+            "trial_to_paid_conversions": totals["trial_conversions"],
+            "subscription_payments_count": totals["subscription_payments_count"],
+            "subscription_payments_amount": totals["subscription_payments_kopeks"],
+            "deposits_count": totals["deposits_count"],
+            "deposits_amount": totals["deposits_kopeks"],
+            "new_tickets": totals["new_tickets"],
         }
 
-    def _txn_query_base(self, txn_type: str, start_utc: datetime, end_utc: datetime):
-        return select(
-            func.count(Transaction.id),
-            func.coalesce(func.sum(Transaction.amount_kopeks), 0),
-        ).where(
-            Transaction.type == txn_type,
-            Transaction.is_completed == true(),
-            Transaction.created_at >= start_utc,
-            Transaction.created_at < end_utc,
-        )
-
-    def _deposit_query_excluding_referrals(self, start_utc: datetime, end_utc: datetime):
-        return select(
-            func.count(Transaction.id),
-            func.coalesce(func.sum(Transaction.amount_kopeks), 0),
-        ).where(
-            Transaction.type == TransactionType.DEPOSIT.value,
-            Transaction.is_completed == true(),
-            Transaction.created_at >= start_utc,
-            Transaction.created_at < end_utc,
-            self._exclude_referral_deposits_condition(),
-        )
-
     async def _get_top_referrers(
         self,
         session,
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.config import settings
+from app.utils.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+
+# Продление и снятие блокировки только её владельцем
+_REFRESH_CLAIM_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_CLAIM_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedStateService:
+    """Общее состояние процессов бота.
+
+    С Redis (``STATE_BACKEND``) FSM, окна троттлинга, реестр рассылок и блокировки
+    лидера видны всем воркерам за nginx. Без Redis всё хранится в памяти процесса,
+    и поведение совпадает с одиночным запуском.
+    """
+
+    def __init__(self) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._claims: Dict[str, Tuple[str, float]] = {}
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self.redis is not None else "memory"
+
+    @property
+    def redis(self):
+        if settings.get_state_backend() != "redis" or not cache._connected:
+            return None
+        return cache.redis_client
+
+    def key(self, *parts) -> str:
+        return ":".join([settings.STATE_KEY_PREFIX, *(str(part) for part in parts)])
+
+    async def connect(self) -> None:
+        if settings.get_state_backend() != "redis":
+            logger.info("🧠 Общее состояние хранится в памяти процесса")
+            return
+
+        if not settings.REDIS_URL:
+            logger.warning("⚠️ STATE_BACKEND=redis, но REDIS_URL не задан: состояние хранится в памяти процесса")
+            return
+
+        if not cache._connected:
+            await cache.connect()
+
+        if cache._connected:
+            logger.info(f"🧠 Общее состояние хранится в Redis (воркер {self.worker_id})")
+        else:
+            logger.warning("⚠️ Redis недоступен: состояние хранится в памяти процесса")
+
+    async def close(self) -> None:
+        await cache.disconnect()
+
+    def create_fsm_storage(self) -> BaseStorage:
+        if self.redis is None:
+            return MemoryStorage()
+
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+        ttl = max(1, int(settings.FSM_STORAGE_TTL_HOURS)) * 3600
+        # Собственный клиент хранилища закрывается отдельно от кеша при остановке
+        return RedisStorage.from_url(
+            settings.REDIS_URL,
+            key_builder=DefaultKeyBuilder(prefix=self.key("fsm"), with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+        )
+
+    async def claim(self, name: str, ttl: float) -> bool:
+        """Захватывает именованную блокировку на ``ttl`` секунд, если она свободна."""
+        redis = self.redis
+        if redis is not None:
+            return bool(await redis.set(
+                self.key("claim", name),
+                self.worker_id,
+                px=max(1, int(ttl * 1000)),
+                nx=True,
+            ))
+
+        now = time.monotonic()
+        owner = self._claims.get(name)
+        if owner is not None and owner[1] > now:
+            return False
+        self._claims[name] = (self.worker_id, now + ttl)
+        return True
+
+    async def refresh_claim(self, name: str, ttl: float) -> bool:
+        redis = self.redis
+        if redis is not None:
+            refreshed = await redis.eval(
+                _REFRESH_CLAIM_SCRIPT,
+                1,
+                self.key("claim", name),
+                self.worker_id,
+                max(1, int(ttl * 1000)),
+            )
+            return bool(refreshed)
+
+        owner = self._claims.get(name)
+        if owner is None or owner[0] != self.worker_id:
+            return False
+        self._claims[name] = (self.worker_id, time.monotonic() + ttl)
+        return True
+
+    async def release_claim(self, name: str) -> None:
+        redis = self.redis
+        if redis is not None:
+            await redis.eval(_RELEASE_CLAIM_SCRIPT, 1, self.key("claim", name), self.worker_id)
+            return
+
+        owner = self._claims.get(name)
+        if owner is not None and owner[0] == self.worker_id:
+            self._claims.pop(name, None)
+
+    async def is_claimed(self, name: str) -> bool:
+        redis = self.redis
+        if redis is not None:
+            return bool(await redis.exists(self.key("claim", name)))
+
+        owner = self._claims.get(name)
+        return owner is not None and owner[1] > time.monotonic()
+
+    async def set_flag(self, name: str, ttl: float) -> None:
+        redis = self.redis
+        if redis is not None:
+            await redis.set(self.key("flag", name), "1", px=max(1, int(ttl * 1000)))
+            return
+        self._claims[f"flag:{name}"] = ("", time.monotonic() + ttl)
+
+    async def pop_flag(self, name: str) -> bool:
+        redis = self.redis
+        if redis is not None:
+            return bool(await redis.delete(self.key("flag", name)))
+
+        flag = self._claims.pop(f"flag:{name}", None)
+        return flag is not None and flag[1] > time.monotonic()
+
+    def leader(
+        self,
+        name: str,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+    ) -> "LeaderElection":
+        return LeaderElection(self, name, on_elected, on_demoted)
+
+
+class LeaderElection:
+    """Выбор ведущего процесса для планировщиков через блокировку с TTL.
+
+    Лидер продлевает блокировку каждую треть TTL. Если продлить не удалось
+    (блокировку перехватили или Redis недоступен дольше TTL), сервисы останавливаются,
+    и процесс снова становится кандидатом.
+    """
+
+    def __init__(
+        self,
+        state: SharedStateService,
+        name: str,
+        on_elected: Callable[[], Awaitable[None]],
+        on_demoted: Callable[[], Awaitable[None]],
+    ) -> None:
+        self.state = state
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._renewed_at = 0.0
+
+    @property
+    def ttl(self) -> float:
+        return max(3.0, float(getattr(settings, 'LEADER_LOCK_TTL_SECONDS', 30)))
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        # Первая попытка синхронно, чтобы одиночный процесс стартовал без задержки
+        await self._tick()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        if self.is_leader:
+            await self._demote()
+            try:
+                await self.state.release_claim(self._claim_name)
+            except Exception as e:
+                logger.warning(f"Не удалось освободить блокировку лидера {self.name}: {e}")
+
+    @property
+    def _claim_name(self) -> str:
+        return f"leader:{self.name}"
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self.ttl / 3)
+                await self._tick()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка выбора лидера {self.name}: {e}")
+
+    async def _tick(self) -> None:
+        try:
+            if self.is_leader:
+                if await self.state.refresh_claim(self._claim_name, self.ttl):
+                    self._renewed_at = time.monotonic()
+                    return
+                logger.warning(f"👑 Блокировка лидера {self.name} потеряна")
+                await self._demote()
+                return
+
+            if await self.state.claim(self._claim_name, self.ttl):
+                self._renewed_at = time.monotonic()
+                self.is_leader = True
+                logger.info(f"👑 Воркер {self.state.worker_id} стал лидером {self.name}")
+                await self.on_elected()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка блокировки лидера {self.name}: {e}")
+            if self.is_leader and time.monotonic() - self._renewed_at >= self.ttl:
+                await self._demote()
+
+    async def _demote(self) -> None:
+        self.is_leader = False
+        try:
+            await self.on_demoted()
+        except Exception as e:
+            logger.error(f"Ошибка остановки сервисов лидера {self.name}: {e}")
+
+
+shared_state = SharedStateService()
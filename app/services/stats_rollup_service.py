@@ -0,0 +1,265 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.crud.stats import (
+    collect_daily_rollups,
+    get_first_activity_day,
+    get_rollup_days,
+    get_rollup_totals,
+    increment_daily_rollups,
+    is_referral_description,
+    stats_day,
+    upsert_daily_rollups,
+)
+from app.database.database import AsyncSessionLocal
+from app.database.models import (
+    ReferralEarning,
+    Subscription,
+    SubscriptionConversion,
+    SubscriptionStatus,
+    Ticket,
+    Transaction,
+    TransactionStatus,
+    TransactionType,
+    User,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatsRollupService:
+    """Суточные агрегаты статистики (таблица ``daily_stats_rollups``).
+
+    Закрытые сутки пересчитываются один раз и помечаются финальными. Изменения через ORM
+    (новые пользователи, подписки, тикеты, реферальные начисления, завершённые транзакции)
+    копятся в памяти процесса после коммита и записываются пачкой в отдельной сессии,
+    поэтому транзакции вызывающих не блокируют друг друга на строке текущих суток.
+    Нефинальные сутки периодически пересчитываются целиком, чтобы учесть массовые
+    вставки в обход ORM.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self._pending: Dict[date, Dict[str, int]] = {}
+        self.last_refresh_at: Optional[datetime] = None
+
+    @property
+    def refresh_interval(self) -> float:
+        return max(60.0, float(getattr(settings, 'STATS_ROLLUP_REFRESH_MINUTES', 15)) * 60)
+
+    @property
+    def flush_delay(self) -> float:
+        return max(0.1, float(getattr(settings, 'STATS_ROLLUP_FLUSH_SECONDS', 5)))
+
+    async def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush_pending()
+
+    def add_pending(self, deltas: Dict[date, Dict[str, int]]) -> None:
+        """Добавляет закоммиченные изменения в буфер и планирует их запись."""
+        _merge_deltas(self._pending, deltas)
+        if self._flush_task and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Без цикла событий буфер запишет ближайший пересчёт
+            return
+        self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        await self.flush_pending()
+
+    async def flush_pending(self) -> None:
+        """Записывает накопленные изменения в агрегаты в собственной сессии."""
+        async with self._refresh_lock:
+            pending, self._pending = self._pending, {}
+            await self._apply_pending(pending)
+
+    async def _apply_pending(self, pending: Dict[date, Dict[str, int]]) -> None:
+        if not pending:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await increment_daily_rollups(db, pending)
+        except Exception as e:
+            logger.error(f"Ошибка записи изменений суточной статистики: {e}")
+            _merge_deltas(self._pending, pending)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.refresh_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка пересчёта суточной статистики: {e}")
+                await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self) -> int:
+        """Достраивает недостающие сутки и пересчитывает нефинальные, включая текущие."""
+        async with self._refresh_lock:
+            async with AsyncSessionLocal() as db:
+                first_day = await get_first_activity_day(db)
+            if first_day is None:
+                return 0
+            rebuilt = await self._rebuild_and_flush(first_day, stats_day(datetime.utcnow()) + timedelta(days=1))
+            self.last_refresh_at = datetime.utcnow()
+            if rebuilt > 1:
+                logger.info(f"📊 Суточная статистика пересчитана: {rebuilt} дн.")
+            return rebuilt
+
+    async def get_totals(
+        self,
+        db: AsyncSession,
+        start_day: Optional[date] = None,
+        end_day: Optional[date] = None
+    ) -> Dict[str, int]:
+        """Суммы суточных агрегатов за [start_day, end_day); без границ — за всё время.
+
+        Отсутствующие и незакрытые прошедшие сутки периода сначала пересчитываются.
+        """
+        today = stats_day(datetime.utcnow())
+        if start_day is not None:
+            rebuild_end = min(end_day or today + timedelta(days=1), today + timedelta(days=1))
+            async with self._refresh_lock:
+                await self._rebuild_and_flush(start_day, rebuild_end, keep_today=True)
+        return await get_rollup_totals(db, start_day, end_day)
+
+    async def _rebuild_and_flush(self, start_day: date, end_day: date, keep_today: bool = False) -> int:
+        """Пересчитывает сутки в собственной сессии и дописывает буфер; вызывать под блокировкой."""
+        pending, self._pending = self._pending, {}
+        async with AsyncSessionLocal() as db:
+            rebuilt = await self._rebuild(db, start_day, end_day, keep_today)
+        # Пересчитанные сутки уже учитывают закоммиченные изменения из буфера
+        selected = set(rebuilt)
+        await self._apply_pending({day: counters for day, counters in pending.items() if day not in selected})
+        return len(rebuilt)
+
+    async def _rebuild(
+        self,
+        db: AsyncSession,
+        start_day: date,
+        end_day: date,
+        keep_today: bool = False
+    ) -> List[date]:
+        today = stats_day(datetime.utcnow())
+        existing = await get_rollup_days(db, start_day, end_day)
+        days = []
+        day = start_day
+        while day < end_day:
+            if day not in existing:
+                days.append(day)
+            elif not existing[day] and (day != today or not keep_today):
+                # Текущие сутки ведутся инкрементально, читателям хватает существующей строки
+                days.append(day)
+            day += timedelta(days=1)
+        if not days:
+            return []
+
+        rows = await collect_daily_rollups(db, days[0], days[-1] + timedelta(days=1))
+        selected = set(days)
+        await upsert_daily_rollups(
+            db,
+            {day: counters for day, counters in rows.items() if day in selected},
+            final_before=today,
+        )
+        return days
+
+
+stats_rollup_service = StatsRollupService()
+
+
+def _merge_deltas(target: Dict[date, Dict[str, int]], deltas: Dict[date, Dict[str, int]]) -> None:
+    for day, counters in deltas.items():
+        day_counters = target.setdefault(day, {})
+        for name, value in counters.items():
+            day_counters[name] = day_counters.get(name, 0) + value
+
+
+def _collect_flush_deltas(session: Session) -> Dict[date, Dict[str, int]]:
+    deltas: Dict[date, Dict[str, int]] = {}
+
+    def add(moment: Optional[datetime], **values: int) -> None:
+        counters = deltas.setdefault(stats_day(moment or datetime.utcnow()), {})
+        for name, value in values.items():
+            counters[name] = counters.get(name, 0) + value
+
+    for obj in session.new:
+        if isinstance(obj, User):
+            add(obj.created_at, new_users=1)
+        elif isinstance(obj, Subscription):
+            if obj.status == SubscriptionStatus.TRIAL:
+                add(obj.created_at, new_trials=1)
+            else:
+                add(obj.created_at, new_paid_subscriptions=1)
+        elif isinstance(obj, SubscriptionConversion):
+            add(obj.converted_at, trial_conversions=1)
+        elif isinstance(obj, ReferralEarning):
+            add(obj.created_at, referral_earnings_count=1, referral_earnings_kopeks=int(obj.amount_kopeks or 0))
+        elif isinstance(obj, Ticket):
+            add(obj.created_at, new_tickets=1)
+
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, Transaction) or obj.status != TransactionStatus.COMPLETED:
+            continue
+        if obj not in session.new:
+            history = inspect(obj).attrs.status.history
+            if TransactionStatus.COMPLETED not in (history.added or ()):
+                continue
+        kopeks = int(round(abs(obj.amount or 0) * 100))
+        moment = obj.completed_at or obj.created_at
+        if obj.type == TransactionType.DEPOSIT and not is_referral_description(obj.description):
+            add(moment, deposits_count=1, deposits_kopeks=kopeks)
+        elif obj.type == TransactionType.SUBSCRIPTION:
+            add(moment, subscription_payments_count=1, subscription_payments_kopeks=kopeks)
+        elif obj.type == TransactionType.REFUND:
+            add(moment, refunds_kopeks=kopeks)
+
+    return deltas
+
+
+_PENDING_KEY = "stats_rollup_deltas"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_rollups_on_flush(session: Session, flush_context) -> None:
+    deltas = _collect_flush_deltas(session)
+    if deltas:
+        _merge_deltas(session.info.setdefault(_PENDING_KEY, {}), deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_rollups_on_commit(session: Session) -> None:
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        stats_rollup_service.add_pending(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rollups_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -9,9 +9,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import PERIOD_PRICES, settings
 from app.database.crud.server_squad import (
     add_user_to_servers,
-    get_available_server_squads,
-    get_server_ids_by_uuids,
-    get_server_squad_by_uuid,
 )
 from app.database.crud.subscription import (
     add_subscription_servers,
@@ -22,8 +19,14 @@ from app.database.crud.subscription_conversion import (
 )
 from app.database.crud.transaction import create_transaction
 from app.database.crud.user import subtract_user_balance
-from app.database.models import ServerSquad, Subscription, SubscriptionStatus, TransactionType, User
+from app.database.models import Subscription, SubscriptionStatus, TransactionType, User
 from app.localization.texts import get_texts
+from app.services.pricing_catalog_service import (
+    CatalogServer,
+    build_discount_resolver,
+    pricing_catalog_service,
+    quote_price,
+)
 from app.services.subscription_service import SubscriptionService
 from app.utils.pricing_utils import (
     calculate_months_from_days,
@@ -307,7 +310,7 @@ def _apply_promo_offer_discount(user: Optional[User], amount: int) -> Tuple[int,
 
 
 def _build_server_option(
-    server: ServerSquad,
+    server: CatalogServer,
     discount_percent: int,
     texts,
 ) -> PurchaseServerOption:
@@ -336,21 +339,15 @@ class MiniAppSubscriptionPurchaseService:
         currency = (getattr(user, "balance_currency", None) or "RUB").upper()
         texts = get_texts(getattr(user, "language", None))
 
-        available_servers = await get_available_server_squads(
-            db,
-            promo_group_id=getattr(user, "promo_group_id", None),
-        )
-        server_catalog: Dict[str, ServerSquad] = {server.squad_uuid: server for server in available_servers}
+        pricing_catalog = await pricing_catalog_service.get_catalog()
+        available_servers = pricing_catalog.available_servers(getattr(user, "promo_group_id", None))
+        server_catalog: Dict[str, CatalogServer] = {server.squad_uuid: server for server in available_servers}
 
         if subscription and subscription.connected_squads:
             for uuid in subscription.connected_squads:
                 if uuid in server_catalog:
                     continue
-                try:
-                    existing = await get_server_squad_by_uuid(db, uuid)
-                except Exception as error:  # pragma: no cover - defensive logging
-                    logger.warning("Failed to load server squad %s: %s", uuid, error)
-                    existing = None
+                existing = pricing_catalog.servers_by_uuid.get(uuid)
                 if existing:
                     server_catalog[uuid] = existing
 
@@ -568,7 +565,7 @@ class MiniAppSubscriptionPurchaseService:
         user: User,
         texts,
         period_days: int,
-        server_catalog: Dict[str, ServerSquad],
+        server_catalog: Dict[str, CatalogServer],
         default_selection: List[str],
     ) -> PurchaseServersConfig:
         discount_percent = user.get_promo_discount("servers", period_days)
@@ -724,7 +721,11 @@ class MiniAppSubscriptionPurchaseService:
         texts = get_texts(getattr(context.user, "language", None))
         months = selection.period.months
 
-        server_ids = await get_server_ids_by_uuids(db, selection.servers)
+        server_ids = [
+            context.server_uuid_to_id[uuid]
+            for uuid in selection.servers
+            if uuid in context.server_uuid_to_id
+        ]
         if len(server_ids) != len(selection.servers):
             raise PurchaseValidationError("Some selected servers are not available", code="invalid_servers")
 
@@ -789,17 +790,16 @@ class MiniAppSubscriptionPurchaseService:
         selection: PurchaseSelection,
         server_ids: List[int],
     ) -> Tuple[int, Dict[str, Any]]:
-        from app.database.crud.subscription import calculate_subscription_total_cost
-
-        total_cost, details = await calculate_subscription_total_cost(
-            db,
+        catalog = await pricing_catalog_service.get_catalog()
+        quote = quote_price(
+            catalog,
+            build_discount_resolver(user),
             selection.period.days,
             selection.traffic_value,
-            server_ids,
             selection.devices,
-            user=user,
+            server_ids,
         )
-        return total_cost, details
+        return quote.total_price, quote.to_details()
 
     def build_preview_payload(
         self,
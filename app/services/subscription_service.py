@@ -11,6 +11,7 @@ from app.external.remnawave_api import (
     TrafficLimitStrategy, RemnaWaveAPIError
 )
 from app.database.crud.user import get_user_by_id
+from app.services.pricing_catalog_service import pricing_catalog_service
 from app.utils.pricing_utils import (
     calculate_months_from_days,
     get_remaining_months,
@@ -455,7 +456,6 @@ class SubscriptionService:
     ) -> Tuple[int, List[int]]:
     
         from app.config import PERIOD_PRICES
-        from app.database.crud.server_squad import get_server_squad_by_id
     
         if settings.MAX_DEVICES_LIMIT > 0 and devices > settings.MAX_DEVICES_LIMIT:
             raise ValueError(f"Превышен максимальный лимит устройств: {settings.MAX_DEVICES_LIMIT}")
@@ -491,9 +491,10 @@ class SubscriptionService:
             period_days=period_days,
         )
 
+        catalog = await pricing_catalog_service.get_catalog()
         for server_id in server_squad_ids:
-            server = await get_server_squad_by_id(db, server_id)
-            if server and server.is_available and not server.is_full:
+            server = catalog.servers_by_id.get(server_id)
+            if server and server.is_purchasable:
                 server_price = server.price_kopeks
                 server_discount = server_price * servers_discount_percent // 100
                 discounted_server_price = server_price - server_discount
@@ -729,19 +730,14 @@ class SubscriptionService:
         promo_group_id: Optional[int] = None,
     ) -> Tuple[int, List[int]]:
         try:
-            from app.database.crud.server_squad import get_server_squad_by_uuid
+            catalog = await pricing_catalog_service.get_catalog()
             
             total_price = 0
             prices_list = []
             
             for country_uuid in country_uuids:
-                server = await get_server_squad_by_uuid(db, country_uuid)
-                is_allowed = True
-                if promo_group_id is not None and server:
-                    allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-                    is_allowed = promo_group_id in allowed_ids
-
-                if server and server.is_available and not server.is_full and is_allowed:
+                server = catalog.servers_by_uuid.get(country_uuid)
+                if server and server.is_purchasable and server.is_allowed_for(promo_group_id):
                     price = server.price_kopeks
                     total_price += price
                     prices_list.append(price)
@@ -781,7 +777,6 @@ class SubscriptionService:
     ) -> Tuple[int, List[int]]:
     
         from app.config import PERIOD_PRICES
-        from app.database.crud.server_squad import get_server_squad_by_id
         
         if settings.MAX_DEVICES_LIMIT > 0 and devices > settings.MAX_DEVICES_LIMIT:
             raise ValueError(f"Превышен максимальный лимит устройств: {settings.MAX_DEVICES_LIMIT}")
@@ -820,9 +815,10 @@ class SubscriptionService:
             period_days=period_days,
         )
 
+        catalog = await pricing_catalog_service.get_catalog()
         for server_id in server_squad_ids:
-            server = await get_server_squad_by_id(db, server_id)
-            if server and server.is_available and not server.is_full:
+            server = catalog.servers_by_id.get(server_id)
+            if server and server.is_purchasable:
                 server_price_per_month = server.price_kopeks
                 server_discount_per_month = server_price_per_month * servers_discount_percent // 100
                 discounted_server_per_month = server_price_per_month - server_discount_per_month
@@ -1083,9 +1079,9 @@ class SubscriptionService:
             logger.info(message)
 
         if additional_server_ids and db:
+            catalog = await pricing_catalog_service.get_catalog()
             for server_id in additional_server_ids:
-                from app.database.crud.server_squad import get_server_squad_by_id
-                server = await get_server_squad_by_id(db, server_id)
+                server = catalog.servers_by_id.get(server_id)
                 if server and server.is_available:
                     server_price_per_month = server.price_kopeks
                     servers_discount_percent = _resolve_addon_discount_percent(
@@ -22,11 +22,19 @@ from app.database.crud.system_setting import (
 )
 from app.database.database import AsyncSessionLocal
 from app.database.models import SystemSetting
+from app.services.pricing_catalog_service import pricing_catalog_service
 
 
 logger = logging.getLogger(__name__)
 
 
+PRICING_CATALOG_SETTING_KEYS = {
+    "TRAFFIC_PACKAGES_CONFIG",
+    "DEFAULT_DEVICE_LIMIT",
+    "MAX_DEVICES_LIMIT",
+}
+
+
 def _title_from_key(key: str) -> str:
     parts = key.split("_")
     if not parts:
@@ -1410,6 +1418,9 @@ class BotConfigurationService:
                         "Не удалось обновить конфигурацию сервиса автосинхронизации RemnaWave: %s",
                         error,
                     )
+
+            if key.startswith("PRICE_") or key in PRICING_CATALOG_SETTING_KEYS:
+                pricing_catalog_service.invalidate()
         except Exception as error:
             logger.error("Не удалось применить значение %s=%s: %s", key, value, error)
 
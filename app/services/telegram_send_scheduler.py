@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+MAX_FLOOD_WAITS_PER_MESSAGE = 5
+RATE_WINDOW_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class TelegramSendStats:
+    queue_depth: int
+    in_flight: int
+    sent_total: int
+    failed_total: int
+    retried_total: int
+    flood_waits_total: int
+    messages_per_second: float
+    eta_seconds: Optional[float]
+    paused_for_seconds: float
+
+
+@dataclass
+class _SendJob:
+    chat_id: int
+    send: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    attempts: int = 0
+    flood_waits: int = 0
+
+
+class TelegramSendScheduler:
+    """Общая очередь исходящих сообщений Telegram.
+
+    Глобальный token bucket держит суммарную скорость в пределах лимита бота,
+    сообщения в один чат разносятся не чаще ``per_chat_interval``, а ``RetryAfter``
+    ставит на паузу всю очередь, после чего сообщение отправляется повторно.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._bucket_lock: Optional[asyncio.Lock] = None
+
+        self._tokens = 0.0
+        self._last_refill = 0.0
+        self._paused_until = 0.0
+        self._chat_next_send: Dict[int, float] = {}
+
+        self._delayed = 0
+        self._in_flight = 0
+        self._sent_times: Deque[float] = deque()
+        self.sent_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+        self.flood_waits_total = 0
+
+    @property
+    def rate(self) -> float:
+        return max(0.1, float(getattr(settings, 'TELEGRAM_SEND_RATE', 25)))
+
+    @property
+    def burst(self) -> int:
+        return max(1, int(getattr(settings, 'TELEGRAM_SEND_BURST', 30)))
+
+    @property
+    def per_chat_interval(self) -> float:
+        return max(0.0, float(getattr(settings, 'TELEGRAM_PER_CHAT_INTERVAL', 1.0)))
+
+    @property
+    def workers_count(self) -> int:
+        return max(1, int(getattr(settings, 'TELEGRAM_SEND_WORKERS', 20)))
+
+    @property
+    def max_retries(self) -> int:
+        return max(0, int(getattr(settings, 'TELEGRAM_SEND_MAX_RETRIES', 3)))
+
+    async def send(self, chat_id: int, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Ставит отправку в очередь и ждёт её результата.
+
+        ``send`` вызывается без аргументов и должен каждый раз создавать новый запрос,
+        потому что при повторе он вызывается снова.
+        """
+
+        self._ensure_workers()
+        future = self._loop.create_future()
+        self._queue.put_nowait(_SendJob(chat_id=chat_id, send=send, future=future))
+        return await future
+
+    def get_stats(self) -> TelegramSendStats:
+        now = time.monotonic()
+        self._trim_sent_times(now)
+        queue_depth = (self._queue.qsize() if self._queue else 0) + self._delayed
+        measured_rate = len(self._sent_times) / RATE_WINDOW_SECONDS
+        effective_rate = measured_rate or self.rate
+        return TelegramSendStats(
+            queue_depth=queue_depth,
+            in_flight=self._in_flight,
+            sent_total=self.sent_total,
+            failed_total=self.failed_total,
+            retried_total=self.retried_total,
+            flood_waits_total=self.flood_waits_total,
+            messages_per_second=round(measured_rate, 2),
+            eta_seconds=round(queue_depth / effective_rate, 1) if queue_depth else 0.0,
+            paused_for_seconds=round(max(0.0, self._paused_until - now), 1),
+        )
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                if not job.future.done():
+                    job.future.cancel()
+        self._queue = None
+        self._loop = None
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._bucket_lock = asyncio.Lock()
+            self._workers = []
+            self._delayed = 0
+            self._tokens = float(self.burst)
+            self._last_refill = time.monotonic()
+
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        for index in range(len(self._workers), self.workers_count):
+            self._workers.append(
+                loop.create_task(self._worker(), name=f"telegram-send-{index}")
+            )
+
+    async def _worker(self) -> None:
+        while True:
+            job: _SendJob = await self._queue.get()
+            try:
+                if job.future.done():
+                    continue
+                await self._wait_for_slot(job.chat_id)
+                await self._execute(job)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as error:  # noqa: BLE001
+                if not job.future.done():
+                    job.future.set_exception(error)
+            finally:
+                self._queue.task_done()
+
+    async def _wait_for_slot(self, chat_id: int) -> None:
+        if self.per_chat_interval:
+            # Слот в чате резервируется сразу, чтобы два воркера не отправили в один чат одновременно
+            now = time.monotonic()
+            slot = max(now, self._chat_next_send.get(chat_id, 0.0))
+            self._chat_next_send[chat_id] = slot + self.per_chat_interval
+            if len(self._chat_next_send) > 10_000:
+                self._prune_chat_pacing()
+            if slot > now:
+                await asyncio.sleep(slot - now)
+
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    float(self.burst),
+                    self._tokens + (now - self._last_refill) * self.rate,
+                )
+                self._last_refill = now
+                if self._tokens >= 1 and self._paused_until <= now:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep(max(
+                    (1 - self._tokens) / self.rate,
+                    self._paused_until - now,
+                ))
+
+    async def _execute(self, job: _SendJob) -> None:
+        self._in_flight += 1
+        try:
+            result = await job.send()
+        except TelegramRetryAfter as error:
+            self.flood_waits_total += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + error.retry_after)
+            logger.warning(
+                "⏳ Telegram flood control: пауза отправки на %s с (чат %s)",
+                error.retry_after,
+                job.chat_id,
+            )
+            job.flood_waits += 1
+            if job.flood_waits > MAX_FLOOD_WAITS_PER_MESSAGE:
+                self.failed_total += 1
+                job.future.set_exception(error)
+                return
+            self._queue.put_nowait(job)
+            return
+        except TRANSIENT_ERRORS as error:
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                self.failed_total += 1
+                job.future.set_exception(error)
+                return
+            self.retried_total += 1
+            delay = 0.5 * (2 ** (job.attempts - 1))
+            logger.debug(
+                "Повтор отправки в чат %s через %.1f с (%s): %s",
+                job.chat_id,
+                delay,
+                job.attempts,
+                error,
+            )
+            self._delayed += 1
+            self._loop.call_later(delay, self._requeue, job)
+            return
+        except Exception:
+            self.failed_total += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+        self.sent_total += 1
+        now = time.monotonic()
+        self._sent_times.append(now)
+        self._trim_sent_times(now)
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _requeue(self, job: _SendJob) -> None:
+        self._delayed -= 1
+        if self._queue is None or job.future.done():
+            return
+        self._queue.put_nowait(job)
+
+    def _trim_sent_times(self, now: float) -> None:
+        border = now - RATE_WINDOW_SECONDS
+        while self._sent_times and self._sent_times[0] < border:
+            self._sent_times.popleft()
+
+    def _prune_chat_pacing(self) -> None:
+        now = time.monotonic()
+        self._chat_next_send = {
+            chat_id: next_send
+            for chat_id, next_send in self._chat_next_send.items()
+            if next_send > now
+        }
+
+
+telegram_send_scheduler = TelegramSendScheduler()
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import Subscription, User
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """Поля пользователя, которые безопасно держать между апдейтами и процессами."""
+
+    id: int
+    telegram_id: int
+    language_code: Optional[str]
+    status: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserIdentity":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            language_code=user.language_code,
+            status=user.status,
+        )
+
+
+@dataclass
+class UserContext:
+    telegram_id: int
+    db: AsyncSession
+    user: Optional[User]
+    identity: Optional[UserIdentity] = None
+
+    @property
+    def subscription(self) -> Optional[Subscription]:
+        return self.user.subscription if self.user else None
+
+
+class UserContextService:
+    """Загружает User+Subscription один раз на апдейт, держит идентичность горячих
+    пользователей в коротком LRU-кеше и пишет last_activity пачками.
+
+    Строки ``User`` в кеш не попадают: баланс и другие изменяемые поля могут
+    поменяться в другом воркере, поэтому каждый апдейт читает их из базы.
+    """
+
+    def __init__(self) -> None:
+        self._cache: "OrderedDict[int, Tuple[float, UserIdentity]]" = OrderedDict()
+        self._telegram_by_user_id: Dict[int, int] = {}
+        self._pending_activity: Dict[int, datetime] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def cache_ttl(self) -> float:
+        return max(0.0, float(getattr(settings, 'USER_CONTEXT_CACHE_TTL_SECONDS', 30)))
+
+    @property
+    def cache_size(self) -> int:
+        return max(0, int(getattr(settings, 'USER_CONTEXT_CACHE_SIZE', 10000)))
+
+    @property
+    def flush_interval(self) -> float:
+        return max(1.0, float(getattr(settings, 'USER_ACTIVITY_FLUSH_SECONDS', 60)))
+
+    async def load(self, db: AsyncSession, telegram_id: int) -> UserContext:
+        user = await self._load_user(db, telegram_id)
+        identity = UserIdentity.from_user(user) if user is not None else None
+        return UserContext(telegram_id=telegram_id, db=db, user=user, identity=identity)
+
+    async def _load_user(self, db: AsyncSession, telegram_id: int) -> Optional[User]:
+        identity = self._get_cached(telegram_id)
+        if identity is not None:
+            # Поиск по первичному ключу берёт строку из identity map сессии, если она там есть
+            user = await db.get(User, identity.id, options=[selectinload(User.subscription)])
+            if user is not None and user.telegram_id == telegram_id:
+                self.cache_hits += 1
+                return user
+            self.invalidate(telegram_id)
+
+        self.cache_misses += 1
+        result = await db.execute(
+            select(User)
+            .options(selectinload(User.subscription))
+            .where(User.telegram_id == telegram_id)
+        )
+        user = result.scalar_one_or_none()
+        if user is not None:
+            self._put_cached(UserIdentity.from_user(user))
+        return user
+
+    def get_identity(self, telegram_id: int) -> Optional[UserIdentity]:
+        return self._get_cached(telegram_id)
+
+    def _get_cached(self, telegram_id: int) -> Optional[UserIdentity]:
+        entry = self._cache.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, identity = entry
+        if expires_at < time.monotonic():
+            self.invalidate(telegram_id)
+            return None
+        self._cache.move_to_end(telegram_id)
+        return identity
+
+    def _put_cached(self, identity: UserIdentity) -> None:
+        if not self.cache_size or not self.cache_ttl:
+            return
+        self._cache[identity.telegram_id] = (time.monotonic() + self.cache_ttl, identity)
+        self._cache.move_to_end(identity.telegram_id)
+        self._telegram_by_user_id[identity.id] = identity.telegram_id
+        while len(self._cache) > self.cache_size:
+            _, (_, evicted_identity) = self._cache.popitem(last=False)
+            self._telegram_by_user_id.pop(evicted_identity.id, None)
+
+    def invalidate(self, telegram_id: Optional[int]) -> None:
+        if telegram_id is None:
+            return
+        entry = self._cache.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_by_user_id.pop(entry[1].id, None)
+
+    def invalidate_user_id(self, user_id: Optional[int]) -> None:
+        if user_id is None:
+            return
+        self.invalidate(self._telegram_by_user_id.get(user_id))
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._telegram_by_user_id.clear()
+
+    def touch(self, telegram_id: int) -> None:
+        self._pending_activity[telegram_id] = datetime.utcnow()
+
+    async def start(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        await self.flush_activity()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush_activity()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка записи активности пользователей: {e}")
+
+    async def flush_activity(self, chunk_size: int = 1000) -> int:
+        async with self._flush_lock:
+            if not self._pending_activity:
+                return 0
+            pending, self._pending_activity = self._pending_activity, {}
+
+            items: List[Tuple[int, datetime]] = list(pending.items())
+            flushed = 0
+            try:
+                async with AsyncSessionLocal() as db:
+                    for offset in range(0, len(items), chunk_size):
+                        chunk = dict(items[offset:offset + chunk_size])
+                        await db.execute(
+                            update(User)
+                            .where(User.telegram_id.in_(list(chunk.keys())))
+                            .values(last_activity=case(chunk, value=User.telegram_id))
+                            .execution_options(synchronize_session=False, user_context_keep_cache=True)
+                        )
+                        flushed += len(chunk)
+                    await db.commit()
+            except Exception:
+                for telegram_id, timestamp in items:
+                    self._pending_activity.setdefault(telegram_id, timestamp)
+                raise
+
+            logger.debug(f"Записана активность {flushed} пользователей")
+            return flushed
+
+
+user_context_service = UserContextService()
+
+
+@event.listens_for(Session, "after_flush")
+def _evict_flushed_users(session: Session, flush_context) -> None:
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, User):
+            user_context_service.invalidate(obj.telegram_id)
+        elif isinstance(obj, Subscription):
+            user_context_service.invalidate_user_id(obj.user_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _evict_on_bulk_write(orm_execute_state) -> None:
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in (User, Subscription):
+        return
+    if orm_execute_state.execution_options.get('user_context_keep_cache'):
+        return
+    user_context_service.clear()
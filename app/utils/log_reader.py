@@ -0,0 +1,265 @@
+"""Чтение больших лог-файлов без загрузки целиком.
+
+Хвост файла читается блоками с конца, страницы — по байтовым смещениям, а новые
+строки отслеживаются по росту файла. Фильтр по уровню учитывает многострочные
+записи: строки трейсбэка получают уровень заголовка своей записи.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+
+READ_BLOCK_SIZE = 64 * 1024
+FOLLOW_READ_LIMIT = 1024 * 1024
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+_LEVEL_ORDER = {level: index for index, level in enumerate(LOG_LEVELS)}
+# Формат из logging.basicConfig: "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_LEVEL_PATTERN = re.compile(r" - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - ")
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    min_level: Optional[str] = None
+    contains: Optional[str] = None
+
+    @property
+    def by_level(self) -> bool:
+        return self.min_level in _LEVEL_ORDER
+
+    def matches(self, line: str, level: Optional[str]) -> bool:
+        if self.by_level and (level is None or _LEVEL_ORDER[level] < _LEVEL_ORDER[self.min_level]):
+            return False
+        if self.contains and self.contains.lower() not in line.lower():
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class LogChunk:
+    lines: List[str]
+    start_offset: int
+    end_offset: int
+    size_bytes: int
+
+
+def line_level(line: str) -> Optional[str]:
+    match = _LEVEL_PATTERN.search(line)
+    return match.group(1) if match else None
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="ignore").rstrip("\r")
+
+
+def read_tail_text(path: Path, max_chars: int) -> Tuple[str, bool, int]:
+    """Последние ``max_chars`` символов файла, флаг усечения и размер в байтах."""
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        # UTF-8 занимает не больше четырёх байт на символ
+        start = max(0, size - max_chars * 4)
+        handle.seek(start)
+        text = handle.read().decode("utf-8", errors="ignore")
+    preview = text[-max_chars:] if max_chars > 0 else ""
+    return preview, start > 0 or len(text) > len(preview), size
+
+
+def tail_lines(
+    path: Path,
+    count: int,
+    log_filter: Optional[LogFilter] = None,
+    before: Optional[int] = None,
+) -> LogChunk:
+    """Последние ``count`` подходящих строк до смещения ``before`` (по умолчанию — конец файла)."""
+    log_filter = log_filter or LogFilter()
+    collected: List[Tuple[int, str]] = []
+    # Строки продолжения ждут заголовок записи, чтобы узнать её уровень
+    pending: List[Tuple[int, str]] = []
+
+    def flush(level: Optional[str]) -> None:
+        for offset, text in pending:
+            if log_filter.matches(text, level):
+                collected.append((offset, text))
+        pending.clear()
+
+    def take(offset: int, raw: bytes) -> None:
+        if not raw:
+            return
+        text = _decode(raw)
+        if not log_filter.by_level:
+            if log_filter.matches(text, None):
+                collected.append((offset, text))
+            return
+        level = line_level(text)
+        pending.append((offset, text))
+        if level is not None:
+            flush(level)
+
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        position = size if before is None else max(0, min(before, size))
+        end = position
+        remainder = b""
+
+        while position > 0 and len(collected) < count:
+            read_size = min(READ_BLOCK_SIZE, position)
+            position -= read_size
+            handle.seek(position)
+            block = handle.read(read_size) + remainder
+            parts = block.split(b"\n")
+            remainder = parts[0]
+            line_end = position + len(block)
+            for raw in reversed(parts[1:]):
+                line_start = line_end - len(raw)
+                take(line_start, raw)
+                line_end = line_start - 1
+
+        if position == 0 and len(collected) < count:
+            take(0, remainder)
+            flush(None)
+
+    selected = collected[:count]
+    selected.reverse()
+    return LogChunk(
+        lines=[text for _, text in selected],
+        start_offset=selected[0][0] if selected else end,
+        end_offset=end,
+        size_bytes=size,
+    )
+
+
+def read_text_range(path: Path, offset: int, limit_bytes: Optional[int] = None) -> Tuple[str, int, int, int]:
+    """Текст диапазона без разбора строк: начало, конец (по границе строки) и размер файла."""
+    with path.open("rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        offset = max(0, min(offset, size))
+        handle.seek(offset)
+        data = handle.read(limit_bytes) if limit_bytes else handle.read()
+
+    end = offset + len(data)
+    if end < size:
+        cut = data.rfind(b"\n")
+        # Строку длиннее страницы отдаём частями, чтобы курсор продвигался
+        if cut >= 0:
+            data = data[:cut + 1]
+            end = offset + cut + 1
+    return data.decode("utf-8", errors="ignore"), offset, end, size
+
+
+def read_range(
+    path: Path,
+    offset: int,
+    limit_bytes: Optional[int] = None,
+    log_filter: Optional[LogFilter] = None,
+) -> LogChunk:
+    """Строки из диапазона ``[offset, offset + limit_bytes)``, обрезанного до конца строки."""
+    log_filter = log_filter or LogFilter()
+    text, offset, end, size = read_text_range(path, offset, limit_bytes)
+
+    lines: List[str] = []
+    level: Optional[str] = None
+    for line in text.split("\n"):
+        line = line.rstrip("\r")
+        if not line:
+            continue
+        level = line_level(line) or level
+        if log_filter.matches(line, level):
+            lines.append(line)
+
+    return LogChunk(lines=lines, start_offset=offset, end_offset=end, size_bytes=size)
+
+
+def iter_filtered_lines(path: Path, log_filter: LogFilter) -> Iterator[bytes]:
+    """Потоково отдаёт подходящие строки файла для скачивания."""
+    level: Optional[str] = None
+    with path.open("rb") as handle:
+        remainder = b""
+        while True:
+            block = handle.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            parts = (remainder + block).split(b"\n")
+            remainder = parts.pop()
+            matched = []
+            for raw in parts:
+                text = _decode(raw)
+                level = line_level(text) or level
+                if raw and log_filter.matches(text, level):
+                    matched.append(raw)
+            if matched:
+                yield b"\n".join(matched) + b"\n"
+
+        if remainder:
+            text = _decode(remainder)
+            if log_filter.matches(text, line_level(text) or level):
+                yield remainder + b"\n"
+
+
+def _read_from(path: Path, offset: int, limit: int) -> Tuple[bytes, int, int]:
+    with path.open("rb") as handle:
+        stats = os.fstat(handle.fileno())
+        if stats.st_size <= offset:
+            return b"", stats.st_size, stats.st_ino
+        handle.seek(offset)
+        return handle.read(limit), stats.st_size, stats.st_ino
+
+
+async def follow_lines(
+    path: Path,
+    log_filter: Optional[LogFilter] = None,
+    offset: Optional[int] = None,
+    poll_interval: float = 1.0,
+) -> AsyncIterator[Tuple[List[str], int]]:
+    """Следит за ростом файла и отдаёт новые строки со смещением, до которого прочитано.
+
+    При простое отдаёт пустой список, чтобы вызывающий код мог отправить keep-alive.
+    Усечение или подмена файла (ротация) сбрасывают чтение на начало.
+    """
+    log_filter = log_filter or LogFilter()
+    position: Optional[int] = offset
+    inode: Optional[int] = None
+    remainder = b""
+    level: Optional[str] = None
+
+    while True:
+        try:
+            if position is None:
+                stats = await asyncio.to_thread(path.stat)
+                position, inode = stats.st_size, stats.st_ino
+            data, size, current_inode = await asyncio.to_thread(
+                _read_from, path, position, FOLLOW_READ_LIMIT
+            )
+        except FileNotFoundError:
+            # Файл появится заново после ротации, читаем его с начала
+            position, inode, remainder = 0, None, b""
+            yield [], 0
+            await asyncio.sleep(poll_interval)
+            continue
+
+        if size < position or (inode is not None and current_inode != inode):
+            position, remainder = 0, b""
+            inode = current_inode
+            continue
+        inode = current_inode
+
+        lines: List[str] = []
+        if data:
+            position += len(data)
+            parts = (remainder + data).split(b"\n")
+            remainder = parts.pop()
+            for raw in parts:
+                if not raw:
+                    continue
+                text = _decode(raw)
+                level = line_level(text) or level
+                if log_filter.matches(text, level):
+                    lines.append(text)
+
+        yield lines, position - len(remainder)
+        if not data or position >= size:
+            await asyncio.sleep(poll_interval)
@@ -129,14 +129,15 @@ async def compute_simple_subscription_price(
     additional_devices = max(0, device_limit - settings.DEFAULT_DEVICE_LIMIT)
     devices_price_original = additional_devices * settings.PRICE_PER_DEVICE
 
+    from app.services.pricing_catalog_service import pricing_catalog_service
+
+    catalog = await pricing_catalog_service.get_catalog()
     promo_group: Optional["PromoGroup"] = params.get("promo_group")
 
     if promo_group is None:
         promo_group_id = params.get("promo_group_id")
         if promo_group_id:
-            from app.database.crud.promo_group import get_promo_group_by_id
-
-            promo_group = await get_promo_group_by_id(db, int(promo_group_id))
+            promo_group = catalog.promo_groups.get(int(promo_group_id))
 
     if promo_group is None and user is not None:
         promo_group = user.get_primary_promo_group()
@@ -185,14 +186,12 @@ async def compute_simple_subscription_price(
         elif raw_squad:
             resolved_uuids.append(str(raw_squad))
 
-    from app.database.crud.server_squad import get_server_squad_by_uuid
-
     server_breakdown: List[Dict[str, Any]] = []
     servers_price_original = 0
     servers_discount_total = 0
 
     for squad_uuid in resolved_uuids:
-        server = await get_server_squad_by_uuid(db, squad_uuid)
+        server = catalog.servers_by_uuid.get(squad_uuid)
         if not server:
             logger.warning(
                 "SIMPLE_SUBSCRIPTION_PRICE_SERVER_NOT_FOUND | squad=%s",
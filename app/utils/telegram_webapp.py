@@ -6,14 +6,43 @@ import hashlib
 import hmac
 import json
 import time
-from typing import Any, Dict
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Tuple
 from urllib.parse import parse_qsl
 
 
+VERIFIED_INIT_DATA_CACHE_SIZE = 4096
+
+# (bot_token, init_data) -> (auth_date, parsed data); the raw string is the key,
+# so a known signature paired with altered fields never hits the cache.
+_verified_init_data: "OrderedDict[Tuple[str, str], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+
+
 class TelegramWebAppAuthError(Exception):
     """Raised when Telegram WebApp init data fails validation."""
 
 
+@lru_cache(maxsize=4)
+def _webapp_secret_key(bot_token: str) -> bytes:
+    return hmac.new(
+        key=b"WebAppData",
+        msg=bot_token.encode("utf-8"),
+        digestmod=hashlib.sha256,
+    ).digest()
+
+
+def _copy_init_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    copied = dict(data)
+    if isinstance(copied.get("user"), dict):
+        copied["user"] = dict(copied["user"])
+    return copied
+
+
+def clear_init_data_cache() -> None:
+    _verified_init_data.clear()
+
+
 def parse_webapp_init_data(
     init_data: str,
     bot_token: str,
@@ -27,6 +56,10 @@ def parse_webapp_init_data(
         bot_token: Bot token used to verify the signature.
         max_age_seconds: Maximum allowed age for the payload. Defaults to 24 hours.
 
+    Successfully verified payloads are cached until they exceed
+    ``max_age_seconds``, so repeated calls with the same init data skip the
+    signature check and parsing.
+
     Returns:
         Parsed init data as a dictionary.
 
@@ -40,6 +73,16 @@ def parse_webapp_init_data(
     if not bot_token:
         raise TelegramWebAppAuthError("Bot token is not configured")
 
+    cache_key = (bot_token, init_data)
+    cached = _verified_init_data.get(cache_key)
+    if cached is not None:
+        auth_date, cached_data = cached
+        if max_age_seconds and int(time.time()) - auth_date > max_age_seconds:
+            _verified_init_data.pop(cache_key, None)
+            raise TelegramWebAppAuthError("Init data is too old")
+        _verified_init_data.move_to_end(cache_key)
+        return _copy_init_data(cached_data)
+
     parsed_pairs = parse_qsl(init_data, strict_parsing=True, keep_blank_values=True)
     data: Dict[str, Any] = {key: value for key, value in parsed_pairs}
 
@@ -51,14 +94,8 @@ def parse_webapp_init_data(
         f"{key}={value}" for key, value in sorted(data.items())
     )
 
-    secret_key = hmac.new(
-        key=b"WebAppData",
-        msg=bot_token.encode("utf-8"),
-        digestmod=hashlib.sha256,
-    ).digest()
-
     computed_hash = hmac.new(
-        key=secret_key,
+        key=_webapp_secret_key(bot_token),
         msg=data_check_string.encode("utf-8"),
         digestmod=hashlib.sha256,
     ).hexdigest()
@@ -87,5 +124,11 @@ def parse_webapp_init_data(
         except json.JSONDecodeError as error:
             raise TelegramWebAppAuthError("Invalid user payload") from error
 
+    # Payloads without auth_date never expire, so only dated ones are cached
+    if data.get("auth_date"):
+        _verified_init_data[cache_key] = (data["auth_date"], _copy_init_data(data))
+        while len(_verified_init_data) > VERIFIED_INIT_DATA_CACHE_SIZE:
+            _verified_init_data.popitem(last=False)
+
     return data
 
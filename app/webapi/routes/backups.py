@@ -66,6 +66,8 @@ def _serialize_backup(raw: dict) -> BackupInfo:
         created_by=created_by,
         database_type=raw.get("database_type"),
         version=raw.get("version"),
+        backup_type=raw.get("backup_type"),
+        chain_position=_to_int(raw.get("chain_position")),
         error=raw.get("error"),
     )
 
@@ -13,12 +13,14 @@ from app.services.broadcast_service import (
     BroadcastMediaConfig,
     broadcast_service,
 )
+from app.services.telegram_send_scheduler import telegram_send_scheduler
 
 from ..dependencies import get_db_session, require_api_token
 from ..schemas.broadcasts import (
     BroadcastCreateRequest,
     BroadcastListResponse,
     BroadcastResponse,
+    BroadcastSchedulerStatsResponse,
 )
 
 
@@ -122,6 +124,24 @@ async def list_broadcasts(
     )
 
 
+@router.get("/scheduler", response_model=BroadcastSchedulerStatsResponse)
+async def get_scheduler_stats(
+    _: Any = Depends(require_api_token),
+) -> BroadcastSchedulerStatsResponse:
+    stats = telegram_send_scheduler.get_stats()
+    return BroadcastSchedulerStatsResponse(
+        queue_depth=stats.queue_depth,
+        in_flight=stats.in_flight,
+        sent_total=stats.sent_total,
+        failed_total=stats.failed_total,
+        retried_total=stats.retried_total,
+        flood_waits_total=stats.flood_waits_total,
+        messages_per_second=stats.messages_per_second,
+        eta_seconds=stats.eta_seconds,
+        paused_for_seconds=stats.paused_for_seconds,
+    )
+
+
 @router.post("/{broadcast_id}/stop", response_model=BroadcastResponse)
 async def stop_broadcast(
     broadcast_id: int,
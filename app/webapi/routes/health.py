@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+from dataclasses import asdict
+
 from fastapi import APIRouter, Security
 
 from app.config import settings
 from app.database import db_manager, get_pool_metrics
+from app.external.remnawave_api import get_pool_metrics as get_remnawave_pool_metrics
+from app.services.rate_limit_service import rate_limiter
 from app.services.version_service import version_service
 
 from ..dependencies import require_api_token
@@ -36,6 +40,18 @@ async def database_health(_: object = Security(require_api_token)) -> dict:
 
 @router.get("/metrics/pool", tags=["health"])
 async def pool_metrics(_: object = Security(require_api_token)) -> dict:
-    """Метрики пула подключений к базе данных."""
+    """Метрики пулов подключений: база данных и HTTP-сессии RemnaWave."""
+
+    metrics = dict(await get_pool_metrics())
+    metrics["remnawave"] = [
+        {**asdict(pool), "wait_time_avg": round(pool.wait_time_avg, 6)}
+        for pool in get_remnawave_pool_metrics()
+    ]
+    return metrics
+
+
+@router.get("/metrics/throttling", tags=["health"])
+async def throttling_metrics(_: object = Security(require_api_token)) -> dict:
+    """Счётчики ограничителя частоты событий бота."""
 
-    return await get_pool_metrics()
+    return asdict(rate_limiter.get_stats())
@@ -2,18 +2,28 @@
 from __future__ import annotations
 
 import logging
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.ticket import TicketCRUD
 from app.services.monitoring_service import monitoring_service
+from app.utils.log_reader import (
+    LogFilter,
+    follow_lines,
+    iter_filtered_lines,
+    read_range,
+    read_tail_text,
+    read_text_range,
+    tail_lines,
+)
 
 from ..dependencies import get_db_session, require_api_token
 from ..schemas.logs import (
@@ -23,8 +33,9 @@ from ..schemas.logs import (
     SupportAuditActionsResponse,
     SupportAuditLogEntry,
     SupportAuditLogListResponse,
-    SystemLogPreviewResponse,
     SystemLogFullResponse,
+    SystemLogLinesResponse,
+    SystemLogPreviewResponse,
 )
 
 router = APIRouter()
@@ -34,6 +45,14 @@ logger = logging.getLogger(__name__)
 
 SYSTEM_LOG_PREVIEW_LIMIT_DEFAULT = 4000
 SYSTEM_LOG_PREVIEW_LIMIT_MAX = 20000
+SYSTEM_LOG_LINES_DEFAULT = 200
+SYSTEM_LOG_LINES_MAX = 5000
+SYSTEM_LOG_PAGE_BYTES_DEFAULT = 256 * 1024
+SYSTEM_LOG_PAGE_BYTES_MAX = 4 * 1024 * 1024
+SYSTEM_LOG_FOLLOW_POLL_SECONDS = 1.0
+SYSTEM_LOG_FOLLOW_KEEPALIVE_SECONDS = 15.0
+
+LOG_LEVEL_PATTERN = "^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$"
 
 
 def _resolve_system_log_path() -> Path:
@@ -43,21 +62,30 @@ def _resolve_system_log_path() -> Path:
     return path
 
 
-async def _read_system_log(path: Path) -> tuple[str, int, Optional[float]]:
-    def _read() -> tuple[str, int, float]:
-        content = path.read_text(encoding="utf-8", errors="ignore")
-        stats = path.stat()
-        return content, stats.st_size, stats.st_mtime
-
-    return await run_in_threadpool(_read)
-
-
 def _format_timestamp(timestamp: Optional[float]) -> Optional[datetime]:
     if timestamp is None:
         return None
     return datetime.fromtimestamp(timestamp, tz=timezone.utc)
 
 
+def _file_mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _require_system_log() -> Path:
+    log_path = _resolve_system_log_path()
+    if not log_path.exists() or not log_path.is_file():
+        raise HTTPException(status_code=404, detail="Лог-файл не найден")
+    return log_path
+
+
+def _build_log_filter(level: Optional[str], contains: Optional[str]) -> LogFilter:
+    return LogFilter(min_level=level, contains=contains or None)
+
+
 @router.get("/system", response_model=SystemLogPreviewResponse)
 async def get_system_log_preview(
     _: Any = Security(require_api_token),
@@ -71,48 +99,38 @@ async def get_system_log_preview(
     """Получить предпросмотр системного лог-файла бота."""
 
     log_path = _resolve_system_log_path()
+    missing = SystemLogPreviewResponse(
+        path=str(log_path),
+        exists=False,
+        updated_at=None,
+        size_bytes=0,
+        size_chars=0,
+        preview="",
+        preview_chars=0,
+        preview_truncated=False,
+        download_url="/logs/system/download",
+    )
 
     if not log_path.exists() or not log_path.is_file():
-        return SystemLogPreviewResponse(
-            path=str(log_path),
-            exists=False,
-            updated_at=None,
-            size_bytes=0,
-            size_chars=0,
-            preview="",
-            preview_chars=0,
-            preview_truncated=False,
-            download_url="/logs/system/download",
-        )
+        return missing
 
     try:
-        content, size_bytes, mtime = await _read_system_log(log_path)
+        preview_text, truncated, size_bytes = await run_in_threadpool(
+            read_tail_text, log_path, preview_limit
+        )
     except FileNotFoundError:
         logger.warning("Лог-файл %s исчез во время чтения", log_path)
-        return SystemLogPreviewResponse(
-            path=str(log_path),
-            exists=False,
-            updated_at=None,
-            size_bytes=0,
-            size_chars=0,
-            preview="",
-            preview_chars=0,
-            preview_truncated=False,
-            download_url="/logs/system/download",
-        )
+        return missing
     except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
         logger.error("Ошибка чтения лог-файла %s: %s", log_path, error)
         raise HTTPException(status_code=500, detail="Не удалось прочитать лог-файл") from error
 
-    preview_text = content[-preview_limit:] if preview_limit > 0 else ""
-    truncated = len(content) > len(preview_text)
-
     return SystemLogPreviewResponse(
         path=str(log_path),
         exists=True,
-        updated_at=_format_timestamp(mtime),
+        updated_at=_format_timestamp(_file_mtime(log_path)),
         size_bytes=size_bytes,
-        size_chars=len(content),
+        size_chars=size_bytes,
         preview=preview_text,
         preview_chars=len(preview_text),
         preview_truncated=truncated,
@@ -120,18 +138,97 @@ async def get_system_log_preview(
     )
 
 
+@router.get("/system/lines", response_model=SystemLogLinesResponse)
+async def get_system_log_lines(
+    _: Any = Security(require_api_token),
+    lines: int = Query(
+        SYSTEM_LOG_LINES_DEFAULT,
+        ge=1,
+        le=SYSTEM_LOG_LINES_MAX,
+        description="Количество строк с конца файла (или до смещения before)",
+    ),
+    before: Optional[int] = Query(
+        default=None,
+        ge=0,
+        description="Читать строки до этого смещения в байтах, для прокрутки назад",
+    ),
+    offset: Optional[int] = Query(
+        default=None,
+        ge=0,
+        description="Читать вперёд с этого смещения в байтах вместо хвоста файла",
+    ),
+    limit_bytes: int = Query(
+        SYSTEM_LOG_PAGE_BYTES_DEFAULT,
+        ge=1024,
+        le=SYSTEM_LOG_PAGE_BYTES_MAX,
+        description="Размер страницы в байтах при чтении вперёд",
+    ),
+    level: Optional[str] = Query(
+        default=None,
+        pattern=LOG_LEVEL_PATTERN,
+        description="Минимальный уровень записей",
+    ),
+    contains: Optional[str] = Query(
+        default=None,
+        max_length=200,
+        description="Подстрока для поиска без учёта регистра",
+    ),
+) -> SystemLogLinesResponse:
+    """Получить строки системного лога с конца файла или страницу по смещению."""
+
+    log_path = _require_system_log()
+    log_filter = _build_log_filter(level, contains)
+
+    try:
+        if offset is not None:
+            chunk = await run_in_threadpool(read_range, log_path, offset, limit_bytes, log_filter)
+        else:
+            chunk = await run_in_threadpool(tail_lines, log_path, lines, log_filter, before)
+    except FileNotFoundError as error:
+        raise HTTPException(status_code=404, detail="Лог-файл не найден") from error
+    except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
+        logger.error("Ошибка чтения лог-файла %s: %s", log_path, error)
+        raise HTTPException(status_code=500, detail="Не удалось прочитать лог-файл") from error
+
+    return SystemLogLinesResponse(
+        path=str(log_path),
+        exists=True,
+        updated_at=_format_timestamp(_file_mtime(log_path)),
+        size_bytes=chunk.size_bytes,
+        lines=chunk.lines,
+        start_offset=chunk.start_offset,
+        end_offset=chunk.end_offset,
+        has_more_before=chunk.start_offset > 0,
+        has_more_after=chunk.end_offset < chunk.size_bytes,
+    )
+
+
 @router.get("/system/download")
 async def download_system_log(
     _: Any = Security(require_api_token),
-) -> FileResponse:
-    """Скачать полный лог-файл бота."""
-
-    log_path = _resolve_system_log_path()
+    level: Optional[str] = Query(
+        default=None,
+        pattern=LOG_LEVEL_PATTERN,
+        description="Минимальный уровень записей",
+    ),
+    contains: Optional[str] = Query(
+        default=None,
+        max_length=200,
+        description="Подстрока для поиска без учёта регистра",
+    ),
+) -> Response:
+    """Скачать лог-файл бота; с фильтрами подходящие строки отдаются потоком."""
 
-    if not log_path.exists() or not log_path.is_file():
-        raise HTTPException(status_code=404, detail="Лог-файл не найден")
+    log_path = _require_system_log()
+    log_filter = _build_log_filter(level, contains)
 
     try:
+        if log_filter.by_level or log_filter.contains:
+            return StreamingResponse(
+                iter_filtered_lines(log_path, log_filter),
+                media_type="text/plain",
+                headers={"Content-Disposition": f'attachment; filename="filtered-{log_path.name}"'},
+            )
         return FileResponse(
             log_path,
             media_type="text/plain",
@@ -142,19 +239,83 @@ async def download_system_log(
         raise HTTPException(status_code=500, detail="Не удалось отправить лог-файл") from error
 
 
+@router.get("/system/follow")
+async def follow_system_log(
+    request: Request,
+    _: Any = Security(require_api_token),
+    offset: Optional[int] = Query(
+        default=None,
+        ge=0,
+        description="Начать с этого смещения в байтах; по умолчанию — только новые строки",
+    ),
+    level: Optional[str] = Query(
+        default=None,
+        pattern=LOG_LEVEL_PATTERN,
+        description="Минимальный уровень записей",
+    ),
+    contains: Optional[str] = Query(
+        default=None,
+        max_length=200,
+        description="Подстрока для поиска без учёта регистра",
+    ),
+) -> StreamingResponse:
+    """Поток новых строк системного лога в формате Server-Sent Events.
+
+    Идентификатор события — смещение в байтах: при переподключении клиент передаёт
+    его в заголовке ``Last-Event-ID`` и продолжает без пропусков.
+    """
+
+    log_path = _resolve_system_log_path()
+    log_filter = _build_log_filter(level, contains)
+
+    last_event_id = request.headers.get("last-event-id")
+    if offset is None and last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    async def events():
+        idle_since = time.monotonic()
+        async for lines, position in follow_lines(
+            log_path,
+            log_filter,
+            offset,
+            poll_interval=SYSTEM_LOG_FOLLOW_POLL_SECONDS,
+        ):
+            if await request.is_disconnected():
+                break
+            if lines:
+                data = "".join(f"data: {line}\n" for line in lines)
+                yield f"id: {position}\n{data}\n"
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= SYSTEM_LOG_FOLLOW_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                idle_since = time.monotonic()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/system/full", response_model=SystemLogFullResponse)
 async def get_system_log_full(
     _: Any = Security(require_api_token),
+    offset: int = Query(0, ge=0, description="Смещение начала страницы в байтах"),
+    limit_bytes: Optional[int] = Query(
+        default=None,
+        ge=1024,
+        le=SYSTEM_LOG_PAGE_BYTES_MAX,
+        description="Размер страницы в байтах; без значения файл читается до конца",
+    ),
 ) -> SystemLogFullResponse:
-    """Получить полный системный лог-файл бота."""
+    """Получить системный лог-файл бота целиком или страницей по смещению."""
 
-    log_path = _resolve_system_log_path()
-
-    if not log_path.exists() or not log_path.is_file():
-        raise HTTPException(status_code=404, detail="Лог-файл не найден")
+    log_path = _require_system_log()
 
     try:
-        content, size_bytes, mtime = await _read_system_log(log_path)
+        content, start, end, size_bytes = await run_in_threadpool(
+            read_text_range, log_path, offset, limit_bytes
+        )
     except Exception as error:  # pragma: no cover - защита от неожиданных ошибок чтения
         logger.error("Ошибка чтения лог-файла %s: %s", log_path, error)
         raise HTTPException(status_code=500, detail="Не удалось прочитать лог-файл") from error
@@ -162,10 +323,12 @@ async def get_system_log_full(
     return SystemLogFullResponse(
         path=str(log_path),
         exists=True,
-        updated_at=_format_timestamp(mtime),
+        updated_at=_format_timestamp(_file_mtime(log_path)),
         size_bytes=size_bytes,
         size_chars=len(content),
         content=content,
+        offset=start,
+        next_offset=end if end < size_bytes else None,
     )
 
 
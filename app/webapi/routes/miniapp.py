@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
 import math
+import time
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, ROUND_FLOOR, ROUND_UP
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -45,15 +47,20 @@ from app.database.crud.transaction import (
     get_user_total_spent_kopeks,
 )
 from app.database.crud.user import get_user_by_telegram_id, subtract_user_balance
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
+    CryptoBotPayment,
+    HeleketPayment,
     PromoGroup,
     PromoOfferTemplate,
+    ServerSquad,
     Subscription,
     SubscriptionTemporaryAccess,
     Transaction,
     TransactionType,
     PaymentMethod,
     User,
+    YooKassaPayment,
 )
 from app.services.faq_service import FaqService
 from app.services.privacy_policy_service import PrivacyPolicyService
@@ -67,6 +74,7 @@ from app.services.payment_service import PaymentService, get_wata_payment_by_lin
 from app.services.promo_offer_service import promo_offer_service
 from app.services.promocode_service import PromoCodeService
 from app.services.maintenance_service import maintenance_service
+from app.services.miniapp_cache_service import miniapp_cache_service
 from app.services.subscription_service import SubscriptionService
 from app.services.subscription_renewal_service import (
     SubscriptionRenewalChargeError,
@@ -567,6 +575,16 @@ async def _find_recent_deposit(
     return transaction
 
 
+_PAYMENT_FINAL_RESULT_STATUSES = {"paid", "failed"}
+_PROVIDER_PAYMENT_METHODS = {"mulenpay", "platega", "wata", "pal24"}
+_PRELOADED_PAYMENT_MODELS = {
+    "yookassa": YooKassaPayment,
+    "yookassa_sbp": YooKassaPayment,
+    "cryptobot": CryptoBotPayment,
+    "heleket": HeleketPayment,
+}
+
+
 def _classify_status(status: Optional[str], is_paid: bool) -> str:
     if is_paid:
         return "paid"
@@ -603,6 +621,15 @@ def _format_limit_label(limit: Optional[int]) -> str:
     return f"{limit} GB"
 
 
+async def _get_request_user(db: AsyncSession, telegram_id: int) -> Optional[User]:
+    """Load the user once per request; the session lives for a single request."""
+
+    users = db.info.setdefault("miniapp_users", {})
+    if telegram_id not in users:
+        users[telegram_id] = await get_user_by_telegram_id(db, telegram_id)
+    return users[telegram_id]
+
+
 async def _resolve_user_from_init_data(
     db: AsyncSession,
     init_data: str,
@@ -636,7 +663,7 @@ async def _resolve_user_from_init_data(
             detail="Invalid Telegram user identifier",
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     if not user:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
@@ -1376,20 +1403,109 @@ async def get_payment_statuses(
     if not entries:
         return MiniAppPaymentStatusResponse(results=[])
 
-    payment_service = PaymentService()
-    results: List[MiniAppPaymentStatusResult] = []
+    resolved: Dict[int, MiniAppPaymentStatusResult] = {}
+    groups: Dict[str, List[Tuple[int, MiniAppPaymentStatusQuery]]] = {}
 
-    for entry in entries:
-        result = await _resolve_payment_status_entry(
-            payment_service=payment_service,
-            db=db,
-            user=user,
-            query=entry,
+    for index, entry in enumerate(entries):
+        cached = miniapp_cache_service.get_payment_status(
+            _payment_status_cache_key(user.id, entry)
         )
-        if result:
-            results.append(result)
+        if cached is not None:
+            resolved[index] = cached
+            continue
+        method = (entry.method or "").strip().lower()
+        groups.setdefault(method, []).append((index, entry))
+
+    if groups:
+        payment_service = PaymentService()
+        group_results = await asyncio.gather(*(
+            _resolve_payment_status_group(payment_service, user, method, items)
+            for method, items in groups.items()
+        ))
+        for items, results in zip(groups.values(), group_results):
+            for (index, entry), result in zip(items, results):
+                if result is None:
+                    continue
+                resolved[index] = result
+                miniapp_cache_service.set_payment_status(
+                    _payment_status_cache_key(user.id, entry),
+                    result,
+                    final=result.status in _PAYMENT_FINAL_RESULT_STATUSES,
+                )
+
+    return MiniAppPaymentStatusResponse(
+        results=[resolved[index] for index in sorted(resolved)]
+    )
+
+
+def _payment_status_cache_key(user_id: int, query: MiniAppPaymentStatusQuery) -> Tuple[int, str]:
+    return user_id, query.model_dump_json()
 
-    return MiniAppPaymentStatusResponse(results=results)
+
+async def _resolve_payment_status_group(
+    payment_service: PaymentService,
+    user: User,
+    method: str,
+    items: List[Tuple[int, MiniAppPaymentStatusQuery]],
+) -> List[Optional[MiniAppPaymentStatusResult]]:
+    """Resolves one method's payments.
+
+    Methods that only read the DB share a session and a batched lookup of local
+    payments; provider-backed methods run each payment in its own session so the
+    provider calls overlap, bounded per provider.
+    """
+
+    queries = [query for _, query in items]
+    preloaded_model = _PRELOADED_PAYMENT_MODELS.get(method)
+
+    if method not in _PROVIDER_PAYMENT_METHODS:
+        async with AsyncSessionLocal() as session:
+            preloaded = (
+                await _preload_local_payments(session, preloaded_model, user, queries)
+                if preloaded_model is not None
+                else {}
+            )
+            return [
+                await _resolve_payment_status_entry(
+                    payment_service=payment_service,
+                    db=session,
+                    user=user,
+                    query=query,
+                    preloaded=preloaded,
+                )
+                for query in queries
+            ]
+
+    semaphore = asyncio.Semaphore(
+        max(1, int(getattr(settings, "MINIAPP_PAYMENT_STATUS_PROVIDER_CONCURRENCY", 4)))
+    )
+
+    async def resolve(query: MiniAppPaymentStatusQuery) -> Optional[MiniAppPaymentStatusResult]:
+        async with semaphore:
+            async with AsyncSessionLocal() as session:
+                return await _resolve_payment_status_entry(
+                    payment_service=payment_service,
+                    db=session,
+                    user=user,
+                    query=query,
+                )
+
+    return list(await asyncio.gather(*(resolve(query) for query in queries)))
+
+
+async def _preload_local_payments(
+    db: AsyncSession,
+    model: Any,
+    user: User,
+    queries: List[MiniAppPaymentStatusQuery],
+) -> Dict[int, Any]:
+    local_ids = {query.local_payment_id for query in queries if query.local_payment_id}
+    if not local_ids:
+        return {}
+    result = await db.execute(
+        select(model).where(model.id.in_(local_ids), model.user_id == user.id)
+    )
+    return {payment.id: payment for payment in result.scalars().all()}
 
 
 async def _resolve_payment_status_entry(
@@ -1398,6 +1514,7 @@ async def _resolve_payment_status_entry(
     db: AsyncSession,
     user: User,
     query: MiniAppPaymentStatusQuery,
+    preloaded: Optional[Dict[int, Any]] = None,
 ) -> MiniAppPaymentStatusResult:
     method = (query.method or "").strip().lower()
     if not method:
@@ -1407,12 +1524,15 @@ async def _resolve_payment_status_entry(
             message="Payment method is required",
         )
 
+    preloaded_payment = (preloaded or {}).get(query.local_payment_id)
+
     if method in {"yookassa", "yookassa_sbp"}:
         return await _resolve_yookassa_payment_status(
             db,
             user,
             query,
             method=method,
+            payment=preloaded_payment,
         )
     if method == "mulenpay":
         return await _resolve_mulenpay_payment_status(payment_service, db, user, query)
@@ -1423,9 +1543,9 @@ async def _resolve_payment_status_entry(
     if method == "pal24":
         return await _resolve_pal24_payment_status(payment_service, db, user, query)
     if method == "cryptobot":
-        return await _resolve_cryptobot_payment_status(db, user, query)
+        return await _resolve_cryptobot_payment_status(db, user, query, payment=preloaded_payment)
     if method == "heleket":
-        return await _resolve_heleket_payment_status(db, user, query)
+        return await _resolve_heleket_payment_status(db, user, query, payment=preloaded_payment)
     if method == "stars":
         return await _resolve_stars_payment_status(db, user, query)
     if method == "tribute":
@@ -1444,14 +1564,14 @@ async def _resolve_yookassa_payment_status(
     query: MiniAppPaymentStatusQuery,
     *,
     method: str = "yookassa",
+    payment: Optional[Any] = None,
 ) -> MiniAppPaymentStatusResult:
     from app.database.crud.yookassa import (
         get_yookassa_payment_by_id,
         get_yookassa_payment_by_local_id,
     )
 
-    payment = None
-    if query.local_payment_id:
+    if not payment and query.local_payment_id:
         payment = await get_yookassa_payment_by_local_id(db, query.local_payment_id)
     if not payment and query.payment_id:
         payment = await get_yookassa_payment_by_id(db, query.payment_id)
@@ -1845,14 +1965,15 @@ async def _resolve_cryptobot_payment_status(
     db: AsyncSession,
     user: User,
     query: MiniAppPaymentStatusQuery,
+    *,
+    payment: Optional[Any] = None,
 ) -> MiniAppPaymentStatusResult:
     from app.database.crud.cryptobot import (
         get_cryptobot_payment_by_id,
         get_cryptobot_payment_by_invoice_id,
     )
 
-    payment = None
-    if query.local_payment_id:
+    if not payment and query.local_payment_id:
         payment = await get_cryptobot_payment_by_id(db, query.local_payment_id)
     if not payment and query.invoice_id:
         payment = await get_cryptobot_payment_by_invoice_id(db, query.invoice_id)
@@ -1914,6 +2035,8 @@ async def _resolve_heleket_payment_status(
     db: AsyncSession,
     user: User,
     query: MiniAppPaymentStatusQuery,
+    *,
+    payment: Optional[Any] = None,
 ) -> MiniAppPaymentStatusResult:
     from app.database.crud.heleket import (
         get_heleket_payment_by_id,
@@ -1921,8 +2044,7 @@ async def _resolve_heleket_payment_status(
         get_heleket_payment_by_uuid,
     )
 
-    payment = None
-    if query.local_payment_id:
+    if not payment and query.local_payment_id:
         payment = await get_heleket_payment_by_id(db, query.local_payment_id)
     if not payment and query.payment_id:
         payment = await get_heleket_payment_by_uuid(db, query.payment_id)
@@ -2531,17 +2653,17 @@ async def _resolve_connected_servers(
     if not squad_uuids:
         return []
 
-    resolved: Dict[str, str] = {}
-    missing: List[str] = []
-
-    for squad_uuid in squad_uuids:
-        if squad_uuid in resolved:
-            continue
-        server = await get_server_squad_by_uuid(db, squad_uuid)
-        if server and server.display_name:
-            resolved[squad_uuid] = server.display_name
-        else:
-            missing.append(squad_uuid)
+    result = await db.execute(
+        select(ServerSquad.squad_uuid, ServerSquad.display_name).where(
+            ServerSquad.squad_uuid.in_(set(squad_uuids))
+        )
+    )
+    resolved: Dict[str, str] = {
+        squad_uuid: display_name
+        for squad_uuid, display_name in result.all()
+        if display_name
+    }
+    missing = [squad_uuid for squad_uuid in dict.fromkeys(squad_uuids) if squad_uuid not in resolved]
 
     if missing:
         try:
@@ -2566,8 +2688,7 @@ async def _resolve_connected_servers(
     return connected_servers
 
 
-async def _load_devices_info(user: User) -> Tuple[int, List[MiniAppDevice]]:
-    remnawave_uuid = getattr(user, "remnawave_uuid", None)
+async def _load_devices_info(remnawave_uuid: Optional[str]) -> Tuple[int, List[MiniAppDevice]]:
     if not remnawave_uuid:
         return 0, []
 
@@ -2660,14 +2781,14 @@ def _serialize_transaction(transaction: Transaction) -> MiniAppTransaction:
 
 
 async def _load_subscription_links(
-    subscription: Subscription,
+    remnawave_short_uuid: Optional[str],
 ) -> Dict[str, Any]:
-    if not subscription.remnawave_short_uuid or not _is_remnawave_configured():
+    if not remnawave_short_uuid or not _is_remnawave_configured():
         return {}
 
     try:
         service = SubscriptionService()
-        info = await service.get_subscription_info(subscription.remnawave_short_uuid)
+        info = await service.get_subscription_info(remnawave_short_uuid)
     except Exception as error:  # pragma: no cover - defensive logging
         logger.warning("Failed to load subscription info from RemnaWave: %s", error)
         return {}
@@ -2818,6 +2939,233 @@ def _is_trial_available_for_user(user: User) -> bool:
     return True
 
 
+def _normalize_rules_language(language: Optional[str]) -> str:
+    base_language = language or settings.DEFAULT_LANGUAGE or "ru"
+    return base_language.split("-")[0].lower()
+
+
+async def _build_faq_payload(
+    db: AsyncSession,
+    content_language_preference: str,
+) -> Optional[MiniAppFaq]:
+    faq_payload: Optional[MiniAppFaq] = None
+    requested_faq_language = FaqService.normalize_language(content_language_preference)
+    faq_pages = await FaqService.get_pages(
+        db,
+        requested_faq_language,
+        include_inactive=False,
+        fallback=True,
+    )
+
+    if faq_pages:
+        faq_setting = await FaqService.get_setting(
+            db,
+            requested_faq_language,
+            fallback=True,
+        )
+        is_enabled = bool(faq_setting.is_enabled) if faq_setting else True
+
+        if is_enabled:
+            ordered_pages = sorted(
+                faq_pages,
+                key=lambda page: (
+                    (page.display_order or 0),
+                    page.id,
+                ),
+            )
+            faq_items: List[MiniAppFaqItem] = []
+            for page in ordered_pages:
+                raw_content = (page.content or "").strip()
+                if not raw_content:
+                    continue
+                if not re.sub(r"<[^>]+>", "", raw_content).strip():
+                    continue
+                faq_items.append(
+                    MiniAppFaqItem(
+                        id=page.id,
+                        title=page.title or None,
+                        content=page.content or "",
+                        display_order=getattr(page, "display_order", None),
+                    )
+            )
+
+            if faq_items:
+                resolved_language = (
+                    faq_setting.language
+                    if faq_setting and faq_setting.language
+                    else ordered_pages[0].language
+                )
+                faq_payload = MiniAppFaq(
+                    requested_language=requested_faq_language,
+                    language=resolved_language or requested_faq_language,
+                    is_enabled=is_enabled,
+                    total=len(faq_items),
+                    items=faq_items,
+                )
+
+    return faq_payload
+
+
+async def _build_legal_documents_payload(
+    db: AsyncSession,
+    content_language_preference: str,
+) -> Optional[MiniAppLegalDocuments]:
+    legal_documents_payload: Optional[MiniAppLegalDocuments] = None
+
+    requested_offer_language = PublicOfferService.normalize_language(content_language_preference)
+    public_offer = await PublicOfferService.get_active_offer(
+        db,
+        requested_offer_language,
+    )
+    if public_offer and (public_offer.content or "").strip():
+        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+        legal_documents_payload.public_offer = MiniAppRichTextDocument(
+            requested_language=requested_offer_language,
+            language=public_offer.language,
+            title=None,
+            is_enabled=bool(public_offer.is_enabled),
+            content=public_offer.content or "",
+            created_at=public_offer.created_at,
+            updated_at=public_offer.updated_at,
+        )
+
+    requested_policy_language = PrivacyPolicyService.normalize_language(
+        content_language_preference
+    )
+    privacy_policy = await PrivacyPolicyService.get_active_policy(
+        db,
+        requested_policy_language,
+    )
+    if privacy_policy and (privacy_policy.content or "").strip():
+        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+        legal_documents_payload.privacy_policy = MiniAppRichTextDocument(
+            requested_language=requested_policy_language,
+            language=privacy_policy.language,
+            title=None,
+            is_enabled=bool(privacy_policy.is_enabled),
+            content=privacy_policy.content or "",
+            created_at=privacy_policy.created_at,
+            updated_at=privacy_policy.updated_at,
+        )
+
+    requested_rules_language = _normalize_rules_language(content_language_preference)
+    default_rules_language = _normalize_rules_language(settings.DEFAULT_LANGUAGE)
+    service_rules = await get_rules_by_language(db, requested_rules_language)
+    if not service_rules and requested_rules_language != default_rules_language:
+        service_rules = await get_rules_by_language(db, default_rules_language)
+
+    if service_rules and (service_rules.content or "").strip():
+        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+        legal_documents_payload.service_rules = MiniAppRichTextDocument(
+            requested_language=requested_rules_language,
+            language=service_rules.language,
+            title=getattr(service_rules, "title", None),
+            is_enabled=bool(getattr(service_rules, "is_active", True)),
+            content=service_rules.content or "",
+            created_at=getattr(service_rules, "created_at", None),
+            updated_at=getattr(service_rules, "updated_at", None),
+        )
+
+    return legal_documents_payload
+
+
+async def _load_miniapp_content(
+    content_language_preference: str,
+) -> Tuple[Optional[MiniAppFaq], Optional[MiniAppLegalDocuments]]:
+    async def load() -> Tuple[Optional[MiniAppFaq], Optional[MiniAppLegalDocuments]]:
+        async with AsyncSessionLocal() as session:
+            faq_payload = await _build_faq_payload(session, content_language_preference)
+            legal_documents_payload = await _build_legal_documents_payload(
+                session,
+                content_language_preference,
+            )
+        return faq_payload, legal_documents_payload
+
+    try:
+        return await miniapp_cache_service.get_content(
+            ("subscription_content", content_language_preference),
+            load,
+        )
+    except Exception as error:  # pragma: no cover - defensive logging
+        logger.warning("Failed to load mini app content: %s", error)
+        return None, None
+
+
+async def _load_connected_servers(squad_uuids: List[str]) -> List[MiniAppConnectedServer]:
+    try:
+        async with AsyncSessionLocal() as session:
+            return await _resolve_connected_servers(session, squad_uuids)
+    except Exception as error:  # pragma: no cover - defensive logging
+        logger.warning("Failed to resolve connected servers: %s", error)
+        return [MiniAppConnectedServer(uuid=uuid, name=uuid) for uuid in squad_uuids]
+
+
+async def _sync_subscription_usage(subscription_id: int) -> Optional[float]:
+    """Syncs traffic usage in its own session and returns when it happened."""
+
+    try:
+        async with AsyncSessionLocal() as session:
+            subscription = await session.get(Subscription, subscription_id)
+            if subscription is None:
+                return None
+            if await SubscriptionService().sync_subscription_usage(session, subscription):
+                return time.monotonic()
+    except Exception as error:  # pragma: no cover - defensive logging
+        logger.warning(
+            "Failed to sync subscription usage for subscription %s: %s",
+            subscription_id,
+            error,
+        )
+    return None
+
+
+async def _load_subscription_usage_sync(
+    telegram_id: int,
+    subscription: Optional[Subscription],
+) -> Optional[float]:
+    if not subscription or not _is_remnawave_configured():
+        return None
+
+    subscription_id = subscription.id
+    return await miniapp_cache_service.get_user_value(
+        telegram_id,
+        "usage_sync",
+        lambda: _sync_subscription_usage(subscription_id),
+    )
+
+
+async def _load_subscription_panel_data(
+    telegram_id: int,
+    user: User,
+    subscription: Optional[Subscription],
+) -> Tuple[Dict[str, Any], List[MiniAppConnectedServer], Tuple[int, List[MiniAppDevice]]]:
+    remnawave_uuid = getattr(user, "remnawave_uuid", None)
+    devices_load = miniapp_cache_service.get_user_value(
+        telegram_id,
+        ("devices", remnawave_uuid),
+        lambda: _load_devices_info(remnawave_uuid),
+    )
+
+    if not subscription:
+        return {}, [], await devices_load
+
+    short_uuid = subscription.remnawave_short_uuid
+    squad_uuids = list(subscription.connected_squads or [])
+    return await asyncio.gather(
+        miniapp_cache_service.get_user_value(
+            telegram_id,
+            ("links", short_uuid),
+            lambda: _load_subscription_links(short_uuid),
+        ),
+        miniapp_cache_service.get_user_value(
+            telegram_id,
+            ("servers", tuple(squad_uuids)),
+            lambda: _load_connected_servers(squad_uuids),
+        ),
+        devices_load,
+    )
+
+
 @router.post("/subscription", response_model=MiniAppSubscriptionResponse)
 async def get_subscription_details(
     payload: MiniAppSubscriptionRequest,
@@ -2846,7 +3194,7 @@ async def get_subscription_details(
             detail="Invalid Telegram user identifier",
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     purchase_url = (settings.MINIAPP_PURCHASE_URL or "").strip()
 
     if not user:
@@ -2863,18 +3211,36 @@ async def get_subscription_details(
         )
 
     subscription = getattr(user, "subscription", None)
-    usage_synced = False
 
-    if subscription and _is_remnawave_configured():
-        service = SubscriptionService()
-        try:
-            usage_synced = await service.sync_subscription_usage(db, subscription)
-        except Exception as error:  # pragma: no cover - defensive logging
-            logger.warning(
-                "Failed to sync subscription usage for user %s: %s",
-                getattr(user, "id", "unknown"),
-                error,
-            )
+    # Panel round trips and shared content run alongside the DB reads below;
+    # the request session is only used by this coroutine.
+    request_started = time.monotonic()
+    side_loads = asyncio.gather(
+        _load_subscription_usage_sync(telegram_id, subscription),
+        _load_miniapp_content(user.language or settings.DEFAULT_LANGUAGE or "ru"),
+        _load_subscription_panel_data(telegram_id, user, subscription),
+    )
+
+    transactions_query = (
+        select(Transaction)
+        .where(Transaction.user_id == user.id)
+        .order_by(Transaction.created_at.desc())
+        .limit(10)
+    )
+    transactions_result = await db.execute(transactions_query)
+    transactions = list(transactions_result.scalars().all())
+
+    total_spent_kopeks = await get_user_total_spent_kopeks(db, user.id)
+    auto_assign_groups = await get_auto_assign_promo_groups(db)
+    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
+    referral_info = await _build_referral_info(db, user)
+
+    (
+        usage_synced_at,
+        (faq_payload, legal_documents_payload),
+        (links_payload, connected_servers, (devices_count, devices)),
+    ) = await side_loads
+    usage_synced = bool(usage_synced_at and usage_synced_at >= request_started)
 
     if usage_synced:
         try:
@@ -2897,22 +3263,11 @@ async def get_subscription_details(
         subscription = getattr(user, "subscription", subscription)
     lifetime_used = _bytes_to_gb(getattr(user, "lifetime_used_traffic_bytes", 0))
 
-    transactions_query = (
-        select(Transaction)
-        .where(Transaction.user_id == user.id)
-        .order_by(Transaction.created_at.desc())
-        .limit(10)
-    )
-    transactions_result = await db.execute(transactions_query)
-    transactions = list(transactions_result.scalars().all())
-
     balance_currency = getattr(user, "balance_currency", None)
     if isinstance(balance_currency, str):
         balance_currency = balance_currency.upper()
 
     promo_group = getattr(user, "promo_group", None)
-    total_spent_kopeks = await get_user_total_spent_kopeks(db, user.id)
-    auto_assign_groups = await get_auto_assign_promo_groups(db)
 
     auto_promo_levels: List[MiniAppAutoPromoGroupLevel] = []
     for group in auto_assign_groups:
@@ -2945,8 +3300,6 @@ async def get_subscription_details(
         active_discount_expires_at = None
         active_discount_percent = 0
 
-    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
-
     promo_offer_source = getattr(user, "promo_offer_discount_source", None)
     active_offer_contexts: List[ActiveOfferContext] = []
     if promo_offer_source or active_discount_percent > 0:
@@ -2976,126 +3329,7 @@ async def get_subscription_details(
         user=user,
     )
 
-    content_language_preference = user.language or settings.DEFAULT_LANGUAGE or "ru"
-
-    def _normalize_language_code(language: Optional[str]) -> str:
-        base_language = language or settings.DEFAULT_LANGUAGE or "ru"
-        return base_language.split("-")[0].lower()
-
-    faq_payload: Optional[MiniAppFaq] = None
-    requested_faq_language = FaqService.normalize_language(content_language_preference)
-    faq_pages = await FaqService.get_pages(
-        db,
-        requested_faq_language,
-        include_inactive=False,
-        fallback=True,
-    )
-
-    if faq_pages:
-        faq_setting = await FaqService.get_setting(
-            db,
-            requested_faq_language,
-            fallback=True,
-        )
-        is_enabled = bool(faq_setting.is_enabled) if faq_setting else True
-
-        if is_enabled:
-            ordered_pages = sorted(
-                faq_pages,
-                key=lambda page: (
-                    (page.display_order or 0),
-                    page.id,
-                ),
-            )
-            faq_items: List[MiniAppFaqItem] = []
-            for page in ordered_pages:
-                raw_content = (page.content or "").strip()
-                if not raw_content:
-                    continue
-                if not re.sub(r"<[^>]+>", "", raw_content).strip():
-                    continue
-                faq_items.append(
-                    MiniAppFaqItem(
-                        id=page.id,
-                        title=page.title or None,
-                        content=page.content or "",
-                        display_order=getattr(page, "display_order", None),
-                    )
-            )
-
-            if faq_items:
-                resolved_language = (
-                    faq_setting.language
-                    if faq_setting and faq_setting.language
-                    else ordered_pages[0].language
-                )
-                faq_payload = MiniAppFaq(
-                    requested_language=requested_faq_language,
-                    language=resolved_language or requested_faq_language,
-                    is_enabled=is_enabled,
-                    total=len(faq_items),
-                    items=faq_items,
-                )
-
-    legal_documents_payload: Optional[MiniAppLegalDocuments] = None
-
-    requested_offer_language = PublicOfferService.normalize_language(content_language_preference)
-    public_offer = await PublicOfferService.get_active_offer(
-        db,
-        requested_offer_language,
-    )
-    if public_offer and (public_offer.content or "").strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.public_offer = MiniAppRichTextDocument(
-            requested_language=requested_offer_language,
-            language=public_offer.language,
-            title=None,
-            is_enabled=bool(public_offer.is_enabled),
-            content=public_offer.content or "",
-            created_at=public_offer.created_at,
-            updated_at=public_offer.updated_at,
-        )
-
-    requested_policy_language = PrivacyPolicyService.normalize_language(
-        content_language_preference
-    )
-    privacy_policy = await PrivacyPolicyService.get_active_policy(
-        db,
-        requested_policy_language,
-    )
-    if privacy_policy and (privacy_policy.content or "").strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.privacy_policy = MiniAppRichTextDocument(
-            requested_language=requested_policy_language,
-            language=privacy_policy.language,
-            title=None,
-            is_enabled=bool(privacy_policy.is_enabled),
-            content=privacy_policy.content or "",
-            created_at=privacy_policy.created_at,
-            updated_at=privacy_policy.updated_at,
-        )
-
-    requested_rules_language = _normalize_language_code(content_language_preference)
-    default_rules_language = _normalize_language_code(settings.DEFAULT_LANGUAGE)
-    service_rules = await get_rules_by_language(db, requested_rules_language)
-    if not service_rules and requested_rules_language != default_rules_language:
-        service_rules = await get_rules_by_language(db, default_rules_language)
-
-    if service_rules and (service_rules.content or "").strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.service_rules = MiniAppRichTextDocument(
-            requested_language=requested_rules_language,
-            language=service_rules.language,
-            title=getattr(service_rules, "title", None),
-            is_enabled=bool(getattr(service_rules, "is_active", True)),
-            content=service_rules.content or "",
-            created_at=getattr(service_rules, "created_at", None),
-            updated_at=getattr(service_rules, "updated_at", None),
-        )
-
-    links_payload: Dict[str, Any] = {}
     connected_squads: List[str] = []
-    connected_servers: List[MiniAppConnectedServer] = []
     links: List[str] = []
     ss_conf_links: Dict[str, str] = {}
     subscription_url: Optional[str] = None
@@ -3114,7 +3348,6 @@ async def get_subscription_details(
         traffic_limit_value = subscription.traffic_limit_gb or 0
         status_actual = subscription.actual_status
         subscription_status_value = subscription.status
-        links_payload = await _load_subscription_links(subscription)
         subscription_url = (
             links_payload.get("subscription_url") or subscription.subscription_url
         )
@@ -3124,7 +3357,6 @@ async def get_subscription_details(
         )
         happ_redirect_link = get_happ_cryptolink_redirect_link(subscription_crypto_link)
         connected_squads = list(subscription.connected_squads or [])
-        connected_servers = await _resolve_connected_servers(db, connected_squads)
         links = links_payload.get("links") or connected_squads
         ss_conf_links = links_payload.get("ss_conf_links") or {}
         remnawave_short_uuid = subscription.remnawave_short_uuid
@@ -3149,8 +3381,6 @@ async def get_subscription_details(
         autopay_payload,
     )
 
-    devices_count, devices = await _load_devices_info(user)
-
     response_user = MiniAppSubscriptionUser(
         telegram_id=user.telegram_id,
         username=user.username,
@@ -3182,8 +3412,6 @@ async def get_subscription_details(
         promo_offer_discount_source=promo_offer_source,
     )
 
-    referral_info = await _build_referral_info(db, user)
-
     trial_available = _is_trial_available_for_user(user)
     trial_duration_days = (
         settings.TRIAL_DURATION_DAYS if settings.TRIAL_DURATION_DAYS > 0 else None
@@ -3628,6 +3856,8 @@ async def activate_subscription_trial_endpoint(
         )
     )
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppSubscriptionTrialResponse(
         message=message,
         subscription_id=getattr(subscription, "id", None),
@@ -3671,7 +3901,7 @@ async def activate_promo_code(
             detail={"code": "invalid_user", "message": "Invalid Telegram user identifier"},
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     if not user:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
@@ -3775,7 +4005,7 @@ async def claim_promo_offer(
             detail={"code": "invalid_user", "message": "Invalid Telegram user identifier"},
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     if not user:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
@@ -3920,7 +4150,7 @@ async def remove_connected_device(
             detail={"code": "invalid_user", "message": "Invalid Telegram user identifier"},
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     if not user:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
@@ -3974,6 +4204,8 @@ async def remove_connected_device(
             detail={"code": "remnawave_error", "message": "Failed to remove device"},
         )
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppDeviceRemovalResponse(success=True)
 
 
@@ -4352,7 +4584,7 @@ async def _authorize_miniapp_user(
             detail={"code": "invalid_user", "message": "Invalid Telegram user identifier"},
         ) from None
 
-    user = await get_user_by_telegram_id(db, telegram_id)
+    user = await _get_request_user(db, telegram_id)
     if not user:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
@@ -5114,6 +5346,8 @@ async def subscription_purchase_endpoint(
 
     balance_label = settings.format_price(getattr(user, "balance_kopeks", 0))
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppSubscriptionPurchaseResponse(
         message=result.get("message"),
         balance_kopeks=user.balance_kopeks,
@@ -5497,6 +5731,8 @@ async def update_subscription_servers_endpoint(
         )
     )
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppSubscriptionUpdateResponse(success=True)
 
 
@@ -5664,6 +5900,8 @@ async def update_subscription_traffic_endpoint(
         )
     )
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppSubscriptionUpdateResponse(success=True)
 
 
@@ -5818,4 +6056,6 @@ async def update_subscription_devices_endpoint(
         )
     )
 
+    miniapp_cache_service.invalidate_user(user.telegram_id)
+
     return MiniAppSubscriptionUpdateResponse(success=True)
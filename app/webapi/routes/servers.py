@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.crud.server_squad import (
+    count_server_connected_users,
     create_server_squad,
     delete_server_squad,
     get_server_connected_users,
@@ -371,9 +372,8 @@ async def get_server_connected_users_endpoint(
     if not server:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Server not found")
 
-    users = await get_server_connected_users(db, server_id)
-    total = len(users)
-    sliced = users[offset : offset + limit]
+    total = await count_server_connected_users(db, server_id)
+    sliced = await get_server_connected_users(db, server_id, limit=limit, offset=offset)
 
     return ServerConnectedUsersResponse(
         items=[_serialize_connected_user(user) for user in sliced],
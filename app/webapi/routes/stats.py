@@ -1,21 +1,21 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, Security
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.crud.stats import stats_day
 from app.database.models import (
     Subscription,
     SubscriptionStatus,
     Ticket,
     TicketStatus,
-    Transaction,
-    TransactionType,
     User,
     UserStatus,
 )
+from app.services.stats_rollup_service import stats_rollup_service
 
 from ..dependencies import get_db_session, require_api_token
 
@@ -59,29 +59,24 @@ async def stats_overview(
     _: object = Security(require_api_token),
     db: AsyncSession = Depends(get_db_session),
 ) -> dict[str, object]:
-    total_users = await db.scalar(select(func.count()).select_from(User)) or 0
-    active_users = await db.scalar(
-        select(func.count()).select_from(User).where(User.status == UserStatus.ACTIVE.value)
-    ) or 0
-    blocked_users = await db.scalar(
-        select(func.count()).select_from(User).where(User.status == UserStatus.BLOCKED.value)
-    ) or 0
-
-    total_balance_kopeks = await db.scalar(
-        select(func.coalesce(func.sum(User.balance_kopeks), 0))
-    ) or 0
-
-    active_subscriptions = await db.scalar(
-        select(func.count()).select_from(Subscription).where(
-            Subscription.status == SubscriptionStatus.ACTIVE.value,
+    users_row = (await db.execute(
+        select(
+            func.count(User.id),
+            func.count(User.id).filter(User.status == UserStatus.ACTIVE.value),
+            func.count(User.id).filter(User.status == UserStatus.BLOCKED.value),
+            func.coalesce(func.sum(User.balance), 0),
         )
-    ) or 0
+    )).one()
+    total_users, active_users, blocked_users, total_balance = users_row
+    total_balance_kopeks = int(round((total_balance or 0) * 100))
 
-    expired_subscriptions = await db.scalar(
-        select(func.count()).select_from(Subscription).where(
-            Subscription.status == SubscriptionStatus.EXPIRED.value,
+    subscriptions_row = (await db.execute(
+        select(
+            func.count(Subscription.id).filter(Subscription.status == SubscriptionStatus.ACTIVE),
+            func.count(Subscription.id).filter(Subscription.status == SubscriptionStatus.EXPIRED),
         )
-    ) or 0
+    )).one()
+    active_subscriptions, expired_subscriptions = subscriptions_row
 
     pending_tickets = await db.scalar(
         select(func.count()).select_from(Ticket).where(
@@ -89,13 +84,9 @@ async def stats_overview(
         )
     ) or 0
 
-    today = datetime.utcnow().date()
-    today_transactions = await db.scalar(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            func.date(Transaction.created_at) == today,
-            Transaction.type == TransactionType.DEPOSIT.value,
-        )
-    ) or 0
+    today = stats_day(datetime.utcnow())
+    today_totals = await stats_rollup_service.get_totals(db, today, today + timedelta(days=1))
+    today_transactions = today_totals["deposits_kopeks"]
 
     return {
         "users": {
@@ -23,6 +23,8 @@ class BackupInfo(BaseModel):
     created_by: Optional[int] = None
     database_type: Optional[str] = None
     version: Optional[str] = None
+    backup_type: Optional[str] = None
+    chain_position: Optional[int] = None
     error: Optional[str] = None
 
 
@@ -108,3 +108,15 @@ class BroadcastListResponse(BaseModel):
     limit: int
     offset: int
 
+
+
+class BroadcastSchedulerStatsResponse(BaseModel):
+    queue_depth: int
+    in_flight: int
+    sent_total: int
+    failed_total: int
+    retried_total: int
+    flood_waits_total: int
+    messages_per_second: float
+    eta_seconds: Optional[float] = None
+    paused_for_seconds: float
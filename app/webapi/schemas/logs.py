@@ -75,7 +75,11 @@ class SystemLogPreviewResponse(BaseModel):
         description="Дата и время последнего изменения лог-файла",
     )
     size_bytes: int = Field(..., ge=0, description="Размер лог-файла в байтах")
-    size_chars: int = Field(..., ge=0, description="Количество символов в лог-файле")
+    size_chars: int = Field(
+        ...,
+        ge=0,
+        description="Размер лог-файла; файл не читается целиком, поэтому совпадает с size_bytes",
+    )
     preview: str = Field(
         default="",
         description="Фрагмент содержимого лог-файла, возвращаемый для предпросмотра",
@@ -99,3 +103,22 @@ class SystemLogFullResponse(BaseModel):
     size_bytes: int
     size_chars: int
     content: str
+    offset: int = 0
+    next_offset: Optional[int] = Field(
+        default=None,
+        description="Смещение следующей страницы в байтах; пусто, если прочитано до конца файла",
+    )
+
+
+class SystemLogLinesResponse(BaseModel):
+    """Строки системного лог-файла с байтовыми курсорами для пагинации."""
+
+    path: str
+    exists: bool
+    updated_at: Optional[datetime] = None
+    size_bytes: int = Field(..., ge=0)
+    lines: List[str] = Field(default_factory=list)
+    start_offset: int = Field(..., ge=0, description="Смещение первой прочитанной строки")
+    end_offset: int = Field(..., ge=0, description="Смещение сразу после прочитанного диапазона")
+    has_more_before: bool = Field(..., description="Есть ли строки до start_offset")
+    has_more_after: bool = Field(..., description="Есть ли строки после end_offset")
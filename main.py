@@ -5,7 +5,6 @@ from contextlib import asynccontextmanager
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
@@ -35,6 +34,7 @@ logger = logging.getLogger(__name__)
 
 bot: Bot = None
 dp: Dispatcher = None
+polling_task: asyncio.Task = None
 
 
 class DatabaseMiddleware:
@@ -47,23 +47,32 @@ class DatabaseMiddleware:
             return await handler(event, data)
 
 
-async def start_bot():
+def setup_bot() -> bool:
+    """Создаёт бота и диспетчер; бот нужен каждому воркеру, поллинг — только лидеру."""
     global bot, dp
     
     try:
         if not settings.BOT_TOKEN:
             logger.error("BOT_TOKEN is not set!")
-            return
+            return False
+        
+        from app.services.shared_state_service import shared_state
         
         bot = Bot(
             token=settings.BOT_TOKEN,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
         
-        dp = Dispatcher(storage=MemoryStorage())
+        dp = Dispatcher(storage=shared_state.create_fsm_storage())
         
         DatabaseMiddleware(dp)
         
+        if settings.THROTTLING_ENABLED:
+            from app.middlewares.throttling import ThrottlingMiddleware
+            throttling = ThrottlingMiddleware()
+            dp.message.outer_middleware(throttling)
+            dp.callback_query.outer_middleware(throttling)
+        
         dp.include_router(start.router)
         dp.include_router(profile.router)
         dp.include_router(subscription.router)
@@ -104,40 +113,118 @@ async def start_bot():
         trials.register_handlers(dp)
         user_messages.register_handlers(dp)
         
+        from app.services.broadcast_service import broadcast_service
+        broadcast_service.set_bot(bot)
+        return True
+    except Exception as e:
+        logger.error(f"Bot setup error: {e}", exc_info=True)
+        return False
+
+
+async def run_polling():
+    try:
         logger.info("Bot started polling...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), close_bot_session=False)
     except Exception as e:
         logger.error(f"Bot polling error: {e}", exc_info=True)
 
 
+async def stop_polling():
+    global polling_task
+    if polling_task is None:
+        return
+    if dp and polling_task.done() is False:
+        try:
+            await dp.stop_polling()
+        except RuntimeError:
+            # Поллинг ещё не успел запуститься
+            polling_task.cancel()
+    try:
+        await polling_task
+    except asyncio.CancelledError:
+        pass
+    polling_task = None
+
+
 async def stop_bot():
-    global bot, dp
-    if dp:
-        await dp.stop_polling()
+    await stop_polling()
     if bot:
         await bot.session.close()
 
 
+async def start_leader_services():
+    """Поллинг и планировщики, которые должны работать в единственном экземпляре."""
+    global polling_task
+    from app.services.broadcast_service import broadcast_service
+    from app.services.daily_billing_service import daily_billing_service
+    from app.services.stats_rollup_service import stats_rollup_service
+    from app.database.crud.subscription_squad import ensure_subscription_squads_index
+    from app.database.crud.ticket_sla import ensure_ticket_sla_schedule
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            await ensure_subscription_squads_index(db)
+    except Exception as e:
+        logger.error(f"Ошибка построения индекса подписок по сквадам: {e}")
+    
+    try:
+        async with AsyncSessionLocal() as db:
+            await ensure_ticket_sla_schedule(db)
+    except Exception as e:
+        logger.error(f"Ошибка построения очереди SLA-напоминаний: {e}")
+    
+    await stats_rollup_service.start()
+    await daily_billing_service.initialize()
+    logger.info("Daily billing service initialized")
+    
+    if bot is None:
+        return
+    resumed = await broadcast_service.resume_pending_broadcasts()
+    if resumed:
+        logger.info(f"Resumed {resumed} unfinished broadcasts")
+    polling_task = asyncio.create_task(run_polling())
+
+
+async def stop_leader_services():
+    from app.services.broadcast_service import broadcast_service
+    from app.services.daily_billing_service import daily_billing_service
+    from app.services.stats_rollup_service import stats_rollup_service
+    
+    await stop_polling()
+    await daily_billing_service.stop()
+    await stats_rollup_service.stop()
+    await broadcast_service.shutdown()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from app.services.daily_billing_service import daily_billing_service
+    from app.external.remnawave_api import close_shared_sessions
+    from app.services.admin_notification_dispatcher import admin_notification_dispatcher
+    from app.services.shared_state_service import shared_state
+    from app.services.telegram_send_scheduler import telegram_send_scheduler
+    from app.services.user_context_service import user_context_service
     
     await init_db()
     logger.info("Database initialized")
     
-    bot_task = asyncio.create_task(start_bot())
-    await daily_billing_service.initialize()
-    logger.info("Daily billing service initialized")
+    await shared_state.connect()
+    await user_context_service.start()
+    
+    setup_bot()
+    leader = shared_state.leader("schedulers", start_leader_services, stop_leader_services)
+    await leader.start()
     
     yield
     
-    await daily_billing_service.stop()
+    await leader.stop()
+    await admin_notification_dispatcher.stop()
     await stop_bot()
-    bot_task.cancel()
-    try:
-        await bot_task
-    except asyncio.CancelledError:
-        pass
+    await user_context_service.stop()
+    await telegram_send_scheduler.stop()
+    await close_shared_sessions()
+    if dp:
+        await dp.storage.close()
+    await shared_state.close()
 
 
 app = FastAPI(title="VPN Bot", lifespan=lifespan)